@@ -0,0 +1,141 @@
+import base64
+import json
+import os
+import time
+import pyotp
+
+# --- SMARTAPI SESSION MANAGER ---
+# Logs in once, keeps the JWT / refresh / feed tokens in a private file and reuses them
+# across runs. Tokens are refreshed shortly before the JWT expires; a full TOTP login
+# only happens when there is no saved session or the refresh is rejected.
+SESSION_FILE = ".angel_session.json"
+REFRESH_MARGIN_SECONDS = 30 * 60        # Refresh when the JWT has less than 30 min left
+FALLBACK_LIFETIME_SECONDS = 6 * 3600    # Used if the JWT carries no 'exp' claim
+TOKEN_ERROR_CODES = {"AG8001", "AG8002", "AG8003"}  # Invalid / expired / missing token
+
+def _strip_bearer(token):
+    return token[7:] if token and token.startswith("Bearer ") else token
+
+def jwt_expiry(token):
+    """Reads the 'exp' claim (epoch seconds) from a JWT without verifying it. None if unreadable."""
+    try:
+        payload = _strip_bearer(token).split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+    except Exception:
+        return None
+
+def is_token_error(response):
+    """True if a SmartAPI response says the session token is invalid or expired."""
+    return isinstance(response, dict) and response.get('errorcode') in TOKEN_ERROR_CODES
+
+def _default_connect(api_key):
+    from SmartApi import SmartConnect
+    return SmartConnect(api_key=api_key)
+
+class SessionManager:
+    """
+    Owns one SmartConnect object for the life of the process. Call get() before each scan;
+    it returns the same object with valid tokens, refreshing or logging in as needed.
+    """
+
+    def __init__(self, credentials, session_file=SESSION_FILE, connect_factory=_default_connect,
+                 refresh_margin=REFRESH_MARGIN_SECONDS, clock=time.time):
+        self.api_key = credentials['api_key']
+        self.client_id = credentials['client_id']
+        self.pin = credentials['pin']
+        self.totp_secret = credentials['totp_secret']
+        self.session_file = session_file
+        self.refresh_margin = refresh_margin
+        self.clock = clock
+        self.api = connect_factory(self.api_key)
+        self.tokens = None
+
+    # --- persistence ---
+    def _load_saved(self):
+        if not os.path.exists(self.session_file):
+            return None
+        try:
+            with open(self.session_file, 'r') as f:
+                saved = json.load(f)
+        except Exception:
+            return None
+        # Never reuse a session that belongs to another account / app key
+        if saved.get('client_id') != self.client_id or saved.get('api_key') != self.api_key:
+            return None
+        return saved
+
+    def _save(self):
+        tmp_path = self.session_file + ".tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.tokens, f)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, self.session_file)
+
+    def clear(self):
+        """Forgets the saved session (next get() does a fresh login)."""
+        self.tokens = None
+        if os.path.exists(self.session_file):
+            os.remove(self.session_file)
+
+    # --- token handling ---
+    def _apply(self, jwt, refresh_token, feed_token):
+        jwt = _strip_bearer(jwt)
+        self.api.setAccessToken(jwt)
+        self.api.setRefreshToken(refresh_token)
+        self.api.setFeedToken(feed_token)
+        self.api.setUserId(self.client_id)
+        expires_at = jwt_expiry(jwt) or int(self.clock() + FALLBACK_LIFETIME_SECONDS)
+        self.tokens = {
+            "client_id": self.client_id, "api_key": self.api_key,
+            "jwt_token": jwt, "refresh_token": refresh_token, "feed_token": feed_token,
+            "expires_at": expires_at
+        }
+        self._save()
+
+    def _needs_refresh(self):
+        return self.tokens is None or self.clock() >= self.tokens['expires_at'] - self.refresh_margin
+
+    def login(self):
+        """Full TOTP login. Raises RuntimeError if Angel One rejects it."""
+        totp = pyotp.TOTP(self.totp_secret).now()
+        session = self.api.generateSession(self.client_id, self.pin, totp)
+        if not session or not session.get('status'):
+            raise RuntimeError(f"Angel One Login Failed: {session}")
+        d = session['data']
+        self._apply(d['jwtToken'], d['refreshToken'], d['feedToken'])
+        print("✅ SmartAPI Login Successful!")
+
+    def refresh(self):
+        """Exchanges the refresh token for a new JWT. Returns False if the refresh was rejected."""
+        if not self.tokens:
+            return False
+        try:
+            res = self.api.generateToken(self.tokens['refresh_token'])
+        except Exception as e:
+            print(f"⚠️ SmartAPI token refresh error: {e}")
+            return False
+        if not res or not res.get('status') or not res.get('data'):
+            print(f"⚠️ SmartAPI token refresh rejected: {res}")
+            return False
+        d = res['data']
+        self._apply(d['jwtToken'], d.get('refreshToken', self.tokens['refresh_token']),
+                    d.get('feedToken', self.tokens['feed_token']))
+        print("🔄 SmartAPI session refreshed.")
+        return True
+
+    def get(self, force_refresh=False):
+        """Returns the SmartConnect object with a valid session."""
+        if self.tokens is None:
+            saved = self._load_saved()
+            if saved:
+                # Even an expired JWT is worth restoring: its refresh token may still be valid
+                self._apply(saved['jwt_token'], saved['refresh_token'], saved['feed_token'])
+                if not self._needs_refresh():
+                    print("♻️ Reusing saved SmartAPI session.")
+
+        if force_refresh or self._needs_refresh():
+            if not self.refresh():
+                self.login()
+        return self.api
@@ -0,0 +1,282 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+import requests
+import angel_session
+import candle_store
+import resampler
+import trading_calendar
+
+# --- GAP-AWARE HISTORICAL BACKFILL ---
+# The bots only ever fetch the last 60 days. This job builds deep history in the candle store:
+# for every instrument it compares the stored bars with the exchange calendar, turns the days
+# that are missing (or short) into ranges, splits them into requests SmartAPI will answer in
+# one go, and fetches those concurrently under a shared rate limit. Results are merged into
+# the store (idempotent: same timestamp = same row), so a rerun only asks for what is still
+# missing. Days the API answered without (all) bars - unlisted holidays, pre-listing, a day
+# still being published - are counted in the state file per series; after SHORT_DAY_ATTEMPTS
+# such answers the day is taken as all there is and not asked for again.
+CONFIG_FILE = "config.json"
+SCRIP_MASTER_URL = "https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json"
+STATE_FILE = "backfill_state.json"       # Inside candle_store.CANDLE_DIR
+# Longest date range getCandleData serves per request, by interval
+MAX_DAYS_PER_REQUEST = {
+    "ONE_MINUTE": 30, "THREE_MINUTE": 60, "FIVE_MINUTE": 100, "TEN_MINUTE": 100,
+    "FIFTEEN_MINUTE": 200, "THIRTY_MINUTE": 200, "ONE_HOUR": 400, "ONE_DAY": 2000,
+}
+REQUESTS_PER_SECOND = 3                  # SmartAPI's historical-data limit
+MAX_WORKERS = 4
+RETRIES = 3
+RETRY_DELAY_SECONDS = 2.0
+SHORT_DAY_ATTEMPTS = 3                   # Answers a day may come back short before it is left as is
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all threads."""
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 1.0 / rate
+        self.clock = clock
+        self.sleep = sleep
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = self.clock()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            self.sleep(slot - now)
+
+# --- CALENDAR & GAPS ---
+# Trading days and session lengths come from trading_calendar (holidays and special sessions included)
+def bars_per_day(exchange, interval, day, calendar=None):
+    """Bars the sessions of `day` hold at `interval` (each session's last one may be cut short by its close)."""
+    if interval == "ONE_DAY":
+        return 1
+    return (calendar or trading_calendar.get()).bars_on(exchange, day, resampler.INTERVAL_SECONDS[interval])
+
+def last_complete_day(exchange="NSE", now=None, calendar=None):
+    """Today once its last session has closed, otherwise yesterday."""
+    now = (now or datetime.now(timezone.utc)).astimezone(trading_calendar.IST)
+    bounds = (calendar or trading_calendar.get()).session_bounds(exchange, now.date())
+    return now.date() if not bounds or now >= bounds[-1][1] else now.date() - timedelta(days=1)
+
+def missing_days(ts, days, exchange, interval, checked=(), calendar=None):
+    """The trading days in `days` with fewer stored bars than their sessions hold, skipping days already checked."""
+    counts = {}
+    if ts is not None and len(ts):
+        local = candle_store.from_epoch(ts).date
+        dates, n = np.unique(local, return_counts=True)
+        counts = dict(zip(dates, n))
+    checked = set(checked)
+    return [d for d in days if counts.get(d, 0) < bars_per_day(exchange, interval, d, calendar) and d.isoformat() not in checked]
+
+def split_ranges(missing, days, max_days):
+    """
+    Runs of consecutive trading days (weekends / holidays do not break a run), each split so
+    no request spans more than max_days calendar days. Returns [(first_day, last_day, [days])].
+    """
+    position = {d: i for i, d in enumerate(days)}
+    chunks, current = [], []
+    for d in missing:
+        if current and (position[d] != position[current[-1]] + 1 or (d - current[0]).days >= max_days):
+            chunks.append((current[0], current[-1], current))
+            current = []
+        current.append(d)
+    if current:
+        chunks.append((current[0], current[-1], current))
+    return chunks
+
+# --- STATE ---
+def state_path():
+    return os.path.join(candle_store.CANDLE_DIR, STATE_FILE)
+
+def load_state():
+    if os.path.exists(state_path()):
+        try:
+            with open(state_path(), 'r') as f: return json.load(f)
+        except Exception: pass
+    return {}
+
+def save_state(state):
+    os.makedirs(candle_store.CANDLE_DIR, exist_ok=True)
+    tmp_path = state_path() + ".tmp"
+    with open(tmp_path, 'w') as f: json.dump(state, f, indent=1)
+    os.replace(tmp_path, state_path())
+
+def series_key(inst, interval):
+    return f"{inst['exchange']}:{inst['symbol']}:{interval}"
+
+def short_answers(state, key):
+    """{day: times the API answered it short} of one series (older state files listed days given up on)."""
+    entry = state.get(key, {})
+    return {d: SHORT_DAY_ATTEMPTS for d in entry} if isinstance(entry, list) else dict(entry)
+
+def given_up(state, key):
+    """Days of one series that came back short SHORT_DAY_ATTEMPTS times."""
+    return {d for d, n in short_answers(state, key).items() if n >= SHORT_DAY_ATTEMPTS}
+
+# --- PLANNING & FETCHING ---
+def plan(instruments, interval, start, end, calendar=None, state=None):
+    """Every request needed to fill the gaps of `instruments` between start and end: [(inst, first_day, last_day, days)]."""
+    calendar = calendar or trading_calendar.get()
+    state = state or {}
+    requests_ = []
+    for inst in instruments:
+        days = calendar.trading_days(inst['exchange'], start, end)
+        arr = candle_store.load_arrays(inst['exchange'], inst['symbol'], interval, mmap=True)
+        ts = None if arr is None else arr['ts']
+        missing = missing_days(ts, days, inst['exchange'], interval, given_up(state, series_key(inst, interval)), calendar)
+        for first, last, chunk_days in split_ranges(missing, days, MAX_DAYS_PER_REQUEST[interval]):
+            requests_.append((inst, first, last, chunk_days))
+    return requests_
+
+def fetch_range(api, inst, interval, first, last, limiter, session=None):
+    """
+    Candles of one instrument from the start of `first` to the end of `last` as a DataFrame
+    (empty if the exchange has none). Raises RuntimeError once the retries are used up.
+    """
+    params = {
+        "exchange": inst['exchange'],
+        "symboltoken": str(inst['token']),
+        "interval": interval,
+        "fromdate": f"{first.isoformat()} 00:00",
+        "todate": f"{last.isoformat()} 23:59",
+    }
+    error = None
+    for attempt in range(RETRIES):
+        limiter.wait()
+        try:
+            res = api.getCandleData(params)
+            if angel_session.is_token_error(res) and session is not None:
+                session.get(force_refresh=True)
+                limiter.wait()
+                res = api.getCandleData(params)
+            if res and res.get('status'):
+                columns = ['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume']
+                return pd.DataFrame(res.get('data') or [], columns=columns)
+            error = res.get('message') if res else res
+        except Exception as e:
+            error = e
+        if attempt < RETRIES - 1:
+            time.sleep(RETRY_DELAY_SECONDS * (attempt + 1))
+    raise RuntimeError(f"{inst['symbol']} {first}..{last}: {error}")
+
+def backfill(api, instruments, interval, start, end=None, calendar=None, derive=(), session=None,
+             max_workers=MAX_WORKERS, limiter=None):
+    """
+    Fills the gaps of every instrument's `interval` series between start and end (dates), then
+    brings the `derive` timeframes up to date. Instruments are {"exchange", "symbol", "token"}
+    dicts, symbol being the candle store name. Returns a summary dict.
+    """
+    limiter = limiter or RateLimiter()
+    calendar = calendar or trading_calendar.get()
+    state = load_state()
+    if end is None:
+        end = min((last_complete_day(inst['exchange'], calendar=calendar) for inst in instruments),
+                  default=last_complete_day(calendar=calendar))
+    todo = plan(instruments, interval, start, end, calendar, state)
+    print(f"🧩 {len(todo)} request(s) to fill gaps in {len(instruments)} series ({interval}, {start} .. {end})")
+
+    summary = {"requests": len(todo), "bars": 0, "failed": 0}
+    oldest_new = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(fetch_range, api, inst, interval, first, last, limiter, session): (inst, days)
+                   for inst, first, last, days in todo}
+        # Merging happens here on one thread, so no two writers ever touch the same series file
+        for future in as_completed(futures):
+            inst, days = futures[future]
+            try:
+                df = future.result()
+            except Exception as e:
+                summary["failed"] += 1
+                print(f"⚠️ Backfill request failed, will retry next run: {e}")
+                continue
+            key = series_key(inst, interval)
+            if len(df):
+                records = candle_store.frame_to_records(df)
+                candle_store.merge_records(inst['exchange'], inst['symbol'], interval, records)
+                summary["bars"] += len(records)
+                oldest_new[key] = min(oldest_new.get(key, records['ts'][0]), int(records['ts'][0]))
+            # Days still short of the calendar are counted; complete ones leave the state
+            arr = candle_store.load_arrays(inst['exchange'], inst['symbol'], interval, mmap=True)
+            short = {d.isoformat() for d in missing_days(None if arr is None else arr['ts'], days, inst['exchange'], interval,
+                                                         calendar=calendar)}
+            answers = short_answers(state, key)
+            for d in days:
+                d = d.isoformat()
+                if d in short:
+                    answers[d] = answers.get(d, 0) + 1
+                else:
+                    answers.pop(d, None)
+            state[key] = dict(sorted(answers.items()))
+    save_state(state)
+
+    for inst in instruments:
+        since = oldest_new.get(series_key(inst, interval))
+        if since is None:
+            continue
+        for target in derive:
+            resampler.update(inst['exchange'], inst['symbol'], interval, target, since=since)
+    print(f"✅ Backfill done: {summary['bars']} bar(s) from {summary['requests'] - summary['failed']} request(s), {summary['failed']} failed")
+    return summary
+
+# --- INSTRUMENTS ---
+def equity_instruments(symbols):
+    """NSE equity instruments for the given base symbols (stored as the bots store them)."""
+    response = requests.get(SCRIP_MASTER_URL, timeout=30)
+    tokens = {row['symbol'][:-3]: row['token'] for row in response.json()
+              if row['exch_seg'] == "NSE" and row['symbol'].endswith("-EQ")}
+    instruments = []
+    for symbol in symbols:
+        if symbol in tokens:
+            instruments.append({"exchange": "NSE", "symbol": symbol, "token": tokens[symbol]})
+        else:
+            print(f"⚠️ Token not found for {symbol}")
+    return instruments
+
+def futures_instruments(meta_file=None):
+    """
+    The DMI bot's continuous futures series, filled from their active contracts. Expired
+    contracts are not served by SmartAPI, so history before the active contract's listing
+    stays empty (those days are recorded as checked).
+    """
+    meta_file = meta_file or os.path.join(candle_store.CANDLE_DIR, "continuous_contracts.json")
+    if not os.path.exists(meta_file):
+        print(f"⚠️ {meta_file} not found - run dmi_bot.py once first")
+        return []
+    with open(meta_file, 'r') as f:
+        meta = json.load(f)
+    return [{"exchange": c['exchange'], "symbol": f"{script}_CONT", "token": c['token']} for script, c in meta.items()]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill gaps in the local SmartAPI candle history.")
+    parser.add_argument("--symbols", nargs="+", help="NSE equities (default: the config watchlist)")
+    parser.add_argument("--futures", action="store_true", help="Also fill the DMI bot's continuous futures")
+    parser.add_argument("--years", type=float, default=5.0)
+    parser.add_argument("--interval", default="FIFTEEN_MINUTE", help="Base resolution to fetch")
+    parser.add_argument("--derive", nargs="*", default=["1h"], help="Timeframes to resample from it")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    args = parser.parse_args()
+
+    with open(CONFIG_FILE, 'r') as f:
+        config = json.load(f)
+    interval = resampler.parse_timeframe(args.interval)
+    derive = [resampler.parse_timeframe(t) for t in args.derive]
+    symbols = args.symbols or [t.replace(".NS", "") for t in config.get('watchlist', [])]
+    instruments = equity_instruments(symbols)
+    if args.futures:
+        instruments += futures_instruments()
+
+    session = angel_session.SessionManager(config['angel_one'])
+    api = session.get()
+    start = (datetime.now() - timedelta(days=int(args.years * 365))).date()
+    backfill(api, instruments, interval, start, calendar=trading_calendar.from_config(config), derive=derive,
+             session=session, max_workers=args.workers)
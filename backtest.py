@@ -1,13 +1,28 @@
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
 import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from numba import njit
+import monte_carlo
+import candle_store
+import resampler
+import equity_curve
+import excursions
+import results_store
+import strategies
 
 # --- SETTINGS ---
 INITIAL_CAPITAL = 2000000.0  # 20 Lakhs
 RISK_PER_TRADE_PCT = 0.005   # 0.5% Risk per trade
 BROKERAGE_RATE = 0.0015      # 0.15% per side
-HARD_STOP_PCT = 0.02         # 2% Hard Stop Loss
+STRATEGY = strategies.STRATEGIES["t3_reversal"]
+HARD_STOP_PCT = STRATEGY.hard_stop_pct  # 2% Hard Stop Loss
+MONTE_CARLO_RUNS = 20000     # Resampled equity paths per backtest (0 to skip)
 
 # yfinance only allows 1h data for the last 730 days. 
 # Calculating dates dynamically for the max 1h window.
@@ -17,35 +32,39 @@ START_DATE = (datetime.today() - timedelta(days=729)).strftime('%Y-%m-%d')
 # Target Ticker: Nifty 50 Spot Index
 TICKER = "^NSEI" 
 
+# --- MINUTE-RESOLUTION MODE ---
+# Hourly signals, but stops are filled against locally stored 1-minute bars
+# (see candle_store.py) so we know whether the stop or the close came first.
+MINUTE_EXCHANGE = "NSE"
+MINUTE_SYMBOL = "NIFTY"
+MINUTE_INTERVAL = "ONE_MINUTE"
+REASON_HARD_SL, REASON_TRAIL_SL, REASON_REVERSAL = 0, 1, 2
+TRADE_TIME_FORMAT = '%Y-%m-%d %H:%M'
+
+# --- UNIVERSE MODE ---
+# The same hourly T3 system over many symbols at once, one worker process per core, each
+# reading its symbol's bars from the local candle store (filled by the bots / backfill.py).
+UNIVERSE_EXCHANGE = "NSE"
+UNIVERSE_INTERVAL = "ONE_HOUR"
+UNIVERSE_BASE_INTERVAL = "FIFTEEN_MINUTE"    # Resampled on the fly when no hourly series is stored
+CONFIG_FILE = "config.json"
+
 def calculate_t3(df, length=8, v_factor=0.7):
     """
-    Calculates Tillson T3 Moving Average.
-    """
-    # Calculate EMA constants
-    a = v_factor
-    c1 = -a**3
-    c2 = 3*a**2 + 3*a**3
-    c3 = -6*a**2 - 3*a - 3*a**3
-    c4 = 1 + 3*a + a**3 + 3*a**2
-
-    # Calculate sequential EMAs
-    e1 = df['Close'].ewm(span=length, adjust=False).mean()
-    e2 = e1.ewm(span=length, adjust=False).mean()
-    e3 = e2.ewm(span=length, adjust=False).mean()
-    e4 = e3.ewm(span=length, adjust=False).mean()
-    e5 = e4.ewm(span=length, adjust=False).mean()
-    e6 = e5.ewm(span=length, adjust=False).mean()
-
-    # T3 Formula
-    df['T3'] = c1*e6 + c2*e5 + c3*e4 + c4*e3
+    Calculates Tillson T3 Moving Average (the same indicator node the live strategies use).
+    """
+    graph = strategies.IndicatorGraph(df)
+    graph.register(strategies.t3(length, v_factor))
+    graph.require('T3')
+    df['T3'] = graph.df['T3']
     return df
 
-def run_backtest(ticker):
-    # Download Hourly Data
+def load_hourly(ticker):
+    """Downloads the hourly bars for `ticker` with T3 attached. Empty if there is too little data."""
     df = yf.download(ticker, start=START_DATE, end=END_DATE, interval="1h", progress=False)
     
     if df.empty or len(df) < 50: 
-        return []
+        return df.iloc[0:0]
     
     # Flatten MultiIndex if necessary (recent yfinance updates)
     if isinstance(df.columns, pd.MultiIndex):
@@ -54,6 +73,14 @@ def run_backtest(ticker):
     # --- INDICATOR CALCULATIONS ---
     df = calculate_t3(df, length=8, v_factor=0.7)
     df.dropna(inplace=True)
+    return df
+
+def run_backtest(ticker, df=None):
+    # Download Hourly Data (unless the caller already has it)
+    if df is None:
+        df = load_hourly(ticker)
+    if df.empty:
+        return []
     
     # --- TRADING LOGIC ---
     trades = []
@@ -61,13 +88,16 @@ def run_backtest(ticker):
     entry_price = 0.0
     entry_date = None
     qty = 0
+    # Plain arrays: per-element .iloc lookups dominated the loop's run time
+    dates = df.index.to_pydatetime()
+    closes, highs, lows, t3s = (df[col].to_numpy(dtype=float) for col in ('Close', 'High', 'Low', 'T3'))
     
     for i in range(1, len(df)):
-        curr_date = df.index[i]
-        close = df['Close'].iloc[i]
-        high = df['High'].iloc[i]
-        low = df['Low'].iloc[i]
-        t3_val = df['T3'].iloc[i]
+        curr_date = dates[i]
+        close = closes[i]
+        high = highs[i]
+        low = lows[i]
+        t3_val = t3s[i]
         
         # Check Crosses for Entry/Exit signals
         bullish_close = close > t3_val
@@ -147,6 +177,245 @@ def run_backtest(ticker):
 
     return trades
 
+def build_hourly_bars(ts):
+    """
+    Groups 1-minute timestamps (UTC epoch seconds) into NSE hourly candles anchored at 09:15 IST.
+    Returns the first and one-past-last minute index of every hourly bar.
+    """
+    return resampler.bucket_bounds(ts, resampler.INTERVAL_SECONDS["ONE_HOUR"], MINUTE_EXCHANGE)
+
+@njit(cache=True)
+def _minute_backtest_kernel(m_open, m_high, m_low, bar_start, bar_end, h_close, h_t3, hard_stop_pct, risk_amount, trail):
+    """
+    Same T3 rules as run_backtest, but an open position walks the minutes of each hourly bar:
+    a stop is filled at the stop price, or at the minute's open if price gapped through it.
+    With trail=True the bot.py rule (breakeven at 1R, lock 1R at 2R) ratchets minute by minute,
+    always testing the stop before the minute's high can move it.
+    """
+    n_bars = len(h_close)
+    max_trades = 2 * n_bars
+    t_entry_bar = np.empty(max_trades, dtype=np.int64)
+    t_exit_bar = np.empty(max_trades, dtype=np.int64)
+    t_exit_min = np.empty(max_trades, dtype=np.int64)
+    t_side = np.empty(max_trades, dtype=np.int64)
+    t_entry_px = np.empty(max_trades)
+    t_exit_px = np.empty(max_trades)
+    t_qty = np.empty(max_trades, dtype=np.int64)
+    t_reason = np.empty(max_trades, dtype=np.int64)
+    k = 0
+
+    position = 0
+    entry_price = 0.0
+    entry_bar = 0
+    qty = 0
+    stop = 0.0
+    best = 0.0
+
+    for i in range(1, n_bars):
+        close = h_close[i]
+        t3_val = h_t3[i]
+
+        if position != 0:
+            risk = entry_price * hard_stop_pct
+            stopped = False
+            fill = 0.0
+            for m in range(bar_start[i], bar_end[i]):
+                if position == 1:
+                    if m_open[m] <= stop:
+                        fill, stopped = m_open[m], True
+                    elif m_low[m] <= stop:
+                        fill, stopped = stop, True
+                else:
+                    if m_open[m] >= stop:
+                        fill, stopped = m_open[m], True
+                    elif m_high[m] >= stop:
+                        fill, stopped = stop, True
+
+                if stopped:
+                    t_entry_bar[k], t_exit_bar[k], t_exit_min[k] = entry_bar, i, m
+                    t_side[k], t_entry_px[k], t_exit_px[k], t_qty[k] = position, entry_price, fill, qty
+                    trailed = (stop > entry_price * (1 - hard_stop_pct)) if position == 1 else (stop < entry_price * (1 + hard_stop_pct))
+                    t_reason[k] = REASON_TRAIL_SL if trailed else REASON_HARD_SL
+                    k += 1
+                    position = 0
+                    break
+
+                if trail:
+                    if position == 1 and m_high[m] > best:
+                        best = m_high[m]
+                        r_multiple = (best - entry_price) / risk
+                        if r_multiple >= 2.0:
+                            stop = max(stop, entry_price + risk)
+                        elif r_multiple >= 1.0:
+                            stop = max(stop, entry_price)
+                    elif position == -1 and m_low[m] < best:
+                        best = m_low[m]
+                        r_multiple = (entry_price - best) / risk
+                        if r_multiple >= 2.0:
+                            stop = min(stop, entry_price - risk)
+                        elif r_multiple >= 1.0:
+                            stop = min(stop, entry_price)
+
+            if stopped:
+                continue  # Flat for the rest of the bar, as in the hourly test
+
+        new_side = 0
+        if position == 1 and close < t3_val:
+            new_side = -1
+        elif position == -1 and close > t3_val:
+            new_side = 1
+        elif position == 0:
+            if close > t3_val:
+                new_side = 1
+            elif close < t3_val:
+                new_side = -1
+
+        if new_side == 0:
+            continue
+
+        if position != 0:
+            t_entry_bar[k], t_exit_bar[k], t_exit_min[k] = entry_bar, i, -1
+            t_side[k], t_entry_px[k], t_exit_px[k], t_qty[k] = position, entry_price, close, qty
+            t_reason[k] = REASON_REVERSAL
+            k += 1
+
+        risk_per_share = close * hard_stop_pct
+        qty = int(risk_amount / risk_per_share) if risk_per_share > 0 else 0
+        position = new_side if qty > 0 else 0
+        entry_price = close
+        entry_bar = i
+        best = close
+        stop = close * (1 - hard_stop_pct) if new_side == 1 else close * (1 + hard_stop_pct)
+
+    return (t_entry_bar[:k], t_exit_bar[:k], t_exit_min[:k], t_side[:k],
+            t_entry_px[:k], t_exit_px[:k], t_qty[:k], t_reason[:k])
+
+def minute_hourly_closes(symbol=MINUTE_SYMBOL, exchange=MINUTE_EXCHANGE, start=None, end=None):
+    """Closes of the hourly bars run_backtest_minute trades on, indexed by bar start (exchange time)."""
+    minutes = candle_store.load_range(exchange, symbol, MINUTE_INTERVAL, start, end)
+    if minutes is None or len(minutes) == 0:
+        return pd.Series(dtype=float)
+    ts = np.asarray(minutes['ts'])
+    bar_start, bar_end = build_hourly_bars(ts)
+    return pd.Series(minutes['Close'][bar_end - 1], index=candle_store.from_epoch(ts[bar_start]))
+
+def run_backtest_minute(symbol=MINUTE_SYMBOL, exchange=MINUTE_EXCHANGE, trail=False, start=None, end=None):
+    """
+    Runs the hourly T3 system with intrabar stop resolution on 1-minute bars from the local
+    candle store (memory-mapped, nothing is downloaded), optionally between start and end.
+    Returns the same trade dicts as run_backtest.
+    """
+    minutes = candle_store.load_range(exchange, symbol, MINUTE_INTERVAL, start, end)
+    if minutes is None or len(minutes) == 0:
+        print(f"⚠️ No 1-minute data stored for {exchange}:{symbol}. Import it with candle_store.py first.")
+        return []
+
+    # Only the requested rows are copied out of the map, and only the columns the kernel walks;
+    # closes are read at the last minute of each hour
+    ts = np.asarray(minutes['ts'])
+    m_open = np.ascontiguousarray(minutes['Open'])
+    m_high = np.ascontiguousarray(minutes['High'])
+    m_low = np.ascontiguousarray(minutes['Low'])
+
+    bar_start, bar_end = build_hourly_bars(ts)
+    if len(bar_start) < 50:
+        return []
+    hourly = pd.DataFrame({'Close': minutes['Close'][bar_end - 1]})
+    hourly = calculate_t3(hourly, length=8, v_factor=0.7)
+
+    risk_amount = INITIAL_CAPITAL * RISK_PER_TRADE_PCT
+    entry_bar, exit_bar, exit_min, side, entry_px, exit_px, qty, reason = _minute_backtest_kernel(
+        m_open, m_high, m_low, bar_start, bar_end,
+        hourly['Close'].to_numpy(), hourly['T3'].to_numpy(),
+        HARD_STOP_PCT, risk_amount, trail
+    )
+
+    bar_times = candle_store.from_epoch(ts[bar_start])
+    minute_times = candle_store.from_epoch(ts[exit_min[exit_min >= 0]]) if (exit_min >= 0).any() else []
+    minute_iter = iter(minute_times)
+
+    trades = []
+    for n in range(len(entry_bar)):
+        is_long = side[n] == 1
+        exit_date = next(minute_iter) if exit_min[n] >= 0 else bar_times[exit_bar[n]]
+        if reason[n] == REASON_REVERSAL:
+            exit_reason = "T3 Cross Down" if is_long else "T3 Cross Up"
+        elif reason[n] == REASON_TRAIL_SL:
+            exit_reason = "Trailing SL Hit"
+        else:
+            exit_reason = "2% SL Hit"
+
+        e_px, x_px, q = float(entry_px[n]), float(exit_px[n]), int(qty[n])
+        gross_pnl = (x_px - e_px) * q if is_long else (e_px - x_px) * q
+        brokerage = (e_px * q * BROKERAGE_RATE) + (x_px * q * BROKERAGE_RATE)
+        net_pnl = gross_pnl - brokerage
+        trades.append(create_trade_log(symbol, "LONG" if is_long else "SHORT", bar_times[entry_bar[n]], exit_date,
+                                       e_px, x_px, q, gross_pnl, brokerage, net_pnl, e_px * q, exit_reason))
+    return trades
+
+def mark_to_market(closes, trades, capital=INITIAL_CAPITAL, brokerage_rate=BROKERAGE_RATE):
+    """
+    Bar-level mark-to-market equity for a trade log, in one vectorized pass (no per-bar loop):
+    the signed quantity held into every bar times that bar's close-to-close change, plus the
+    difference between fill and close and the brokerage on the entry / exit bars.
+    At every exit bar the equity equals capital plus the cumulative Net P/L of the trade log.
+
+    closes: hourly closes indexed by bar start - a Series for a single instrument, or a DataFrame
+            with one column per 'Ticker' for multi-symbol runs.
+    trades: create_trade_log dicts; a stop filled inside a bar belongs to that bar.
+    Returns a DataFrame with Equity, Peak, Drawdown (%), Exposure (% gross notional / equity)
+    and Open (positions held into the bar).
+    """
+    single = isinstance(closes, pd.Series)
+    closes = (closes.to_frame() if single else closes).sort_index().ffill()
+    prices = np.nan_to_num(closes.to_numpy(dtype=float))  # Before a ticker's first bar nothing is held
+    n_bars, n_cols = prices.shape
+    held = np.zeros((n_bars + 1, n_cols))
+    flows = np.zeros(n_bars)
+
+    if trades:
+        log = pd.DataFrame(trades)
+        labels = closes.index.strftime(TRADE_TIME_FORMAT).to_numpy()
+        entry_bar = np.searchsorted(labels, log['Entry Date'].to_numpy(), side='right') - 1
+        exit_bar = np.searchsorted(labels, log['Exit Date'].to_numpy(), side='right') - 1
+        col = np.zeros(len(log), dtype=np.int64) if single else closes.columns.get_indexer(log['Ticker'])
+        if (entry_bar < 0).any() or (col < 0).any():
+            raise ValueError("trades reference bars or tickers missing from closes")
+
+        entry_px = log['Entry Price'].to_numpy(dtype=float)
+        signed = np.where(log['Type'] == 'LONG', 1.0, -1.0) * log['Qty'].to_numpy(dtype=float)
+        entry_cost = entry_px * np.abs(signed) * brokerage_rate
+
+        # Held from the bar after entry through the exit bar
+        np.add.at(held, (entry_bar + 1, col), signed)
+        np.add.at(held, (exit_bar + 1, col), -signed)
+        # Entry fill vs. that bar's close; at the exit, whatever makes the trade total its Net P/L
+        np.add.at(flows, entry_bar, -signed * (entry_px - prices[entry_bar, col]) - entry_cost)
+        np.add.at(flows, exit_bar, log['Net P/L'].to_numpy(dtype=float)
+                  - signed * (prices[exit_bar, col] - entry_px) + entry_cost)
+
+    held = held.cumsum(axis=0)[:n_bars]
+    change = np.diff(prices, axis=0, prepend=prices[:1])
+    equity = capital + np.cumsum((held * change).sum(axis=1) + flows)
+    peak = np.maximum.accumulate(equity)
+    return pd.DataFrame({
+        'Equity': equity,
+        'Peak': peak,
+        'Drawdown': (peak - equity) / peak * 100,
+        'Exposure': (np.abs(held) * prices).sum(axis=1) / equity * 100,
+        'Open': (held != 0).sum(axis=1),
+    }, index=closes.index)
+
+def mtm_stats(mtm):
+    """Headline risk figures from a mark_to_market frame."""
+    in_market = mtm['Open'] > 0
+    return {
+        'max_drawdown': float(mtm['Drawdown'].max()),
+        'time_in_market': float(in_market.mean() * 100),
+        'avg_exposure': float(mtm.loc[in_market, 'Exposure'].mean()) if in_market.any() else 0.0,
+        'max_exposure': float(mtm['Exposure'].max()),
+    }
+
 def enter_trade(date, price, pos_type):
     """
     Helper to calculate position sizing for entering a trade.
@@ -165,8 +434,8 @@ def create_trade_log(ticker, type, entry_date, exit_date, entry_price, exit_pric
     return {
         'Ticker': ticker,
         'Type': type,
-        'Entry Date': entry_date.strftime('%Y-%m-%d %H:%M'),
-        'Exit Date': exit_date.strftime('%Y-%m-%d %H:%M'),
+        'Entry Date': entry_date.strftime(TRADE_TIME_FORMAT),
+        'Exit Date': exit_date.strftime(TRADE_TIME_FORMAT),
         'Exit Reason': reason,
         'Entry Price': round(entry_price, 2),
         'Exit Price': round(exit_price, 2),
@@ -177,14 +446,242 @@ def create_trade_log(ticker, type, entry_date, exit_date, entry_price, exit_pric
         'Return %': round((net_pnl / base_val) * 100, 2) if base_val > 0 else 0
     }
 
+def summarize(trades, closes):
+    """Report metrics of one run: trade statistics, closed-trade and mark-to-market risk."""
+    results_df = pd.DataFrame(trades).sort_values(by='Exit Date')
+    equity = INITIAL_CAPITAL + results_df['Net P/L'].cumsum()
+    peak = equity.cummax()
+    net_pl = float(results_df['Net P/L'].sum())
+    wins = int((results_df['Net P/L'] > 0).sum())
+    metrics = {
+        'trades': len(results_df),
+        'longs': int((results_df['Type'] == 'LONG').sum()),
+        'shorts': int((results_df['Type'] == 'SHORT').sum()),
+        'wins': wins,
+        'win_rate': wins / len(results_df) * 100,
+        'gross_pnl': float(results_df['Gross P/L'].sum()),
+        'brokerage': float(results_df['Brokerage'].sum()),
+        'net_pnl': net_pl,
+        'avg_pnl': float(results_df['Net P/L'].mean()),
+        'final_capital': INITIAL_CAPITAL + net_pl,
+        'roi': net_pl / INITIAL_CAPITAL * 100,
+        'max_drawdown': float(((peak - equity) / peak * 100).max()),
+    }
+    risk = mtm_stats(mark_to_market(closes, trades))
+    metrics['max_drawdown_mtm'] = risk.pop('max_drawdown')
+    metrics.update(risk)
+    return metrics
+
+
+def print_report(metrics):
+    print("\n" + "="*50)
+    print("      📊 STRATEGY PERFORMANCE REPORT")
+    print("="*50)
+    print(f"Total Trades:           {metrics['trades']} (Long: {metrics['longs']}, Short: {metrics['shorts']})")
+    print(f"Win Rate:               {metrics['win_rate']:.2f}% ({metrics['wins']} W / {metrics['trades'] - metrics['wins']} L)")
+    print("-" * 50)
+    print(f"Initial Capital:        ₹{INITIAL_CAPITAL:,.2f}")
+    print(f"Final Capital:          ₹{metrics['final_capital']:,.2f}")
+    print(f"Net Profit/Loss:        ₹{metrics['net_pnl']:,.2f} ({metrics['roi']:.2f}%)")
+    print(f"Gross Profit/Loss:      ₹{metrics['gross_pnl']:,.2f}")
+    print(f"Total Brokerage:        ₹{metrics['brokerage']:,.2f}")
+    print("-" * 50)
+    print(f"Avg P/L per Trade:      ₹{metrics['avg_pnl']:,.2f}")
+    print(f"Max Drawdown (closed):  {metrics['max_drawdown']:.2f}%")
+    print(f"Max Drawdown (MTM):     {metrics['max_drawdown_mtm']:.2f}%")
+    print(f"Time in Market:         {metrics['time_in_market']:.2f}% of bars")
+    print(f"Exposure (avg / max):   {metrics['avg_exposure']:.2f}% / {metrics['max_exposure']:.2f}% of equity")
+    print("="*50)
+
+def trade_excursions(trades, index_for, minute_stops=False):
+    """
+    Trade log with MAE / MFE columns (see excursions.py). Entries and closing-price exits are
+    stamped with hourly bar starts, so a trade is exposed from the bar after its entry bar
+    through its exit bar; R is the hard stop distance. With minute_stops (run_backtest_minute)
+    stop exits carry their fill minute instead and are exposed through that minute only.
+    index_for(ticker) gives the bars to measure on (hourly or finer).
+    """
+    log = pd.DataFrame(trades).reset_index(drop=True)
+    log['Risk'] = (log['Entry Price'] * HARD_STOP_PCT).round(2)
+    hour = resampler.INTERVAL_SECONDS["ONE_HOUR"]
+    end_offset = hour
+    if minute_stops:
+        end_offset = np.where(log['Exit Reason'].str.contains("SL Hit"), resampler.INTERVAL_SECONDS[MINUTE_INTERVAL], hour)
+    return excursions.for_trades(log, index_for, risk_col='Risk', offset=hour, end_offset=end_offset)
+
+def universe_bar_index(symbol):
+    """Finest stored bars of a universe symbol, for excursions."""
+    return (excursions.load_index(UNIVERSE_EXCHANGE, symbol, UNIVERSE_BASE_INTERVAL) or
+            excursions.load_index(UNIVERSE_EXCHANGE, symbol, UNIVERSE_INTERVAL))
+
+def backtest_code_version():
+    """Code hash of everything that decides a run's trades and metrics (see results_store)."""
+    return results_store.code_version(strategies, calculate_t3, run_backtest, enter_trade, build_hourly_bars,
+                                      _minute_backtest_kernel.py_func, run_backtest_minute, create_trade_log,
+                                      mark_to_market, mtm_stats, summarize, load_cached_hourly)
+
+def hourly_params(mode="hourly", trail=False):
+    return {"mode": mode, "t3_length": 8, "v_factor": 0.7,
+            "hard_stop_pct": HARD_STOP_PCT, "risk_pct": RISK_PER_TRADE_PCT, "brokerage_rate": BROKERAGE_RATE,
+            "capital": INITIAL_CAPITAL, "trail": trail}
+
+def load_cached_hourly(symbol, exchange=UNIVERSE_EXCHANGE, start=None, end=None):
+    """Hourly bars of `symbol` from the candle store with T3 attached (same shape as load_hourly). Empty if too short."""
+    df = candle_store.load_candles(exchange, symbol, UNIVERSE_INTERVAL, start, end)
+    if df.empty:
+        base = candle_store.load_candles(exchange, symbol, UNIVERSE_BASE_INTERVAL, start, end)
+        if not base.empty:
+            df = resampler.resample(base, UNIVERSE_INTERVAL, exchange)
+    if len(df) < 50:
+        return df.iloc[0:0].set_index('Timestamp')
+    df = calculate_t3(df.set_index('Timestamp'), length=8, v_factor=0.7)
+    df.dropna(inplace=True)
+    return df
+
+def _universe_worker(symbol, params, code, stored_keys, start, end):
+    """
+    One symbol of a universe run (executed in a worker process): loads the cached bars, and
+    backtests them unless this exact run is already stored. The store itself is only written
+    by the parent process. Returns (symbol, key, dataset, trades, metrics, closes).
+    """
+    df = load_cached_hourly(symbol, start=start, end=end)
+    if df.empty:
+        return symbol, None, None, [], None, None
+    dataset = results_store.dataset_fingerprint(symbol, df.index[:1], df.index[-1:], df[['Open', 'High', 'Low', 'Close']].to_numpy())
+    key = results_store.run_key(STRATEGY.name, params, dataset, code)
+    if key in stored_keys:
+        return symbol, key, dataset, None, None, df['Close']
+    trades = run_backtest(symbol, df)
+    return symbol, key, dataset, trades, summarize(trades, df['Close']) if trades else {'trades': 0}, df['Close']
+
+def run_universe(symbols, workers=None, start=None, end=None, rerun=False):
+    """
+    Backtests every symbol in parallel and combines them into one book (each symbol sized off
+    INITIAL_CAPITAL, as in the single-symbol run). Per-symbol runs are memoized in the results
+    store. Returns (per-symbol metrics DataFrame, all trades, aggregate metrics, closes).
+    """
+    params, code = hourly_params("universe"), backtest_code_version()
+    stored = set() if rerun else set(results_store.load_summary(columns=["key"])["key"])
+    rows, all_trades, closes = [], [], {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = [pool.submit(_universe_worker, s, params, code, stored, start, end) for s in symbols]
+        for job in jobs:
+            symbol, key, dataset, trades, metrics, close = job.result()
+            if key is None:
+                print(f"⚠️ {symbol}: not enough cached hourly data, skipped")
+                continue
+            if trades is None:
+                trades = results_store.load_trades(key).to_dict('records')
+                metrics = results_store.lookup(key)
+            else:
+                metrics = results_store.save(key, STRATEGY.name, params, dataset, code, trades, metrics)
+            closes[symbol] = close
+            all_trades += trades
+            rows.append(dict(metrics, symbol=symbol, key=key))
+
+    per_symbol = pd.DataFrame(rows)
+    if not all_trades:
+        return per_symbol, [], None, None
+    closes = pd.concat(closes, axis=1)
+    aggregate = summarize(all_trades, closes)
+    # The combined book is stored too, keyed by the per-symbol runs it is made of; always rewritten,
+    # so a --rerun replaces whatever an earlier build stored under the same key
+    dataset = {"symbol": f"universe_{len(rows)}", "data_start": str(closes.index[0]), "data_end": str(closes.index[-1]),
+               "bars": len(closes), "checksum": hashlib.sha1(json.dumps(sorted(per_symbol['key'])).encode()).hexdigest()[:results_store.KEY_LENGTH]}
+    key = results_store.run_key(STRATEGY.name, params, dataset, code)
+    results_store.save(key, STRATEGY.name, params, dataset, code, all_trades, aggregate)
+    return per_symbol, all_trades, aggregate, closes
+
+def universe_symbols(symbols):
+    """Explicit symbols, or the config watchlist (Nifty 50) as candle store names."""
+    if symbols:
+        return [s.replace(".NS", "") for s in symbols]
+    with open(CONFIG_FILE, 'r') as f:
+        return [t.replace(".NS", "") for t in json.load(f)['watchlist']]
+
+def main_universe(args):
+    symbols = universe_symbols(args.universe)
+    print(f"\n🚀 Starting HOURLY T3(8) Universe Backtest on {len(symbols)} symbols from the local candle store...")
+    print(f"💰 Capital: ₹{INITIAL_CAPITAL:,.0f} per symbol sizing | Stop Loss: {HARD_STOP_PCT*100}% | Brokerage: {BROKERAGE_RATE*100}%")
+    print("-" * 65)
+    started = datetime.now()
+    per_symbol, all_trades, metrics, closes = run_universe(symbols, args.workers, args.start, args.end, args.rerun)
+    if not all_trades:
+        print("\n📉 No trades found matching criteria.")
+        return
+
+    columns = ['symbol', 'trades', 'win_rate', 'net_pnl', 'roi', 'max_drawdown_mtm', 'time_in_market']
+    table = per_symbol[per_symbol['trades'] > 0].sort_values('net_pnl', ascending=False)[columns]
+    print("\n📋 Per-symbol results:")
+    print(table.to_string(index=False, float_format=lambda v: f"{v:,.2f}"))
+    print_report(metrics)
+    results_df = trade_excursions(pd.DataFrame(all_trades).sort_values(by='Exit Date'), universe_bar_index)
+    excursions.print_report(excursions.summary(results_df))
+    print(f"⏱️  {len(per_symbol)} symbols in {(datetime.now() - started).total_seconds():.1f}s")
+
+    results_df.to_csv("Universe_T3_Backtest.csv", index=False)
+    print("✅ Combined trade log saved to 'Universe_T3_Backtest.csv'")
+    mtm = mark_to_market(closes, all_trades)
+    equity_curve.write_series("backtest_universe", candle_store.to_epoch(mtm.index), mtm['Equity'])
+    print("📈 Equity curve stored as 'backtest_universe'")
+
 if __name__ == "__main__":
-    print(f"\n🚀 Starting HOURLY T3(8) Backtest on {TICKER}...")
-    print(f"📅 Period: {START_DATE} to {END_DATE} (Max 1hr Data Limit)")
+    parser = argparse.ArgumentParser(description="Hourly T3 backtest.")
+    parser.add_argument("--minute", action="store_true", help="Resolve stops on locally stored 1-minute bars")
+    parser.add_argument("--symbol", default=MINUTE_SYMBOL, help="Candle store symbol for --minute mode")
+    parser.add_argument("--trail", action="store_true", help="Apply bot.py's 1R/2R trailing stop (minute mode)")
+    parser.add_argument("--rerun", action="store_true", help="Recompute even if this exact run is already stored")
+    parser.add_argument("--universe", nargs="*", default=None, metavar="SYMBOL",
+                        help="Run every symbol (default: the config watchlist) from the candle store in parallel")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for --universe (default: one per core)")
+    parser.add_argument("--start", default=None, help="First date for --universe and --minute (default: all cached bars)")
+    parser.add_argument("--end", default=None)
+    args = parser.parse_args()
+    if args.universe is not None:
+        main_universe(args)
+        raise SystemExit
+
+    if args.minute:
+        print(f"\n🚀 Starting HOURLY T3(8) Backtest on {MINUTE_EXCHANGE}:{args.symbol} with 1-minute stop fills...")
+    else:
+        print(f"\n🚀 Starting HOURLY T3(8) Backtest on {TICKER}...")
+        print(f"📅 Period: {START_DATE} to {END_DATE} (Max 1hr Data Limit)")
     print(f"💰 Capital: ₹{INITIAL_CAPITAL:,.0f} | Stop Loss: {HARD_STOP_PCT*100}% | Brokerage: {BROKERAGE_RATE*100}%")
     print("-" * 65)
+
+    # Everything that decides the trades and the metrics is part of the run key
+    params = hourly_params("minute" if args.minute else "hourly", bool(args.minute and args.trail))
+    code = backtest_code_version()
     
+    all_trades, metrics = [], None
     try:
-        all_trades = run_backtest(TICKER)
+        if args.minute:
+            symbol = args.symbol
+            minutes = candle_store.load_range(MINUTE_EXCHANGE, symbol, MINUTE_INTERVAL, args.start, args.end)
+            closes = minute_hourly_closes(symbol, start=args.start, end=args.end)
+            ts = minutes['ts'] if minutes is not None else np.empty(0, dtype=np.int64)
+            dataset = results_store.dataset_fingerprint(symbol, candle_store.from_epoch(ts[:1]), candle_store.from_epoch(ts[-1:]), *(
+                [minutes[c] for c in ('Open', 'High', 'Low', 'Close')] if minutes is not None else [ts]))
+            run = lambda: run_backtest_minute(symbol, trail=args.trail, start=args.start, end=args.end)
+            bar_index = lambda ticker: excursions.load_index(MINUTE_EXCHANGE, symbol, MINUTE_INTERVAL)
+        else:
+            symbol = TICKER.replace('^', '')
+            hourly = load_hourly(TICKER)
+            closes = hourly['Close'] if not hourly.empty else pd.Series(dtype=float)
+            dataset = results_store.dataset_fingerprint(symbol, closes.index[:1], closes.index[-1:],
+                                                        hourly[['Open', 'High', 'Low', 'Close']].to_numpy())
+            run = lambda: run_backtest(TICKER, hourly)
+            bar_index = lambda ticker: excursions.BarIndex.from_frame(hourly)
+
+        def compute():
+            trades = run()
+            return trades, summarize(trades, closes) if trades else {'trades': 0}
+
+        if args.rerun:
+            results_store.forget(results_store.run_key(STRATEGY.name, params, dataset, code))
+        key, all_trades, metrics, cached = results_store.memoized(STRATEGY.name, params, dataset, code, compute)
+        if cached:
+            print(f"♻️  Identical run already stored ({key}, computed {metrics['created_at']} UTC) - reusing it")
     except Exception as e:
         print(f"❌ Error during backtest: {e}")
         all_trades = []
@@ -203,47 +700,27 @@ if __name__ == "__main__":
         results_df['Equity'] = INITIAL_CAPITAL + results_df['Cumulative P/L']
         results_df['Peak'] = results_df['Equity'].cummax()
         results_df['Drawdown'] = (results_df['Peak'] - results_df['Equity']) / results_df['Peak'] * 100
+
+        print_report(metrics)
+
+        # How much of each move the exits captured (reported, not part of the stored metrics)
+        results_df = trade_excursions(results_df, bar_index, minute_stops=args.minute)
+        excursions.print_report(excursions.summary(results_df))
         
-        # Metrics
-        total_trades = len(results_df)
-        winners = results_df[results_df['Net P/L'] > 0]
-        losers = results_df[results_df['Net P/L'] <= 0]
-        
-        win_count = len(winners)
-        loss_count = len(losers)
-        win_rate = (win_count / total_trades) * 100 if total_trades > 0 else 0
-        
-        long_trades = results_df[results_df['Type'] == 'LONG']
-        short_trades = results_df[results_df['Type'] == 'SHORT']
-        
-        gross_pl = results_df['Gross P/L'].sum()
-        total_brokerage = results_df['Brokerage'].sum()
-        net_pl = results_df['Net P/L'].sum()
-        
-        avg_pl = results_df['Net P/L'].mean()
-        max_dd = results_df['Drawdown'].max()
-        
-        final_capital = INITIAL_CAPITAL + net_pl
-        roi = (net_pl / INITIAL_CAPITAL) * 100
-
-        print("\n" + "="*50)
-        print("      📊 STRATEGY PERFORMANCE REPORT")
-        print("="*50)
-        print(f"Total Trades:           {total_trades} (Long: {len(long_trades)}, Short: {len(short_trades)})")
-        print(f"Win Rate:               {win_rate:.2f}% ({win_count} W / {loss_count} L)")
-        print("-" * 50)
-        print(f"Initial Capital:        ₹{INITIAL_CAPITAL:,.2f}")
-        print(f"Final Capital:          ₹{final_capital:,.2f}")
-        print(f"Net Profit/Loss:        ₹{net_pl:,.2f} ({roi:.2f}%)")
-        print(f"Gross Profit/Loss:      ₹{gross_pl:,.2f}")
-        print(f"Total Brokerage:        ₹{total_brokerage:,.2f}")
-        print("-" * 50)
-        print(f"Avg P/L per Trade:      ₹{avg_pl:,.2f}")
-        print(f"Max Drawdown:           {max_dd:.2f}%")
-        print("="*50)
+        # Monte Carlo: distribution of outcomes instead of the single recorded path
+        if MONTE_CARLO_RUNS > 0:
+            pnl = results_df['Net P/L'].to_numpy()
+            mc_results = monte_carlo.simulate(pnl, MONTE_CARLO_RUNS, INITIAL_CAPITAL, method="bootstrap")
+            monte_carlo.print_report(pnl, mc_results, INITIAL_CAPITAL, "bootstrap", risk_pct=RISK_PER_TRADE_PCT)
         
-        # Export
-        csv_name = "Hourly_T3_Nifty_Backtest.csv"
-        results_df.drop(columns=['Peak', 'Drawdown'], inplace=True) # Clean export
+        # Export (the run itself is kept in the results store under its key)
+        csv_name = f"Minute_T3_{args.symbol}_Backtest.csv" if args.minute else "Hourly_T3_Nifty_Backtest.csv"
+        results_df.drop(columns=['Peak'], inplace=True) # Clean export (Equity / Drawdown are kept for charts)
         results_df.to_csv(csv_name, index=False)
-        print(f"✅ Detailed trade log saved to '{csv_name}'")
\ No newline at end of file
+        print(f"✅ Detailed trade log saved to '{csv_name}' (run {key} in {results_store.RESULTS_DIR}/)")
+        
+        # Bar-level equity series for the dashboards' downsampled charts
+        mtm = mark_to_market(closes, all_trades)
+        series_name = f"backtest_{symbol}"
+        equity_curve.write_series(series_name, candle_store.to_epoch(mtm.index), mtm['Equity'])
+        print(f"📈 Equity curve stored as '{series_name}'")
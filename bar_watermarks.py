@@ -0,0 +1,55 @@
+import json
+import os
+import candle_store
+import trading_calendar
+
+# --- BAR-CLOSE WATERMARKS ---
+# The bots wake up more often than their hourly bars close. For every symbol we remember the
+# start time of the last fully closed bar that was evaluated; until the exchange clock says a
+# newer bar has closed there is nothing new to fetch or compute for that symbol.
+IST = trading_calendar.IST
+BAR_SECONDS = 3600
+
+def last_closed_bar(now=None, exchange="NSE", bar_seconds=BAR_SECONDS):
+    """Start (IST) of the most recent bar that has fully closed at `now`, per the exchange calendar."""
+    return trading_calendar.get().last_closed_bar(exchange, now, bar_seconds)
+
+def closed_bars(df, exchange="NSE", now=None, bar_seconds=BAR_SECONDS):
+    """Rows of a candle DataFrame (with a 'Timestamp' column) whose bar has fully closed."""
+    cutoff = last_closed_bar(now, exchange, bar_seconds)
+    if cutoff is None or df.empty:
+        return df.iloc[0:0]
+    return df[candle_store.to_epoch(df['Timestamp']) <= int(cutoff.timestamp())]
+
+class Watermarks:
+    """Per-symbol epoch of the last closed bar processed, persisted in a small JSON file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.marks = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f: self.marks = json.load(f)
+            except (OSError, ValueError):
+                self.marks = {}
+
+    def due(self, key, exchange="NSE", now=None, bar_seconds=BAR_SECONDS):
+        """True if a bar newer than the watermark should have closed by now."""
+        expected = last_closed_bar(now, exchange, bar_seconds)
+        return expected is not None and self.marks.get(key, -1) < int(expected.timestamp())
+
+    def mark(self, key, bar_start):
+        """Moves the watermark up to bar_start (never back). True if it advanced."""
+        epoch = int(candle_store.to_epoch([bar_start])[0])
+        if epoch <= self.marks.get(key, -1):
+            return False
+        self.marks[key] = epoch
+        return True
+
+    def forget(self, key):
+        self.marks.pop(key, None)
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f: json.dump(self.marks, f, indent=2)
+        os.replace(tmp_path, self.path)
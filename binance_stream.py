@@ -0,0 +1,272 @@
+import argparse
+import json
+import time
+from collections import deque
+import pandas as pd
+import requests
+
+# --- BINANCE KLINE / TRADE STREAM ---
+# One multiplexed websocket carries the 1h kline and trade streams of every watched coin.
+# Closed 1h bars are kept in memory per symbol and handed to a callback the moment Binance
+# marks them final, so exits are evaluated on the bar close instead of whenever cron wakes up.
+# On every (re)connect, and whenever a closed bar arrives more than one interval after the
+# last one, the missing bars are backfilled from the REST klines endpoint first, in order.
+BINANCE_WS_URL = "wss://stream.binance.com:9443/stream?streams="
+BINANCE_KLINES_URL = "https://api.binance.com/api/v3/klines"
+INTERVAL = "1h"
+INTERVAL_MS = 3600 * 1000
+HISTORY_BARS = 500               # Closed bars kept per symbol (indicators need ~200)
+REST_LIMIT = 1000                # Max klines per REST request
+QUOTE_ASSET = "USDT"
+RECONNECT_DELAY = (1.0, 60.0)    # Exponential backoff between reconnects (min, max seconds)
+
+def binance_symbol(ticker):
+    """'BTC-USD' (the yfinance tickers the crypto bot uses) -> 'BTCUSDT'."""
+    return ticker.split('-')[0].upper() + QUOTE_ASSET
+
+def stream_url(symbols, interval=INTERVAL, trades=True):
+    names = []
+    for symbol in symbols:
+        names.append(f"{symbol.lower()}@kline_{interval}")
+        if trades:
+            names.append(f"{symbol.lower()}@trade")
+    return BINANCE_WS_URL + "/".join(names)
+
+def rest_klines(symbol, start_ms=None, limit=REST_LIMIT, interval=INTERVAL):
+    """Raw REST klines ([open_time, open, high, low, close, volume, close_time, ...]), oldest first."""
+    params = {"symbol": symbol, "interval": interval, "limit": limit}
+    if start_ms is not None:
+        params["startTime"] = int(start_ms)
+    response = requests.get(BINANCE_KLINES_URL, params=params, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+def _default_connect(url):
+    from websockets.sync.client import connect
+    return connect(url, open_timeout=10, ping_interval=20, ping_timeout=20, max_size=2 ** 22)
+
+class BarSeries:
+    """Closed bars of one symbol (bounded), plus the forming bar and the last trade price."""
+
+    def __init__(self, history=HISTORY_BARS):
+        self.bars = deque(maxlen=history)   # (open_time_ms, open, high, low, close, volume)
+        self.forming = None
+        self.last_price = None
+
+    @property
+    def last_open(self):
+        return self.bars[-1][0] if self.bars else None
+
+    def append(self, bar):
+        """Adds a closed bar; anything not newer than the last one (duplicate / replayed) is ignored."""
+        if self.bars and bar[0] <= self.bars[-1][0]:
+            return False
+        self.bars.append(bar)
+        if self.forming is not None and self.forming[0] <= bar[0]:
+            self.forming = None
+        return True
+
+    def frame(self):
+        """Closed bars as an OHLCV DataFrame on a UTC DatetimeIndex (same shape as a yfinance download)."""
+        df = pd.DataFrame(list(self.bars), columns=['ts', 'Open', 'High', 'Low', 'Close', 'Volume'])
+        df.index = pd.to_datetime(df.pop('ts'), unit='ms', utc=True)
+        return df
+
+def _rest_bar(k):
+    return (int(k[0]), float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[5]))
+
+def _ws_bar(k):
+    return (int(k['t']), float(k['o']), float(k['h']), float(k['l']), float(k['c']), float(k['v']))
+
+class KlineStream:
+    """
+    Live 1h bars for a set of tickers over one websocket.
+      on_bar_close(ticker, series, catching_up): a bar closed; series.frame() ends with it.
+          catching_up is True for backfilled bars that are not the newest, which callers
+          should only use to manage open positions, not to open new ones.
+      on_trade(ticker, price, trade_time_ms): every trade print (optional).
+    connect / fetch_klines / clock are injectable so a recorded stream can stand in for Binance.
+    """
+
+    def __init__(self, tickers, on_bar_close, on_trade=None, connect=_default_connect, fetch_klines=rest_klines,
+                 clock=time.time, history=HISTORY_BARS, reconnect_delay=RECONNECT_DELAY):
+        self.tickers = {binance_symbol(t): t for t in tickers}
+        self.series = {symbol: BarSeries(history) for symbol in self.tickers}
+        self.on_bar_close = on_bar_close
+        self.on_trade = on_trade
+        self.connect = connect
+        self.fetch_klines = fetch_klines
+        self.clock = clock
+        self.history = history
+        self.reconnect_delay = reconnect_delay
+        self.url = stream_url(self.tickers, trades=on_trade is not None)
+        self.connections = 0
+        self.backfilled = 0
+        self._ws = None
+        self._stopped = False
+
+    # --- CONNECTION ---
+    def run(self, max_connections=None):
+        """Blocks, reconnecting with backoff until stop() (or max_connections sessions have ended)."""
+        delay = self.reconnect_delay[0]
+        while not self._stopped and (max_connections is None or self.connections < max_connections):
+            self.connections += 1
+            try:
+                with self.connect(self.url) as ws:
+                    self._ws = ws
+                    self.backfill()
+                    delay = self.reconnect_delay[0]
+                    for raw in ws:
+                        self.handle(raw)
+                        if self._stopped:
+                            break
+                print("🔌 Binance stream closed.")
+            except Exception as e:
+                print(f"⚠️ Binance stream dropped: {e}")
+            finally:
+                self._ws = None
+            if self._stopped or (max_connections is not None and self.connections >= max_connections):
+                break
+            print(f"🔄 Reconnecting in {delay:.0f}s...")
+            time.sleep(delay)
+            delay = min(delay * 2, self.reconnect_delay[1])
+
+    def stop(self):
+        self._stopped = True
+        if self._ws is not None:
+            try: self._ws.close()
+            except Exception: pass
+
+    # --- BACKFILL ---
+    def backfill(self, symbols=None):
+        """Fetches every closed bar missed since the last one held (or the last `history` bars on first start)."""
+        for symbol in symbols or self.series:
+            try:
+                self._backfill_symbol(symbol)
+            except Exception as e:
+                print(f"⚠️ Backfill failed for {symbol}: {e}")
+
+    def _backfill_symbol(self, symbol, before_ms=None):
+        series = self.series[symbol]
+        seeding = series.last_open is None
+        now_ms = int(self.clock() * 1000)
+        start = None if seeding else series.last_open + INTERVAL_MS
+        fresh = []
+        while True:
+            klines = self.fetch_klines(symbol, start) if start is not None else self.fetch_klines(symbol, None, self.history)
+            # Only closed bars, and on a mid-stream gap only those before the bar that revealed it
+            closed = [_rest_bar(k) for k in klines if int(k[6]) < now_ms and (before_ms is None or int(k[0]) < before_ms)]
+            fresh += [bar for bar in closed if not fresh or bar[0] > fresh[-1][0]]
+            if start is None or len(klines) < REST_LIMIT or not closed:
+                break
+            start = closed[-1][0] + INTERVAL_MS
+
+        if seeding:
+            for bar in fresh:
+                series.append(bar)
+            # A (re)started bot evaluates the latest closed bar once, as a cron run would
+            if fresh:
+                self._emit(symbol, False)
+            return
+        for n, bar in enumerate(fresh):
+            if series.append(bar):
+                self.backfilled += 1
+                self._emit(symbol, catching_up=n < len(fresh) - 1 or before_ms is not None)
+
+    # --- MESSAGES ---
+    def handle(self, raw):
+        message = json.loads(raw)
+        data = message.get('data', message)    # Combined streams wrap the payload
+        event = data.get('e')
+        symbol = data.get('s')
+        if symbol not in self.series:
+            return
+        if event == 'kline':
+            self._on_kline(symbol, data['k'])
+        elif event == 'trade':
+            price = float(data['p'])
+            self.series[symbol].last_price = price
+            if self.on_trade is not None:
+                self._call(self.on_trade, self.tickers[symbol], price, int(data['T']))
+
+    def _on_kline(self, symbol, k):
+        series = self.series[symbol]
+        bar = _ws_bar(k)
+        if not k['x']:
+            series.forming = bar
+            series.last_price = bar[4]
+            return
+        if series.last_open is not None and bar[0] > series.last_open + INTERVAL_MS:
+            print(f"🕳️ Gap in {symbol} before {pd.to_datetime(bar[0], unit='ms')} - backfilling")
+            self._backfill_symbol(symbol, before_ms=bar[0])
+        if series.append(bar):
+            self._emit(symbol, False)
+
+    def _emit(self, symbol, catching_up):
+        self._call(self.on_bar_close, self.tickers[symbol], self.series[symbol], catching_up)
+
+    def _call(self, callback, *args):
+        # A failing handler must not take the stream (and every other symbol) down with it
+        try:
+            callback(*args)
+        except Exception as e:
+            print(f"⚠️ Stream handler failed for {args[0]}: {e}")
+
+# --- RECORDED STREAM STAND-IN ---
+class ReplayConnection:
+    """Plays back recorded raw messages like a websocket; `drop_after` raises a connection error mid-way."""
+
+    def __init__(self, messages, drop_after=None):
+        self.messages = list(messages)
+        self.drop_after = drop_after
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+        return False
+
+    def __iter__(self):
+        for n, raw in enumerate(self.messages):
+            if self.closed:
+                return
+            if self.drop_after is not None and n >= self.drop_after:
+                raise ConnectionError("recorded disconnect")
+            yield raw
+
+    def close(self):
+        self.closed = True
+
+def replay_connect(sessions):
+    """connect() stand-in: each (re)connect plays the next recorded session (list of ReplayConnection)."""
+    pending = list(sessions)
+    return lambda url: pending.pop(0)
+
+def load_recording(path):
+    with open(path, 'r') as f:
+        return [line.rstrip('\n') for line in f if line.strip()]
+
+def record(tickers, path, seconds, trades=True):
+    """Saves raw combined-stream messages to a JSONL file for offline replay."""
+    deadline = time.time() + seconds
+    count = 0
+    with _default_connect(stream_url([binance_symbol(t) for t in tickers], trades=trades)) as ws, open(path, 'w') as f:
+        while time.time() < deadline:
+            try:
+                raw = ws.recv(timeout=max(deadline - time.time(), 0.1))
+            except TimeoutError:
+                break
+            f.write(raw + "\n")
+            count += 1
+    print(f"💾 Recorded {count} messages to {path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record the Binance kline / trade stream for replay.")
+    parser.add_argument("path")
+    parser.add_argument("--tickers", nargs="+", default=["BTC-USD", "ETH-USD"])
+    parser.add_argument("--seconds", type=int, default=600)
+    parser.add_argument("--no-trades", action="store_true")
+    args = parser.parse_args()
+    record(args.tickers, args.path, args.seconds, trades=not args.no_trades)
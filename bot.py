@@ -1,74 +1,126 @@
+import argparse
+import time
 import pandas as pd
 import numpy as np
 import json
 import os
 import requests
-from datetime import datetime, timedelta, timezone
-from SmartApi import SmartConnect
-import pyotp
+from datetime import datetime, timedelta
+import angel_session
+import backfill
+import config_loader
+import market_data
+import candle_store
+import resampler
+import screener
+import bar_watermarks
+import trading_calendar
+import correlation
+import shadow
+import trade_archive
+import equity_curve
+import execution
+import strategies
 
 # --- CONFIGURATION FILES ---
 PORTFOLIO_FILE = "portfolio.json"
+SNAPSHOT_FILE = screener.SNAPSHOT_FILE   # Per-symbol trend heatmap read by the dashboard
+WATERMARK_FILE = "watermarks.json"       # Last closed hourly bar evaluated per ticker
+CORRELATION_FILE = correlation.STATE_FILE
 CONFIG_FILE = "config.json"
+ENGINE_NAME = "nifty"            # Trade archive partition / rollup name
+STRATEGY_NAME = "ema_trend"
 
 # --- LOAD CONFIG ---
 def load_config():
-    if not os.path.exists(CONFIG_FILE):
-        print(f"❌ Error: {CONFIG_FILE} not found!")
+    try:
+        return config_loader.load(CONFIG_FILE)
+    except config_loader.ConfigError as e:
+        print(f"❌ Error: {e}")
         exit()
-    with open(CONFIG_FILE, 'r') as f:
-        return json.load(f)
 
 config = load_config()
+trading_calendar.configure(config)
 CAPITAL = config['strategy_settings']['capital']
 RISK_PER_TRADE = config['strategy_settings']['risk_per_trade_percent'] / 100.0
 BROKERAGE = config['strategy_settings']['brokerage_percent'] / 100.0
 WATCHLIST = config['watchlist']
 TELEGRAM_ENABLED = config['telegram']['enabled']
 TELEGRAM_RECIPIENTS = config['telegram']['recipients']
+MTM_INTERVAL_SECONDS = config['strategy_settings'].get('mtm_interval_seconds', 60)
+# Correlated-exposure filter: a new entry is skipped once `max_positions` open positions move with it
+CORRELATION = dict({"enabled": True, "threshold": 0.7, "max_positions": 2,
+                    "window": correlation.WINDOW, "min_periods": correlation.MIN_PERIODS}, **config.get('correlation', {}))
+
+# --- TIMEFRAMES ---
+# Only the base resolution is downloaded (incrementally); the trading timeframe is resampled
+# from it locally on the same 09:15-anchored grid Angel One uses for its own candles. The
+# history kept is at least HISTORY_DAYS, and longer when the slowest strategy's min_bars at
+# the trading timeframe need it (200 bars are ~30 sessions at 1h but ~100 at 4h, ~200 at 1d).
+HISTORY_DAYS = 60
+HISTORY_SLACK_BARS = 20          # Bars kept beyond the slowest strategy's min_bars
+BASE_INTERVAL = resampler.parse_timeframe(config['strategy_settings'].get('base_interval', 'FIFTEEN_MINUTE'))
+try:
+    TIMEFRAME = resampler.parse_timeframe(config['strategy_settings'].get('timeframe', '1h'))
+except ValueError as e:
+    print(f"⚠️ {e}; trading the 1h timeframe")
+    TIMEFRAME = "ONE_HOUR"
+if resampler.INTERVAL_SECONDS[TIMEFRAME] % resampler.INTERVAL_SECONDS[BASE_INTERVAL]:
+    BASE_INTERVAL = TIMEFRAME
+BAR_SECONDS = resampler.INTERVAL_SECONDS[TIMEFRAME]
 
 # --- ANGEL ONE API SETUP ---
+SESSION = angel_session.SessionManager(config['angel_one']) if 'angel_one' in config else None
+
 def get_angel_session():
     print("🔐 Authenticating with Angel One SmartAPI...")
     try:
-        api_key = config['angel_one']['api_key']
-        client_id = config['angel_one']['client_id']
-        pin = config['angel_one']['pin']
-        totp_secret = config['angel_one']['totp_secret']
-        
-        smartApi = SmartConnect(api_key=api_key)
-        totp = pyotp.TOTP(totp_secret).now()
-        session = smartApi.generateSession(client_id, pin, totp)
-        
-        if session.get('status'):
-            print("✅ SmartAPI Login Successful!")
-            return smartApi
-        else:
-            print("❌ Angel One Login Failed:", session)
-            exit()
+        if SESSION is None:
+            raise KeyError("'angel_one' credentials missing from config")
+        return SESSION.get()
     except Exception as e:
         print("❌ Angel One Connection Error:", e)
         exit()
 
 def get_token_map():
+    """NSE equity tokens, plus the names that trade in F&O (for the 'fno' universe)."""
     print("🔄 Fetching NSE Token Master List...")
     url = "https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json"
     try:
         response = requests.get(url, timeout=10)
         instrument_list = response.json()
         token_map = {}
+        fno_symbols = set()
         for instrument in instrument_list:
             if instrument["exch_seg"] == "NSE" and instrument["symbol"].endswith("-EQ"):
                 base_symbol = instrument["symbol"].replace("-EQ", "")
                 token_map[base_symbol] = instrument["token"]
-        return token_map
+            elif instrument["exch_seg"] == "NFO" and instrument.get("instrumenttype") == "FUTSTK":
+                fno_symbols.add(instrument["name"])
+        return token_map, fno_symbols
     except Exception as e:
         print(f"❌ Failed to fetch tokens: {e}")
-        return {}
+        return {}, set()
 
 # Initialize Angel One connection and fetch tokens
 smartApi = get_angel_session()
-TOKEN_MAP = get_token_map()
+TOKEN_MAP, FNO_SYMBOLS = get_token_map()
+
+# The scan universe is generated from the token master unless it is the hand-kept watchlist
+UNIVERSE = config.get('universe', 'watchlist')
+SCAN_UNIVERSE = screener.build_universe(UNIVERSE, TOKEN_MAP, FNO_SYMBOLS, WATCHLIST)
+
+# Strategy plug-ins evaluated on every fetched dataset, first match wins (see strategies.py)
+STRATEGIES = strategies.load(config.get('strategies', {}).get(ENGINE_NAME, [STRATEGY_NAME]))
+# Paper-traded parameter variants evaluated on the same scan (config['shadow_portfolios'])
+SHADOWS = shadow.from_config(ENGINE_NAME, config, config.get('strategies', {}).get(ENGINE_NAME, [STRATEGY_NAME]))
+
+# Paper trading unless config['execution']['mode'] is 'mock' or 'live'
+EXECUTION = execution.from_config(ENGINE_NAME, config, SESSION, BROKERAGE)
+
+def instrument(ticker):
+    base_symbol = ticker.replace(".NS", "")
+    return {"exchange": "NSE", "trading_symbol": f"{base_symbol}-EQ", "token": TOKEN_MAP.get(base_symbol)}
 
 # --- HELPER FUNCTIONS ---
 def send_telegram(message):
@@ -99,8 +151,10 @@ def load_portfolio():
     }
 
 def save_portfolio(data):
-    with open(PORTFOLIO_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+    # Write to a temp file and rename, so readers never see a half-written portfolio
+    tmp_file = PORTFOLIO_FILE + ".tmp"
+    with open(tmp_file, 'w') as f: json.dump(data, f, indent=4)
+    os.replace(tmp_file, PORTFOLIO_FILE)
 
 def log_event(data, message):
     """Logs signal to console, JSON, and Telegram."""
@@ -115,9 +169,45 @@ def log_event(data, message):
     send_telegram(f"🤖 Algo Alert\n{message}")
 
 # --- UPDATED DATA FETCHING ---
+DEEPENED = set()   # Tickers whose stored history was already fetched back to history_start() this run
+
+def history_start(now):
+    """
+    Where a ticker's history has to reach back to: the slowest strategy's (shadows included)
+    min_bars plus slack, counted back over NSE sessions at TIMEFRAME, and never under HISTORY_DAYS.
+    """
+    bars = max(s.min_bars for s in STRATEGIES + [s for v in SHADOWS for s in v.strategies]) + HISTORY_SLACK_BARS
+    first_day = trading_calendar.get().history_start("NSE", bars, BAR_SECONDS, now)
+    return min(datetime.combine(first_day, datetime.min.time()), now - timedelta(days=HISTORY_DAYS))
+
+def get_candle_data(token, from_dt, to_dt):
+    """Base candles from SmartAPI, split into requests no longer than it serves at BASE_INTERVAL."""
+    frames, span = [], timedelta(days=backfill.MAX_DAYS_PER_REQUEST.get(BASE_INTERVAL, 30))
+    while from_dt < to_dt:
+        until = min(from_dt + span, to_dt)
+        historicParam = {
+            "exchange": "NSE",
+            "symboltoken": token,
+            "interval": BASE_INTERVAL,
+            "fromdate": from_dt.strftime("%Y-%m-%d %H:%M"),
+            "todate": until.strftime("%Y-%m-%d %H:%M")
+        }
+        res = smartApi.getCandleData(historicParam)
+        if angel_session.is_token_error(res):
+            SESSION.get(force_refresh=True)
+            res = smartApi.getCandleData(historicParam)
+        if res.get('status') and res.get('data'):
+            # Convert Angel One data format to matching Pandas DataFrame
+            frames.append(pd.DataFrame(res['data'], columns=['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume']))
+        from_dt = until
+    return pd.concat(frames, ignore_index=True) if frames else None
+
 def fetch_hourly_data(ticker):
-    """Fetches 1-Hour data from Angel One SmartAPI and calculates MAs."""
-    if smartApi is None: return None, None
+    """
+    Fetches the base candles added since the last call from Angel One SmartAPI, derives the
+    trading timeframe locally and returns the indicator graph of its closed bars.
+    """
+    if smartApi is None: return None
     
     # Convert "RELIANCE.NS" to "RELIANCE" to find the token
     base_symbol = ticker.replace(".NS", "")
@@ -125,62 +215,52 @@ def fetch_hourly_data(ticker):
     
     if not token:
         print(f"⚠️ Token not found for {ticker}")
-        return None, None
+        return None
         
-    to_date = datetime.now().strftime("%Y-%m-%d %H:%M")
-    from_date = (datetime.now() - timedelta(days=60)).strftime("%Y-%m-%d %H:%M")
+    now = datetime.now()
+    start = history_start(now)
+    from_dt = start
+    stored = candle_store.load_arrays("NSE", base_symbol, BASE_INTERVAL, mmap=True)
+    last_ts = int(stored['ts'][-1]) if stored is not None and len(stored) else None
+    if last_ts is not None:
+        first_bar = candle_store.from_epoch([stored['ts'][0]])[0].tz_localize(None).to_pydatetime()
+        if first_bar.date() <= start.date() or ticker in DEEPENED:
+            # Re-fetch from the last stored bar so the still-forming candle gets completed
+            last_bar = candle_store.from_epoch([last_ts])[0].tz_localize(None).to_pydatetime()
+            from_dt = max(last_bar, start)
+    # Once per run a shorter stored history (e.g. after moving to a slower timeframe) is fetched back to the start
+    DEEPENED.add(ticker)
     
     try:
-        historicParam = {
-            "exchange": "NSE",
-            "symboltoken": token,
-            "interval": "ONE_HOUR",
-            "fromdate": from_date,
-            "todate": to_date
-        }
-        res = smartApi.getCandleData(historicParam)
+        df_new = get_candle_data(token, from_dt, now)
+        if df_new is not None:
+            candle_store.save_candles("NSE", base_symbol, BASE_INTERVAL, df_new)
+            # The derived series is also the screener's first-stage cache
+            resampler.update("NSE", base_symbol, BASE_INTERVAL, TIMEFRAME, since=int(candle_store.to_epoch([from_dt])[0]))
+        elif last_ts is None:
+            return None
         
-        if res.get('status') and res.get('data'):
-            # Convert Angel One data format to matching Pandas DataFrame
-            columns = ['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume']
-            df = pd.DataFrame(res['data'], columns=columns)
-            
-            df['SMA_100'] = df['Close'].rolling(window=100).mean()
-            df['SMA_200'] = df['Close'].rolling(window=200).mean()
-            df['EMA_50'] = df['Close'].ewm(span=50, adjust=False).mean()
-            df['EMA_21'] = df['Close'].ewm(span=21, adjust=False).mean()
-            df['EMA_10'] = df['Close'].ewm(span=10, adjust=False).mean()
-            df['EMA_5'] = df['Close'].ewm(span=5, adjust=False).mean()
-            
-            return df.iloc[-1], df.iloc[-2]
-        else:
-            return None, None
+        # Signals are evaluated on fully closed bars only; indicators are computed on demand
+        df = candle_store.load_candles("NSE", base_symbol, TIMEFRAME, start=start)
+        df = bar_watermarks.closed_bars(df, "NSE", bar_seconds=BAR_SECONDS)
+        if len(df) < 2:
+            return None
+        return strategies.IndicatorGraph(df.reset_index(drop=True), STRATEGIES)
     except Exception as e:
         print(f"Error fetching {ticker}: {e}")
-        return None, None
-    
+        return None
+
+def quote_open_positions(data, *books):
+    """LTP of every open position (shadow books' too) with one batched quote request (no candles)."""
+    if smartApi is None:
+        return {}
+    held = set(data["open_longs"]) | set(data["open_shorts"]) | shadow.held(books)
+    return market_data.quote_ltp(smartApi, {ticker: instrument(ticker) for ticker in held}, SESSION)
+
 def is_market_open():
-    """Checks if the Indian market is currently open (IST)."""
-    # Force IST time (UTC + 5:30)
-    now_ist = datetime.now(timezone.utc) + timedelta(hours=5, minutes=30)
-    
-    # 1. Check Weekends (5 = Saturday, 6 = Sunday)
-    if now_ist.weekday() >= 5:
-        return False
-        
-    # 2. Check Holidays (Reads from your config.json)
-    today_str = now_ist.strftime('%Y-%m-%d')
-    if today_str in config.get('holidays', []):
-        return False
-        
-    # 3. Check Market Hours (09:15 AM to 03:30 PM)
-    market_start = now_ist.replace(hour=9, minute=15, second=0, microsecond=0)
-    market_end = now_ist.replace(hour=15, minute=30, second=0, microsecond=0)
-    
-    if not (market_start <= now_ist <= market_end):
-        return False
-        
-    return True
+    """Checks if NSE is in session right now (holidays and special sessions per the trading calendar)."""
+    return trading_calendar.get().is_open("NSE")
+
 # --- MAIN BOT LOOP ---
 def run_bot():
     if not is_market_open():
@@ -195,107 +275,136 @@ def run_bot():
     open_shorts = data["open_shorts"]
     current_capital = data["capital"]
 
+    # When cron runs more often than hourly, tickers whose last closed bar was already
+    # evaluated are skipped until the next bar closes; open positions are still marked at their LTP.
+    watermarks = bar_watermarks.Watermarks(WATERMARK_FILE)
+    scanned = {}
+    advanced = set()    # Tickers that really got a new closed bar (not failed or stale fetches)
+
+    def closed_bars_for(ticker):
+        if ticker in scanned:
+            return scanned[ticker]
+        if not watermarks.due(ticker, bar_seconds=BAR_SECONDS):
+            return None
+        graph = fetch_hourly_data(ticker)
+        if graph is not None and watermarks.mark(ticker, graph.df['Timestamp'].iat[-1]):
+            advanced.add(ticker)
+        scanned[ticker] = graph
+        return graph
+
     # 1. MANAGE EXITS & TRAILING STOPS
+    # Each position is managed by the strategy that opened it
     for ticker in list(open_longs.keys()):
-        curr, prev = fetch_hourly_data(ticker)
-        if curr is None: continue
+        graph = closed_bars_for(ticker)
+        if graph is None: continue
         
         pos = open_longs[ticker]
+        strategy = strategies.resolve(pos.get('strategy', STRATEGY_NAME), STRATEGIES)
+        graph.register(*strategy.indicators)  # In case it was dropped from config since the entry
+        curr, prev = graph.bar(-1), graph.bar(-2)
         entry_price = pos['entry_price']
-        initial_risk = pos['risk_points']
-        current_sl = pos['stop_loss']
-        
-        r_multiple = (curr['High'] - entry_price) / initial_risk if initial_risk > 0 else 0
-        new_sl = current_sl
-        
-        if r_multiple >= 2.0:
-            new_sl = max(current_sl, entry_price + initial_risk)
-        elif r_multiple >= 1.0:
-            new_sl = max(current_sl, entry_price)
+        new_sl, exit_price, reason = strategy.manage(strategies.LONG, pos, curr, prev)
+        new_sl = pos['stop_loss'] if new_sl is None else new_sl
             
         open_longs[ticker]['stop_loss'] = round(new_sl, 2)
         open_longs[ticker]['current_price'] = round(curr['Close'], 2)
         
-        sl_hit = curr['Low'] <= new_sl
-        strategy_exit = (curr['EMA_5'] < curr['EMA_10']) and (prev['EMA_5'] >= prev['EMA_10'])
-        
-        if sl_hit or strategy_exit:
-            exit_price = new_sl if sl_hit else curr['Close']
+        if exit_price is not None:
             qty = pos['qty']
             
             gross_pnl = (exit_price - entry_price) * qty
             brokerage = ((entry_price * qty) + (exit_price * qty)) * BROKERAGE
             net_pnl = gross_pnl - brokerage
-            reason = "Stop Loss Hit" if sl_hit else "EMA 5 < 10"
             
-            data['closed_longs'].append({
+            trade = {
                 "Ticker": ticker, "Entry Date": pos['entry_date'],
                 "Exit Date": datetime.now().strftime('%Y-%m-%d %H:%M'),
                 "Entry Price": entry_price, "Exit Price": round(exit_price, 2),
                 "Qty": qty, "Stop Loss": round(new_sl, 2), "PnL": round(net_pnl, 2),
-                "Status": "CLOSED", "Reason": reason
-            })
-            current_capital += (exit_price * qty) - brokerage
+                "Status": "CLOSED", "Reason": reason, "Strategy": strategy.name,
+                "Risk": pos.get('risk_points')  # Initial stop distance: excursions in R
+            }
+            data['closed_longs'].append(trade)
+            cash = (exit_price * qty) - brokerage
+            current_capital += cash
+            EXECUTION.exit("open_longs", ticker, qty, exit_price, cash, pos, trade, instrument(ticker), trade['Exit Date'])
             del open_longs[ticker]
             log_event(data, f"❌ CLOSED LONG: {ticker} @ ₹{exit_price:.2f} | PnL: ₹{net_pnl:.2f}\nReason: {reason}")
 
     for ticker in list(open_shorts.keys()):
-        curr, prev = fetch_hourly_data(ticker)
-        if curr is None: continue
+        graph = closed_bars_for(ticker)
+        if graph is None: continue
         
         pos = open_shorts[ticker]
+        strategy = strategies.resolve(pos.get('strategy', STRATEGY_NAME), STRATEGIES)
+        graph.register(*strategy.indicators)  # In case it was dropped from config since the entry
+        curr, prev = graph.bar(-1), graph.bar(-2)
         entry_price = pos['entry_price']
-        initial_risk = pos['risk_points']
-        current_sl = pos['stop_loss']
-        
-        r_multiple = (entry_price - curr['Low']) / initial_risk if initial_risk > 0 else 0
-        new_sl = current_sl
-        
-        if r_multiple >= 2.0:
-            new_sl = min(current_sl, entry_price - initial_risk)
-        elif r_multiple >= 1.0:
-            new_sl = min(current_sl, entry_price)
+        new_sl, exit_price, reason = strategy.manage(strategies.SHORT, pos, curr, prev)
+        new_sl = pos['stop_loss'] if new_sl is None else new_sl
             
         open_shorts[ticker]['stop_loss'] = round(new_sl, 2)
         open_shorts[ticker]['current_price'] = round(curr['Close'], 2)
         
-        sl_hit = curr['High'] >= new_sl
-        strategy_exit = (curr['EMA_5'] > curr['EMA_10']) and (prev['EMA_5'] <= prev['EMA_10'])
-        
-        if sl_hit or strategy_exit:
-            exit_price = new_sl if sl_hit else curr['Close']
+        if exit_price is not None:
             qty = pos['qty']
             
             gross_pnl = (entry_price - exit_price) * qty
             brokerage = ((entry_price * qty) + (exit_price * qty)) * BROKERAGE
             net_pnl = gross_pnl - brokerage
-            reason = "Stop Loss Hit" if sl_hit else "EMA 5 > 10"
             
-            data['closed_shorts'].append({
+            trade = {
                 "Ticker": ticker, "Entry Date": pos['entry_date'],
                 "Exit Date": datetime.now().strftime('%Y-%m-%d %H:%M'),
                 "Entry Price": entry_price, "Exit Price": round(exit_price, 2),
                 "Qty": qty, "Stop Loss": round(new_sl, 2), "PnL": round(net_pnl, 2),
-                "Status": "CLOSED", "Reason": reason
-            })
-            current_capital += (entry_price * qty) + net_pnl
+                "Status": "CLOSED", "Reason": reason, "Strategy": strategy.name,
+                "Risk": pos.get('risk_points')  # Initial stop distance: excursions in R
+            }
+            data['closed_shorts'].append(trade)
+            cash = (entry_price * qty) + net_pnl
+            current_capital += cash
+            EXECUTION.exit("open_shorts", ticker, qty, exit_price, cash, pos, trade, instrument(ticker), trade['Exit Date'])
             del open_shorts[ticker]
             log_event(data, f"❌ CLOSED SHORT: {ticker} @ ₹{exit_price:.2f} | PnL: ₹{net_pnl:.2f}\nReason: {reason}")
 
     # 2. CHECK NEW ENTRIES
-    print("\n🔎 Scanning for New Hourly Signals...")
-    for ticker in WATCHLIST:
+    # Rolling return correlations over the universe: only the bars stored since the last update are added
+    corr = None
+    if CORRELATION['enabled']:
+        corr = correlation.load_or_create(SCAN_UNIVERSE, CORRELATION_FILE, CORRELATION['window'], CORRELATION['min_periods'])
+        update_correlations(corr)
+
+    # Stage 1: cached trend filter over the whole universe; stage 2: live fetch for survivors only.
+    # Only tickers held by every book (live and shadow) are skipped; each book skips its own below.
+    books = {v.name: shadow.load_book(v) for v in SHADOWS}
+    skip = set(open_longs) | set(open_shorts)
+    for book in books.values():
+        skip &= set(book["open_longs"]) | set(book["open_shorts"])
+    candidates, stage1 = screener.screen(SCAN_UNIVERSE, skip=skip, interval=TIMEFRAME)
+    print(f"\n🔎 Scanning for New Hourly Signals... ({len(candidates)}/{len(SCAN_UNIVERSE)} passed the trend screen)")
+    for ticker in candidates:
         if ticker in open_longs or ticker in open_shorts: continue
             
-        curr, prev = fetch_hourly_data(ticker)
-        if curr is None: continue
+        graph = closed_bars_for(ticker)
+        if graph is None: continue
         
-        long_trend = (curr['SMA_100'] > curr['SMA_200']) and (curr['EMA_50'] > curr['SMA_100']) and (curr['EMA_21'] > curr['EMA_50'])
-        long_trigger = (curr['EMA_10'] > curr['EMA_21']) and (prev['EMA_10'] <= prev['EMA_21'])
+        # All configured strategies run off this one dataset; cheap trigger rules go first
+        strategy, side = strategies.entry_signal(STRATEGIES, graph)
+        if side is None: continue
+        curr = graph.bar(-1)
+        entry_price = curr['Close']
+        sl_price = strategy.stop_loss(side, curr)
+        if sl_price is None: continue  # Position size here is set by the distance to the stop
+        if corr is not None:
+            # Positions opened earlier in this scan count too
+            held = {t: strategies.LONG for t in open_longs} | {t: strategies.SHORT for t in open_shorts}
+            hits = correlation.correlated_positions(corr, ticker, side, held, CORRELATION['threshold'])
+            if len(hits) >= CORRELATION['max_positions']:
+                print(f"🧲 Skipping {side} {ticker}: moves with {', '.join(f'{t} ({c:+.2f})' for t, c in hits)}")
+                continue
         
-        if long_trend and long_trigger:
-            entry_price = curr['Close']
-            sl_price = curr['EMA_21'] * 0.999
+        if side == strategies.LONG:
             risk_points = entry_price - sl_price
             
             if risk_points > 0:
@@ -307,16 +416,12 @@ def run_bot():
                         "entry_date": datetime.now().strftime('%Y-%m-%d %H:%M'),
                         "entry_price": round(entry_price, 2), "qty": qty,
                         "risk_points": round(risk_points, 2), "stop_loss": round(sl_price, 2),
-                        "current_price": round(entry_price, 2)
+                        "current_price": round(entry_price, 2), "strategy": strategy.name
                     }
+                    EXECUTION.enter("open_longs", ticker, qty, entry_price, -(cost + (cost * BROKERAGE)), instrument(ticker), open_longs[ticker]['entry_date'])
                     log_event(data, f"✅ OPEN LONG: {ticker}\nEntry: ₹{entry_price:.2f} | Qty: {qty}\nSL: ₹{sl_price:.2f}")
         
-        short_trend = (curr['SMA_100'] < curr['SMA_200']) and (curr['EMA_50'] < curr['SMA_100']) and (curr['EMA_21'] < curr['EMA_50'])
-        short_trigger = (curr['EMA_10'] < curr['EMA_21']) and (prev['EMA_10'] >= prev['EMA_21'])
-        
-        if short_trend and short_trigger:
-            entry_price = curr['Close']
-            sl_price = curr['EMA_21'] * 1.001
+        elif side == strategies.SHORT:
             risk_points = sl_price - entry_price
             
             if risk_points > 0:
@@ -328,15 +433,101 @@ def run_bot():
                         "entry_date": datetime.now().strftime('%Y-%m-%d %H:%M'),
                         "entry_price": round(entry_price, 2), "qty": qty,
                         "risk_points": round(risk_points, 2), "stop_loss": round(sl_price, 2),
-                        "current_price": round(entry_price, 2)
+                        "current_price": round(entry_price, 2), "strategy": strategy.name
                     }
+                    EXECUTION.enter("open_shorts", ticker, qty, entry_price, -(margin_req * BROKERAGE), instrument(ticker), open_shorts[ticker]['entry_date'])
                     log_event(data, f"✅ OPEN SHORT: {ticker}\nEntry: ₹{entry_price:.2f} | Qty: {qty}\nSL: ₹{sl_price:.2f}")
 
+    # 3. SHADOW PORTFOLIOS: the same graphs, each variant's own decisions and ledger
+    shadow_closed = {v.name: shadow.step(v, books[v.name], candidates, closed_bars_for, corr, CORRELATION) for v in SHADOWS}
+
     data["open_longs"] = open_longs
     data["open_shorts"] = open_shorts
     data["capital"] = current_capital
+    # Everything still open (new entries and shadow books included) is marked at its LTP in one batched request
+    prices = quote_open_positions(data, *books.values())
+    market_data.mark_positions(data, prices)
+    # Orders go out concurrently here; fills are reconciled into the portfolio before it is saved
+    for side, trade in EXECUTION.flush(data, log=lambda message: log_event(data, message)):
+        trade_archive.archive_trade(ENGINE_NAME, trade.get('Strategy', STRATEGY_NAME), side, trade)
     save_portfolio(data)
-    print("💾 Portfolio Updated Successfully.")
+    watermarks.save()
+    if corr is not None:
+        # Bars fetched by this scan's stage 2 and shadow books go in now, not a cycle late
+        update_correlations(corr)
+        corr.save(CORRELATION_FILE)
+    for v in SHADOWS:
+        shadow.finish(v, books[v.name], prices, shadow_closed[v.name])
+        book = books[v.name]
+        print(f"👥 Shadow '{v.name}': {len(book['open_longs']) + len(book['open_shorts'])} open, {len(shadow_closed[v.name])} closed this scan")
+    print(f"💾 Portfolio Updated Successfully. ({len(advanced)} ticker(s) had a new closed bar)")
+    positions = {t: "LONG" for t in open_longs} | {t: "SHORT" for t in open_shorts}
+    # Live values only for indicators this scan actually computed; the rest come from stage 1
+    live = {ticker: graph.values(-1, screener.TREND_COLUMNS) for ticker, graph in scanned.items() if graph is not None}
+    screener.save_snapshot(screener.build_snapshot(stage1, live, positions), SNAPSHOT_FILE)
+    equity_curve.append_mark(ENGINE_NAME, equity_curve.portfolio_equity(data, CAPITAL))
+
+def update_correlations(corr):
+    """Adds every bar stored since the tracker last read each ticker (see correlation.update_from_store)."""
+    since = candle_store.to_epoch([history_start(datetime.now())])[0]
+    return correlation.update_from_store(corr, "NSE", TIMEFRAME, since, bar_seconds=BAR_SECONDS,
+                                         store_symbol=lambda t: t.replace(".NS", ""))
+
+def refresh_marks():
+    """
+    Mark-to-market only: re-prices every open position from one batched LTP request and
+    saves. No candles are fetched and no signals are evaluated, so it can run every minute.
+    """
+    prices = quote_open_positions(load_portfolio(), *(shadow.load_book(v) for v in SHADOWS))
+    if not prices:
+        return 0
+    # A full run may have saved while the quote was in flight: apply the prices to the latest file
+    data = load_portfolio()
+    marked = market_data.mark_positions(data, prices)
+    if marked:
+        save_portfolio(data)
+        equity_curve.append_mark(ENGINE_NAME, equity_curve.portfolio_equity(data, CAPITAL))
+    for v in SHADOWS:
+        book = shadow.load_book(v)
+        if market_data.mark_positions(book, prices):
+            shadow.save_book(v, book)
+            equity_curve.append_mark(v.series, equity_curve.portfolio_equity(book, v.capital))
+    return marked
+
+def apply_config(new_config, changed):
+    """Swaps in an edited config (holidays, Telegram, risk settings, mark interval) between marks."""
+    global config, CAPITAL, RISK_PER_TRADE, BROKERAGE, WATCHLIST, TELEGRAM_ENABLED, TELEGRAM_RECIPIENTS, MTM_INTERVAL_SECONDS, SHADOWS
+    settings = new_config['strategy_settings']
+    config, CAPITAL, RISK_PER_TRADE, BROKERAGE, WATCHLIST, TELEGRAM_ENABLED, TELEGRAM_RECIPIENTS, MTM_INTERVAL_SECONDS = (
+        new_config, settings['capital'], settings['risk_per_trade_percent'] / 100.0, settings['brokerage_percent'] / 100.0,
+        new_config['watchlist'], new_config['telegram']['enabled'], new_config['telegram']['recipients'],
+        settings.get('mtm_interval_seconds', 60))
+    trading_calendar.configure(new_config)
+    EXECUTION.brokerage = BROKERAGE
+    SHADOWS = shadow.from_config(ENGINE_NAME, new_config, new_config.get('strategies', {}).get(ENGINE_NAME, [STRATEGY_NAME]))
+    print(f"🔧 Config reloaded: {', '.join(sorted(changed))}")
+
+def run_mtm_loop():
+    print(f"📡 Marking open positions every {MTM_INTERVAL_SECONDS}s")
+    # Runs for the whole session, so config edits are picked up without a restart
+    watcher = config_loader.ConfigWatcher(CONFIG_FILE, config)
+    while True:
+        update = watcher.poll()
+        if update is not None:
+            apply_config(*update)
+        if is_market_open():
+            try:
+                marked = refresh_marks()
+                print(f"💹 Marked {marked} position(s) | {datetime.now().strftime('%H:%M:%S')}")
+            except Exception as e:
+                print(f"⚠️ Mark-to-market failed: {e}")
+        time.sleep(MTM_INTERVAL_SECONDS)
 
 if __name__ == "__main__":
-    run_bot()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Hourly NSE equity bot.")
+    parser.add_argument("--mtm", action="store_true", help="Only keep open positions marked to their LTP (loops every mtm_interval_seconds)")
+    args = parser.parse_args()
+    if args.mtm:
+        run_mtm_loop()
+    else:
+        run_bot()
\ No newline at end of file
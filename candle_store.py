@@ -0,0 +1,154 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+# --- LOCAL CANDLE STORE ---
+# One file per (exchange, symbol, interval): a NumPy structured array sorted by time.
+# Plain .npy files can be memory-mapped, so years of minute bars open instantly and
+# only the pages actually touched are read from disk.
+CANDLE_DIR = "candles"
+EXCHANGE_TZ = "Asia/Kolkata"
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+CANDLE_DTYPE = np.dtype([('ts', 'i8')] + [(col, 'f8') for col in PRICE_COLUMNS])
+
+def series_path(exchange, symbol, interval):
+    """Path of the .npy file backing one candle series."""
+    safe_symbol = symbol.replace('/', '_').replace('^', '_').replace('&', '_')
+    return os.path.join(CANDLE_DIR, exchange, interval, f"{safe_symbol}.npy")
+
+def to_epoch(timestamps, tz=EXCHANGE_TZ):
+    """Converts timestamps (strings, datetimes, tz-aware or naive exchange time) to UTC epoch seconds."""
+    ts = pd.to_datetime(pd.Series(timestamps))
+    if ts.dt.tz is None:
+        ts = ts.dt.tz_localize(tz)
+    return ((ts.dt.tz_convert('UTC') - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)).to_numpy(dtype=np.int64)
+
+def from_epoch(epoch, tz=EXCHANGE_TZ):
+    """UTC epoch seconds -> tz-aware exchange-time DatetimeIndex."""
+    return pd.to_datetime(np.asarray(epoch, dtype=np.int64), unit='s', utc=True).tz_convert(tz)
+
+def frame_to_records(df):
+    """DataFrame with a 'Timestamp' column (or DatetimeIndex) and OHLCV columns -> sorted structured array."""
+    if 'Timestamp' in df.columns:
+        stamps = df['Timestamp']
+    else:
+        stamps = df.index
+    records = np.empty(len(df), dtype=CANDLE_DTYPE)
+    records['ts'] = to_epoch(stamps)
+    for col in PRICE_COLUMNS:
+        records[col] = df[col].to_numpy(dtype=np.float64) if col in df.columns else np.nan
+    return records[np.argsort(records['ts'], kind='stable')]
+
+def load_arrays(exchange, symbol, interval, mmap=True):
+    """
+    Returns the raw structured array for a series (memory-mapped read-only by default),
+    or None if nothing is stored yet. Columns are accessed as arr['ts'], arr['Close'], ...
+    """
+    path = series_path(exchange, symbol, interval)
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode='r' if mmap else None)
+
+def load_range(exchange, symbol, interval, start=None, end=None):
+    """
+    Memory-mapped rows of a series between start and end (inclusive, any to_epoch input), or
+    None if nothing is stored. Only the two ends are searched: no column is read until used.
+    """
+    arr = load_arrays(exchange, symbol, interval, mmap=True)
+    if arr is None:
+        return None
+    lo, hi = 0, len(arr)
+    if start is not None:
+        lo = int(np.searchsorted(arr['ts'], to_epoch([start])[0], side='left'))
+    if end is not None:
+        hi = int(np.searchsorted(arr['ts'], to_epoch([end])[0], side='right'))
+    return arr[lo:hi]
+
+def load_candles(exchange, symbol, interval, start=None, end=None):
+    """Loads a series as a DataFrame in the bots' format: Timestamp, Open, High, Low, Close, Volume."""
+    part = load_range(exchange, symbol, interval, start, end)
+    if part is None or len(part) == 0:
+        return pd.DataFrame(columns=['Timestamp'] + PRICE_COLUMNS)
+
+    df = pd.DataFrame({col: np.asarray(part[col]) for col in PRICE_COLUMNS})
+    df.insert(0, 'Timestamp', from_epoch(part['ts']))
+    return df
+
+def write_records(exchange, symbol, interval, records):
+    """Replaces a series atomically (write to temp file, then rename over the old one)."""
+    path = series_path(exchange, symbol, interval)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, np.ascontiguousarray(records, dtype=CANDLE_DTYPE))
+    os.replace(tmp_path, path)
+
+def save_candles(exchange, symbol, interval, df):
+    """
+    Merges new candles into the stored series. Rows with the same timestamp are replaced
+    by the new data (the still-forming bar gets updated), so saving is idempotent.
+    Returns the number of stored rows.
+    """
+    return merge_records(exchange, symbol, interval, frame_to_records(df))
+
+def merge_records(exchange, symbol, interval, new):
+    """save_candles for a structured array that is already in CANDLE_DTYPE."""
+    old = load_arrays(exchange, symbol, interval, mmap=False)
+    if old is not None and len(old):
+        # New rows first so np.unique keeps them over stale copies
+        merged = np.concatenate([new, old])
+        _, keep = np.unique(merged['ts'], return_index=True)
+        merged = merged[keep]
+    else:
+        merged = new
+    write_records(exchange, symbol, interval, merged)
+    return len(merged)
+
+def last_timestamp(exchange, symbol, interval):
+    """Epoch seconds of the newest stored bar, or None."""
+    arr = load_arrays(exchange, symbol, interval, mmap=True)
+    if arr is None or len(arr) == 0:
+        return None
+    return int(arr['ts'][-1])
+
+def read_csv_candles(path):
+    """Reads an OHLCV CSV export (Timestamp/Date/Datetime column, any capitalisation)."""
+    df = pd.read_csv(path)
+    rename = {}
+    for col in df.columns:
+        key = col.strip().lower()
+        if key in ('timestamp', 'date', 'datetime', 'time'):
+            rename[col] = 'Timestamp'
+        elif key in ('open', 'high', 'low', 'close', 'volume'):
+            rename[col] = key.capitalize()
+    df = df.rename(columns=rename)
+    if 'Timestamp' not in df.columns:
+        raise ValueError(f"No timestamp column found in {path}")
+    return df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local candle store utilities.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    imp = sub.add_parser("import", help="Merge an OHLCV CSV into the store")
+    imp.add_argument("csv")
+    imp.add_argument("--exchange", default="NSE")
+    imp.add_argument("--symbol", required=True)
+    imp.add_argument("--interval", default="ONE_MINUTE")
+
+    info = sub.add_parser("info", help="Show the range of a stored series")
+    info.add_argument("--exchange", default="NSE")
+    info.add_argument("--symbol", required=True)
+    info.add_argument("--interval", default="ONE_MINUTE")
+
+    args = parser.parse_args()
+    if args.command == "import":
+        rows = save_candles(args.exchange, args.symbol, args.interval, read_csv_candles(args.csv))
+        print(f"✅ {args.exchange}:{args.symbol} {args.interval} now holds {rows:,} bars")
+    else:
+        arr = load_arrays(args.exchange, args.symbol, args.interval)
+        if arr is None or len(arr) == 0:
+            print("📭 No data stored.")
+        else:
+            first, last = from_epoch([arr['ts'][0], arr['ts'][-1]])
+            print(f"📦 {len(arr):,} bars | {first} -> {last}")
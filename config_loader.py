@@ -0,0 +1,208 @@
+import json
+import os
+import re
+from datetime import datetime
+import strategies
+import trading_calendar
+
+# --- HOT-RELOADABLE CONFIG ---
+# The long-running loops poll config.json between scans. A changed file is parsed and validated
+# as a whole; only a valid config is handed back, so a half-saved or mistyped edit never
+# reaches the bots (they keep running on the last good one and the problem is printed once).
+CONFIG_FILE = "config.json"
+SHADOW_NAME = re.compile(r"^[A-Za-z0-9_-]+$")
+# Read once at start-up (a new login / broker / re-derived candle history); changing them needs a restart
+RESTART_KEYS = {"angel_one", "execution", "strategy_settings.timeframe", "strategy_settings.base_interval"}
+
+class ConfigError(ValueError):
+    """The config file is missing, unreadable or fails validation."""
+
+def _number(errors, section, key, value, low=None, high=None, strict_low=True):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        errors.append(f"{section}.{key} must be a number, got {value!r}")
+    elif low is not None and (value <= low if strict_low else value < low):
+        errors.append(f"{section}.{key} must be {'>' if strict_low else '>='} {low}, got {value}")
+    elif high is not None and value > high:
+        errors.append(f"{section}.{key} must be <= {high}, got {value}")
+
+def _symbols(errors, name, value):
+    if not isinstance(value, list) or not all(isinstance(s, str) and s.strip() for s in value):
+        errors.append(f"{name} must be a list of symbols")
+
+def _strategies(errors, name, specs):
+    if not isinstance(specs, list) or not specs:
+        errors.append(f"{name} must be a non-empty list of strategy names or {{name, parameters}}")
+        return
+    for spec in specs:
+        try:
+            strategies.variant(spec)
+        except (ValueError, TypeError, AttributeError) as e:
+            errors.append(f"{name}: {e}")
+
+def validate(config):
+    """Raises ConfigError listing every problem found, or returns the config unchanged."""
+    errors = []
+    if not isinstance(config, dict):
+        raise ConfigError("config must be a JSON object")
+
+    telegram = config.get('telegram')
+    if not isinstance(telegram, dict) or not isinstance(telegram.get('enabled'), bool):
+        errors.append("telegram.enabled must be true or false")
+    elif not isinstance(telegram.get('recipients'), list) or not all(
+            isinstance(r, dict) and r.get('bot_token') and r.get('chat_id') for r in telegram['recipients']):
+        errors.append("telegram.recipients must be a list of {bot_token, chat_id}")
+
+    settings = config.get('strategy_settings')
+    if not isinstance(settings, dict):
+        errors.append("strategy_settings is missing")
+    else:
+        for key in ('capital', 'risk_per_trade_percent', 'brokerage_percent'):
+            if key not in settings:
+                errors.append(f"strategy_settings.{key} is missing")
+        if 'capital' in settings: _number(errors, 'strategy_settings', 'capital', settings['capital'], 0)
+        if 'risk_per_trade_percent' in settings: _number(errors, 'strategy_settings', 'risk_per_trade_percent', settings['risk_per_trade_percent'], 0, 100)
+        if 'brokerage_percent' in settings: _number(errors, 'strategy_settings', 'brokerage_percent', settings['brokerage_percent'], 0, 100, strict_low=False)
+        if 'mtm_interval_seconds' in settings: _number(errors, 'strategy_settings', 'mtm_interval_seconds', settings['mtm_interval_seconds'], 0)
+
+    _symbols(errors, "watchlist", config.get('watchlist'))
+
+    holidays = config.get('holidays', [])
+    if not isinstance(holidays, list):
+        errors.append("holidays must be a list of YYYY-MM-DD dates")
+    else:
+        for day in holidays:
+            try:
+                datetime.strptime(day, "%Y-%m-%d")
+            except (TypeError, ValueError):
+                errors.append(f"holidays: {day!r} is not a YYYY-MM-DD date")
+
+    specials = config.get('special_sessions', [])
+    if not isinstance(specials, list):
+        errors.append("special_sessions must be a list of {date, start, end}")
+    else:
+        for spec in specials:
+            try:
+                datetime.strptime(spec['date'], "%Y-%m-%d")
+                if datetime.strptime(spec['start'], "%H:%M") >= datetime.strptime(spec['end'], "%H:%M"):
+                    errors.append(f"special_sessions: {spec['date']} starts after it ends")
+            except (TypeError, KeyError, ValueError):
+                errors.append(f"special_sessions: {spec!r} needs a YYYY-MM-DD date and HH:MM start / end")
+                continue
+            exchanges = spec.get('exchanges', [])
+            if not isinstance(exchanges, list) or any(e not in trading_calendar.SESSIONS for e in exchanges):
+                errors.append(f"special_sessions: {spec['date']} exchanges must be a list of {', '.join(trading_calendar.SESSIONS)}")
+
+    corr = config.get('correlation', {})
+    if not isinstance(corr, dict):
+        errors.append("correlation must be an object")
+    else:
+        if 'threshold' in corr: _number(errors, 'correlation', 'threshold', corr['threshold'], 0, 1)
+        for key in ('max_positions', 'window', 'min_periods'):
+            if key in corr: _number(errors, 'correlation', key, corr[key], 0)
+
+    for engine, specs in config.get('strategies', {}).items():
+        _strategies(errors, f"strategies.{engine}", specs)
+
+    shadows = config.get('shadow_portfolios', {})
+    if not isinstance(shadows, dict):
+        errors.append("shadow_portfolios must be an object of {name: settings}")
+    else:
+        for name, spec in shadows.items():
+            section = f"shadow_portfolios.{name}"
+            if not SHADOW_NAME.match(name):
+                errors.append(f"{section}: names may only use letters, digits, '_' and '-'")
+            if not isinstance(spec, dict):
+                errors.append(f"{section} must be an object")
+                continue
+            if 'capital' in spec: _number(errors, section, 'capital', spec['capital'], 0)
+            if 'risk_per_trade_percent' in spec: _number(errors, section, 'risk_per_trade_percent', spec['risk_per_trade_percent'], 0, 100)
+            if 'brokerage_percent' in spec: _number(errors, section, 'brokerage_percent', spec['brokerage_percent'], 0, 100, strict_low=False)
+            if 'strategies' in spec: _strategies(errors, f"{section}.strategies", spec['strategies'])
+
+    dmi = config.get('dmi', {})
+    if not isinstance(dmi, dict):
+        errors.append("dmi must be an object")
+    else:
+        if 'watchlist' in dmi: _symbols(errors, "dmi.watchlist", dmi['watchlist'])
+        for key in ('total_capital', 'trade_capital'):
+            if key in dmi: _number(errors, 'dmi', key, dmi[key], 0)
+        if 'brokerage_rate' in dmi: _number(errors, 'dmi', 'brokerage_rate', dmi['brokerage_rate'], 0, 1, strict_low=False)
+        if 'rollover_days_before_expiry' in dmi: _number(errors, 'dmi', 'rollover_days_before_expiry', dmi['rollover_days_before_expiry'], 0, strict_low=False)
+        if 'iv_sizing' in dmi and not isinstance(dmi['iv_sizing'], bool):
+            errors.append("dmi.iv_sizing must be true or false")
+        if 'reference_iv' in dmi: _number(errors, 'dmi', 'reference_iv', dmi['reference_iv'], 0, 5)
+        for key in ('min_size_scale', 'max_size_scale'):
+            if key in dmi: _number(errors, 'dmi', key, dmi[key], 0)
+        if all(k in dmi for k in ('min_size_scale', 'max_size_scale')) and not errors and dmi['min_size_scale'] > dmi['max_size_scale']:
+            errors.append("dmi.min_size_scale must not exceed dmi.max_size_scale")
+        if all(k in dmi for k in ('total_capital', 'trade_capital')) and not errors and dmi['trade_capital'] > dmi['total_capital']:
+            errors.append("dmi.trade_capital must not exceed dmi.total_capital")
+
+    if errors:
+        raise ConfigError("; ".join(errors))
+    return config
+
+def load(path=CONFIG_FILE):
+    """Reads and validates the config. Raises ConfigError."""
+    try:
+        with open(path, 'r') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        raise ConfigError(f"{path} not found")
+    except (OSError, ValueError) as e:
+        raise ConfigError(f"{path} is not valid JSON: {e}")
+    return validate(config)
+
+def changed_keys(old, new, prefix=""):
+    """Dotted paths of every setting that differs (sections are compared key by key, lists as a whole)."""
+    changed = set()
+    for key in set(old) | set(new):
+        path = f"{prefix}{key}"
+        a, b = old.get(key), new.get(key)
+        if isinstance(a, dict) and isinstance(b, dict):
+            changed |= changed_keys(a, b, path + ".")
+        elif a != b:
+            changed.add(path)
+    return changed
+
+def needs_restart(changed):
+    return sorted(k for k in changed if k in RESTART_KEYS or k.split('.')[0] in RESTART_KEYS)
+
+class ConfigWatcher:
+    """
+    Watches the config file (size + modification time). poll() returns (config, changed_keys)
+    once per valid edit, or None when nothing (valid) changed. The last good config stays in
+    `self.config`.
+    """
+
+    def __init__(self, path=CONFIG_FILE, config=None):
+        self.path = path
+        self.config = config if config is not None else load(path)
+        self._seen = self._fingerprint()
+
+    def _fingerprint(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def poll(self):
+        fingerprint = self._fingerprint()
+        if fingerprint is None or fingerprint == self._seen:
+            return None
+        # Remembered even if invalid, so a broken edit is reported once rather than every poll
+        self._seen = fingerprint
+        try:
+            new = load(self.path)
+        except ConfigError as e:
+            print(f"⚠️ Config change ignored, still running on the previous one: {e}")
+            return None
+        changed = changed_keys(self.config, new)
+        if not changed:
+            return None
+        restart = needs_restart(changed)
+        if restart:
+            print(f"⚠️ Restart to apply: {', '.join(restart)}")
+        self.config = new
+        return new, changed
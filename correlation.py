@@ -0,0 +1,206 @@
+import os
+import numpy as np
+import candle_store
+import bar_watermarks
+
+# --- ROLLING RETURN CORRELATION ---
+# Pairwise correlation of bar returns over the last `window` bars for the whole watchlist, kept
+# as running sums so each new bar costs a few n x n rank-one updates (add the new row, subtract
+# the one leaving the window) instead of a pass over the window. Symbols without a bar at a
+# timestamp just sit that bar out: every sum is pairwise over the bars both symbols have.
+# The sums are re-derived from the window once per `window` bars so float drift cannot build up.
+STATE_FILE = "correlation_state.npz"
+WINDOW = 120                 # Hourly bars (about four weeks of NSE sessions)
+MIN_PERIODS = 60             # Fewer shared bars than this and a pair's correlation is unknown (NaN)
+
+class RollingCorrelation:
+    def __init__(self, symbols, window=WINDOW, min_periods=MIN_PERIODS):
+        self.symbols = list(symbols)
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.window = window
+        self.min_periods = min_periods
+        n = len(self.symbols)
+        self.returns = np.full((window, n), np.nan)    # The bars in the window, one slot each
+        self.stamps = np.full(window, -1, dtype=np.int64)  # Bar timestamp of each slot (-1 = empty)
+        self.count = 0                                 # Bars currently in the window
+        self.pushes = 0
+        self.last_ts = None                            # Newest bar timestamp in the window (epoch seconds)
+        self.seen = np.full(n, -1, dtype=np.int64)     # Newest stored bar read per symbol (-1 = none yet)
+        self.n = np.zeros((n, n))                      # Bars where both i and j have a return
+        self.sx = np.zeros((n, n))                     # Sum of i's returns over those bars
+        self.sxx = np.zeros((n, n))                    # Sum of i's squared returns over those bars
+        self.sxy = np.zeros((n, n))                    # Sum of i * j returns
+
+    def _add(self, row, sign):
+        valid = ~np.isnan(row)
+        v = valid.astype(np.float64)
+        x = np.where(valid, row, 0.0)
+        self.n += sign * np.outer(v, v)
+        self.sx += sign * np.outer(x, v)
+        self.sxx += sign * np.outer(x * x, v)
+        self.sxy += sign * np.outer(x, x)
+
+    def resync(self):
+        """Recomputes every running sum from the window (exact; used periodically against drift)."""
+        valid = ~np.isnan(self.returns)
+        v = valid.astype(np.float64)
+        x = np.where(valid, self.returns, 0.0)
+        self.n, self.sx, self.sxx, self.sxy = v.T @ v, x.T @ v, (x * x).T @ v, x.T @ x
+
+    def push(self, row, ts=None):
+        """
+        Adds one bar's returns (array in `symbols` order, NaN = no bar). A full window drops its
+        oldest bar; a bar older than all of them is ignored (returns False). Bars pushed without
+        a timestamp are ordered by arrival.
+        """
+        row = np.asarray(row, dtype=np.float64)
+        if ts is None:
+            ts = int(self.stamps.max()) + 1 if self.count else 0
+        if self.count < self.window:
+            slot = self.count
+            self.count += 1
+        else:
+            slot = int(np.argmin(self.stamps))
+            if ts < self.stamps[slot]:
+                return False
+            self._add(self.returns[slot], -1.0)
+        self.returns[slot] = row
+        self.stamps[slot] = ts
+        self._add(row, 1.0)
+        self.pushes += 1
+        if self.pushes % self.window == 0:
+            self.resync()
+        self.last_ts = int(ts) if self.last_ts is None else max(self.last_ts, int(ts))
+        return True
+
+    def fill(self, ts, values):
+        """
+        Adds returns that arrived late for a bar already in the window ({column: return}); cells
+        the bar already has are kept. Returns False if no bar with that timestamp is in the window.
+        """
+        slots = np.flatnonzero(self.stamps[:self.count] == ts)
+        if not len(slots):
+            return False
+        row = self.returns[slots[0]]
+        self._add(row, -1.0)
+        for col, value in values.items():
+            if np.isnan(row[col]):
+                row[col] = value
+        self._add(row, 1.0)
+        return True
+
+    def matrix(self):
+        """Full n x n correlation matrix (NaN where a pair has fewer than min_periods shared bars)."""
+        n = self.n
+        cov = n * self.sxy - self.sx * self.sx.T
+        var = n * self.sxx - self.sx ** 2
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = cov / np.sqrt(var * var.T)
+        corr[(n < self.min_periods) | ~np.isfinite(corr)] = np.nan
+        return np.clip(corr, -1.0, 1.0)
+
+    def corr(self, a, b):
+        i, j = self.index.get(a), self.index.get(b)
+        if i is None or j is None:
+            return np.nan
+        n = self.n[i, j]
+        if n < self.min_periods:
+            return np.nan
+        cov = n * self.sxy[i, j] - self.sx[i, j] * self.sx[j, i]
+        var = (n * self.sxx[i, j] - self.sx[i, j] ** 2) * (n * self.sxx[j, i] - self.sx[j, i] ** 2)
+        return float(np.clip(cov / np.sqrt(var), -1.0, 1.0)) if var > 0 else np.nan
+
+    # --- persistence ---
+    def save(self, path=STATE_FILE):
+        # np.savez appends .npz to names without it, so the temp file keeps that suffix
+        tmp_path = path[:-4] + ".tmp.npz"
+        np.savez(tmp_path, symbols=np.array(self.symbols), window=self.window, min_periods=self.min_periods,
+                 returns=self.returns, stamps=self.stamps, seen=self.seen, count=self.count, pushes=self.pushes,
+                 last_ts=-1 if self.last_ts is None else self.last_ts)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=STATE_FILE):
+        with np.load(path) as f:
+            tracker = cls([str(s) for s in f['symbols']], int(f['window']), int(f['min_periods']))
+            tracker.returns = f['returns'].copy()
+            tracker.stamps, tracker.seen = f['stamps'].copy(), f['seen'].copy()
+            tracker.count, tracker.pushes = int(f['count']), int(f['pushes'])
+            tracker.last_ts = None if int(f['last_ts']) < 0 else int(f['last_ts'])
+        tracker.resync()
+        return tracker
+
+def load_or_create(symbols, path=STATE_FILE, window=WINDOW, min_periods=MIN_PERIODS):
+    """The saved tracker if it covers exactly these symbols and settings, else a new empty one."""
+    if os.path.exists(path):
+        try:
+            tracker = RollingCorrelation.load(path)
+            if tracker.symbols == list(symbols) and tracker.window == window and tracker.min_periods == min_periods:
+                return tracker
+        except Exception as e:
+            print(f"⚠️ Correlation state unreadable, rebuilding: {e}")
+    return RollingCorrelation(symbols, window, min_periods)
+
+def update_from_store(tracker, exchange, interval, since_ts, now=None, bar_seconds=bar_watermarks.BAR_SECONDS, store_symbol=None):
+    """
+    Takes in every closed bar stored since each symbol's own last one (or since `since_ts` for a
+    symbol not read yet). Each symbol's return is taken against its own previous stored close.
+    Bars that reach the store late (after newer bars of other symbols were pushed) are filled
+    into their bar while it is still in the window, so a slow fetch never drops out of the sums.
+    store_symbol maps a tracker symbol to its candle store name ('RELIANCE.NS' -> 'RELIANCE').
+    Returns the number of bars pushed or filled.
+    """
+    cutoff = bar_watermarks.last_closed_bar(now, exchange, bar_seconds)
+    if cutoff is None:
+        return 0
+    cutoff = int(candle_store.to_epoch([cutoff])[0])
+
+    fresh = []
+    for col, symbol in enumerate(tracker.symbols):
+        arr = candle_store.load_arrays(exchange, store_symbol(symbol) if store_symbol else symbol, interval, mmap=True)
+        if arr is None or len(arr) < 2:
+            continue
+        after = int(tracker.seen[col]) if tracker.seen[col] >= 0 else int(since_ts)
+        lo = max(int(np.searchsorted(arr['ts'], after, side='right')), 1)
+        hi = int(np.searchsorted(arr['ts'], cutoff, side='right'))
+        if hi <= lo:
+            continue
+        close = np.asarray(arr['Close'][lo - 1:hi], dtype=np.float64)
+        fresh.append((col, np.asarray(arr['ts'][lo:hi]), close[1:] / close[:-1] - 1.0))
+        tracker.seen[col] = int(arr['ts'][hi - 1])
+    if not fresh:
+        return 0
+
+    stamps = np.unique(np.concatenate([ts for _, ts, _ in fresh]))
+    rows = np.full((len(stamps), len(tracker.symbols)), np.nan)
+    for col, ts, ret in fresh:
+        rows[np.searchsorted(stamps, ts), col] = ret
+    # Bars that would leave the window again straight away are skipped (a cold start)
+    held = tracker.stamps[:tracker.count]
+    newest = np.sort(np.union1d(held, stamps))[-tracker.window:]
+    taken = 0
+    for ts, row in zip(stamps, rows):
+        if ts < newest[0]:
+            continue
+        if ts in held:
+            tracker.fill(ts, {col: row[col] for col in np.flatnonzero(~np.isnan(row))})
+        else:
+            tracker.push(row, ts)
+        taken += 1
+    return taken
+
+def correlated_positions(tracker, ticker, side, positions, threshold):
+    """
+    Open positions whose risk moves with a new `side` entry in `ticker`: same-side positions
+    correlated at >= threshold, or opposite-side ones at <= -threshold. positions = {ticker: side}.
+    Returns [(ticker, correlation)], most correlated first.
+    """
+    sign = 1 if side == "LONG" else -1
+    hits = []
+    for other, other_side in positions.items():
+        c = tracker.corr(ticker, other)
+        if np.isnan(c):
+            continue
+        if c * sign * (1 if other_side == "LONG" else -1) >= threshold:
+            hits.append((other, round(c, 3)))
+    return sorted(hits, key=lambda h: -abs(h[1]))
@@ -1,14 +1,23 @@
+import argparse
+import time
 import yfinance as yf
 import pandas as pd
 import numpy as np
 import json
 import os
 import requests
+import trade_archive
+import equity_curve
+import strategies
+import binance_stream
 from datetime import datetime
 
 # --- CRYPTO CONFIGURATION ---
 PORTFOLIO_FILE = "crypto_portfolio.json"
 CONFIG_FILE = "config.json" # Reusing this just for your Telegram keys
+ENGINE_NAME = "crypto"           # Trade archive partition / rollup name
+STRATEGY_NAME = "ema_trend"
+MIN_BARS = 205                   # Enough history for the slowest indicator (SMA 200)
 
 def load_config():
     if not os.path.exists(CONFIG_FILE):
@@ -25,6 +34,8 @@ RISK_PER_TRADE = 0.005 # 0.5% Risk ($50 per trade)
 BROKERAGE = 0.0015  # 0.15% Crypto Exchange average fee  
 TELEGRAM_ENABLED = config['telegram']['enabled']
 TELEGRAM_RECIPIENTS = config['telegram']['recipients']
+# Strategy plug-ins evaluated on every fetched dataset, first match wins (see strategies.py)
+STRATEGIES = strategies.load(config.get('strategies', {}).get(ENGINE_NAME, [STRATEGY_NAME]))
 
 WATCHLIST = [
     'BTC-USD', 'ETH-USD', 'SOL-USD', 'BNB-USD', 'XRP-USD', 
@@ -51,7 +62,10 @@ def load_portfolio():
     }
 
 def save_portfolio(data):
-    with open(PORTFOLIO_FILE, 'w') as f: json.dump(data, f, indent=4)
+    # Write to a temp file and rename, so readers never see a half-written portfolio
+    tmp_file = PORTFOLIO_FILE + ".tmp"
+    with open(tmp_file, 'w') as f: json.dump(data, f, indent=4)
+    os.replace(tmp_file, PORTFOLIO_FILE)
 
 def log_event(data, message):
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -63,127 +77,144 @@ def log_event(data, message):
     send_telegram(message)
 
 def fetch_hourly_data(ticker):
+    """Indicator graph of the last 60 days of hourly candles; indicators are computed on demand."""
     try:
         df = yf.download(ticker, period="60d", interval="1h", progress=False)
-        if df.empty or len(df) < 205: return None, None
+        if df.empty or len(df) < MIN_BARS: return None
         if isinstance(df.columns, pd.MultiIndex): df.columns = df.columns.get_level_values(0)
-
-        df['SMA_100'] = df['Close'].rolling(window=100).mean()
-        df['SMA_200'] = df['Close'].rolling(window=200).mean()
-        df['EMA_50'] = df['Close'].ewm(span=50, adjust=False).mean()
-        df['EMA_21'] = df['Close'].ewm(span=21, adjust=False).mean()
-        df['EMA_10'] = df['Close'].ewm(span=10, adjust=False).mean()
-        df['EMA_5'] = df['Close'].ewm(span=5, adjust=False).mean()
-        return df.iloc[-1], df.iloc[-2]
+        return strategies.IndicatorGraph(df, STRATEGIES)
     except Exception as e:
         print(f"Error fetching {ticker}: {e}")
-        return None, None
+        return None
+
+# --- POSITION LOGIC (shared by the cron run and the stream) ---
+def manage_exit(data, side, ticker, graph):
+    """Trails / exits one open position with the strategy that opened it. Returns True if it was closed."""
+    book = data["open_longs"] if side == strategies.LONG else data["open_shorts"]
+    pos = book[ticker]
+    strategy = strategies.resolve(pos.get('strategy', STRATEGY_NAME), STRATEGIES)
+    graph.register(*strategy.indicators)
+    curr, prev = graph.bar(-1), graph.bar(-2)
+    entry_price, qty = pos['entry_price'], pos['qty']
+    new_sl, exit_price, reason = strategy.manage(side, pos, curr, prev)
+    new_sl = pos['stop_loss'] if new_sl is None else new_sl
+        
+    pos['stop_loss'], pos['current_price'] = round(new_sl, 4), round(curr['Close'], 4)
+    if exit_price is None: return False
+    
+    brokerage = ((entry_price * qty) + (exit_price * qty)) * BROKERAGE
+    gross_pnl = (exit_price - entry_price) * qty if side == strategies.LONG else (entry_price - exit_price) * qty
+    net_pnl = gross_pnl - brokerage
+    trade = {
+        "Ticker": ticker, "Entry Date": pos['entry_date'], "Exit Date": datetime.now().strftime('%Y-%m-%d %H:%M'),
+        "Entry Price": entry_price, "Exit Price": round(exit_price, 4), "Qty": qty, "Stop Loss": round(new_sl, 4), 
+        "PnL": round(net_pnl, 2), "Status": "CLOSED", "Reason": reason, "Strategy": strategy.name
+    }
+    data['closed_longs' if side == strategies.LONG else 'closed_shorts'].append(trade)
+    trade_archive.archive_trade(ENGINE_NAME, strategy.name, side, trade)
+    data["capital"] += (exit_price * qty) - brokerage if side == strategies.LONG else (entry_price * qty) + net_pnl
+    del book[ticker]
+    log_event(data, f"❌ CLOSED {side}: {ticker} @ ${exit_price:.4f} | PnL: ${net_pnl:.2f}\nReason: {reason}")
+    return True
+
+def check_entry(data, ticker, graph):
+    """All strategies off one dataset, cheap trigger rules first; opens at most one position."""
+    strategy, side = strategies.entry_signal(STRATEGIES, graph)
+    if side is None: return
+    curr = graph.bar(-1)
+    entry_price, sl_price = curr['Close'], strategy.stop_loss(side, curr)
+    if sl_price is None: return  # Position size here is set by the distance to the stop
+    
+    risk_points = entry_price - sl_price if side == strategies.LONG else sl_price - entry_price
+    if risk_points <= 0: return
+    qty = (CAPITAL * RISK_PER_TRADE) / risk_points # Crypto can have fractional quantities!
+    notional = qty * entry_price
+    if qty <= 0 or data["capital"] < notional: return
+    
+    if side == strategies.LONG:
+        data["capital"] -= (notional + (notional * BROKERAGE))
+    else:
+        data["capital"] -= (notional * BROKERAGE)
+    data["open_longs" if side == strategies.LONG else "open_shorts"][ticker] = {
+        "entry_date": datetime.now().strftime('%Y-%m-%d %H:%M'), "entry_price": round(entry_price, 4), 
+        "qty": round(qty, 4), "risk_points": round(risk_points, 4), "stop_loss": round(sl_price, 4), "current_price": round(entry_price, 4),
+        "strategy": strategy.name
+    }
+    log_event(data, f"✅ OPEN {side}: {ticker}\nEntry: ${entry_price:.4f} | Qty: {qty:.4f}\nSL: ${sl_price:.4f}")
+
+def finish(data):
+    save_portfolio(data)
+    equity_curve.append_mark(ENGINE_NAME, equity_curve.portfolio_equity(data, CAPITAL))
 
 # --- MAIN BOT LOOP ---
 def run_bot():
     print(f"\n🪙 Running CRYPTO Bot | {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     data = load_portfolio()
-    
-    open_longs, open_shorts, current_capital = data["open_longs"], data["open_shorts"], data["capital"]
 
-    # 1. MANAGE EXITS
-    for ticker in list(open_longs.keys()):
-        curr, prev = fetch_hourly_data(ticker)
-        if curr is None: continue
-        
-        pos = open_longs[ticker]
-        entry_price, initial_risk, current_sl = pos['entry_price'], pos['risk_points'], pos['stop_loss']
-        
-        r_multiple = (curr['High'] - entry_price) / initial_risk if initial_risk > 0 else 0
-        new_sl = max(current_sl, entry_price + initial_risk) if r_multiple >= 2.0 else max(current_sl, entry_price) if r_multiple >= 1.0 else current_sl
-            
-        open_longs[ticker]['stop_loss'], open_longs[ticker]['current_price'] = round(new_sl, 4), round(curr['Close'], 4)
-        
-        sl_hit = curr['Low'] <= new_sl
-        strategy_exit = (curr['EMA_5'] < curr['EMA_10']) and (prev['EMA_5'] >= prev['EMA_10'])
-        
-        if sl_hit or strategy_exit:
-            exit_price = new_sl if sl_hit else curr['Close']
-            qty = pos['qty']
-            net_pnl = ((exit_price - entry_price) * qty) - (((entry_price * qty) + (exit_price * qty)) * BROKERAGE)
-            reason = "Stop Loss Hit" if sl_hit else "EMA 5 < 10"
-            
-            data['closed_longs'].append({
-                "Ticker": ticker, "Entry Date": pos['entry_date'], "Exit Date": datetime.now().strftime('%Y-%m-%d %H:%M'),
-                "Entry Price": entry_price, "Exit Price": round(exit_price, 4), "Qty": qty, "Stop Loss": round(new_sl, 4), 
-                "PnL": round(net_pnl, 2), "Status": "CLOSED", "Reason": reason
-            })
-            current_capital += (exit_price * qty) - (((entry_price * qty) + (exit_price * qty)) * BROKERAGE)
-            del open_longs[ticker]
-            log_event(data, f"❌ CLOSED LONG: {ticker} @ ${exit_price:.4f} | PnL: ${net_pnl:.2f}\nReason: {reason}")
-
-    for ticker in list(open_shorts.keys()):
-        curr, prev = fetch_hourly_data(ticker)
-        if curr is None: continue
-        
-        pos = open_shorts[ticker]
-        entry_price, initial_risk, current_sl = pos['entry_price'], pos['risk_points'], pos['stop_loss']
-        
-        r_multiple = (entry_price - curr['Low']) / initial_risk if initial_risk > 0 else 0
-        new_sl = min(current_sl, entry_price - initial_risk) if r_multiple >= 2.0 else min(current_sl, entry_price) if r_multiple >= 1.0 else current_sl
-            
-        open_shorts[ticker]['stop_loss'], open_shorts[ticker]['current_price'] = round(new_sl, 4), round(curr['Close'], 4)
-        
-        sl_hit = curr['High'] >= new_sl
-        strategy_exit = (curr['EMA_5'] > curr['EMA_10']) and (prev['EMA_5'] <= prev['EMA_10'])
-        
-        if sl_hit or strategy_exit:
-            exit_price = new_sl if sl_hit else curr['Close']
-            qty = pos['qty']
-            net_pnl = ((entry_price - exit_price) * qty) - (((entry_price * qty) + (exit_price * qty)) * BROKERAGE)
-            reason = "Stop Loss Hit" if sl_hit else "EMA 5 > 10"
-            
-            data['closed_shorts'].append({
-                "Ticker": ticker, "Entry Date": pos['entry_date'], "Exit Date": datetime.now().strftime('%Y-%m-%d %H:%M'),
-                "Entry Price": entry_price, "Exit Price": round(exit_price, 4), "Qty": qty, "Stop Loss": round(new_sl, 4), 
-                "PnL": round(net_pnl, 2), "Status": "CLOSED", "Reason": reason
-            })
-            current_capital += (entry_price * qty) + net_pnl
-            del open_shorts[ticker]
-            log_event(data, f"❌ CLOSED SHORT: {ticker} @ ${exit_price:.4f} | PnL: ${net_pnl:.2f}\nReason: {reason}")
+    # 1. MANAGE EXITS (each position by the strategy that opened it)
+    for side, book in ((strategies.LONG, "open_longs"), (strategies.SHORT, "open_shorts")):
+        for ticker in list(data[book].keys()):
+            graph = fetch_hourly_data(ticker)
+            if graph is None: continue
+            manage_exit(data, side, ticker, graph)
 
     # 2. CHECK ENTRIES
     for ticker in WATCHLIST:
-        if ticker in open_longs or ticker in open_shorts: continue
-        curr, prev = fetch_hourly_data(ticker)
-        if curr is None: continue
-        
-        if (curr['SMA_100'] > curr['SMA_200']) and (curr['EMA_50'] > curr['SMA_100']) and (curr['EMA_21'] > curr['EMA_50']) and (curr['EMA_10'] > curr['EMA_21']) and (prev['EMA_10'] <= prev['EMA_21']):
-            entry_price, sl_price = curr['Close'], curr['EMA_21'] * 0.999
-            risk_points = entry_price - sl_price
-            if risk_points > 0:
-                qty = (CAPITAL * RISK_PER_TRADE) / risk_points # Crypto can have fractional quantities!
-                cost = qty * entry_price
-                if qty > 0 and current_capital >= cost:
-                    current_capital -= (cost + (cost * BROKERAGE))
-                    open_longs[ticker] = {
-                        "entry_date": datetime.now().strftime('%Y-%m-%d %H:%M'), "entry_price": round(entry_price, 4), 
-                        "qty": round(qty, 4), "risk_points": round(risk_points, 4), "stop_loss": round(sl_price, 4), "current_price": round(entry_price, 4)
-                    }
-                    log_event(data, f"✅ OPEN LONG: {ticker}\nEntry: ${entry_price:.4f} | Qty: {qty:.4f}\nSL: ${sl_price:.4f}")
-        
-        if (curr['SMA_100'] < curr['SMA_200']) and (curr['EMA_50'] < curr['SMA_100']) and (curr['EMA_21'] < curr['EMA_50']) and (curr['EMA_10'] < curr['EMA_21']) and (prev['EMA_10'] >= prev['EMA_21']):
-            entry_price, sl_price = curr['Close'], curr['EMA_21'] * 1.001
-            risk_points = sl_price - entry_price
-            if risk_points > 0:
-                qty = (CAPITAL * RISK_PER_TRADE) / risk_points
-                margin_req = qty * entry_price
-                if qty > 0 and current_capital >= margin_req:
-                    current_capital -= (margin_req * BROKERAGE)
-                    open_shorts[ticker] = {
-                        "entry_date": datetime.now().strftime('%Y-%m-%d %H:%M'), "entry_price": round(entry_price, 4), 
-                        "qty": round(qty, 4), "risk_points": round(risk_points, 4), "stop_loss": round(sl_price, 4), "current_price": round(entry_price, 4)
-                    }
-                    log_event(data, f"✅ OPEN SHORT: {ticker}\nEntry: ${entry_price:.4f} | Qty: {qty:.4f}\nSL: ${sl_price:.4f}")
-
-    data["open_longs"], data["open_shorts"], data["capital"] = open_longs, open_shorts, current_capital
-    save_portfolio(data)
+        if ticker in data["open_longs"] or ticker in data["open_shorts"]: continue
+        graph = fetch_hourly_data(ticker)
+        if graph is None: continue
+        check_entry(data, ticker, graph)
+
+    finish(data)
     print("💾 Crypto Portfolio Updated.")
 
+# --- STREAM MODE ---
+# Instead of cron + yfinance, one Binance websocket delivers every watched coin's 1h klines and
+# trades. Each closed bar is evaluated the moment it closes (only closed bars, so no forming
+# candle); trades keep current_price fresh and are written at most every MARK_SECONDS.
+MARK_SECONDS = 30
+
+def on_bar_close(ticker, series, catching_up):
+    if len(series.bars) < MIN_BARS: return
+    graph = strategies.IndicatorGraph(series.frame(), STRATEGIES)
+    data = load_portfolio()
+    if ticker in data["open_longs"]:
+        manage_exit(data, strategies.LONG, ticker, graph)
+    elif ticker in data["open_shorts"]:
+        manage_exit(data, strategies.SHORT, ticker, graph)
+    elif not catching_up:
+        # Bars replayed after a disconnect only manage exits: their entry moment has passed
+        check_entry(data, ticker, graph)
+    finish(data)
+
+class TradeMarks:
+    """Latest trade price per coin, written into the open positions at most every MARK_SECONDS."""
+
+    def __init__(self):
+        self.prices = {}
+        self.written = time.time()
+
+    def __call__(self, ticker, price, trade_time_ms):
+        self.prices[ticker] = price
+        if time.time() - self.written < MARK_SECONDS: return
+        self.written = time.time()
+        data = load_portfolio()
+        marked = False
+        for book in ("open_longs", "open_shorts"):
+            for held, pos in data[book].items():
+                if held in self.prices:
+                    pos['current_price'], marked = round(self.prices[held], 4), True
+        if marked: save_portfolio(data)
+
+def run_stream():
+    print(f"\n📡 CRYPTO stream mode | {len(WATCHLIST)} coins on one Binance websocket")
+    binance_stream.KlineStream(WATCHLIST, on_bar_close, on_trade=TradeMarks()).run()
+
 if __name__ == "__main__":
-    run_bot()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Hourly crypto bot.")
+    parser.add_argument("--stream", action="store_true", help="Run continuously on the Binance kline / trade websocket")
+    args = parser.parse_args()
+    if args.stream:
+        run_stream()
+    else:
+        run_bot()
@@ -2,17 +2,50 @@ import streamlit as st
 import pandas as pd
 import json
 import os
+import trade_archive
+import portfolio_client
+import equity_curve
+import screener
+import shadow
+import config_loader
+import excursions
+from datetime import datetime
+
+# --- EQUITY CHARTS ---
+def render_equity(series):
+    # Charts come pre-downsampled for the selected window, so history length never matters
+    span = equity_curve.series_range(series)
+    if span is None:
+        st.info("No equity marks yet. One is recorded at the end of every run.")
+        return
+    first, last = [datetime.fromtimestamp(x) for x in span]
+    window = st.slider("Window", min_value=first, max_value=last, value=(first, last), key=f"window_{series}") if first < last else (first, last)
+    curve = portfolio_client.load_equity(series, int(window[0].timestamp()), int(window[1].timestamp()))
+    st.line_chart(curve, x='Timestamp', y='Equity')
+    st.area_chart(curve, x='Timestamp', y='Drawdown')
 
 # --- PAGE CONFIG ---
 st.set_page_config(page_title="Hourly Swing Bot", layout="wide")
 
 PORTFOLIO_FILE = "portfolio.json"
 
-def load_data():
-    if not os.path.exists(PORTFOLIO_FILE):
+def live_capital():
+    # Starting capital of the live book, for its row in the shadow comparison
+    try:
+        return config_loader.load()['strategy_settings']['capital']
+    except config_loader.ConfigError:
         return None
-    with open(PORTFOLIO_FILE, 'r') as f:
-        return json.load(f)
+
+def live_base_interval():
+    # Finest bars bot.py stores per symbol: excursions are measured on these
+    try:
+        return config_loader.load()['strategy_settings'].get('base_interval', excursions.INTERVAL)
+    except config_loader.ConfigError:
+        return excursions.INTERVAL
+
+def load_data():
+    # Served by portfolio_api.py when it is running (unchanged data costs a 304), else read from disk
+    return portfolio_client.load_portfolio("nifty", PORTFOLIO_FILE, st.session_state.setdefault("portfolio_cache", {}))
 
 data = load_data()
 
@@ -127,7 +160,7 @@ else:
     st.markdown("---")
     
     # --- TABS FOR TABLES ---
-    t1, t2, t3, t4 = st.tabs(["🟢 Open Longs", "🔴 Open Shorts", "✅ Closed Longs", "❌ Closed Shorts"])
+    t1, t2, t3, t4, t5, t6, t7, t8, t9, t10 = st.tabs(["🟢 Open Longs", "🔴 Open Shorts", "✅ Closed Longs", "❌ Closed Shorts", "📅 Performance", "📈 Equity", "🧪 Backtests", "🌡️ Trend Heatmap", "👥 Shadow Variants", "📐 Excursions"])
 
     with t1:
         df_ol = format_open_positions(open_longs, "LONG")
@@ -155,4 +188,87 @@ else:
         if not df_cs.empty:
             st.dataframe(df_cs.style.map(color_pnl, subset=['P/L']), use_container_width=True, hide_index=True)
         else:
-            st.info("No closed short positions.")
\ No newline at end of file
+            st.info("No closed short positions.")
+
+    with t5:
+        # Rollups are kept up to date by the bot on every close, so this is a constant-time read
+        level = st.radio("Group by", trade_archive.ROLLUP_LEVELS, index=1, horizontal=True)
+        df_roll = trade_archive.rollup_frame("nifty", level)
+        if not df_roll.empty:
+            st.dataframe(df_roll.style.map(color_pnl, subset=['net_pnl']), use_container_width=True)
+        else:
+            st.info("No archived trades yet.")
+
+    with t6:
+        render_equity("nifty")
+
+    with t7:
+        backtests = equity_curve.list_series("backtest_")
+        if backtests:
+            render_equity(st.selectbox("Backtest", backtests))
+        else:
+            st.info("No backtest equity curves yet. Run 'backtest.py' first.")
+
+    with t8:
+        # Written by bot.py at the end of every scan; nothing is fetched or recomputed here
+        scanned_at, heatmap = screener.load_snapshot()
+        if heatmap.empty:
+            st.info("No scan snapshot yet. It is written at the end of every 'bot.py' run.")
+        else:
+            st.caption(f"Last scan: {scanned_at} | {len(heatmap)} symbols | {(heatmap['State'] == 'LONG').sum()} long / {(heatmap['State'] == 'SHORT').sum()} short trends")
+            states = st.multiselect("Trend state", ["LONG", "SHORT", "NONE", "NO_DATA"], default=["LONG", "SHORT", "NONE", "NO_DATA"])
+            heatmap = heatmap[heatmap['State'].isin(states)].sort_values('Trigger Gap %', key=abs)
+
+            def color_state(val):
+                return {'LONG': 'background-color: #1b5e20; color: white', 'SHORT': 'background-color: #b71c1c; color: white'}.get(val, '')
+
+            def color_gap(val):
+                # Greener / redder the further EMA_10 sits above / below EMA_21, capped at 2%
+                if val is None or pd.isna(val): return ''
+                alpha = min(abs(val) / 2.0, 1.0) * 0.8
+                rgb = "46, 125, 50" if val > 0 else "198, 40, 40"
+                return f'background-color: rgba({rgb}, {alpha:.2f})'
+
+            st.dataframe(
+                heatmap.style.map(color_state, subset=['State']).map(color_gap, subset=['Trigger Gap %', 'Trend Spread %']).format(precision=2),
+                use_container_width=True, height=min(40 + 35 * len(heatmap), 900)
+            )
+
+    with t9:
+        # Ledgers written by bot.py for each config['shadow_portfolios'] variant, next to the live book
+        names = shadow.list_books("nifty")
+        if not names:
+            st.info("No shadow portfolios yet. Add variants under 'shadow_portfolios' in config.json.")
+        else:
+            capital_0 = live_capital()
+            table = shadow.comparison("nifty", data if capital_0 else None, capital_0)
+            st.dataframe(table.style.map(color_pnl, subset=['Realized P&L', 'Return %']).format(precision=2), use_container_width=True)
+            series = (["nifty"] if capital_0 else []) + [shadow.series_name("nifty", n) for n in names]
+            curves = [portfolio_client.load_equity(s).assign(Variant=label) for s, label in zip(series, table.index)]
+            curves = [c for c in curves if not c.empty]
+            if curves:
+                st.line_chart(pd.concat(curves), x='Timestamp', y='Equity', color='Variant')
+
+    with t10:
+        # MAE / MFE of every closed trade from the stored candles (one range query per trade)
+        closed = [dict(t, Type="LONG") for t in closed_longs] + [dict(t, Type="SHORT") for t in closed_shorts]
+        if not closed:
+            st.info("No closed trades yet.")
+        else:
+            interval = live_base_interval()
+            log = excursions.for_trades(closed, excursions.store_index_for("NSE", interval, lambda t: t.replace(".NS", "")),
+                                        risk_col='Risk', align=interval)
+            stats = excursions.summary(log)
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Avg MFE", f"{stats['avg_mfe_pct']:.2f}%", f"{stats['avg_mfe_r']:.2f}R" if 'avg_mfe_r' in stats else None)
+            c2.metric("Avg MAE", f"{stats['avg_mae_pct']:.2f}%", f"-{stats['avg_mae_r']:.2f}R" if 'avg_mae_r' in stats else None)
+            c3.metric("Median Capture", f"{stats['median_capture_pct']:.1f}%")
+            c4.metric("Avg Bars to Peak", f"{stats['avg_bars_to_peak']:.1f}")
+            if 'reached_1r_pct' in stats:
+                st.caption(f"Reached 1R: {stats['reached_1r_pct']:.1f}% of trades ({stats['gave_back_1r_pct']:.1f}% of those closed under 0.5R) | "
+                           f"Reached 2R: {stats['reached_2r_pct']:.1f}% ({stats['gave_back_2r_pct']:.1f}% closed under 1R)")
+            columns = ['Ticker', 'Type', 'Entry Date', 'Exit Date', 'Entry Price', 'Exit Price', 'PnL', 'Reason',
+                       'MFE %', 'MAE %', 'MFE R', 'MAE R', 'Bars To Peak', 'Bars Held', 'Capture %']
+            log = log[[c for c in columns if c in log.columns]].sort_values('Exit Date', ascending=False)
+            st.dataframe(log.style.map(color_pnl, subset=['PnL']).format(precision=2), use_container_width=True, hide_index=True)
+            st.scatter_chart(log.dropna(subset=['MFE %']), x='MAE %', y='MFE %', color='Type')
@@ -3,11 +3,21 @@ import numpy as np
 import json
 import os
 import requests
+import trade_archive
+import equity_curve
+import execution
+import strategies
 import time  # <--- Add this here
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
 # ... (rest of imports)
-from SmartApi import SmartConnect
-import pyotp
+import angel_session
+import config_loader
+import market_data
+import option_greeks
+import candle_store
+import bar_watermarks
+import resampler
+import trading_calendar
 import warnings
 
 # Suppress pandas warnings for cleaner terminal output
@@ -16,85 +26,121 @@ warnings.filterwarnings('ignore')
 # --- CONFIGURATION ---
 PORTFOLIO_FILE = "dmi_portfolio.json"  # Brand new ledger so it doesn't mix with your old bot!
 CONFIG_FILE = "config.json"
+ENGINE_NAME = "dmi"              # Trade archive partition / rollup name
+STRATEGY_NAME = "rsi_dmi"
 
 # --- STRATEGY SETTINGS ---
+# Defaults; config.json -> "dmi" overrides them, and edits are applied between scans (apply_config)
 TOTAL_CAPITAL = 1000000.0        # ₹10 Lakhs Total Capital
 TRADE_CAPITAL = 200000.0         # ₹2 Lakhs Deployed Per Trade
 BROKERAGE_RATE = 0.0015          # 0.15% of deployed capital
 WATCHLIST = ["NIFTY", "BANKNIFTY", "RELIANCE", "HDFCBANK", "BAJAJFINSV", "NATGASMINI"]
+DEFAULTS = {"total_capital": TOTAL_CAPITAL, "trade_capital": TRADE_CAPITAL, "brokerage_rate": BROKERAGE_RATE,
+            "watchlist": WATCHLIST, "rollover_days_before_expiry": 1,
+            "iv_sizing": True, "reference_iv": 0.14, "min_size_scale": 0.5, "max_size_scale": 1.5}
+CONTINUOUS_META_FILE = os.path.join(candle_store.CANDLE_DIR, "continuous_contracts.json")
+WATERMARK_FILE = "dmi_watermarks.json"   # Last closed hourly bar evaluated per script
+MTM_INTERVAL_SECONDS = 60                # Batched LTP marks of open positions between scans
+BASE_INTERVAL = "FIFTEEN_MINUTE"         # The only resolution fetched from SmartAPI
+TIMEFRAME = "ONE_HOUR"                   # Derived locally from BASE_INTERVAL; the strategy trades it
+HISTORY_DAYS = 60
+OPTION_CHAIN_NAMES = ("NIFTY", "BANKNIFTY")  # Index futures sized by their option chain's ATM IV
+OPTION_IV_MAX_AGE = 300                  # Seconds before a chain snapshot is too old to size with
+STRATEGY = strategies.STRATEGIES[STRATEGY_NAME]
 
 def load_config():
-    if not os.path.exists(CONFIG_FILE):
-        print(f"❌ Error: {CONFIG_FILE} not found!")
+    try:
+        return config_loader.load(CONFIG_FILE)
+    except config_loader.ConfigError as e:
+        print(f"❌ Error: {e}")
         exit()
-    with open(CONFIG_FILE, 'r') as f:
-        return json.load(f)
+
+def settings_from(config):
+    """Every hot-reloadable setting, resolved against the defaults."""
+    dmi = dict(DEFAULTS, **config.get('dmi', {}))
+    return {
+        "TOTAL_CAPITAL": float(dmi['total_capital']), "TRADE_CAPITAL": float(dmi['trade_capital']),
+        "BROKERAGE_RATE": float(dmi['brokerage_rate']), "WATCHLIST": list(dmi['watchlist']),
+        "ROLLOVER_DAYS": dmi['rollover_days_before_expiry'],   # Roll the day before expiry by default
+        # Index futures trade TRADE_CAPITAL x reference_iv / ATM IV, clamped to the scale limits
+        "IV_SIZING": bool(dmi['iv_sizing']), "REFERENCE_IV": float(dmi['reference_iv']),
+        "SIZE_SCALE_LIMITS": (float(dmi['min_size_scale']), float(dmi['max_size_scale'])),
+        "TELEGRAM_ENABLED": config['telegram']['enabled'], "TELEGRAM_RECIPIENTS": config['telegram']['recipients'],
+    }
 
 config = load_config()
-TELEGRAM_ENABLED = config['telegram']['enabled']
-TELEGRAM_RECIPIENTS = config['telegram']['recipients']
+globals().update(settings_from(config))
+trading_calendar.configure(config)
+CONFIG_WATCHER = config_loader.ConfigWatcher(CONFIG_FILE, config)
 
 # --- ANGEL ONE API SETUP ---
+SESSION = angel_session.SessionManager(config['angel_one']) if 'angel_one' in config else None
+
 def get_angel_session():
     print("🔐 Authenticating with Angel One SmartAPI...")
     try:
-        api_key = config['angel_one']['api_key']
-        client_id = config['angel_one']['client_id']
-        pin = config['angel_one']['pin']
-        totp_secret = config['angel_one']['totp_secret']
-        
-        smartApi = SmartConnect(api_key=api_key)
-        totp = pyotp.TOTP(totp_secret).now()
-        session = smartApi.generateSession(client_id, pin, totp)
-        
-        if session.get('status'):
-            print("✅ SmartAPI Login Successful!")
-            return smartApi
-        else:
-            print("❌ Angel One Login Failed:", session)
-            exit()
+        if SESSION is None:
+            raise KeyError("'angel_one' credentials missing from config")
+        return SESSION.get()
     except Exception as e:
         print("❌ Angel One Connection Error:", e)
         exit()
 
 # --- DYNAMIC FUTURES TOKEN FETCHER ---
+SCRIP_MASTER_URL = "https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json"
+FUTURES_MASTER = None        # Futures rows of the scrip master, refreshed once a day
+FUTURES_MASTER_DATE = None
+OPTIONS_MASTER = None        # Index option rows of the scrip master (OPTION_CHAIN_NAMES only)
+
+def load_futures_master():
+    """Downloads the scrip master and keeps only live NFO & MCX futures (and the index option chains)."""
+    global FUTURES_MASTER, FUTURES_MASTER_DATE, OPTIONS_MASTER
+    response = requests.get(SCRIP_MASTER_URL, timeout=10)
+    df = pd.DataFrame(response.json())
+
+    # Filter for NFO & MCX Futures
+    df_nfo = df[(df['exch_seg'].isin(['NFO', 'MCX'])) & (df['instrumenttype'].isin(['FUTIDX', 'FUTSTK', 'FUTCOM', 'FUTENG']))]
+
+    # Convert the string 'expiry' to actual dates so we can sort them mathematically
+    df_nfo['expiry_date'] = pd.to_datetime(df_nfo['expiry'], format='%d%b%Y')
+
+    # Filter out contracts that have already expired
+    today = pd.to_datetime('today').normalize()
+    FUTURES_MASTER = df_nfo[df_nfo['expiry_date'] >= today]
+    FUTURES_MASTER_DATE = today
+    OPTIONS_MASTER = df[(df['exch_seg'] == 'NFO') & (df['instrumenttype'] == 'OPTIDX') & df['name'].isin(OPTION_CHAIN_NAMES)]
+    return FUTURES_MASTER
+
+def pick_contract(script, today):
+    """
+    Nearest contract that is not yet inside the rollover window: once a contract is
+    ROLLOVER_DAYS or fewer days from expiry we trade the next one.
+    """
+    script_df = FUTURES_MASTER[FUTURES_MASTER['name'] == script]
+    if script_df.empty:
+        return None
+    script_df = script_df.sort_values(by='expiry_date')
+    live = script_df[script_df['expiry_date'] - pd.Timedelta(days=ROLLOVER_DAYS) > today]
+    contract = live.iloc[0] if not live.empty else script_df.iloc[-1]
+    return {
+        "token": contract['token'],
+        "trading_symbol": contract['symbol'],
+        "expiry": contract['expiry'],
+        "exchange": contract['exch_seg']
+    }
+
 def get_futures_tokens(watchlist):
-    """Finds the closest expiring Futures contract for the watchlist."""
+    """Finds the active (near-month, or next month inside the rollover window) contract for the watchlist."""
     print("🔄 Scanning for Near-Month Future Contracts...")
-    url = "https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json"
     try:
-        response = requests.get(url, timeout=10)
-        instrument_list = response.json()
-        
-        df = pd.DataFrame(instrument_list)
-        
-        # Filter for NFO (Futures & Options) and specifically Futures (FUTIDX and FUTSTK)
-        # Filter for NFO & MCX Futures
-        df_nfo = df[(df['exch_seg'].isin(['NFO', 'MCX'])) & (df['instrumenttype'].isin(['FUTIDX', 'FUTSTK', 'FUTCOM', 'FUTENG']))]
-
-        # Convert the string 'expiry' to actual dates so we can sort them mathematically
-        df_nfo['expiry_date'] = pd.to_datetime(df_nfo['expiry'], format='%d%b%Y')
-        
-        # Filter out contracts that have already expired
+        load_futures_master()
         today = pd.to_datetime('today').normalize()
-        df_nfo = df_nfo[df_nfo['expiry_date'] >= today]
-        
         token_map = {}
         for script in watchlist:
-            # Find all available futures for the specific script
-            script_df = df_nfo[df_nfo['name'] == script]
-            
-            if not script_df.empty:
-                # Sort by expiry date (closest date first)
-                script_df = script_df.sort_values(by='expiry_date')
-                near_month = script_df.iloc[0]
-                
-                token_map[script] = {
-                    "token": near_month['token'],
-                    "trading_symbol": near_month['symbol'],
-                    "expiry": near_month['expiry']
-                }
-                print(f"🎯 Locked onto {script} -> {near_month['symbol']} (Expires: {near_month['expiry']})")
+            contract = pick_contract(script, today)
+            if contract:
+                token_map[script] = contract
+                print(f"🎯 Locked onto {script} -> {contract['trading_symbol']} (Expires: {contract['expiry']})")
             else:
                 print(f"⚠️ Could not find future contracts for {script}")
                 
@@ -106,78 +152,222 @@ def get_futures_tokens(watchlist):
 # Initialize the connection and lock onto the tokens
 smartApi = get_angel_session()
 TOKEN_MAP = get_futures_tokens(WATCHLIST)
+
+# Paper trading unless config['execution']['mode'] is 'mock' or 'live'
+EXECUTION = execution.from_config(ENGINE_NAME, config, SESSION, BROKERAGE_RATE)
+
+def instrument(script):
+    return dict(TOKEN_MAP.get(script, {}), product_type="CARRYFORWARD")
+
+# --- CONTINUOUS CONTRACT SERIES ---
+# Each underlying keeps one back-adjusted hourly series in the candle store. Its newest
+# bars are always the active contract's real prices; on a roll the whole history is shifted
+# by the old->new spread, so indicators carry straight through the switch.
+def continuous_symbol(script):
+    return f"{script}_CONT"
+
+def load_continuous_meta():
+    """Which contract currently forms the tail of each continuous series."""
+    if os.path.exists(CONTINUOUS_META_FILE):
+        try:
+            with open(CONTINUOUS_META_FILE, 'r') as f: return json.load(f)
+        except: pass
+    return {}
+
+def save_continuous_meta(meta):
+    os.makedirs(os.path.dirname(CONTINUOUS_META_FILE), exist_ok=True)
+    with open(CONTINUOUS_META_FILE, 'w') as f: json.dump(meta, f, indent=4)
+
+def fetch_candles(exchange, token, from_dt, to_dt):
+    """Raw BASE_INTERVAL candles from SmartAPI as a DataFrame, or None."""
+    historicParam = {
+        "exchange": exchange,
+        "symboltoken": token,
+        "interval": BASE_INTERVAL,
+        "fromdate": from_dt.strftime("%Y-%m-%d %H:%M"),
+        "todate": to_dt.strftime("%Y-%m-%d %H:%M")
+    }
+    res = smartApi.getCandleData(historicParam)
+    if angel_session.is_token_error(res):
+        SESSION.get(force_refresh=True)
+        res = smartApi.getCandleData(historicParam)
+
+    if res.get('status') and res.get('data'):
+        columns = ['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume']
+        return pd.DataFrame(res['data'], columns=columns)
+    return None
+
+def roll_continuous_series(script, old_contract, new_contract):
+    """
+    Back-adjusts the stored base series onto the new contract, appends its bars and re-derives
+    the trading timeframe from it. Returns the price spread (new - old) or None if the new contract could not be fetched.
+    """
+    exchange = new_contract['exchange']
+    series = continuous_symbol(script)
+    cont = candle_store.load_arrays(exchange, series, BASE_INTERVAL, mmap=False)
+
+    now = datetime.now()
+    if cont is not None and len(cont):
+        # Only fetch back to where our history ends (plus a day of overlap to measure the spread)
+        last_bar = candle_store.from_epoch([cont['ts'][-1]])[0].tz_localize(None).to_pydatetime()
+        from_dt = max(last_bar - timedelta(days=1), now - timedelta(days=HISTORY_DAYS))
+    else:
+        from_dt = now - timedelta(days=HISTORY_DAYS)
+
+    df_new = fetch_candles(exchange, new_contract['token'], from_dt, now)
+    if df_new is None:
+        return None
+
+    spread = 0.0
+    if cont is not None and len(cont):
+        new_rec = candle_store.frame_to_records(df_new)
+        common = np.intersect1d(cont['ts'], new_rec['ts'])
+        if len(common):
+            t = common[-1]
+            spread = float(new_rec['Close'][new_rec['ts'] == t][0] - cont['Close'][cont['ts'] == t][0])
+            for col in ['Open', 'High', 'Low', 'Close']:
+                cont[col] += spread
+            candle_store.write_records(exchange, series, BASE_INTERVAL, cont)
+        else:
+            print(f"⚠️ No overlapping bars between {old_contract['trading_symbol']} and {new_contract['trading_symbol']}; series joined unadjusted.")
+
+    candle_store.save_candles(exchange, series, BASE_INTERVAL, df_new)
+    # Every derived bar moved with the adjustment, so re-derive rather than update
+    resampler.rebuild(exchange, series, BASE_INTERVAL, TIMEFRAME)
+    return spread
+
+def check_rollovers(data):
+    """Switches scripts to the next contract inside the rollover window, without a restart."""
+    global TOKEN_MAP
+    today = pd.to_datetime('today').normalize()
+    if FUTURES_MASTER is None or FUTURES_MASTER_DATE != today:
+        try:
+            load_futures_master()
+        except Exception as e:
+            print(f"⚠️ Could not refresh scrip master, keeping current contracts: {e}")
+            if FUTURES_MASTER is None: return
+
+    meta = load_continuous_meta()
+    # Scripts dropped from the watchlist keep rolling while a position in them is still open
+    for script in sorted(set(WATCHLIST) | set(TOKEN_MAP)):
+        target = pick_contract(script, today)
+        if target is None: continue
+        current = meta.get(script)
+
+        if current and current['token'] != target['token']:
+            spread = roll_continuous_series(script, current, target)
+            if spread is None:
+                print(f"⚠️ Rollover of {script} to {target['trading_symbol']} failed, retrying next scan.")
+                continue
+
+            # Carry open positions over at the same P&L: entry shifts by the roll spread,
+            # and the capital flow of selling old / buying new is booked now.
+            for book in (data["open_longs"], data["open_shorts"]):
+                pos = book.get(script)
+                if pos and pos.get('trading_symbol') == current['trading_symbol']:
+                    pos['entry_price'] = round(pos['entry_price'] + spread, 2)
+                    pos['trading_symbol'] = target['trading_symbol']
+                    data["capital"] -= spread * pos['qty']
+
+            log_event(data, f"🔁 ROLLED {script}: {current['trading_symbol']} -> {target['trading_symbol']}\nSpread: {spread:+.2f}")
+
+        TOKEN_MAP[script] = target
+        meta[script] = target
+    save_continuous_meta(meta)
+
+# --- CONFIG HOT RELOAD ---
+def apply_config(new_config, changed):
+    """
+    Switches to an edited config between scans. Everything is resolved first and then swapped
+    in at once, so a scan never sees half of an edit. Only scripts added to the watchlist are
+    warmed (contract lookup; their candles load on their first scan), and dropped ones are
+    forgotten unless a position in them is still open.
+    """
+    global config, TOKEN_MAP
+    settings = settings_from(new_config)
+    added = [s for s in settings["WATCHLIST"] if s not in TOKEN_MAP]
+    # Any edit, not just a watchlist one, must keep the contracts of scripts a position is still open in
+    data = load_portfolio()
+    held = set(data["open_longs"]) | set(data["open_shorts"])
+
+    token_map = {s: c for s, c in TOKEN_MAP.items() if s in settings["WATCHLIST"] or s in held}
+    if added:
+        try:
+            if FUTURES_MASTER is None: load_futures_master()
+            today = pd.to_datetime('today').normalize()
+            for script in added:
+                contract = pick_contract(script, today)
+                if contract:
+                    token_map[script] = contract
+                    print(f"🎯 Locked onto {script} -> {contract['trading_symbol']} (Expires: {contract['expiry']})")
+                else:
+                    print(f"⚠️ Could not find future contracts for {script}")
+        except Exception as e:
+            print(f"⚠️ Could not look up contracts for {', '.join(added)}, retrying at the next rollover check: {e}")
+
+    config = new_config
+    TOKEN_MAP = token_map
+    globals().update(settings)
+    trading_calendar.configure(new_config)
+    EXECUTION.brokerage = BROKERAGE_RATE
+    print(f"🔧 Config reloaded: {', '.join(sorted(changed))}")
+
+def reload_config():
+    """Applies config.json if it changed (and is valid) since the last check. Returns True if it did."""
+    update = CONFIG_WATCHER.poll()
+    if update is None:
+        return False
+    apply_config(*update)
+    return True
+
 # --- DATA FETCHING & MATH ENGINE ---
 def fetch_hourly_data(script_name):
-    """Fetches 1-Hour data for the active future and calculates RSI-DMI."""
+    """
+    Updates the continuous series with the active future's latest candles (only the bars
+    we do not have yet), derives the trading timeframe locally and returns the RSI-DMI
+    indicator graph of its last 60 days.
+    """
     if smartApi is None or script_name not in TOKEN_MAP: 
-        return None, None
+        return None
     
     token_info = TOKEN_MAP[script_name]
-    token = token_info['token']
-    exchange = "MCX" if script_name == "NATGASMINI" else "NFO"
-        
-    to_date = datetime.now().strftime("%Y-%m-%d %H:%M")
-    from_date = (datetime.now() - timedelta(days=60)).strftime("%Y-%m-%d %H:%M")
+    exchange = token_info['exchange']
+    series = continuous_symbol(script_name)
+    now = datetime.now()
     
     try:
-        historicParam = {
-            "exchange": exchange,
-            "symboltoken": token,
-            "interval": "ONE_HOUR",
-            "fromdate": from_date,
-            "todate": to_date
-        }
-        res = smartApi.getCandleData(historicParam)
-        
-        if res.get('status') and res.get('data'):
-            columns = ['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume']
-            df = pd.DataFrame(res['data'], columns=columns)
-            
-            # 1. CALCULATE RSI (14) using PineScript's RMA method
-            delta = df['Close'].diff()
-            up = delta.clip(lower=0)
-            down = -1 * delta.clip(upper=0)
-            
-            # Pandas ewm(alpha=1/length) perfectly matches TradingView's ta.rma()
-            ema_up = up.ewm(alpha=1/14, adjust=False).mean()
-            ema_down = down.ewm(alpha=1/14, adjust=False).mean()
-            rs = ema_up / ema_down
-            df['RSI'] = 100 - (100 / (1 + rs))
-            
-            # 2. CALCULATE DMI ON RSI
-            rsi_diff = df['RSI'].diff()
-            
-            # UpMove and DownMove (Since High/Low/Close are all just the RSI value)
-            upMove = rsi_diff
-            downMove = -rsi_diff
-            
-            # +DM and -DM
-            df['plusDM'] = np.where((upMove > downMove) & (upMove > 0), upMove, 0)
-            df['minusDM'] = np.where((downMove > upMove) & (downMove > 0), downMove, 0)
-            
-            # True Range of RSI
-            df['TR'] = abs(rsi_diff)
-            
-            # Smooth the TR, +DM, and -DM using RMA(14)
-            smoothedTR = df['TR'].ewm(alpha=1/14, adjust=False).mean()
-            smoothedPlusDM = df['plusDM'].ewm(alpha=1/14, adjust=False).mean()
-            smoothedMinusDM = df['minusDM'].ewm(alpha=1/14, adjust=False).mean()
-            
-            # Calculate Base +DI and -DI
-            df['plusDI'] = 100 * smoothedPlusDM / smoothedTR
-            df['minusDI'] = 100 * smoothedMinusDM / smoothedTR
-            
-            # 3. APPLY 5 EMA SMOOTHING (As requested for the signals)
-            df['plusDI_EMA5'] = df['plusDI'].ewm(span=5, adjust=False).mean()
-            df['minusDI_EMA5'] = df['minusDI'].ewm(span=5, adjust=False).mean()
-            
-            # Return the last fully closed candle (-2) and the one before it (-3)
-            return df.iloc[-2], df.iloc[-3]
+        last_ts = candle_store.last_timestamp(exchange, series, BASE_INTERVAL)
+        if last_ts is None:
+            from_dt = now - timedelta(days=HISTORY_DAYS)
         else:
-            return None, None
+            # Re-fetch from the last stored bar so the still-forming candle gets completed
+            last_bar = candle_store.from_epoch([last_ts])[0].tz_localize(None).to_pydatetime()
+            from_dt = max(last_bar, now - timedelta(days=HISTORY_DAYS))
+
+        new_bars = fetch_candles(exchange, token_info['token'], from_dt, now)
+        if new_bars is not None:
+            candle_store.save_candles(exchange, series, BASE_INTERVAL, new_bars)
+            resampler.update(exchange, series, BASE_INTERVAL, TIMEFRAME)
+        elif last_ts is None:
+            return None
+
+        df = candle_store.load_candles(exchange, series, TIMEFRAME, start=now - timedelta(days=HISTORY_DAYS))
+        # Only fully closed candles; RSI / DMI are computed when the strategy reads them
+        df = bar_watermarks.closed_bars(df, exchange, bar_seconds=resampler.INTERVAL_SECONDS[TIMEFRAME])
+        if len(df) < 2:
+            return None
+        return strategies.IndicatorGraph(df.reset_index(drop=True), [STRATEGY])
     except Exception as e:
         print(f"Error fetching data for {script_name}: {e}")
-        return None, None
+        return None
+
+def quote_open_positions(data):
+    """LTP of every open position whose market is open: one batched request per exchange (NFO / MCX)."""
+    if smartApi is None:
+        return {}
+    held = [s for s in set(data["open_longs"]) | set(data["open_shorts"]) if is_market_open(s)]
+    return market_data.quote_ltp(smartApi, {script: instrument(script) for script in held}, SESSION)
+
     # --- HELPER FUNCTIONS ---
 def send_telegram(message):
     if not TELEGRAM_ENABLED: return
@@ -198,7 +388,10 @@ def load_portfolio():
     }
 
 def save_portfolio(data):
-    with open(PORTFOLIO_FILE, 'w') as f: json.dump(data, f, indent=4)
+    # Write to a temp file and rename, so readers never see a half-written portfolio
+    tmp_file = PORTFOLIO_FILE + ".tmp"
+    with open(tmp_file, 'w') as f: json.dump(data, f, indent=4)
+    os.replace(tmp_file, PORTFOLIO_FILE)
 
 def log_event(data, message):
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -209,42 +402,70 @@ def log_event(data, message):
     data["signals"] = data["signals"][:100]
     send_telegram(message)
 
+def script_exchange(script_name):
+    """Exchange the script's active contract trades on (NFO until its contract is known)."""
+    return TOKEN_MAP.get(script_name, {}).get('exchange', 'NFO')
+
 def is_market_open(script_name):
-    """Checks IST market hours. NFO closes at 15:30, MCX at 23:30."""
-    now_ist = datetime.now(timezone.utc) + timedelta(hours=5, minutes=30)
-    
-    if now_ist.weekday() >= 5: return False
-    if now_ist.strftime('%Y-%m-%d') in config.get('holidays', []): return False
-        
-    market_start = now_ist.replace(hour=9, minute=15, second=0, microsecond=0)
-    
-    if script_name == "NATGASMINI":
-        market_end = now_ist.replace(hour=23, minute=30, second=0, microsecond=0)
-    else:
-        market_end = now_ist.replace(hour=15, minute=30, second=0, microsecond=0)
-    
-    return market_start <= now_ist <= market_end
+    """True while the script's exchange is in session (NFO 09:15-15:30, MCX 09:00-23:30, holidays and special sessions per the calendar)."""
+    return trading_calendar.get().is_open(script_exchange(script_name))
+
+def next_scan_time(now=None):
+    """Next base-bar close on any watched exchange, plus a 5-second buffer for the API to finalize the candle."""
+    calendar = trading_calendar.get()
+    seconds = resampler.INTERVAL_SECONDS[BASE_INTERVAL]
+    closes = [calendar.next_bar_close(exchange, now, seconds) for exchange in {script_exchange(s) for s in WATCHLIST} or {"NFO"}]
+    closes = [c for c in closes if c is not None]
+    if not closes:
+        return (now or datetime.now(trading_calendar.IST)) + timedelta(seconds=seconds)
+    return min(closes) + timedelta(seconds=5)
 
 # --- MAIN BOT LOOP ---
 def run_bot():
     print(f"\n🚀 Running DMI-RSI Bot | {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    # The loop runs for days: refresh the JWT before it expires instead of dying mid-session
+    try:
+        SESSION.get()
+    except Exception as e:
+        print(f"❌ SmartAPI session unavailable, skipping this scan: {e}")
+        return
     data = load_portfolio()
     
+    check_rollovers(data)
+    
     open_longs = data["open_longs"]
     open_shorts = data["open_shorts"]
     current_capital = data["capital"]
 
+    # Scripts whose last closed hourly bar was already evaluated are skipped until the next
+    # bar closes (3 of every 4 wakeups); open positions are still marked at their LTP.
+    watermarks = bar_watermarks.Watermarks(WATERMARK_FILE)
+    scanned = {}
+    advanced = set()    # Scripts that really got a new closed bar (not failed or stale fetches)
+
+    def closed_bars_for(script):
+        if script in scanned:
+            return scanned[script]
+        if script not in TOKEN_MAP or not watermarks.due(script, TOKEN_MAP[script]['exchange'], bar_seconds=resampler.INTERVAL_SECONDS[TIMEFRAME]):
+            return None
+        graph = fetch_hourly_data(script)
+        if graph is not None and watermarks.mark(script, graph.df['Timestamp'].iat[-1]):
+            advanced.add(script)
+        scanned[script] = graph
+        return graph
+
     # 1. MANAGE EXITS
     for script in list(open_longs.keys()):
         if not is_market_open(script): continue
-        curr, prev = fetch_hourly_data(script)
-        if curr is None: continue
+        graph = closed_bars_for(script)
+        if graph is None: continue
+        curr, prev = graph.bar(-1), graph.bar(-2)
         open_longs[script]['current_price'] = round(curr['Close'], 2)
         # Buy Exit Condition: current +DI < previous +DI
-        if curr['plusDI_EMA5'] < prev['plusDI_EMA5']:
+        _, exit_price, reason = STRATEGY.manage(strategies.LONG, open_longs[script], curr, prev)
+        if exit_price is not None:
             pos = open_longs[script]
             entry_price = pos['entry_price']
-            exit_price = curr['Close']
             qty = pos['qty']
             
             gross_pnl = (exit_price - entry_price) * qty
@@ -252,40 +473,47 @@ def run_bot():
             brokerage = ((entry_price * qty) + (exit_price * qty)) * BROKERAGE_RATE
             net_pnl = gross_pnl - brokerage
             
-            data['closed_longs'].append({
+            trade = {
                 "Ticker": script, "Trading Symbol": pos['trading_symbol'],
                 "Entry Date": pos['entry_date'], "Exit Date": datetime.now().strftime('%Y-%m-%d %H:%M'),
                 "Entry Price": entry_price, "Exit Price": round(exit_price, 2), "Qty": qty, 
-                "PnL": round(net_pnl, 2), "Status": "CLOSED", "Reason": "+DI Decreased"
-            })
-            current_capital += (exit_price * qty) - brokerage
+                "PnL": round(net_pnl, 2), "Status": "CLOSED", "Reason": reason
+            }
+            data['closed_longs'].append(trade)
+            cash = (exit_price * qty) - brokerage
+            current_capital += cash
+            EXECUTION.exit("open_longs", script, qty, exit_price, cash, pos, trade, instrument(script), trade['Exit Date'])
             del open_longs[script]
             log_event(data, f"❌ CLOSED LONG: {script}\nExit: ₹{exit_price:.2f} | PnL: ₹{net_pnl:.2f}")
 
     for script in list(open_shorts.keys()):
         if not is_market_open(script): continue
-        curr, prev = fetch_hourly_data(script)
-        if curr is None: continue
+        graph = closed_bars_for(script)
+        if graph is None: continue
+        curr, prev = graph.bar(-1), graph.bar(-2)
         open_shorts[script]['current_price'] = round(curr['Close'], 2)
 
         # Sell Exit Condition: current -DI < previous -DI
-        if curr['minusDI_EMA5'] < prev['minusDI_EMA5']:
+        _, exit_price, reason = STRATEGY.manage(strategies.SHORT, open_shorts[script], curr, prev)
+        if exit_price is not None:
             pos = open_shorts[script]
             entry_price = pos['entry_price']
-            exit_price = curr['Close']
             qty = pos['qty']
             
             gross_pnl = (entry_price - exit_price) * qty
             brokerage = ((entry_price * qty) + (exit_price * qty)) * BROKERAGE_RATE
             net_pnl = gross_pnl - brokerage
             
-            data['closed_shorts'].append({
+            trade = {
                 "Ticker": script, "Trading Symbol": pos['trading_symbol'],
                 "Entry Date": pos['entry_date'], "Exit Date": datetime.now().strftime('%Y-%m-%d %H:%M'),
                 "Entry Price": entry_price, "Exit Price": round(exit_price, 2), "Qty": qty, 
-                "PnL": round(net_pnl, 2), "Status": "CLOSED", "Reason": "-DI Decreased"
-            })
-            current_capital += (exit_price * qty) + net_pnl
+                "PnL": round(net_pnl, 2), "Status": "CLOSED", "Reason": reason
+            }
+            data['closed_shorts'].append(trade)
+            cash = (exit_price * qty) + net_pnl
+            current_capital += cash
+            EXECUTION.exit("open_shorts", script, qty, exit_price, cash, pos, trade, instrument(script), trade['Exit Date'])
             del open_shorts[script]
             log_event(data, f"❌ CLOSED SHORT: {script}\nExit: ₹{exit_price:.2f} | PnL: ₹{net_pnl:.2f}")
 
@@ -295,16 +523,17 @@ def run_bot():
         if script in open_longs or script in open_shorts: continue
         if not is_market_open(script): continue
             
-        curr, prev = fetch_hourly_data(script)
-        if curr is None: continue
+        graph = closed_bars_for(script)
+        if graph is None: continue
+        curr = graph.bar(-1)
         
         # --- ENTRY LOGIC ---
-        buy_cond = (curr['plusDI_EMA5'] > prev['plusDI_EMA5']) and (curr['minusDI_EMA5'] < prev['minusDI_EMA5'])
-        sell_cond = (curr['minusDI_EMA5'] > prev['minusDI_EMA5']) and (curr['plusDI_EMA5'] < prev['plusDI_EMA5'])
+        # +DI rising with -DI falling (long) or the reverse (short), see strategies.RsiDmi
+        side = STRATEGY.entry(graph)
         
-        if buy_cond:
+        if side == strategies.LONG:
             entry_price = curr['Close']
-            qty = int(TRADE_CAPITAL // entry_price) # Fixed ₹2 Lakhs per trade
+            qty = int(trade_capital_for(script) // entry_price) # ₹2 Lakhs per trade (IV-scaled for index futures)
             cost = qty * entry_price
             
             if qty > 0 and current_capital >= cost:
@@ -314,11 +543,12 @@ def run_bot():
                     "entry_date": datetime.now().strftime('%Y-%m-%d %H:%M'),
                     "entry_price": round(entry_price, 2), "qty": qty
                 }
+                EXECUTION.enter("open_longs", script, qty, entry_price, -(cost + (cost * BROKERAGE_RATE)), instrument(script), open_longs[script]['entry_date'])
                 log_event(data, f"✅ OPEN LONG: {script} ({TOKEN_MAP[script]['trading_symbol']})\nEntry: ₹{entry_price:.2f} | Qty: {qty}")
         # --- 1. Fix the Short Entry (Around line 206) ---
-        elif sell_cond:
+        elif side == strategies.SHORT:
             entry_price = curr['Close']
-            qty = int(TRADE_CAPITAL // entry_price)
+            qty = int(trade_capital_for(script) // entry_price)
             margin_req = qty * entry_price
     
             if qty > 0 and current_capital >= margin_req:
@@ -329,27 +559,97 @@ def run_bot():
                 "entry_date": datetime.now().strftime('%Y-%m-%d %H:%M'),
                 "entry_price": round(entry_price, 2), "qty": qty
         }
+                EXECUTION.enter("open_shorts", script, qty, entry_price, -(margin_req + (margin_req * BROKERAGE_RATE)), instrument(script), open_shorts[script]['entry_date'])
         log_event(data, f"✅ OPEN SHORT: {script}...\nEntry: ₹{entry_price:.2f} | Qty: {qty}")
 
     data["open_longs"] = open_longs
     data["open_shorts"] = open_shorts
     data["capital"] = current_capital
+    # Everything still open (new entries included) is marked at its LTP in one batched request
+    market_data.mark_positions(data, quote_open_positions(data))
+    # Orders go out concurrently here; fills are reconciled into the portfolio before it is saved
+    for side, trade in EXECUTION.flush(data, log=lambda message: log_event(data, message)):
+        trade_archive.archive_trade(ENGINE_NAME, STRATEGY_NAME, side, trade)
     save_portfolio(data)
-    print("💾 DMI Portfolio Updated.")
+    watermarks.save()
+    print(f"💾 DMI Portfolio Updated. ({len(advanced)} script(s) had a new closed bar)")
+    equity_curve.append_mark(ENGINE_NAME, equity_curve.portfolio_equity(data, TOTAL_CAPITAL))
+
+def refresh_marks():
+    """Mark-to-market only: re-prices open positions from one batched LTP request and saves."""
+    prices = quote_open_positions(load_portfolio())
+    if not prices:
+        return 0
+    # Applied to a fresh copy, in case a scan saved while the quote was in flight
+    data = load_portfolio()
+    marked = market_data.mark_positions(data, prices)
+    if marked:
+        save_portfolio(data)
+        equity_curve.append_mark(ENGINE_NAME, equity_curve.portfolio_equity(data, TOTAL_CAPITAL))
+    return marked
+
+# --- OPTION CHAIN IV ---
+# The full nearest-expiry chain of each index is re-quoted (batched LTP) and re-priced every
+# minute between scans; the ATM IV it yields scales the next entry in that index's future.
+OPTION_IV = {}      # name -> {"atm_iv", "forward", "expiry", "solved", "at"}
+
+def refresh_option_chains():
+    """Re-prices the option chain of every watched index. Returns how many chains were priced."""
+    if smartApi is None or not IV_SIZING:
+        return 0
+    if OPTIONS_MASTER is None or FUTURES_MASTER_DATE != pd.to_datetime('today').normalize():
+        load_futures_master()
+    priced_chains = 0
+    for name in OPTION_CHAIN_NAMES:
+        if name not in WATCHLIST or name not in TOKEN_MAP or not is_market_open(name):
+            continue
+        chain = option_greeks.option_chain(OPTIONS_MASTER, name)
+        if chain.empty:
+            continue
+        # The future rides along in the same batch as a first guess at the forward
+        instruments = {token: {"exchange": "NFO", "token": token} for token in chain['token']}
+        instruments[name] = TOKEN_MAP[name]
+        prices = market_data.quote_ltp(smartApi, instruments, SESSION)
+        priced, forward = option_greeks.price_chain(chain, prices, prices.get(name))
+        iv = option_greeks.atm_iv(priced, forward)
+        if np.isnan(iv):
+            continue
+        OPTION_IV[name] = {"atm_iv": iv, "forward": forward, "expiry": str(chain['expiry'].iat[0].date()),
+                           "solved": int(priced['iv'].notna().sum()), "at": time.time()}
+        priced_chains += 1
+    return priced_chains
+
+def trade_capital_for(script):
+    """TRADE_CAPITAL, scaled by reference / ATM IV for the index futures when a fresh chain snapshot exists."""
+    snapshot = OPTION_IV.get(script)
+    if not IV_SIZING or snapshot is None or time.time() - snapshot['at'] > OPTION_IV_MAX_AGE:
+        return TRADE_CAPITAL
+    low, high = SIZE_SCALE_LIMITS
+    scale = min(max(REFERENCE_IV / snapshot['atm_iv'], low), high)
+    print(f"📐 {script} ATM IV {snapshot['atm_iv']:.1%} -> sizing x{scale:.2f}")
+    return TRADE_CAPITAL * scale
 
 if __name__ == "__main__":
     while True:
+        try: reload_config()
+        except Exception as e: print(f"⚠️ Config reload failed, keeping the current settings: {e}")
+        try: refresh_option_chains()
+        except Exception as e: print(f"⚠️ Option chain refresh failed: {e}")
         run_bot()
         
         # --- INSTITUTIONAL TIMING SYNC ---
-        now = datetime.now()
-        
-        # Find the next 15-minute interval (0, 15, 30, or 45)
-        next_minute = ((now.minute // 15) + 1) * 15
-        
-        # Calculate exact next timestamp, adding a 5-second buffer for the API to finalize data
-        next_time = now.replace(minute=0, second=5, microsecond=0) + timedelta(minutes=next_minute)
+        # Wake at the next 15-minute bar close of an open session (overnight and on holidays, the next session's first)
+        now = datetime.now(trading_calendar.IST)
+        next_time = next_scan_time(now)
         sleep_seconds = (next_time - now).total_seconds()
         
-        print(f"\n⏳ Syncing to exchange clock... Sleeping for {int(sleep_seconds)} seconds until {next_time.strftime('%H:%M:%S')}")
-        time.sleep(sleep_seconds)
+        print(f"\n⏳ Syncing to exchange clock... Sleeping for {int(sleep_seconds)} seconds until {next_time.strftime('%a %H:%M:%S')} IST")
+        # Between scans, keep unrealized P&L fresh with batched LTP marks
+        while sleep_seconds > 0:
+            time.sleep(min(MTM_INTERVAL_SECONDS, sleep_seconds))
+            sleep_seconds = (next_time - datetime.now(trading_calendar.IST)).total_seconds()
+            if sleep_seconds > 0:
+                try: refresh_marks()
+                except Exception as e: print(f"⚠️ Mark-to-market failed: {e}")
+                try: refresh_option_chains()
+                except Exception as e: print(f"⚠️ Option chain refresh failed: {e}")
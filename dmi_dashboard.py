@@ -2,6 +2,23 @@ import streamlit as st
 import pandas as pd
 import json
 import os
+import trade_archive
+import portfolio_client
+import equity_curve
+from datetime import datetime
+
+# --- EQUITY CHARTS ---
+def render_equity(series):
+    # Charts come pre-downsampled for the selected window, so history length never matters
+    span = equity_curve.series_range(series)
+    if span is None:
+        st.info("No equity marks yet. One is recorded at the end of every run.")
+        return
+    first, last = [datetime.fromtimestamp(x) for x in span]
+    window = st.slider("Window", min_value=first, max_value=last, value=(first, last), key=f"window_{series}") if first < last else (first, last)
+    curve = portfolio_client.load_equity(series, int(window[0].timestamp()), int(window[1].timestamp()))
+    st.line_chart(curve, x='Timestamp', y='Equity')
+    st.area_chart(curve, x='Timestamp', y='Drawdown')
 
 # --- PAGE CONFIG ---
 st.set_page_config(page_title="DMI-RSI Bot", layout="wide")
@@ -9,10 +26,8 @@ st.set_page_config(page_title="DMI-RSI Bot", layout="wide")
 PORTFOLIO_FILE = "dmi_portfolio.json"
 
 def load_data():
-    if not os.path.exists(PORTFOLIO_FILE):
-        return None
-    with open(PORTFOLIO_FILE, 'r') as f:
-        return json.load(f)
+    # Served by portfolio_api.py when it is running (unchanged data costs a 304), else read from disk
+    return portfolio_client.load_portfolio("dmi", PORTFOLIO_FILE, st.session_state.setdefault("portfolio_cache", {}))
 
 data = load_data()
 
@@ -128,7 +143,7 @@ else:
     st.markdown("---")
     
     # --- TABS FOR TABLES ---
-    t1, t2, t3, t4 = st.tabs(["🟢 Open Longs", "🔴 Open Shorts", "✅ Closed Longs", "❌ Closed Shorts"])
+    t1, t2, t3, t4, t5, t6 = st.tabs(["🟢 Open Longs", "🔴 Open Shorts", "✅ Closed Longs", "❌ Closed Shorts", "📅 Performance", "📈 Equity"])
 
     with t1:
         df_ol = format_open_positions(open_longs, "LONG")
@@ -156,4 +171,16 @@ else:
         if not df_cs.empty:
             st.dataframe(df_cs.style.map(color_pnl, subset=['P/L']), use_container_width=True, hide_index=True)
         else:
-            st.info("No closed short positions.")
\ No newline at end of file
+            st.info("No closed short positions.")
+
+    with t5:
+        # Rollups are kept up to date by the bot on every close, so this is a constant-time read
+        level = st.radio("Group by", trade_archive.ROLLUP_LEVELS, index=1, horizontal=True)
+        df_roll = trade_archive.rollup_frame("dmi", level)
+        if not df_roll.empty:
+            st.dataframe(df_roll.style.map(color_pnl, subset=['net_pnl']), use_container_width=True)
+        else:
+            st.info("No archived trades yet.")
+
+    with t6:
+        render_equity("dmi")
\ No newline at end of file
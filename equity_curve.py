@@ -0,0 +1,140 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# --- EQUITY CURVE STORE ---
+# One append-only binary file per series (equity/<name>.bin) of fixed-size records:
+# timestamp, equity, running peak and drawdown %. Appending a mark is O(1) (the peak comes
+# from the last record) and reading is a memory map, so charts never rebuild the curve.
+EQUITY_DIR = "equity"
+EQUITY_DTYPE = np.dtype([('ts', 'i8'), ('equity', 'f8'), ('peak', 'f8'), ('drawdown', 'f8')])
+DEFAULT_POINTS = 1000
+
+def series_path(name):
+    return os.path.join(EQUITY_DIR, f"{name}.bin")
+
+def load_series(name, start=None, end=None):
+    """Memory-mapped records of a series between start / end epoch seconds (inclusive)."""
+    path = series_path(name)
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return np.empty(0, dtype=EQUITY_DTYPE)
+    # Ignore a trailing partial record from an interrupted append
+    count = os.path.getsize(path) // EQUITY_DTYPE.itemsize
+    records = np.memmap(path, dtype=EQUITY_DTYPE, mode='r', shape=(count,))
+    lo = int(np.searchsorted(records['ts'], start, side='left')) if start is not None else 0
+    hi = int(np.searchsorted(records['ts'], end, side='right')) if end is not None else count
+    return records[lo:hi]
+
+def _last_record(name):
+    records = load_series(name)
+    return records[-1] if len(records) else None
+
+def append_mark(name, equity, ts=None):
+    """Appends one equity mark (e.g. at the end of every bot run). Marks older than the last one are ignored."""
+    ts = int(ts if ts is not None else time.time())
+    last = _last_record(name)
+    if last is not None and ts <= last['ts']:
+        return False
+    peak = max(float(last['peak']), equity) if last is not None else equity
+    record = np.array([(ts, equity, peak, (peak - equity) / peak * 100 if peak > 0 else 0.0)], dtype=EQUITY_DTYPE)
+    os.makedirs(EQUITY_DIR, exist_ok=True)
+    with open(series_path(name), 'ab') as f:
+        # Drop a partial record left by an interrupted append, so this one starts on a record boundary
+        size = f.seek(0, os.SEEK_END)
+        if size % EQUITY_DTYPE.itemsize:
+            f.truncate(size - size % EQUITY_DTYPE.itemsize)
+        f.write(record.tobytes())
+    return True
+
+def write_series(name, ts, equity):
+    """Replaces a whole series at once (backtest outputs), computing peak and drawdown vectorized."""
+    ts = np.asarray(ts, dtype=np.int64)
+    equity = np.asarray(equity, dtype=np.float64)
+    records = np.empty(len(ts), dtype=EQUITY_DTYPE)
+    records['ts'] = ts
+    records['equity'] = equity
+    records['peak'] = np.maximum.accumulate(equity) if len(equity) else equity
+    records['drawdown'] = np.where(records['peak'] > 0, (records['peak'] - equity) / records['peak'] * 100, 0.0)
+    os.makedirs(EQUITY_DIR, exist_ok=True)
+    tmp_path = series_path(name) + ".tmp"
+    records.tofile(tmp_path)
+    os.replace(tmp_path, series_path(name))
+
+def portfolio_equity(data, initial_capital):
+    """Mark-to-market equity of a bot portfolio: starting capital + realized + unrealized P&L."""
+    realized = sum(t['PnL'] for t in data.get("closed_longs", [])) + sum(t['PnL'] for t in data.get("closed_shorts", []))
+    unrealized = sum((p.get('current_price', p['entry_price']) - p['entry_price']) * p['qty'] for p in data.get("open_longs", {}).values())
+    unrealized += sum((p['entry_price'] - p.get('current_price', p['entry_price'])) * p['qty'] for p in data.get("open_shorts", {}).values())
+    return initial_capital + realized + unrealized
+
+# --- DOWNSAMPLING ---
+def lttb(x, y, points):
+    """Largest-Triangle-Three-Buckets: indices of `points` samples that keep the visual shape of y."""
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)  # Buckets between first and last point
+    chosen = np.empty(points, dtype=np.int64)
+    chosen[0], chosen[-1] = 0, n - 1
+    a = 0
+    for b in range(points - 2):
+        lo, hi = edges[b], edges[b + 1]
+        # Average of the next bucket is the third corner of the triangle
+        nlo, nhi = edges[b + 1], (edges[b + 2] if b + 2 < len(edges) else n)
+        avg_x = x[nlo:nhi].mean() if nhi > nlo else x[-1]
+        avg_y = y[nlo:nhi].mean() if nhi > nlo else y[-1]
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        chosen[b + 1] = a
+    return chosen
+
+def minmax_buckets(y, points):
+    """Indices of the min and max of each of points/2 equal buckets, so no spike is ever dropped."""
+    n = len(y)
+    if points >= n or points < 2:
+        return np.arange(n)
+    buckets = max(points // 2, 1)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    edges = np.unique(edges)
+    starts = edges[:-1]
+    # reduceat gives per-bucket min / max; argmin/argmax positions come from a masked compare
+    mins = np.minimum.reduceat(y, starts)
+    maxs = np.maximum.reduceat(y, starts)
+    bucket_of = np.repeat(np.arange(len(starts)), np.diff(edges))
+    is_min = y == mins[bucket_of]
+    is_max = y == maxs[bucket_of]
+    first_min = np.unique(bucket_of[is_min], return_index=True)[1]
+    first_max = np.unique(bucket_of[is_max], return_index=True)[1]
+    return np.unique(np.concatenate([np.flatnonzero(is_min)[first_min], np.flatnonzero(is_max)[first_max]]))
+
+def downsample(name, start=None, end=None, points=DEFAULT_POINTS):
+    """
+    Chart-ready view of a series for the requested zoom window: equity via LTTB, drawdown via
+    min/max bucketing (so the deepest drawdown always survives), merged on the same timestamps.
+    """
+    records = load_series(name, start, end)
+    if len(records) == 0:
+        return pd.DataFrame(columns=['Timestamp', 'Equity', 'Drawdown'])
+    ts = np.asarray(records['ts'])
+    keep = np.union1d(lttb(ts, records['equity'], points // 2), minmax_buckets(np.asarray(records['drawdown']), points // 2))
+    return pd.DataFrame({
+        'Timestamp': pd.to_datetime(ts[keep], unit='s', utc=True).tz_convert('Asia/Kolkata'),
+        'Equity': np.asarray(records['equity'])[keep],
+        'Drawdown': -np.asarray(records['drawdown'])[keep],
+    })
+
+def list_series(prefix=""):
+    """Names of stored series, optionally filtered by prefix (e.g. 'backtest_')."""
+    if not os.path.isdir(EQUITY_DIR):
+        return []
+    return sorted(f[:-4] for f in os.listdir(EQUITY_DIR) if f.endswith(".bin") and f.startswith(prefix))
+
+def series_range(name):
+    """(first, last) epoch seconds of a series, or None."""
+    records = load_series(name)
+    if len(records) == 0:
+        return None
+    return int(records['ts'][0]), int(records['ts'][-1])
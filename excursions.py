@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+import candle_store
+import resampler
+
+# --- TRADE EXCURSIONS (MAE / MFE) ---
+# How far each closed trade went against us (maximum adverse excursion) and for us (maximum
+# favorable excursion) while it was open, and how many bars it took to reach that best price.
+# Highs and lows of a symbol's candle history get a sparse table of range-max / range-min
+# positions (O(n log n) to build, once per symbol), so every trade is an O(1) lookup and a
+# whole trade log is a handful of vectorized gathers.
+INTERVAL = "FIFTEEN_MINUTE"       # Finest resolution the bots keep for every symbol
+CACHE_SIZE = 64                   # Symbol indexes kept in memory
+
+class SparseTable:
+    """Position of the max (or min) of values[lo..hi] for any inclusive range, earliest on ties."""
+
+    def __init__(self, values, mode="max"):
+        self.values = np.asarray(values, dtype=np.float64)
+        n = len(self.values)
+        better = np.greater_equal if mode == "max" else np.less_equal
+        levels = max(int(n).bit_length(), 1)
+        self.table = np.zeros((levels, max(n, 1)), dtype=np.int32 if n < 2**31 else np.int64)
+        self.table[0, :n] = np.arange(n)
+        for k in range(1, levels):
+            half, width = 1 << (k - 1), n - (1 << k) + 1
+            left, right = self.table[k - 1, :width], self.table[k - 1, half:half + width]
+            self.table[k, :width] = np.where(better(self.values[left], self.values[right]), left, right)
+        self._better = better
+
+    def query(self, lo, hi):
+        """Positions for arrays of inclusive ranges (lo <= hi required)."""
+        lo, hi = np.asarray(lo), np.asarray(hi)
+        k = np.log2(hi - lo + 1).astype(np.int64)
+        left, right = self.table[k, lo], self.table[k, hi - (1 << k) + 1]
+        return np.where(self._better(self.values[left], self.values[right]), left, right)
+
+class BarIndex:
+    """Bar start times of one symbol with range-max over its highs and range-min over its lows."""
+
+    def __init__(self, ts, high, low):
+        self.ts = np.asarray(ts, dtype=np.int64)
+        self.high = SparseTable(high, "max")
+        self.low = SparseTable(low, "min")
+
+    @classmethod
+    def from_frame(cls, df):
+        """From a DataFrame of High / Low indexed (or with a 'Timestamp' column) by bar start."""
+        stamps = df['Timestamp'] if 'Timestamp' in df.columns else df.index
+        return cls(candle_store.to_epoch(stamps), df['High'].to_numpy(), df['Low'].to_numpy())
+
+    def __len__(self):
+        return len(self.ts)
+
+    def bar_range(self, start_ts, end_ts):
+        """Inclusive (lo, hi) of the bars starting in [start_ts, end_ts); lo > hi where there are none."""
+        lo = np.searchsorted(self.ts, np.asarray(start_ts, dtype=np.int64), side='left')
+        hi = np.searchsorted(self.ts, np.asarray(end_ts, dtype=np.int64), side='left') - 1
+        return lo, hi
+
+_CACHE = {}
+
+def load_index(exchange, symbol, interval=INTERVAL):
+    """Cached BarIndex of a stored series (rebuilt when the series has grown), or None."""
+    arr = candle_store.load_arrays(exchange, symbol, interval, mmap=True)
+    if arr is None or len(arr) == 0:
+        return None
+    key = (exchange, symbol, interval)
+    cached = _CACHE.get(key)
+    if cached is not None and len(cached) == len(arr) and cached.ts[-1] == arr['ts'][-1]:
+        return cached
+    index = BarIndex(arr['ts'], arr['High'], arr['Low'])
+    _CACHE.pop(key, None)
+    _CACHE[key] = index
+    while len(_CACHE) > CACHE_SIZE:
+        _CACHE.pop(next(iter(_CACHE)))
+    return index
+
+def analyze(index, long, start_ts, end_ts, entry_price, exit_price, risk=None):
+    """
+    Excursions of trades on one symbol, all arrays. A trade is exposed to the bars starting in
+    [start_ts, end_ts). long: bool array. risk: initial stop distance in price (R), optional.
+    Returns a dict of arrays: MFE / MAE in price, %, R, Bars To Peak, Bars Held, Capture % (NaN where no bars).
+    """
+    long = np.asarray(long, dtype=bool)
+    entry_price = np.asarray(entry_price, dtype=np.float64)
+    exit_price = np.asarray(exit_price, dtype=np.float64)
+    n = len(entry_price)
+    lo, hi = index.bar_range(start_ts, end_ts)
+    ok = (lo <= hi) & (lo < len(index))
+    mfe, mae, to_peak = np.full(n, np.nan), np.full(n, np.nan), np.full(n, np.nan)
+    if ok.any():
+        l, h = lo[ok], hi[ok]
+        top, bottom = index.high.query(l, h), index.low.query(l, h)
+        highest, lowest = index.high.values[top], index.low.values[bottom]
+        is_long, entry = long[ok], entry_price[ok]
+        # Measured from the fill; an excursion never counts below zero
+        mfe[ok] = np.maximum(np.where(is_long, highest - entry, entry - lowest), 0.0)
+        mae[ok] = np.maximum(np.where(is_long, entry - lowest, highest - entry), 0.0)
+        to_peak[ok] = np.where(is_long, top, bottom) - l + 1
+    realized = np.where(long, exit_price - entry_price, entry_price - exit_price)
+    risk = np.full(n, np.nan) if risk is None else np.asarray(risk, dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {
+            "MFE": mfe, "MAE": mae,
+            "MFE %": mfe / entry_price * 100, "MAE %": mae / entry_price * 100,
+            "MFE R": np.where(risk > 0, mfe / risk, np.nan), "MAE R": np.where(risk > 0, mae / risk, np.nan),
+            "Bars To Peak": to_peak, "Bars Held": np.where(ok, hi - lo + 1, np.nan),
+            "Capture %": np.where(mfe > 0, realized / mfe * 100, np.nan),
+        }
+
+def for_trades(trades, index_for, side_col='Type', start_col='Entry Date', end_col='Exit Date', risk_col=None,
+               offset=0, align=None, end_offset=None):
+    """
+    Excursion columns added to a trade log (DataFrame or list of dicts), one vectorized pass per
+    ticker. index_for(ticker) returns its BarIndex (or None). Trades are exposed to the bars
+    starting in [start + offset, end + end_offset) seconds (end_offset defaults to offset and may
+    be an array, one per trade); `align` (an interval name) first floors both times to that bar
+    grid, for logs stamped with the wall-clock time of a scan.
+    """
+    log = pd.DataFrame(trades).reset_index(drop=True)
+    if log.empty:
+        return log
+    out = pd.DataFrame(np.nan, index=log.index, columns=["MFE", "MAE", "MFE %", "MAE %", "MFE R", "MAE R",
+                                                         "Bars To Peak", "Bars Held", "Capture %"])
+    start, end = candle_store.to_epoch(log[start_col]), candle_store.to_epoch(log[end_col])
+    if align:
+        # Intraday grids of up to 15 minutes line up with UTC (09:15 IST is 03:45 UTC)
+        seconds = resampler.INTERVAL_SECONDS[align]
+        start, end = start // seconds * seconds, end // seconds * seconds
+    start, end = start + offset, end + (offset if end_offset is None else np.asarray(end_offset))
+    for ticker, rows in log.groupby('Ticker').indices.items():
+        index = index_for(ticker)
+        if index is None:
+            continue
+        part = log.iloc[rows]
+        risk = part[risk_col].to_numpy(dtype=float) if risk_col and risk_col in part else None
+        result = analyze(index, (part[side_col] == "LONG").to_numpy(), start[rows], end[rows],
+                         part['Entry Price'].to_numpy(), part['Exit Price'].to_numpy(), risk)
+        for column, values in result.items():
+            out.loc[rows, column] = values
+    return pd.concat([log, out.round(2)], axis=1)
+
+def summary(analyzed, risk_levels=(1.0, 2.0)):
+    """Headline excursion figures of an analyzed trade log (what the trailing rule left behind)."""
+    done = analyzed.dropna(subset=['MFE'])
+    stats = {
+        "trades": len(done),
+        "avg_mfe_pct": float(done['MFE %'].mean()) if len(done) else np.nan,
+        "avg_mae_pct": float(done['MAE %'].mean()) if len(done) else np.nan,
+        "median_capture_pct": float(done['Capture %'].median()) if len(done) else np.nan,
+        "avg_bars_to_peak": float(done['Bars To Peak'].mean()) if len(done) else np.nan,
+    }
+    with_r = done.dropna(subset=['MFE R'])
+    if len(with_r):
+        stats["avg_mfe_r"], stats["avg_mae_r"] = float(with_r['MFE R'].mean()), float(with_r['MAE R'].mean())
+        realized_r = with_r['MFE R'] * with_r['Capture %'] / 100
+        for level in risk_levels:
+            reached = with_r['MFE R'] >= level
+            stats[f"reached_{level:g}r_pct"] = float(reached.mean() * 100)
+            # Of the trades that got to `level` R, how many gave most of it back
+            stats[f"gave_back_{level:g}r_pct"] = float((realized_r[reached] < level / 2).mean() * 100) if reached.any() else np.nan
+    return stats
+
+def print_report(stats):
+    print("\n" + "="*50)
+    print("      📐 TRADE EXCURSIONS (MAE / MFE)")
+    print("="*50)
+    print(f"Trades with bar history: {stats['trades']}")
+    print(f"Avg MFE / MAE:          {stats['avg_mfe_pct']:.2f}% / {stats['avg_mae_pct']:.2f}%")
+    print(f"Median Capture of MFE:  {stats['median_capture_pct']:.1f}%")
+    print(f"Avg Bars to Peak:       {stats['avg_bars_to_peak']:.1f}")
+    if "avg_mfe_r" in stats:
+        print(f"Avg MFE / MAE (R):      {stats['avg_mfe_r']:.2f}R / {stats['avg_mae_r']:.2f}R")
+        for key in [k for k in stats if k.startswith("reached_")]:
+            level = key[len("reached_"):-len("r_pct")]
+            print(f"Reached {level}R:             {stats[key]:.1f}% (closed under {float(level) / 2:g}R: {stats[f'gave_back_{level}r_pct']:.1f}%)")
+    print("="*50)
+
+def store_index_for(exchange="NSE", interval=INTERVAL, store_symbol=None):
+    """index_for() over the candle store; store_symbol maps a ticker to its store name."""
+    return lambda ticker: load_index(exchange, store_symbol(ticker) if store_symbol else ticker, interval)
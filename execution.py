@@ -0,0 +1,424 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# --- ORDER EXECUTION ---
+# The bots keep making their decisions exactly as in paper mode (positions, capital and
+# closed trades are updated inline) and hand each decision to an ExecutionEngine. At the
+# end of the scan flush() submits every order concurrently, waits for fills on the broker's
+# order-update stream and reconciles the actual fill price / quantity into the portfolio:
+#   filled    -> entry / exit price and capital follow the average fill price
+#   partial   -> only the filled quantity is opened / closed, the rest is undone
+#   rejected  -> the decision is undone (position removed or restored, capital given back)
+# Every order carries an idempotency key derived from the decision, recorded in a journal
+# (orders_<engine>.json) before submission, so a crash or retry never sends it twice.
+EXECUTION_MODES = ["paper", "mock", "live"]
+MAX_WORKERS = 8
+FILL_TIMEOUT_SECONDS = 20.0
+JOURNAL_SIZE = 500          # Reconciled orders kept in the journal
+TERMINAL = {"FILLED", "REJECTED", "CANCELLED"}
+
+# SmartAPI order book / order-update statuses -> our states
+_STATUS_MAP = {
+    "complete": "FILLED", "rejected": "REJECTED", "cancelled": "CANCELLED",
+    "open": "OPEN", "open pending": "OPEN", "trigger pending": "OPEN", "modified": "OPEN",
+    "validation pending": "OPEN", "put order req received": "OPEN", "modify validation pending": "OPEN",
+}
+
+def normalize_status(raw):
+    return _STATUS_MAP.get(str(raw or "").strip().lower(), "OPEN")
+
+def idempotency_key(engine, action, ticker, decided_at):
+    """Same decision -> same key. 16 hex chars fits SmartAPI's 20-character ordertag."""
+    return hashlib.sha1(f"{engine}|{action}|{ticker}|{decided_at}".encode()).hexdigest()[:16]
+
+# --- BROKERS ---
+# A broker places orders, looks them up by tag and pushes order updates to a callback.
+# Updates are dicts: {order_id, tag, status, filled_qty, avg_price, message}.
+class MockBroker:
+    """
+    Local stand-in for the exchange: every order is acknowledged immediately and filled (or
+    rejected) after a random latency on a background thread, with configurable slippage.
+    """
+
+    def __init__(self, latency=(0.05, 0.3), slippage_bps=5.0, reject_rate=0.0, partial_rate=0.0, seed=None):
+        self.latency = latency
+        self.slippage_bps = slippage_bps
+        self.reject_rate = reject_rate
+        self.partial_rate = partial_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.orders = {}        # order_id -> latest update
+        self.by_tag = {}
+        self.placed = 0         # placeOrder calls that created an order
+        self.callback = None
+
+    def start_stream(self, callback):
+        self.callback = callback
+
+    def stop_stream(self):
+        self.callback = None
+
+    def place(self, order):
+        with self.lock:
+            if order['tag'] in self.by_tag:
+                return self.by_tag[order['tag']]   # Same tag = same order, like a broker-side dedupe
+            self.placed += 1
+            order_id = f"MOCK{self.placed:08d}"
+            self.by_tag[order['tag']] = order_id
+            self.orders[order_id] = {"order_id": order_id, "tag": order['tag'], "status": "OPEN",
+                                     "filled_qty": 0, "avg_price": 0.0, "message": ""}
+            delay = self.rng.uniform(*self.latency)
+            rejected = self.rng.random() < self.reject_rate
+            partial = self.rng.random() < self.partial_rate
+            slip = self.rng.uniform(0, self.slippage_bps) / 10000.0
+        timer = threading.Timer(delay, self._fill, args=(order_id, order, rejected, partial, slip))
+        timer.daemon = True
+        timer.start()
+        return order_id
+
+    def _fill(self, order_id, order, rejected, partial, slip):
+        with self.lock:
+            update = dict(self.orders[order_id])
+            if rejected:
+                update.update(status="REJECTED", message="Mock rejection")
+            else:
+                # Slippage always goes against us
+                price = order['price'] * (1 + slip if order['transaction'] == "BUY" else 1 - slip)
+                qty = order['qty']
+                filled = type(qty)(qty / 2) if partial and qty > 1 else qty
+                update.update(status="CANCELLED" if filled < qty else "FILLED", filled_qty=filled, avg_price=price,
+                              message="Partially filled, remainder cancelled" if filled < qty else "")
+            self.orders[order_id] = update
+        if self.callback:
+            self.callback(update)
+
+    def find_by_tag(self, tag):
+        with self.lock:
+            order_id = self.by_tag.get(tag)
+            return dict(self.orders[order_id]) if order_id else None
+
+    def order_book(self):
+        with self.lock:
+            return [dict(o) for o in self.orders.values()]
+
+class SmartApiBroker:
+    """Angel One SmartAPI: placeOrder / orderBook plus the order-update websocket."""
+
+    def __init__(self, session, product_type="DELIVERY"):
+        self.session = session
+        self.product_type = product_type
+        self.stream = None
+
+    @staticmethod
+    def _update(row):
+        return {
+            "order_id": row.get('orderid'), "tag": row.get('ordertag'),
+            "status": normalize_status(row.get('orderstatus') or row.get('status')),
+            "filled_qty": float(row.get('filledshares') or 0), "avg_price": float(row.get('averageprice') or 0),
+            "message": row.get('text', ''),
+        }
+
+    def place(self, order):
+        params = {
+            "variety": "NORMAL", "tradingsymbol": order['instrument']['trading_symbol'],
+            "symboltoken": order['instrument']['token'], "exchange": order['instrument']['exchange'],
+            "transactiontype": order['transaction'], "ordertype": "MARKET",
+            "producttype": order['instrument'].get('product_type', self.product_type),
+            "duration": "DAY", "quantity": str(int(order['qty'])), "ordertag": order['tag'],
+        }
+        order_id = self.session.get().placeOrder(params)
+        if not order_id:
+            raise RuntimeError("placeOrder returned no order id")
+        return order_id
+
+    def order_book(self):
+        res = self.session.get().orderBook()
+        return [self._update(row) for row in (res or {}).get('data') or []]
+
+    def find_by_tag(self, tag):
+        return next((o for o in self.order_book() if o['tag'] == tag), None)
+
+    def start_stream(self, callback):
+        if self.stream is not None:
+            return
+        from SmartApi.smartWebSocketOrderUpdate import SmartWebSocketOrderUpdate
+        self.session.get()    # The stream authenticates with the current JWT / feed token
+        tokens = self.session.tokens
+        broker = self
+
+        class _OrderStream(SmartWebSocketOrderUpdate):
+            def on_message(self, wsapp, message):
+                try:
+                    payload = json.loads(message)
+                except ValueError:
+                    return
+                if payload.get('orderData'):
+                    callback(broker._update(payload['orderData']))
+
+        self.stream = _OrderStream(tokens['jwt_token'], self.session.api_key, self.session.client_id, tokens['feed_token'])
+        threading.Thread(target=self.stream.connect, daemon=True).start()
+
+    def stop_stream(self):
+        if self.stream is not None:
+            self.stream.close_connection()
+            self.stream = None
+
+# --- EXECUTION ENGINE ---
+class ExecutionEngine:
+    """
+    Collects a scan's entry / exit decisions and turns them into broker orders on flush().
+    With no broker (paper mode) flush() just hands back the closed trades unchanged.
+    """
+
+    def __init__(self, engine, broker=None, journal_file=None, brokerage=0.0,
+                 max_workers=MAX_WORKERS, fill_timeout=FILL_TIMEOUT_SECONDS):
+        self.engine = engine
+        self.broker = broker
+        self.journal_file = journal_file or f"orders_{engine}.json"
+        self.brokerage = brokerage
+        self.max_workers = max_workers
+        self.fill_timeout = fill_timeout
+        self.pending = []
+        self.orders = {}                    # tag -> order record (the journal)
+        self.by_order_id = {}
+        self.changed = threading.Condition()
+        self.loaded = False
+        self.streaming = False
+
+    @property
+    def paper(self):
+        return self.broker is None
+
+    # --- decisions ---
+    def enter(self, book, ticker, qty, price, capital_delta, instrument=None, decided_at=None):
+        """Records an entry already applied to data[book] that changed capital by capital_delta."""
+        self._record("ENTRY", book, ticker, qty, price, capital_delta, instrument, decided_at)
+
+    def exit(self, book, ticker, qty, price, capital_delta, position, trade, instrument=None, decided_at=None):
+        """Records an exit: `position` was removed from data[book] and `trade` appended to the closed list."""
+        self._record("EXIT", book, ticker, qty, price, capital_delta, instrument, decided_at,
+                     position=dict(position), trade=trade)
+
+    def _record(self, action, book, ticker, qty, price, capital_delta, instrument, decided_at, **extra):
+        decided_at = decided_at or time.strftime('%Y-%m-%d %H:%M')
+        opening_buy = book == "open_longs"
+        self.pending.append({
+            "tag": idempotency_key(self.engine, action, ticker, decided_at), "engine": self.engine,
+            "action": action, "book": book, "ticker": ticker, "decided_at": decided_at,
+            "transaction": "BUY" if (action == "ENTRY") == opening_buy else "SELL",
+            "qty": qty, "price": float(price), "capital_delta": float(capital_delta), "instrument": instrument or {},
+            "status": "NEW", "order_id": None, "filled_qty": 0, "avg_price": 0.0, "message": "", "reconciled": False,
+            **extra
+        })
+
+    # --- journal ---
+    def _load_journal(self):
+        self.loaded = True
+        if os.path.exists(self.journal_file):
+            try:
+                with open(self.journal_file, 'r') as f:
+                    self.orders = json.load(f)
+            except (OSError, ValueError):
+                self.orders = {}
+        self.by_order_id = {o['order_id']: o for o in self.orders.values() if o.get('order_id')}
+
+    def _save_journal(self):
+        done = [tag for tag, o in self.orders.items() if o['reconciled']]
+        for tag in done[:-JOURNAL_SIZE]:
+            del self.orders[tag]
+        tmp_path = self.journal_file + ".tmp"
+        with open(tmp_path, 'w') as f: json.dump(self.orders, f, indent=2)
+        os.replace(tmp_path, self.journal_file)
+
+    # --- order flow ---
+    def on_update(self, update):
+        """Order-update stream callback (any thread)."""
+        with self.changed:
+            order = self.by_order_id.get(update.get('order_id'))
+            if order is None and update.get('tag') in self.orders:
+                order = self.orders[update['tag']]
+            if order is None or order['status'] in TERMINAL:
+                return
+            order.update(order_id=update['order_id'], status=update['status'], message=update.get('message', ''),
+                         filled_qty=update.get('filled_qty', 0), avg_price=update.get('avg_price', 0.0))
+            self.by_order_id[update['order_id']] = order
+            self.changed.notify_all()
+
+    def _submit(self, order):
+        try:
+            order_id = self.broker.place(order)
+        except Exception as e:
+            # The request may have reached the broker before failing: look for our tag first
+            try:
+                existing = self.broker.find_by_tag(order['tag'])
+            except Exception:
+                existing = None
+            if existing:
+                return self.on_update(existing)
+            with self.changed:
+                order.update(status="REJECTED", message=f"Submit failed: {e}")
+                self.changed.notify_all()
+            return
+        with self.changed:
+            order['order_id'] = order_id
+            self.by_order_id[order_id] = order
+            if order['status'] == "NEW":
+                order['status'] = "OPEN"
+            self.changed.notify_all()
+
+    def _recover(self, order):
+        # Journaled but never acknowledged (crash mid-submit): only resubmit if the broker has no such tag
+        existing = self.broker.find_by_tag(order['tag'])
+        if existing:
+            self.on_update(existing)
+        else:
+            self._submit(order)
+
+    def flush(self, data, log=print):
+        """
+        Submits the scan's orders concurrently, waits for fills and reconciles them into `data`.
+        Returns [(side, trade)] for exits that are final, to be archived by the caller.
+        """
+        if self.paper:
+            closes = [("LONG" if o['book'] == "open_longs" else "SHORT", o['trade']) for o in self.pending if o['action'] == "EXIT"]
+            self.pending = []
+            return closes
+
+        if not self.loaded:
+            self._load_journal()
+        fresh, recover = [], [o for o in self.orders.values() if o['status'] == "NEW"]
+        for order in self.pending:
+            if order['tag'] in self.orders:
+                continue    # Same decision already journaled by an earlier run
+            self.orders[order['tag']] = order
+            fresh.append(order)
+        self.pending = []
+        # Journal before submitting, so a crash cannot lose track of an order that was sent
+        self._save_journal()
+
+        if not self.streaming:
+            self.broker.start_stream(self.on_update)
+            self.streaming = True
+
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            list(pool.map(self._submit, fresh))
+            list(pool.map(self._recover, recover))
+        if fresh or recover:
+            log(f"📤 {len(fresh)} order(s) submitted in {time.time() - started:.2f}s")
+
+        waiting = [o for o in self.orders.values() if not o['reconciled']]
+        deadline = time.time() + self.fill_timeout
+        with self.changed:
+            while any(o['status'] not in TERMINAL for o in waiting) and time.time() < deadline:
+                self.changed.wait(deadline - time.time())
+
+        # Stream updates can be missed (reconnects): the order book is the source of truth
+        if any(o['status'] not in TERMINAL for o in waiting):
+            try:
+                for update in self.broker.order_book():
+                    self.on_update(update)
+            except Exception as e:
+                log(f"⚠️ Order book refresh failed: {e}")
+
+        closes = []
+        for order in waiting:
+            if order['status'] in TERMINAL:
+                closed = self._reconcile(data, order, log)
+                if closed:
+                    closes.append(closed)
+            else:
+                self._mark_pending(data, order)
+        self._save_journal()
+        return closes
+
+    # --- reconciliation ---
+    def _mark_pending(self, data, order):
+        if order['action'] == "ENTRY" and order['ticker'] in data[order['book']]:
+            data[order['book']][order['ticker']]['order_status'] = "PENDING"
+        elif order['action'] == "EXIT":
+            trade = self._find_trade(data, order)
+            if trade is not None:
+                trade['Status'] = "EXIT_PENDING"
+
+    def _find_trade(self, data, order):
+        closed = data["closed_longs" if order['book'] == "open_longs" else "closed_shorts"]
+        key = (order['trade']['Ticker'], order['trade']['Entry Date'], order['trade']['Exit Date'])
+        return next((t for t in reversed(closed) if (t['Ticker'], t['Entry Date'], t['Exit Date']) == key), None)
+
+    def _reconcile(self, data, order, log):
+        order['reconciled'] = True
+        qty, price, delta = order['qty'], order['price'], order['capital_delta']
+        filled, fill_price = order['filled_qty'], order['avg_price'] or price
+        filled = type(qty)(filled) if filled else 0
+        ticker, book = order['ticker'], data[order['book']]
+
+        if order['action'] == "ENTRY":
+            if filled <= 0:
+                book.pop(ticker, None)
+                data['capital'] -= delta
+                log(f"⛔ ENTRY REJECTED: {ticker} | {order['message'] or order['status']}")
+                return None
+            # Entry cash flows in every bot are proportional to the notional bought / sold
+            actual = delta * (filled * fill_price) / (qty * price) if qty and price else delta
+            data['capital'] += actual - delta
+            pos = book.get(ticker)
+            if pos is not None:
+                if 'stop_loss' in pos:
+                    pos['risk_points'] = round(abs(fill_price - pos['stop_loss']), 2)
+                pos.update(entry_price=round(fill_price, 2), qty=filled, order_id=order['order_id'])
+                pos.pop('order_status', None)
+            if filled < qty:
+                log(f"⚠️ PARTIAL ENTRY: {ticker} filled {filled}/{qty} @ {fill_price:.2f}")
+            return None
+
+        side = "LONG" if order['book'] == "open_longs" else "SHORT"
+        trade = self._find_trade(data, order)
+        if filled < qty:
+            # Whatever did not fill stays open at its original entry
+            remainder = dict(order['position'], qty=qty - filled)
+            if ticker in book:
+                book[ticker]['qty'] += remainder['qty']
+            else:
+                book[ticker] = remainder
+            data['capital'] -= delta * (qty - filled) / qty
+        if filled <= 0:
+            if trade is not None:
+                data["closed_longs" if side == "LONG" else "closed_shorts"].remove(trade)
+            log(f"⛔ EXIT REJECTED: {ticker} stays open | {order['message'] or order['status']}")
+            return None
+
+        # Fill price vs. decision price, net of the brokerage on the difference
+        sign = 1 if side == "LONG" else -1
+        slippage = sign * (fill_price - price) * filled - abs(fill_price - price) * filled * self.brokerage
+        data['capital'] += slippage
+        if trade is None:
+            trade = dict(order['trade'])
+            data["closed_longs" if side == "LONG" else "closed_shorts"].append(trade)
+        trade.update({"Exit Price": round(fill_price, 2), "Qty": filled, "Status": "CLOSED",
+                      "PnL": round(order['trade']['PnL'] * filled / qty + slippage, 2)})
+        if filled < qty:
+            log(f"⚠️ PARTIAL EXIT: {ticker} filled {filled}/{qty} @ {fill_price:.2f}")
+        return side, trade
+
+def from_config(engine, config, session=None, brokerage=0.0):
+    """Builds the engine from config['execution'] ({mode: paper | mock | live, ...}); paper by default."""
+    settings = config.get('execution', {})
+    mode = settings.get('mode', 'paper')
+    if mode not in EXECUTION_MODES:
+        raise ValueError(f"Unknown execution mode '{mode}'")
+    broker = None
+    if mode == "mock":
+        broker = MockBroker(slippage_bps=settings.get('mock_slippage_bps', 5.0), reject_rate=settings.get('mock_reject_rate', 0.0))
+    elif mode == "live":
+        if session is None:
+            raise ValueError("Live execution needs an Angel One session")
+        broker = SmartApiBroker(session, settings.get('product_type', 'DELIVERY'))
+    return ExecutionEngine(engine, broker, brokerage=brokerage,
+                           max_workers=settings.get('max_workers', MAX_WORKERS),
+                           fill_timeout=settings.get('fill_timeout_seconds', FILL_TIMEOUT_SECONDS))
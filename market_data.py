@@ -0,0 +1,52 @@
+import angel_session
+
+# --- BATCHED LAST-TRADED PRICES ---
+# Marking open positions used to cost one request per position. SmartAPI's market-data
+# endpoint quotes many tokens of one exchange in a single call, so a whole book across NSE,
+# NFO and MCX is refreshed with one request per exchange (per 50 tokens, the API's limit).
+QUOTE_MODE = "LTP"
+MAX_TOKENS_PER_REQUEST = 50
+
+def _request(api, exchange_tokens, session=None):
+    try:
+        res = api.getMarketData(QUOTE_MODE, exchange_tokens)
+        if angel_session.is_token_error(res) and session is not None:
+            session.get(force_refresh=True)
+            res = api.getMarketData(QUOTE_MODE, exchange_tokens)
+        if res and res.get('status') and res.get('data'):
+            return res['data']
+        print(f"⚠️ Quote request failed for {', '.join(exchange_tokens)}: {res.get('message') if res else res}")
+    except Exception as e:
+        print(f"⚠️ Quote request failed for {', '.join(exchange_tokens)}: {e}")
+    return None
+
+def quote_ltp(api, instruments, session=None):
+    """
+    Last traded prices for many instruments at once.
+    instruments: {key: {"exchange": ..., "token": ...}} (the bots' instrument() dicts).
+    Returns {key: ltp}; keys without a token, or that the exchange did not quote, are left out.
+    """
+    by_exchange = {}
+    for key, inst in instruments.items():
+        if inst and inst.get('token'):
+            by_exchange.setdefault(inst['exchange'], {}).setdefault(str(inst['token']), []).append(key)
+
+    prices = {}
+    for exchange, keys_by_token in by_exchange.items():
+        tokens = list(keys_by_token)
+        for start in range(0, len(tokens), MAX_TOKENS_PER_REQUEST):
+            data = _request(api, {exchange: tokens[start:start + MAX_TOKENS_PER_REQUEST]}, session)
+            for row in (data or {}).get('fetched', []):
+                for key in keys_by_token.get(str(row.get('symbolToken')), []):
+                    prices[key] = float(row['ltp'])
+    return prices
+
+def mark_positions(data, prices):
+    """Writes quoted prices into current_price of the open positions. Returns how many were marked."""
+    marked = 0
+    for book in ("open_longs", "open_shorts"):
+        for key, pos in data.get(book, {}).items():
+            if key in prices:
+                pos['current_price'] = round(prices[key], 2)
+                marked += 1
+    return marked
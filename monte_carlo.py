@@ -0,0 +1,177 @@
+import argparse
+import numpy as np
+import pandas as pd
+from numba import njit, prange
+
+# --- SETTINGS ---
+DEFAULT_RUNS = 20000
+DEFAULT_CAPITAL = 2000000.0   # Same 20 Lakhs used by backtest.py
+PNL_COLUMN = "Net P/L"
+PERCENTILES = [1, 5, 25, 50, 75, 95, 99]
+
+# --- RANDOM NUMBERS ---
+# Each run gets its own SplitMix64 stream seeded from (seed, run index), so results
+# are identical no matter how many cores numba spreads the runs over.
+@njit(inline='always')
+def _next_random(state):
+    state = state + np.uint64(0x9E3779B97F4A7C15)
+    z = state
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return state, z ^ (z >> np.uint64(31))
+
+# --- SIMULATION KERNEL ---
+@njit(parallel=True, cache=True)
+def _simulate(pnl, runs, initial_capital, seed, bootstrap):
+    n = pnl.shape[0]
+    final_equity = np.empty(runs)
+    max_drawdown = np.empty(runs)
+    max_losing_streak = np.empty(runs, dtype=np.int64)
+
+    for r in prange(runs):
+        state = np.uint64(seed) ^ (np.uint64(r + 1) * np.uint64(0xD1B54A32D192ED03))
+        order = np.arange(n)
+
+        equity = initial_capital
+        peak = initial_capital
+        worst_dd = 0.0
+        streak = 0
+        worst_streak = 0
+
+        for i in range(n):
+            state, rnd = _next_random(state)
+            if bootstrap:
+                # Resample with replacement
+                idx = np.int64(rnd % np.uint64(n))
+            else:
+                # Incremental Fisher-Yates shuffle: same trades, new order
+                j = i + np.int64(rnd % np.uint64(n - i))
+                tmp = order[i]
+                order[i] = order[j]
+                order[j] = tmp
+                idx = order[i]
+
+            trade_pnl = pnl[idx]
+            equity += trade_pnl
+            if equity > peak:
+                peak = equity
+            dd = (peak - equity) / peak * 100 if peak > 0 else 100.0
+            if dd > worst_dd:
+                worst_dd = dd
+
+            # Losers are Net P/L <= 0, same split as the backtest report
+            if trade_pnl <= 0:
+                streak += 1
+                if streak > worst_streak:
+                    worst_streak = streak
+            else:
+                streak = 0
+
+        final_equity[r] = equity
+        max_drawdown[r] = worst_dd
+        max_losing_streak[r] = worst_streak
+
+    return final_equity, max_drawdown, max_losing_streak
+
+# --- PUBLIC HELPERS ---
+def load_pnl(path, column=PNL_COLUMN):
+    """Reads the per-trade P/L column from any trade log CSV (backtest or bot export)."""
+    df = pd.read_csv(path)
+    if column not in df.columns:
+        raise ValueError(f"Column '{column}' not found in {path}")
+    if 'Exit Date' in df.columns:
+        df = df.sort_values(by='Exit Date')
+    return df[column].dropna().to_numpy(dtype=np.float64)
+
+def path_stats(pnl, initial_capital=DEFAULT_CAPITAL):
+    """Final equity, max drawdown % and worst losing streak of the trades in their recorded order."""
+    pnl = np.asarray(pnl, dtype=np.float64)
+    equity = initial_capital + np.cumsum(pnl)
+    peak = np.maximum.accumulate(np.concatenate(([initial_capital], equity)))[1:]
+    drawdown = (peak - equity) / peak * 100
+    losers = (pnl <= 0).astype(np.int64)
+    # Every winner opens a new group, so losers per group = losing streak lengths
+    resets = np.cumsum(1 - losers)
+    streaks = np.bincount(resets, weights=losers) if len(pnl) else np.zeros(1)
+    return {
+        "final_equity": float(equity[-1]) if len(pnl) else initial_capital,
+        "max_drawdown": float(drawdown.max()) if len(pnl) else 0.0,
+        "max_losing_streak": int(streaks.max()),
+    }
+
+def simulate(pnl, runs=DEFAULT_RUNS, initial_capital=DEFAULT_CAPITAL, method="bootstrap", seed=42):
+    """
+    Runs the Monte Carlo resampling of a trade P/L sequence.
+    method: 'bootstrap' (sample with replacement) or 'shuffle' (permute the order).
+    """
+    if method not in ("bootstrap", "shuffle"):
+        raise ValueError(f"Unknown method '{method}'")
+    pnl = np.ascontiguousarray(pnl, dtype=np.float64)
+    if len(pnl) == 0:
+        raise ValueError("Trade log has no P/L values")
+
+    final_equity, max_drawdown, max_losing_streak = _simulate(
+        pnl, int(runs), float(initial_capital), int(seed), method == "bootstrap"
+    )
+    return {
+        "final_equity": final_equity,
+        "max_drawdown": max_drawdown,
+        "max_losing_streak": max_losing_streak,
+    }
+
+def summarize(results, percentiles=PERCENTILES):
+    """Percentile table (rows = percentile) of every simulated metric."""
+    table = {name: np.percentile(values, percentiles) for name, values in results.items()}
+    return pd.DataFrame(table, index=[f"P{p}" for p in percentiles])
+
+def risk_scale_for_drawdown(results, target_dd_pct, confidence=95):
+    """
+    Factor to multiply the current risk per trade by so the simulated drawdown at the given
+    confidence stays within target_dd_pct. Qty scales linearly with risk, so P/L does too.
+    """
+    dd = np.percentile(results["max_drawdown"], confidence)
+    return target_dd_pct / dd if dd > 0 else float('inf')
+
+def print_report(pnl, results, initial_capital=DEFAULT_CAPITAL, method="bootstrap", target_dd_pct=None, risk_pct=None):
+    actual = path_stats(pnl, initial_capital)
+    table = summarize(results)
+    runs = len(results["final_equity"])
+    below_start = (results["final_equity"] < initial_capital).mean() * 100
+
+    print("\n" + "="*50)
+    print(f"      🎲 MONTE CARLO ({method.upper()}, {runs:,} runs)")
+    print("="*50)
+    print(f"Trades per run:         {len(pnl)}")
+    print(f"Recorded Final Equity:  ₹{actual['final_equity']:,.2f}")
+    print(f"Recorded Max Drawdown:  {actual['max_drawdown']:.2f}%")
+    print(f"Recorded Losing Streak: {actual['max_losing_streak']}")
+    print("-" * 50)
+    print(f"{'':6}{'Final Equity':>18}{'Max DD %':>12}{'Streak':>10}")
+    for label, row in table.iterrows():
+        equity_str = f"₹{row['final_equity']:,.0f}"
+        print(f"{label:6}{equity_str:>18}{row['max_drawdown']:>12.2f}{row['max_losing_streak']:>10.0f}")
+    print("-" * 50)
+    print(f"P(Final < Initial):     {below_start:.2f}%")
+    if target_dd_pct is not None:
+        scale = risk_scale_for_drawdown(results, target_dd_pct)
+        line = f"Risk scale for {target_dd_pct:.1f}% DD @P95: x{scale:.2f}"
+        if risk_pct is not None:
+            line += f" (risk/trade {risk_pct*100:.2f}% -> {risk_pct*scale*100:.2f}%)"
+        print(line)
+    print("="*50)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo resampling of a trade log's Net P/L sequence.")
+    parser.add_argument("trade_log", nargs="?", default="Hourly_T3_Nifty_Backtest.csv")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--capital", type=float, default=DEFAULT_CAPITAL)
+    parser.add_argument("--method", choices=["bootstrap", "shuffle"], default="bootstrap")
+    parser.add_argument("--column", default=PNL_COLUMN)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--target-dd", type=float, default=None, help="Max drawdown %% you are willing to accept at P95")
+    parser.add_argument("--risk-pct", type=float, default=None, help="Current risk per trade as a fraction (e.g. 0.005)")
+    args = parser.parse_args()
+
+    pnl = load_pnl(args.trade_log, args.column)
+    results = simulate(pnl, args.runs, args.capital, args.method, args.seed)
+    print_report(pnl, results, args.capital, args.method, args.target_dd, args.risk_pct)
@@ -0,0 +1,189 @@
+import math
+from datetime import datetime, time as dt_time, timedelta, timezone
+import numpy as np
+import pandas as pd
+from numba import njit
+import market_data
+
+# --- OPTION CHAIN IV & GREEKS ---
+# Black-76 on the index forward (options on NIFTY / BANKNIFTY are priced off the forward the
+# futures trade at). A whole chain is solved in one compiled pass: per option a Newton step
+# on vega, falling back to bisection whenever Newton would leave the bracket that is kept
+# around the root, so every quote that has an implied volatility converges. Quotes that
+# have none (below intrinsic, above the no-arbitrage bound, no trade yet) come back as NaN.
+RISK_FREE_RATE = 0.065           # Annual, continuously compounded
+DAYS_PER_YEAR = 365.0
+EXPIRY_TIME = dt_time(15, 30)    # Options expire at the NSE close
+IST = timezone(timedelta(hours=5, minutes=30))
+IV_BOUNDS = (1e-4, 5.0)
+MAX_ITERATIONS = 60
+PRICE_TOLERANCE = 1e-6           # Rupees
+STRIKE_SCALE = 100.0             # The scrip master stores strikes x100
+OPTION_TYPES = ("OPTIDX", "OPTSTK")
+
+@njit(inline='always')
+def _cdf(x):
+    return 0.5 * math.erfc(-x / math.sqrt(2.0))
+
+@njit(inline='always')
+def _pdf(x):
+    return math.exp(-0.5 * x * x) / math.sqrt(2.0 * math.pi)
+
+@njit(inline='always')
+def _black76(f, k, t, sigma, disc, call):
+    sd = sigma * math.sqrt(t)
+    d1 = (math.log(f / k) + 0.5 * sd * sd) / sd
+    d2 = d1 - sd
+    if call:
+        return disc * (f * _cdf(d1) - k * _cdf(d2)), d1
+    return disc * (k * _cdf(-d2) - f * _cdf(-d1)), d1
+
+@njit(cache=True)
+def _price_kernel(forward, strike, t, sigma, call, r, out):
+    for i in range(forward.shape[0]):
+        out[i] = _black76(forward[i], strike[i], t[i], sigma[i], math.exp(-r[i] * t[i]), call[i])[0]
+
+@njit(cache=True)
+def _solve_kernel(price, forward, strike, t, call, r, lo_bound, hi_bound, max_iter, tol,
+                  iv, delta, gamma, vega, theta, iterations):
+    for i in range(price.shape[0]):
+        f, k, tt, p = forward[i], strike[i], t[i], price[i]
+        iv[i] = delta[i] = gamma[i] = vega[i] = theta[i] = np.nan
+        iterations[i] = 0
+        if not (p > 0.0 and f > 0.0 and k > 0.0 and tt > 0.0):
+            continue
+        disc = math.exp(-r[i] * tt)
+        intrinsic = disc * max(f - k, 0.0) if call[i] else disc * max(k - f, 0.0)
+        upper = disc * f if call[i] else disc * k
+        if p <= intrinsic + tol or p >= upper:
+            continue
+
+        lo, hi = lo_bound, hi_bound
+        # Brenner-Subrahmanyam ATM approximation as the starting point
+        sigma = min(max(math.sqrt(2.0 * math.pi / tt) * p / (disc * f), lo), hi)
+        for n in range(max_iter):
+            model, d1 = _black76(f, k, tt, sigma, disc, call[i])
+            diff = model - p
+            iterations[i] = n + 1
+            if abs(diff) < tol:
+                break
+            if diff > 0.0:
+                hi = sigma
+            else:
+                lo = sigma
+            v = disc * f * _pdf(d1) * math.sqrt(tt)
+            step = sigma - diff / v if v > 1e-12 else -1.0
+            sigma = step if lo < step < hi else 0.5 * (lo + hi)
+        else:
+            continue
+
+        sqrt_t = math.sqrt(tt)
+        model, d1 = _black76(f, k, tt, sigma, disc, call[i])
+        pdf = _pdf(d1)
+        iv[i] = sigma
+        delta[i] = disc * _cdf(d1) if call[i] else -disc * _cdf(-d1)
+        gamma[i] = disc * pdf / (f * sigma * sqrt_t)
+        vega[i] = disc * f * pdf * sqrt_t / 100.0                                    # Per 1 vol point
+        theta[i] = (-disc * f * pdf * sigma / (2.0 * sqrt_t) + r[i] * model) / DAYS_PER_YEAR   # Per calendar day
+
+def _arrays(*values):
+    return [np.ascontiguousarray(v) for v in np.broadcast_arrays(*values)]
+
+def black76_price(forward, strike, t, sigma, is_call, r=RISK_FREE_RATE):
+    """Black-76 premiums (array) for arrays / scalars of forward, strike, years to expiry, volatility and call flags."""
+    forward, strike, t, sigma, r = _arrays(*(np.asarray(v, dtype=np.float64) for v in (forward, strike, t, sigma, r)))
+    call = np.ascontiguousarray(np.broadcast_to(np.asarray(is_call, dtype=np.bool_), forward.shape))
+    out = np.empty(forward.shape[0] if forward.ndim else 1)
+    _price_kernel(forward.ravel(), strike.ravel(), t.ravel(), sigma.ravel(), call.ravel(), r.ravel(), out)
+    return out
+
+def implied_vol_greeks(price, forward, strike, t, is_call, r=RISK_FREE_RATE):
+    """
+    Implied volatility and Greeks for a whole chain at once (1-D arrays or scalars, broadcast).
+    Returns a dict of arrays: iv, delta, gamma, vega (per vol point), theta (per day), iterations.
+    """
+    price, forward, strike, t, r = (a.ravel() for a in _arrays(*(np.asarray(v, dtype=np.float64) for v in (price, forward, strike, t, r))))
+    call = np.ascontiguousarray(np.broadcast_to(np.asarray(is_call, dtype=np.bool_).ravel(), price.shape))
+    out = {name: np.empty(price.shape[0]) for name in ("iv", "delta", "gamma", "vega", "theta")}
+    out["iterations"] = np.empty(price.shape[0], dtype=np.int64)
+    _solve_kernel(price, forward, strike, t, call, r, IV_BOUNDS[0], IV_BOUNDS[1], MAX_ITERATIONS, PRICE_TOLERANCE,
+                  out["iv"], out["delta"], out["gamma"], out["vega"], out["theta"], out["iterations"])
+    return out
+
+# --- CHAINS FROM THE SCRIP MASTER ---
+def option_chain(master, name, today=None, expiry=None):
+    """
+    One expiry's option instruments for `name` from scrip master rows (list of dicts or DataFrame):
+    DataFrame with token, symbol, strike, call, expiry, lotsize. Nearest unexpired expiry by default.
+    """
+    df = master if isinstance(master, pd.DataFrame) else pd.DataFrame(master)
+    df = df[(df['exch_seg'] == "NFO") & df['instrumenttype'].isin(OPTION_TYPES) & (df['name'] == name)]
+    if df.empty:
+        return pd.DataFrame(columns=["token", "symbol", "strike", "call", "expiry", "lotsize"])
+    expiries = pd.to_datetime(df['expiry'], format='%d%b%Y')
+    today = pd.Timestamp(today or datetime.now(IST).date()).normalize()
+    if expiry is None:
+        live = expiries[expiries >= today]
+        if live.empty:
+            return pd.DataFrame(columns=["token", "symbol", "strike", "call", "expiry", "lotsize"])
+        expiry = live.min()
+    df = df[expiries == pd.Timestamp(expiry)]
+    chain = pd.DataFrame({
+        "token": df['token'].astype(str).to_numpy(),
+        "symbol": df['symbol'].to_numpy(),
+        "strike": df['strike'].astype(float).to_numpy() / STRIKE_SCALE,
+        "call": df['symbol'].str.endswith("CE").to_numpy(),
+        "expiry": pd.Timestamp(expiry),
+        "lotsize": pd.to_numeric(df['lotsize']).to_numpy(),
+    })
+    return chain.sort_values(["strike", "call"]).reset_index(drop=True)
+
+def years_to_expiry(expiry, now=None):
+    """Calendar time from `now` to the expiry day's close, in years (0 once expired)."""
+    now = (now or datetime.now(IST)).astimezone(IST)
+    close = datetime.combine(pd.Timestamp(expiry).date(), EXPIRY_TIME, IST)
+    return max((close - now).total_seconds(), 0.0) / (DAYS_PER_YEAR * 86400)
+
+def parity_forward(chain, prices, t, r=RISK_FREE_RATE, near=None, strikes=3):
+    """
+    Forward implied by put-call parity (F = K + e^(rT) (C - P)), the median over the `strikes`
+    strikes where C and P are closest (or closest to `near`). None without a quoted pair.
+    """
+    quoted = chain.assign(ltp=chain['token'].map(prices)).dropna(subset=['ltp'])
+    pairs = quoted.pivot_table(index='strike', columns='call', values='ltp', aggfunc='last').dropna()
+    if pairs.empty or True not in pairs.columns or False not in pairs.columns:
+        return None
+    gap = (pairs.index.to_numpy() - near) if near else (pairs[True] - pairs[False]).to_numpy()
+    closest = pairs.iloc[np.argsort(np.abs(gap))[:strikes]]
+    return float(np.median(closest.index.to_numpy() + math.exp(r * t) * (closest[True] - closest[False]).to_numpy()))
+
+def price_chain(chain, prices, forward=None, now=None, r=RISK_FREE_RATE):
+    """
+    IV and Greeks for every quoted option of one expiry. prices: {token: ltp}. The forward comes
+    from put-call parity, or the given futures price if the chain has no quoted pairs.
+    Returns (chain with ltp, iv, delta, gamma, vega, theta columns, forward used).
+    """
+    if chain.empty:
+        return chain, forward
+    t = years_to_expiry(chain['expiry'].iat[0], now)
+    implied = parity_forward(chain, prices, t, r, near=forward)
+    forward = implied if implied is not None else forward
+    ltp = chain['token'].map(prices).astype(float).to_numpy()
+    out = implied_vol_greeks(ltp, forward if forward is not None else np.nan, chain['strike'].to_numpy(), t,
+                             chain['call'].to_numpy(), r)
+    priced = chain.assign(ltp=ltp, **{k: out[k] for k in ("iv", "delta", "gamma", "vega", "theta")})
+    return priced, forward
+
+def atm_iv(priced, forward):
+    """Average call / put IV at the strike nearest the forward (NaN if neither solved)."""
+    solved = priced.dropna(subset=['iv'])
+    if solved.empty or forward is None:
+        return np.nan
+    strike = solved['strike'].iloc[np.argmin(np.abs(solved['strike'].to_numpy() - forward))]
+    return float(solved.loc[solved['strike'] == strike, 'iv'].mean())
+
+def quote_and_price(api, chain, forward=None, session=None, now=None):
+    """Quotes the whole chain (batched LTP, 50 tokens per request) and prices it."""
+    instruments = {token: {"exchange": "NFO", "token": token} for token in chain['token']}
+    prices = market_data.quote_ltp(api, instruments, session)
+    return price_chain(chain, prices, forward, now)
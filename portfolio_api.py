@@ -0,0 +1,286 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+import equity_curve
+
+# --- LOCAL PORTFOLIO READ API ---
+# Keeps every bot's portfolio in memory and serves it over HTTP/JSON on localhost, so the
+# dashboards and scripts stop parsing the JSON files themselves. A portfolio is reloaded only
+# when its file changes; every response carries an ETag and If-None-Match returns 304.
+#   GET /portfolios                      -> names served
+#   GET /<name>/snapshot                 -> full portfolio document
+#   GET /<name>/summary                  -> capital, realized / unrealized P&L, trade counts
+#   GET /<name>/positions                -> open longs and shorts
+#   GET /<name>/signals?limit=20         -> latest signals
+#   GET /<name>/closed?page=1&size=50&side=all|long|short  -> closed trades, newest first
+#   GET /<name>/events                   -> server-sent events stream of new signals
+#   GET /equity/<series>?start=&end=&points=  -> downsampled equity / drawdown for a zoom window
+PORTFOLIOS = {
+    "nifty": "portfolio.json",
+    "dmi": "dmi_portfolio.json",
+    "crypto": "crypto_portfolio.json",
+}
+API_HOST = "127.0.0.1"
+API_PORT = 8765
+POLL_SECONDS = 1.0
+SSE_KEEPALIVE_SECONDS = 15
+SIGNAL_LOG_SIZE = 500
+
+class PortfolioState:
+    """In-memory copy of one portfolio file plus the values derived from it."""
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.stamp = None
+        self.etag = '"empty"'
+        self.data = None
+        self.summary = {}
+        self.closed = []
+        self.signal_log = []    # [(event_id, signal)] oldest first
+        self.next_event_id = 1
+        self.changed = threading.Condition()
+
+    def refresh(self):
+        """Reloads the file if its mtime / size changed. Returns True when state was updated."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self.stamp:
+            return False
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+            data = json.loads(raw)
+        except (OSError, ValueError):
+            return False  # Half-written file from an old bot version: try again next poll
+
+        with self.changed:
+            self._ingest_signals(data.get("signals", []))
+            self.data = data
+            self.summary = summarize(data)
+            self.closed = merged_closed(data)
+            self.etag = '"' + hashlib.sha1(raw).hexdigest()[:16] + '"'
+            self.stamp = stamp
+            self.changed.notify_all()
+        return True
+
+    def _ingest_signals(self, signals):
+        # Bots insert new signals at the front of a capped list; everything before the
+        # newest one we already know is new
+        latest = self.signal_log[-1][1] if self.signal_log else None
+        fresh = []
+        for signal in signals:
+            if signal == latest:
+                break
+            fresh.append(signal)
+        for signal in reversed(fresh):
+            self.signal_log.append((self.next_event_id, signal))
+            self.next_event_id += 1
+        del self.signal_log[:-SIGNAL_LOG_SIZE]
+
+    def signals_after(self, event_id):
+        return [(i, s) for i, s in self.signal_log if i > event_id]
+
+def summarize(data):
+    """Same headline numbers the dashboards show."""
+    open_longs = data.get("open_longs", {})
+    open_shorts = data.get("open_shorts", {})
+    closed_longs = data.get("closed_longs", [])
+    closed_shorts = data.get("closed_shorts", [])
+    unrealized = sum((p.get('current_price', p['entry_price']) - p['entry_price']) * p['qty'] for p in open_longs.values())
+    unrealized += sum((p['entry_price'] - p.get('current_price', p['entry_price'])) * p['qty'] for p in open_shorts.values())
+    closed = closed_longs + closed_shorts
+    return {
+        "capital": data.get("capital"),
+        "realized_pnl": round(sum(t['PnL'] for t in closed), 2),
+        "unrealized_pnl": round(unrealized, 2),
+        "open_longs": len(open_longs),
+        "open_shorts": len(open_shorts),
+        "closed_trades": len(closed),
+        "wins": sum(1 for t in closed if t['PnL'] > 0),
+    }
+
+def merged_closed(data):
+    """Closed longs and shorts in one list, newest exit first."""
+    rows = [dict(t, Side="LONG") for t in data.get("closed_longs", [])]
+    rows += [dict(t, Side="SHORT") for t in data.get("closed_shorts", [])]
+    rows.sort(key=lambda t: t.get('Exit Date', ''), reverse=True)
+    return rows
+
+STATES = {}
+
+class BadQuery(ValueError):
+    """A query parameter the API cannot serve; answered with 400."""
+
+def query_int(query, name, default=None, minimum=None):
+    """Integer query parameter, or `default` when absent. Raises BadQuery if it is not an integer or below `minimum`."""
+    if name not in query:
+        return default
+    raw = query[name][0]
+    try:
+        value = int(raw)
+    except ValueError:
+        raise BadQuery(f"{name} must be an integer, got {raw!r}")
+    if minimum is not None and value < minimum:
+        raise BadQuery(f"{name} must be at least {minimum}, got {value}")
+    return value
+
+def watch_files(stop_event):
+    while not stop_event.is_set():
+        for state in STATES.values():
+            state.refresh()
+        stop_event.wait(POLL_SECONDS)
+
+class PortfolioHandler(BaseHTTPRequestHandler):
+    server_version = "PortfolioAPI/1.0"
+
+    def log_message(self, format, *args):
+        pass  # Dashboards poll constantly; keep the console for real errors
+
+    def _send_json(self, payload, status=200, etag=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = [p for p in url.path.split('/') if p]
+
+        if parts == ["portfolios"]:
+            return self._send_json(sorted(STATES))
+        if len(parts) == 2 and parts[0] == "equity":
+            return self._send_equity(parts[1], url.query, query)
+        if len(parts) != 2 or parts[0] not in STATES:
+            return self._send_json({"error": "not found"}, status=404)
+
+        state, endpoint = STATES[parts[0]], parts[1]
+        if endpoint == "events":
+            return self._stream_events(state)
+        if state.data is None:
+            return self._send_json({"error": f"{state.path} not found yet"}, status=503)
+
+        # Every endpoint is derived from the same file, so the file hash is a valid ETag;
+        # the query string is folded in so pages of /closed do not share one.
+        etag = state.etag if not url.query else state.etag[:-1] + "-" + hashlib.sha1(url.query.encode()).hexdigest()[:8] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        try:
+            if endpoint == "snapshot":
+                payload = state.data
+            elif endpoint == "summary":
+                payload = state.summary
+            elif endpoint == "positions":
+                payload = {"open_longs": state.data.get("open_longs", {}), "open_shorts": state.data.get("open_shorts", {})}
+            elif endpoint == "signals":
+                limit = query_int(query, "limit", 20, minimum=0)
+                payload = state.data.get("signals", [])[:limit]
+            elif endpoint == "closed":
+                page = query_int(query, "page", 1, minimum=1)
+                size = min(query_int(query, "size", 50, minimum=1), 500)
+                side = query.get("side", ["all"])[0].upper()
+                if side not in ("ALL", "LONG", "SHORT"):
+                    raise BadQuery(f"side must be all, long or short, got {side.lower()!r}")
+                rows = state.closed if side == "ALL" else [t for t in state.closed if t["Side"] == side]
+                payload = {"page": page, "size": size, "total": len(rows), "trades": rows[(page - 1) * size: page * size]}
+            else:
+                return self._send_json({"error": "not found"}, status=404)
+        except BadQuery as e:
+            return self._send_json({"error": str(e)}, status=400)
+        self._send_json(payload, etag=etag)
+
+    def _send_equity(self, series, raw_query, query):
+        path = equity_curve.series_path(series)
+        if not os.path.exists(path):
+            return self._send_json({"error": "not found"}, status=404)
+        # Series are append-only (or replaced whole), so size + mtime identify the content
+        st = os.stat(path)
+        etag = '"' + hashlib.sha1(f"{st.st_size}-{st.st_mtime_ns}-{raw_query}".encode()).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        try:
+            start = query_int(query, "start")
+            end = query_int(query, "end")
+            points = min(query_int(query, "points", equity_curve.DEFAULT_POINTS, minimum=1), 10000)
+        except BadQuery as e:
+            return self._send_json({"error": str(e)}, status=400)
+        curve = equity_curve.downsample(series, start, end, points)
+        payload = {
+            "ts": ((curve['Timestamp'] - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)).tolist() if len(curve) else [],
+            "equity": curve['Equity'].round(2).tolist(),
+            "drawdown": curve['Drawdown'].round(4).tolist(),
+        }
+        self._send_json(payload, etag=etag)
+
+    def _stream_events(self, state):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "keep-alive")
+        self.end_headers()
+
+        # Resume after the last event the client saw, otherwise only push new signals
+        last_id = self.headers.get("Last-Event-ID")
+        last_id = int(last_id) if last_id and last_id.isdigit() else state.next_event_id - 1
+        try:
+            while True:
+                with state.changed:
+                    events = state.signals_after(last_id)
+                    if not events:
+                        state.changed.wait(SSE_KEEPALIVE_SECONDS)
+                        events = state.signals_after(last_id)
+                if events:
+                    for event_id, signal in events:
+                        self.wfile.write(f"id: {event_id}\nevent: signal\ndata: {json.dumps(signal)}\n\n".encode())
+                        last_id = event_id
+                else:
+                    self.wfile.write(b": keepalive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+def serve(host=API_HOST, port=API_PORT, portfolios=PORTFOLIOS):
+    for name, path in portfolios.items():
+        STATES[name] = PortfolioState(name, path)
+        STATES[name].refresh()
+    stop_event = threading.Event()
+    threading.Thread(target=watch_files, args=(stop_event,), daemon=True).start()
+    server = ThreadingHTTPServer((host, port), PortfolioHandler)
+    server.daemon_threads = True
+    print(f"📡 Portfolio API on http://{host}:{port} serving {', '.join(portfolios)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local read API for bot portfolios.")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+    serve(args.host, args.port)
@@ -0,0 +1,51 @@
+import json
+import os
+import requests
+import pandas as pd
+import equity_curve
+
+# --- PORTFOLIO API CLIENT ---
+# Used by the dashboards: ask the local portfolio API (portfolio_api.py) with the last ETag,
+# so an unchanged portfolio costs a 304 and no JSON parsing. Falls back to reading the file
+# when the API is not running.
+API_URL = os.environ.get("PORTFOLIO_API_URL", "http://127.0.0.1:8765")
+
+def load_portfolio(name, fallback_file, cache):
+    """
+    Returns the portfolio document for `name`. `cache` is a dict that survives between calls
+    (st.session_state in Streamlit) holding the last ETag and document.
+    """
+    headers = {"If-None-Match": cache["etag"]} if cache.get("etag") else {}
+    try:
+        res = requests.get(f"{API_URL}/{name}/snapshot", headers=headers, timeout=2)
+        if res.status_code == 304 and "data" in cache:
+            return cache["data"]
+        if res.status_code == 200:
+            cache["etag"] = res.headers.get("ETag")
+            cache["data"] = res.json()
+            return cache["data"]
+    except requests.RequestException:
+        pass
+
+    if not os.path.exists(fallback_file):
+        return None
+    with open(fallback_file, 'r') as f:
+        return json.load(f)
+
+def load_equity(series, start=None, end=None, points=equity_curve.DEFAULT_POINTS):
+    """Downsampled equity / drawdown for a zoom window: from the API if it runs, else computed locally."""
+    params = {"points": points}
+    if start is not None: params["start"] = start
+    if end is not None: params["end"] = end
+    try:
+        res = requests.get(f"{API_URL}/equity/{series}", params=params, timeout=2)
+        if res.status_code == 200:
+            payload = res.json()
+            return pd.DataFrame({
+                'Timestamp': pd.to_datetime(payload['ts'], unit='s', utc=True).tz_convert('Asia/Kolkata'),
+                'Equity': payload['equity'],
+                'Drawdown': payload['drawdown'],
+            })
+    except requests.RequestException:
+        pass
+    return equity_curve.downsample(series, start, end, points)
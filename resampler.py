@@ -0,0 +1,121 @@
+import argparse
+import numpy as np
+import pandas as pd
+import candle_store
+import trading_calendar
+
+# --- MULTI-TIMEFRAME RESAMPLER ---
+# Each symbol is fetched and stored once at a base resolution (e.g. FIFTEEN_MINUTE); every
+# higher timeframe is derived locally and kept in the candle store under its own interval.
+# Buckets are anchored at the session open, like the exchange's own candles: NSE / NFO hourly
+# bars run 09:15-10:15 ... 15:15-15:30, MCX bars start at 09:00, and a daily bar is one session.
+IST_OFFSET_SECONDS = 5 * 3600 + 30 * 60
+INTERVAL_SECONDS = {
+    "ONE_MINUTE": 60, "THREE_MINUTE": 180, "FIVE_MINUTE": 300, "TEN_MINUTE": 600,
+    "FIFTEEN_MINUTE": 900, "THIRTY_MINUTE": 1800, "ONE_HOUR": 3600, "TWO_HOUR": 7200,
+    "FOUR_HOUR": 14400, "ONE_DAY": 86400,
+}
+TIMEFRAME_ALIASES = {
+    "1m": "ONE_MINUTE", "3m": "THREE_MINUTE", "5m": "FIVE_MINUTE", "10m": "TEN_MINUTE",
+    "15m": "FIFTEEN_MINUTE", "30m": "THIRTY_MINUTE", "1h": "ONE_HOUR", "2h": "TWO_HOUR",
+    "4h": "FOUR_HOUR", "1d": "ONE_DAY",
+}
+
+def parse_timeframe(value):
+    """'1h' / '4h' / 'ONE_HOUR' ... -> the candle store interval name. ValueError if unsupported."""
+    name = TIMEFRAME_ALIASES.get(str(value).strip().lower(), str(value).strip().upper())
+    if name not in INTERVAL_SECONDS:
+        raise ValueError(f"unsupported timeframe {value!r} (use one of {', '.join(TIMEFRAME_ALIASES)})")
+    return name
+
+def session_anchor_seconds(exchange):
+    start = trading_calendar.SESSIONS.get(exchange, trading_calendar.SESSIONS["NSE"])[0]
+    return start.hour * 3600 + start.minute * 60
+
+def bucket_keys(ts, bucket_seconds, exchange="NSE"):
+    """
+    For UTC epoch timestamps, the session-anchored bucket each one falls in: returns (key, bucket
+    start epoch). Bars before the session open (pre-open) are folded into the first bucket.
+    """
+    local = np.asarray(ts, dtype=np.int64) + IST_OFFSET_SECONDS
+    anchor = session_anchor_seconds(exchange)
+    day = local // 86400
+    slot = np.maximum((local % 86400 - anchor) // bucket_seconds, 0)
+    key = day * (86400 // bucket_seconds + 1) + slot
+    return key, day * 86400 + anchor + slot * bucket_seconds - IST_OFFSET_SECONDS
+
+def bucket_bounds(ts, bucket_seconds, exchange="NSE"):
+    """First and one-past-last index of every bucket in a sorted timestamp array."""
+    key, _ = bucket_keys(ts, bucket_seconds, exchange)
+    first = np.concatenate(([0], np.flatnonzero(np.diff(key)) + 1)) if len(key) else np.empty(0, dtype=np.int64)
+    return first, np.append(first[1:], len(key))
+
+def resample_records(records, interval, exchange="NSE"):
+    """Aggregates sorted CANDLE_DTYPE records into `interval` bars (open first, high max, low min, close last, volume sum)."""
+    out = np.empty(0, dtype=candle_store.CANDLE_DTYPE)
+    if records is None or len(records) == 0:
+        return out
+    seconds = INTERVAL_SECONDS[interval]
+    _, start_ts = bucket_keys(records['ts'], seconds, exchange)
+    first, end = bucket_bounds(records['ts'], seconds, exchange)
+    out = np.empty(len(first), dtype=candle_store.CANDLE_DTYPE)
+    out['ts'] = start_ts[first]
+    out['Open'] = records['Open'][first]
+    out['High'] = np.maximum.reduceat(records['High'], first)
+    out['Low'] = np.minimum.reduceat(records['Low'], first)
+    out['Close'] = records['Close'][end - 1]
+    out['Volume'] = np.add.reduceat(np.nan_to_num(records['Volume']), first)
+    return out
+
+def resample(df, interval, exchange="NSE"):
+    """DataFrame (Timestamp + OHLCV, as the bots use) -> the same frame at `interval`."""
+    bars = resample_records(candle_store.frame_to_records(df), interval, exchange)
+    out = pd.DataFrame({col: bars[col] for col in candle_store.PRICE_COLUMNS})
+    out.insert(0, 'Timestamp', candle_store.from_epoch(bars['ts']))
+    return out
+
+def update(exchange, symbol, base_interval, interval, since=None):
+    """
+    Brings the stored `interval` series up to date from the stored base series. Only base bars
+    from the newest derived bucket onward are resampled (that bucket may have been partial), so
+    an update costs the bars added since the last one. If older base bars were written too (a
+    backfill), pass the epoch of the oldest one as `since`. Returns the number of bars written.
+    """
+    if interval == base_interval:
+        return 0
+    if INTERVAL_SECONDS[interval] % INTERVAL_SECONDS[base_interval]:
+        raise ValueError(f"{interval} is not a multiple of {base_interval}")
+    base = candle_store.load_arrays(exchange, symbol, base_interval, mmap=True)
+    if base is None or len(base) == 0:
+        return 0
+    last = candle_store.last_timestamp(exchange, symbol, interval)
+    start = 0 if last is None else int(np.searchsorted(base['ts'], last, side='left'))
+    if since is not None:
+        # Back to the start of the bucket `since` falls in
+        _, bucket_start = bucket_keys([since], INTERVAL_SECONDS[interval], exchange)
+        start = min(start, int(np.searchsorted(base['ts'], bucket_start[0], side='left')))
+    bars = resample_records(base[start:], interval, exchange)
+    if len(bars):
+        candle_store.merge_records(exchange, symbol, interval, bars)
+    return len(bars)
+
+def rebuild(exchange, symbol, base_interval, interval):
+    """Re-derives the whole `interval` series (after the base series was rewritten, e.g. back-adjusted)."""
+    base = candle_store.load_arrays(exchange, symbol, base_interval, mmap=True)
+    bars = resample_records(base, interval, exchange)
+    candle_store.write_records(exchange, symbol, interval, bars)
+    return len(bars)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Derive higher timeframes from a stored base series.")
+    parser.add_argument("exchange")
+    parser.add_argument("symbol")
+    parser.add_argument("--base", default="FIFTEEN_MINUTE")
+    parser.add_argument("--to", nargs="+", default=["1h", "4h", "1d"], help="Target timeframes")
+    parser.add_argument("--rebuild", action="store_true", help="Re-derive from scratch instead of incrementally")
+    args = parser.parse_args()
+    base = parse_timeframe(args.base)
+    for target in args.to:
+        interval = parse_timeframe(target)
+        written = (rebuild if args.rebuild else update)(args.exchange, args.symbol, base, interval)
+        print(f"✅ {args.exchange}:{args.symbol} {base} -> {interval}: {written} bar(s) written")
@@ -0,0 +1,231 @@
+import argparse
+import glob
+import hashlib
+import inspect
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+# --- BACKTEST RESULTS STORE ---
+# Every backtest run is keyed by a hash of (strategy code version, parameters, dataset). A run
+# whose key is already stored is answered from disk instead of being recomputed.
+#   backtest_results/runs/<key>.parquet       -> trade log of one run
+#   backtest_results/summary/part-<key>.parquet -> one summary row, written when the run finishes
+#   backtest_results/summary.parquet          -> compacted summary of all runs
+# Sweeps write one tiny part per run (so parallel workers never rewrite a shared file); queries
+# fold the parts into summary.parquet and only ever read that one columnar file, never trade logs.
+RESULTS_DIR = "backtest_results"
+KEY_LENGTH = 16
+LOCK_STALE_SECONDS = 600      # A summary lock older than this was left by a crashed process
+LOCK_WAIT_SECONDS = 30
+
+def _runs_dir():
+    return os.path.join(RESULTS_DIR, "runs")
+
+def _parts_dir():
+    return os.path.join(RESULTS_DIR, "summary")
+
+def _summary_path():
+    return os.path.join(RESULTS_DIR, "summary.parquet")
+
+def _trades_path(key):
+    return os.path.join(_runs_dir(), f"{key}.parquet")
+
+def _part_path(key):
+    return os.path.join(_parts_dir(), f"part-{key}.parquet")
+
+def _lock_path():
+    return os.path.join(RESULTS_DIR, "summary.lock")
+
+@contextmanager
+def _summary_lock(wait=False):
+    """
+    Exclusive right to rewrite summary.parquet across processes (a lock file created with O_EXCL).
+    Yields False if another process holds it and `wait` is off, or it is still held after LOCK_WAIT_SECONDS.
+    """
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    deadline = time.time() + (LOCK_WAIT_SECONDS if wait else 0)
+    while True:
+        try:
+            os.close(os.open(_lock_path(), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(_lock_path()) > LOCK_STALE_SECONDS:
+                    os.remove(_lock_path())
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.time() >= deadline:
+                yield False
+                return
+            time.sleep(0.1)
+    try:
+        yield True
+    finally:
+        os.remove(_lock_path())
+
+def _read_part(path):
+    """A summary part, or None if a concurrent compact / forget already removed it."""
+    try:
+        return pd.read_parquet(path)
+    except FileNotFoundError:
+        return None
+
+def _write_parquet(df, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+# --- KEYS ---
+def code_version(*objects):
+    """Hash of the source of the modules / functions a run depends on: editing any of them invalidates its results."""
+    digest = hashlib.sha1()
+    for obj in objects:
+        digest.update(inspect.getsource(obj).encode())
+    return digest.hexdigest()[:KEY_LENGTH]
+
+def dataset_fingerprint(symbol, start, end, *columns):
+    """Identifies the data a run saw: symbol, first / last bar, bar count and a checksum of the price columns."""
+    digest = hashlib.sha1()
+    for column in columns:
+        digest.update(np.ascontiguousarray(column, dtype=np.float64).tobytes())
+    return {
+        "symbol": symbol,
+        "data_start": str(start[0]) if len(start) else "",
+        "data_end": str(end[-1]) if len(end) else "",
+        "bars": int(len(columns[0])) if columns else 0,
+        "checksum": digest.hexdigest()[:KEY_LENGTH],
+    }
+
+def run_key(strategy, params, dataset, code):
+    payload = json.dumps({"strategy": strategy, "params": params, "dataset": dataset, "code": code}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:KEY_LENGTH]
+
+# --- WRITING / READING ONE RUN ---
+def save(key, strategy, params, dataset, code, trades, metrics):
+    """Stores a run's trade log and summary row. The summary part is written last, so a run is
+    only ever visible once its trades are on disk."""
+    _write_parquet(pd.DataFrame(trades), _trades_path(key))
+    row = {"key": key, "strategy": strategy, "code": code,
+           "created_at": datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+           "params": json.dumps(params, sort_keys=True, default=str)}
+    row.update({f"param_{name}": value for name, value in params.items()})
+    row.update({name: value for name, value in dataset.items() if name != "checksum"})
+    row.update(metrics)
+    _write_parquet(pd.DataFrame([row]), _part_path(key))
+    return row
+
+def lookup(key):
+    """Summary row (dict) of a stored run, or None."""
+    if not os.path.exists(_trades_path(key)):
+        return None
+    part = _read_part(_part_path(key))
+    if part is not None:
+        return part.iloc[0].to_dict()
+    summary = load_summary()
+    match = summary[summary["key"] == key] if not summary.empty else summary
+    return match.iloc[0].to_dict() if len(match) else None
+
+def load_trades(key):
+    """Trade log of one run as a DataFrame (columns as written by backtest.create_trade_log)."""
+    return pd.read_parquet(_trades_path(key))
+
+def memoized(strategy, params, dataset, code, compute):
+    """
+    Returns (key, trades, metrics, cached). `compute()` must return (trades, metrics) and is only
+    called when this exact strategy code, parameter set and dataset has not been run before.
+    """
+    key = run_key(strategy, params, dataset, code)
+    stored = lookup(key)
+    if stored is not None:
+        return key, load_trades(key).to_dict('records'), stored, True
+    trades, metrics = compute()
+    return key, trades, save(key, strategy, params, dataset, code, trades, metrics), False
+
+# --- QUERYING ---
+def compact():
+    """
+    Folds pending summary parts into summary.parquet. Safe to run while sweeps are writing, and
+    from several processes at once: only the holder of the summary lock compacts, the others
+    return 0 and leave their parts for the next call.
+    """
+    if not glob.glob(os.path.join(_parts_dir(), "part-*.parquet")):
+        return 0
+    with _summary_lock() as locked:
+        if not locked:
+            return 0
+        parts = sorted(glob.glob(os.path.join(_parts_dir(), "part-*.parquet")))
+        frames = [pd.read_parquet(_summary_path())] if os.path.exists(_summary_path()) else []
+        read = [(p, _read_part(p)) for p in parts]
+        read = [(p, df) for p, df in read if df is not None]
+        if not read:
+            return 0
+        merged = pd.concat(frames + [df for _, df in read], ignore_index=True).drop_duplicates("key", keep="last")
+        _write_parquet(merged, _summary_path())
+        # Only the parts that made it into the file; new ones are picked up next time
+        for path, _ in read:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return len(read)
+
+def load_summary(columns=None):
+    """All run summaries (one row per run)."""
+    compact()
+    if not os.path.exists(_summary_path()):
+        return pd.DataFrame(columns=columns)
+    return pd.read_parquet(_summary_path(), columns=columns)
+
+def query(where=None, rank_by="net_pnl", ascending=False, top=None, columns=None):
+    """
+    Compares runs from the summary file only. `where` is a DataFrame.query expression, e.g.
+    "strategy == 't3_reversal' and param_hard_stop_pct < 0.03 and trades > 50".
+    """
+    runs = load_summary()
+    if runs.empty:
+        return runs
+    if where:
+        runs = runs.query(where)
+    if rank_by:
+        runs = runs.sort_values(rank_by, ascending=ascending)
+    if top:
+        runs = runs.head(top)
+    return runs[columns] if columns else runs
+
+def forget(key):
+    """Deletes one run (e.g. produced by a buggy build whose code hash did not change)."""
+    for path in (_trades_path(key), _part_path(key)):
+        if os.path.exists(path):
+            os.remove(path)
+    with _summary_lock(wait=True) as locked:
+        if not locked:
+            raise RuntimeError(f"Summary lock {_lock_path()} is held; could not forget run {key}")
+        if not os.path.exists(_summary_path()):
+            return
+        summary = pd.read_parquet(_summary_path())
+        if (summary["key"] == key).any():
+            _write_parquet(summary[summary["key"] != key], _summary_path())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query stored backtest runs.")
+    parser.add_argument("--where", default=None, help="Filter expression, e.g. \"trades > 50 and max_drawdown_mtm < 10\"")
+    parser.add_argument("--rank-by", default="net_pnl")
+    parser.add_argument("--ascending", action="store_true")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--trades", metavar="KEY", default=None, help="Print the trade log of one run")
+    args = parser.parse_args()
+
+    if args.trades:
+        print(load_trades(args.trades).to_string(index=False))
+    else:
+        columns = ["key", "strategy", "symbol", "data_start", "data_end", "params", "trades", "win_rate",
+                   "net_pnl", "roi", "max_drawdown_mtm", "time_in_market"]
+        runs = query(args.where, args.rank_by, args.ascending, args.top)
+        print(runs[[c for c in columns if c in runs.columns]].to_string(index=False) if not runs.empty else "No stored runs.")
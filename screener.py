@@ -0,0 +1,165 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+import bar_watermarks
+import candle_store
+import resampler
+
+# --- TWO-STAGE UNIVERSE SCREENER ---
+# Stage 1 runs the slow trend filter (SMA_100 / SMA_200 / EMA_50 / EMA_21) for the whole
+# universe at once from the local candle store - no API calls. Only the symbols whose trend
+# stack is aligned go on to stage 2, the live hourly fetch and trigger check in bot.py.
+# The cache is only refreshed by stage 2, so a symbol whose newest cached bar is older than the
+# exchange's last closed bar is stale: it is re-warmed (oldest first) instead of being judged
+# on frozen bars, and can re-qualify when its trend turns.
+EXCHANGE = "NSE"
+INTERVAL = "ONE_HOUR"
+LOOKBACK_DAYS = 60           # Same window bot.py fetches, so indicator values line up
+MIN_BARS = 200               # SMA_200 needs this many bars
+WARMUP_PER_SCAN = 100        # Symbols without cached history let through per scan
+SNAPSHOT_FILE = "scan_snapshot.json"
+TREND_COLUMNS = ['Close', 'SMA_100', 'SMA_200', 'EMA_50', 'EMA_21', 'EMA_10', 'EMA_5']
+
+def build_universe(universe, token_map, fno_symbols=(), watchlist=()):
+    """
+    Turns a universe name into a list of '.NS' tickers using the scrip master token map.
+    'watchlist' -> config watchlist, 'fno' -> every F&O stock, 'nse_eq' -> every NSE equity,
+    or an explicit list of tickers.
+    """
+    if isinstance(universe, list):
+        return universe
+    if universe == "watchlist":
+        return list(watchlist)
+    if universe == "fno":
+        return sorted(f"{sym}.NS" for sym in fno_symbols if sym in token_map)
+    if universe == "nse_eq":
+        return sorted(f"{sym}.NS" for sym in token_map)
+    raise ValueError(f"Unknown universe '{universe}'")
+
+def _close_matrix(tickers, since, interval=INTERVAL):
+    """
+    Right-aligned (symbols x bars) matrix of cached closes since `since`, NaN-padded on the left,
+    plus each row's bar count and newest bar start (epoch, -1 if none). Each symbol's filter only
+    uses its own history, so no time alignment.
+    """
+    since_ts = candle_store.to_epoch([since])[0]
+    series, newest = [], np.full(len(tickers), -1, dtype=np.int64)
+    for row, ticker in enumerate(tickers):
+        arr = candle_store.load_arrays(EXCHANGE, ticker.replace(".NS", ""), interval)
+        if arr is None or len(arr) == 0:
+            series.append(np.empty(0))
+            continue
+        newest[row] = arr['ts'][-1]
+        lo = int(np.searchsorted(arr['ts'], since_ts, side='left'))
+        series.append(np.asarray(arr['Close'][lo:], dtype=np.float64))
+
+    counts = np.array([len(s) for s in series], dtype=np.int64)
+    width = max(int(counts.max()) if len(counts) else 0, 1)
+    closes = np.full((len(tickers), width), np.nan)
+    for row, s in enumerate(series):
+        if len(s):
+            closes[row, width - len(s):] = s
+    return closes, counts, newest
+
+def trend_stage(tickers, now=None, interval=INTERVAL):
+    """
+    Stage 1: latest cached trend-stack values and state for every ticker in one batch.
+    State is LONG / SHORT when the stack is aligned, NONE otherwise, NO_DATA if the cache is too short.
+    Stale marks a cache whose newest bar predates the exchange's last closed bar.
+    """
+    now = now or datetime.now()
+    closes, counts, newest = _close_matrix(tickers, now - timedelta(days=LOOKBACK_DAYS), interval)
+    last_closed = bar_watermarks.last_closed_bar(now, EXCHANGE, resampler.INTERVAL_SECONDS[interval])
+    stale = newest < (int(last_closed.timestamp()) if last_closed is not None else 0)
+
+    # Columns = symbols, so every rolling / ewm call below covers the whole universe at once
+    frame = pd.DataFrame(closes.T, columns=tickers)
+    last = frame.ffill().iloc[-1]
+    sma_100 = frame.rolling(window=100).mean().iloc[-1]
+    sma_200 = frame.rolling(window=200).mean().iloc[-1]
+    ema_50 = frame.ewm(span=50, adjust=False).mean().iloc[-1]
+    ema_21 = frame.ewm(span=21, adjust=False).mean().iloc[-1]
+    ema_10 = frame.ewm(span=10, adjust=False).mean().iloc[-1]
+    ema_5 = frame.ewm(span=5, adjust=False).mean().iloc[-1]
+
+    result = pd.DataFrame({
+        'Close': last, 'SMA_100': sma_100, 'SMA_200': sma_200,
+        'EMA_50': ema_50, 'EMA_21': ema_21, 'EMA_10': ema_10, 'EMA_5': ema_5,
+        'Bars': counts, 'Last Bar': newest, 'Stale': stale
+    }, index=tickers)
+
+    result['State'] = trend_state(result, result['Bars'] < MIN_BARS)
+    return result
+
+def trend_state(values, no_data=False):
+    """LONG / SHORT when the SMA_100 / SMA_200 / EMA_50 / EMA_21 stack is aligned, else NONE (vectorized)."""
+    long_trend = (values['SMA_100'] > values['SMA_200']) & (values['EMA_50'] > values['SMA_100']) & (values['EMA_21'] > values['EMA_50'])
+    short_trend = (values['SMA_100'] < values['SMA_200']) & (values['EMA_50'] < values['SMA_100']) & (values['EMA_21'] < values['EMA_50'])
+    return np.select([no_data, long_trend, short_trend], ['NO_DATA', 'LONG', 'SHORT'], 'NONE')
+
+def screen(tickers, skip=(), now=None, warmup_per_scan=WARMUP_PER_SCAN, interval=INTERVAL):
+    """
+    Returns (candidates, stage1) where candidates are the tickers worth a live fetch:
+    aligned trend on cached data, plus a limited number of cold or stale symbols (least recently
+    cached first) so the cache warms up and keeps up.
+    """
+    if not tickers:
+        return [], pd.DataFrame()
+    # Stage 1 still covers the skipped tickers so the scan snapshot has every symbol
+    stage1 = trend_stage(tickers, now, interval)
+    open_rows = stage1[~stage1.index.isin(list(skip))]
+    aligned = open_rows.index[open_rows['State'].isin(['LONG', 'SHORT'])].tolist()
+    # A stale NONE may have turned since its last fetch: it is re-warmed like an uncached symbol
+    cold = open_rows[(open_rows['State'] == 'NO_DATA') | ((open_rows['State'] == 'NONE') & open_rows['Stale'])]
+    cold = cold.sort_values('Last Bar', kind='stable').index.tolist()[:warmup_per_scan]
+    return aligned + cold, stage1
+
+# --- SCAN SNAPSHOT ---
+def build_snapshot(stage1, live=None, positions=None):
+    """
+    Per-symbol table of the latest trend stack, state and distance to the EMA_10 / EMA_21 trigger.
+    Rows come from stage 1; symbols fetched live this scan (`live`: ticker -> latest bar values)
+    override the cached values they carry. `positions` maps tickers to 'LONG' / 'SHORT' for open trades.
+    """
+    rows = stage1[TREND_COLUMNS + ['Bars']].copy() if len(stage1) else pd.DataFrame(columns=TREND_COLUMNS + ['Bars'])
+    rows['Source'] = 'cache'
+    if live:
+        # A live bar may carry only some of the columns (indicators are computed on demand)
+        fresh = pd.DataFrame({t: {c: float(bar[c]) for c in TREND_COLUMNS if c in bar} for t, bar in live.items()}).T
+        rows = rows.reindex(rows.index.union(fresh.index))
+        for col in fresh.columns:
+            known = fresh[col].notna()
+            rows.loc[fresh.index[known], col] = fresh.loc[known, col].values
+        rows.loc[fresh.index, 'Source'] = 'live'
+
+    # SMA_200 is only defined once a symbol has MIN_BARS bars, cached or live
+    rows['State'] = trend_state(rows, rows['SMA_200'].isna())
+    # Signed % gap the fast pair has to close for a crossover: > 0 means EMA_10 is above EMA_21.
+    # Longs trigger as it turns positive, shorts as it turns negative.
+    rows['Trigger Gap %'] = ((rows['EMA_10'] - rows['EMA_21']) / rows['Close'] * 100).round(3)
+    rows['Trend Spread %'] = ((rows['EMA_21'] - rows['SMA_200']) / rows['Close'] * 100).round(3)
+    rows['Position'] = pd.Series(positions or {}, dtype=object).reindex(rows.index).fillna('')
+    rows[TREND_COLUMNS] = rows[TREND_COLUMNS].astype(float).round(2)
+    return rows
+
+def save_snapshot(snapshot, path=SNAPSHOT_FILE, scanned_at=None):
+    """Atomically writes the snapshot as JSON: {'scanned_at': ..., 'symbols': {ticker: {...}}}."""
+    payload = {
+        "scanned_at": (scanned_at or datetime.now()).strftime('%Y-%m-%d %H:%M:%S'),
+        "symbols": json.loads(snapshot.astype(object).where(snapshot.notna(), None).to_json(orient='index'))
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f: json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+def load_snapshot(path=SNAPSHOT_FILE):
+    """(scanned_at, DataFrame indexed by ticker) or (None, empty DataFrame)."""
+    if not os.path.exists(path):
+        return None, pd.DataFrame()
+    try:
+        with open(path, 'r') as f: payload = json.load(f)
+    except (OSError, ValueError):
+        return None, pd.DataFrame()
+    return payload.get("scanned_at"), pd.DataFrame.from_dict(payload.get("symbols", {}), orient='index')
@@ -0,0 +1,196 @@
+import json
+import os
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import correlation
+import equity_curve
+import market_data
+import strategies
+import trade_archive
+
+# --- SHADOW PORTFOLIOS ---
+# Parameter variants of a bot traded on paper off the live scan. Every variant reads the
+# indicator graphs the scan already fetched (indicators are shared DAG nodes, so an EMA that
+# several variants use is computed once per symbol) and keeps its own ledger, equity curve
+# and trade-archive partition. A variant adds decisions to a scan, never candle fetches.
+#   config.json -> "shadow_portfolios": {"<name>": {"risk_per_trade_percent": 0.5,
+#                                                  "strategies": [{"name": "ema_trend", "fast": 8}]}}
+SHADOW_DIR = "shadow_portfolios"
+SETTING_KEYS = ("capital", "risk_per_trade_percent", "brokerage_percent")
+
+class Variant:
+    """One shadow configuration: its strategies and sizing. `series` names its equity curve and archive partition."""
+
+    def __init__(self, engine, name, strategy_list, capital, risk_per_trade, brokerage):
+        self.engine = engine
+        self.name = name
+        self.strategies = list(strategy_list)
+        self.capital = capital
+        self.risk_per_trade = risk_per_trade
+        self.brokerage = brokerage
+        self.series = series_name(engine, name)
+        self.path = os.path.join(SHADOW_DIR, f"{self.series}.json")
+
+def series_name(engine, name):
+    return f"{engine}_shadow_{name}"
+
+def from_config(engine, config, default_strategies):
+    """The configured variants; unset settings (and strategies) are the live bot's."""
+    settings = config['strategy_settings']
+    variants = []
+    for name, spec in config.get('shadow_portfolios', {}).items():
+        merged = {key: spec.get(key, settings[key]) for key in SETTING_KEYS}
+        variants.append(Variant(engine, name, strategies.load(spec.get('strategies', default_strategies)),
+                                merged['capital'], merged['risk_per_trade_percent'] / 100.0, merged['brokerage_percent'] / 100.0))
+    return variants
+
+# --- LEDGERS ---
+# Same document as the live portfolio.json, plus the capital it started from
+def load_book(variant):
+    if os.path.exists(variant.path):
+        try:
+            with open(variant.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {"capital": variant.capital, "initial_capital": variant.capital, "open_longs": {}, "open_shorts": {},
+            "closed_longs": [], "closed_shorts": [], "signals": []}
+
+def save_book(variant, book):
+    os.makedirs(SHADOW_DIR, exist_ok=True)
+    tmp_file = variant.path + ".tmp"
+    with open(tmp_file, 'w') as f: json.dump(book, f, indent=4)
+    os.replace(tmp_file, variant.path)
+
+def held(books):
+    """Every ticker open in any of the books."""
+    return set().union(*(set(b["open_longs"]) | set(b["open_shorts"]) for b in books)) if books else set()
+
+def _log(book, message):
+    book["signals"].insert(0, f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
+    del book["signals"][100:]
+
+# --- ONE SCAN ---
+def manage_exits(variant, book, graph_for, now=None):
+    """Trails stops and closes positions exactly as the live bot does. Returns [(side, trade)] closed."""
+    now = now or datetime.now().strftime('%Y-%m-%d %H:%M')
+    closed = []
+    for side, key in ((strategies.LONG, "open_longs"), (strategies.SHORT, "open_shorts")):
+        for ticker in list(book[key]):
+            graph = graph_for(ticker)
+            if graph is None: continue
+            pos = book[key][ticker]
+            strategy = strategies.resolve(pos['strategy'], variant.strategies)
+            graph.register(*strategy.indicators)
+            curr, prev = graph.bar(-1), graph.bar(-2)
+            new_sl, exit_price, reason = strategy.manage(side, pos, curr, prev)
+            pos['stop_loss'] = round(pos['stop_loss'] if new_sl is None else new_sl, 2)
+            pos['current_price'] = round(curr['Close'], 2)
+            if exit_price is None: continue
+
+            qty, entry_price = pos['qty'], pos['entry_price']
+            gross_pnl = (exit_price - entry_price) * qty if side == strategies.LONG else (entry_price - exit_price) * qty
+            brokerage = (entry_price * qty + exit_price * qty) * variant.brokerage
+            net_pnl = gross_pnl - brokerage
+            trade = {
+                "Ticker": ticker, "Entry Date": pos['entry_date'], "Exit Date": now,
+                "Entry Price": entry_price, "Exit Price": round(exit_price, 2), "Qty": qty,
+                "Stop Loss": pos['stop_loss'], "PnL": round(net_pnl, 2), "Status": "CLOSED", "Reason": reason,
+                "Strategy": strategy.name, "Risk": pos.get('risk_points')
+            }
+            book["closed_longs" if side == strategies.LONG else "closed_shorts"].append(trade)
+            book["capital"] += (exit_price * qty - brokerage) if side == strategies.LONG else (entry_price * qty + net_pnl)
+            del book[key][ticker]
+            closed.append((side, trade))
+            _log(book, f"❌ CLOSED {side}: {ticker} @ ₹{exit_price:.2f} | PnL: ₹{net_pnl:.2f} ({reason})")
+    return closed
+
+def try_entry(variant, book, ticker, graph, corr=None, corr_settings=None, now=None):
+    """Sizes and opens a position if one of the variant's strategies signals on this graph. Returns the side or None."""
+    for strategy in variant.strategies:
+        graph.register(*strategy.indicators)
+    strategy, side = strategies.entry_signal(variant.strategies, graph)
+    if side is None:
+        return None
+    curr = graph.bar(-1)
+    entry_price = curr['Close']
+    sl_price = strategy.stop_loss(side, curr)
+    if sl_price is None:
+        return None
+    if corr is not None:
+        positions = {t: strategies.LONG for t in book["open_longs"]} | {t: strategies.SHORT for t in book["open_shorts"]}
+        if len(correlation.correlated_positions(corr, ticker, side, positions, corr_settings['threshold'])) >= corr_settings['max_positions']:
+            return None
+
+    risk_points = entry_price - sl_price if side == strategies.LONG else sl_price - entry_price
+    if risk_points <= 0:
+        return None
+    qty = int((variant.capital * variant.risk_per_trade) // risk_points)
+    value = qty * entry_price
+    # Longs pay for the shares, shorts only the brokerage (as in the live book)
+    cost = value + value * variant.brokerage if side == strategies.LONG else value * variant.brokerage
+    if qty <= 0 or book["capital"] < value:
+        return None
+    book["capital"] -= cost
+    book["open_longs" if side == strategies.LONG else "open_shorts"][ticker] = {
+        "entry_date": now or datetime.now().strftime('%Y-%m-%d %H:%M'),
+        "entry_price": round(entry_price, 2), "qty": qty,
+        "risk_points": round(risk_points, 2), "stop_loss": round(sl_price, 2),
+        "current_price": round(entry_price, 2), "strategy": strategy.name
+    }
+    _log(book, f"✅ OPEN {side}: {ticker} | Entry: ₹{entry_price:.2f} | Qty: {qty} | SL: ₹{sl_price:.2f}")
+    return side
+
+def step(variant, book, candidates, graph_for, corr=None, corr_settings=None):
+    """One scan of one variant on the live scan's graphs. Returns the trades it closed."""
+    closed = manage_exits(variant, book, graph_for)
+    for ticker in candidates:
+        if ticker in book["open_longs"] or ticker in book["open_shorts"]: continue
+        graph = graph_for(ticker)
+        if graph is not None:
+            try_entry(variant, book, ticker, graph, corr, corr_settings)
+    return closed
+
+def finish(variant, book, prices, closed):
+    """Marks the book at the scan's batched LTPs, saves it, archives its closes and records an equity mark."""
+    market_data.mark_positions(book, prices)
+    save_book(variant, book)
+    for side, trade in closed:
+        trade_archive.archive_trade(variant.series, trade.get('Strategy', ''), side, trade)
+    equity_curve.append_mark(variant.series, equity_curve.portfolio_equity(book, variant.capital))
+
+# --- COMPARISON ---
+def list_books(engine):
+    """Names of the shadow ledgers on disk for an engine."""
+    prefix = series_name(engine, "")
+    if not os.path.isdir(SHADOW_DIR):
+        return []
+    return sorted(f[len(prefix):-5] for f in os.listdir(SHADOW_DIR) if f.startswith(prefix) and f.endswith(".json"))
+
+def metrics(data, initial_capital, series):
+    """Headline numbers of one ledger, for side-by-side comparison."""
+    closed = data.get("closed_longs", []) + data.get("closed_shorts", [])
+    pnl = np.array([t['PnL'] for t in closed], dtype=float)
+    equity = equity_curve.portfolio_equity(data, initial_capital)
+    curve = equity_curve.load_series(series)
+    wins, losses = pnl[pnl > 0].sum(), -pnl[pnl < 0].sum()
+    return {
+        "Equity": round(equity, 2), "Return %": round((equity / initial_capital - 1) * 100, 2) if initial_capital else np.nan,
+        "Realized P&L": round(pnl.sum(), 2), "Trades": len(pnl),
+        "Win %": round((pnl > 0).mean() * 100, 1) if len(pnl) else np.nan,
+        "Profit Factor": round(wins / losses, 2) if losses > 0 else np.nan,
+        "Max DD %": round(float(curve['drawdown'].max()), 2) if len(curve) else np.nan,
+        "Open": len(data.get("open_longs", {})) + len(data.get("open_shorts", {})),
+    }
+
+def comparison(engine, live_data=None, live_capital=None):
+    """One row per shadow ledger (plus the live book, if given), indexed by variant name."""
+    rows = {}
+    if live_data is not None:
+        rows["live"] = metrics(live_data, live_capital or live_data.get("capital", 0), engine)
+    for name in list_books(engine):
+        with open(os.path.join(SHADOW_DIR, f"{series_name(engine, name)}.json"), 'r') as f:
+            book = json.load(f)
+        rows[name] = metrics(book, book.get("initial_capital", book["capital"]), series_name(engine, name))
+    return pd.DataFrame.from_dict(rows, orient='index')
@@ -0,0 +1,385 @@
+import json
+import numpy as np
+import pandas as pd
+
+# --- STRATEGY PLUG-INS ---
+# A strategy declares the indicators it reads and its entry / exit rules; the bots keep
+# fetching, sizing, capital and order handling. Indicators are nodes of a DAG keyed by name,
+# so EMA_21 or an RMA(14) shared by several strategies is computed once per symbol, and only
+# when a rule actually reads it. Entry rules run cheapest-first and stop at the first failure,
+# so a rare trigger (a crossover) spares the slow trend filter on most symbols.
+LONG, SHORT = "LONG", "SHORT"
+
+class Indicator:
+    """
+    One DAG node: a named column computed from raw columns (str) or other indicators. `spec`
+    describes what fn does with its inputs, e.g. ("ema", 21), so two strategies building the
+    same node are recognised as one; a node without a spec only matches itself.
+    """
+
+    def __init__(self, name, inputs, fn, cost=1, spec=None):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.fn = fn
+        self.cost = cost
+        self.spec = spec
+
+    def same_as(self, other):
+        """True if both nodes compute the same column from the same inputs."""
+        if other is self:
+            return True
+        return (self.spec is not None and (self.name, self.spec) == (other.name, other.spec)
+                and [_name(i) for i in self.inputs] == [_name(i) for i in other.inputs])
+
+    def __repr__(self):
+        return f"Indicator({self.name})"
+
+def _name(src):
+    return src if isinstance(src, str) else src.name
+
+def sma(n, src="Close", name=None):
+    return Indicator(name or (f"SMA_{n}" if src == "Close" else f"{_name(src)}_SMA{n}"), (src,),
+                     lambda s: s.rolling(window=n).mean(), cost=2, spec=("sma", n))
+
+def ema(n, src="Close", name=None):
+    return Indicator(name or (f"EMA_{n}" if src == "Close" else f"{_name(src)}_EMA{n}"), (src,),
+                     lambda s: s.ewm(span=n, adjust=False).mean(), spec=("ema", n))
+
+def rma(n, src, name=None):
+    """Wilder's moving average; ewm(alpha=1/n) matches TradingView's ta.rma()."""
+    return Indicator(name or f"{_name(src)}_RMA{n}", (src,), lambda s: s.ewm(alpha=1/n, adjust=False).mean(), spec=("rma", n))
+
+def diff(src="Close"):
+    return Indicator(f"{_name(src)}_diff", (src,), lambda s: s.diff(), spec=("diff",))
+
+def rsi(n=14, src="Close", name=None):
+    delta = diff(src)
+    up = Indicator(f"{_name(src)}_up", (delta,), lambda d: d.clip(lower=0), spec=("gain",))
+    down = Indicator(f"{_name(src)}_down", (delta,), lambda d: -1 * d.clip(upper=0), spec=("loss",))
+    return Indicator(name or f"RSI_{n}", (rma(n, up), rma(n, down)), lambda u, d: 100 - (100 / (1 + u / d)), spec=("rsi",))
+
+def dmi(src, n=14, prefix=""):
+    """
+    +DI / -DI of a single series (High = Low = Close = src): +DM is the rise, -DM the fall,
+    the true range the absolute change, all smoothed with RMA(n). Returns (plusDI, minusDI).
+    """
+    move = diff(src)
+    plus_dm = Indicator(f"{prefix}plusDM", (move,), lambda m: pd.Series(np.where(m > 0, m, 0), index=m.index), spec=("plus_dm",))
+    minus_dm = Indicator(f"{prefix}minusDM", (move,), lambda m: pd.Series(np.where(m < 0, -m, 0), index=m.index), spec=("minus_dm",))
+    true_range = Indicator(f"{prefix}TR", (move,), lambda m: m.abs(), spec=("abs",))
+    smoothed_tr = rma(n, true_range)
+    plus_di = Indicator(f"{prefix}plusDI", (rma(n, plus_dm), smoothed_tr), lambda dm, tr: 100 * dm / tr, spec=("di",))
+    minus_di = Indicator(f"{prefix}minusDI", (rma(n, minus_dm), smoothed_tr), lambda dm, tr: 100 * dm / tr, spec=("di",))
+    return plus_di, minus_di
+
+def t3(length=8, v_factor=0.7, name="T3"):
+    """Tillson T3: six chained EMAs (each one a shared node) combined with the volume factor."""
+    a = v_factor
+    c1 = -a**3
+    c2 = 3*a**2 + 3*a**3
+    c3 = -6*a**2 - 3*a - 3*a**3
+    c4 = 1 + 3*a + a**3 + 3*a**2
+    chain, src = [], "Close"
+    for _ in range(6):
+        src = ema(length, src)
+        chain.append(src)
+    e3, e4, e5, e6 = chain[2:]
+    return Indicator(name, (e3, e4, e5, e6), lambda e3, e4, e5, e6: c1*e6 + c2*e5 + c3*e4 + c4*e3, cost=6, spec=("t3", v_factor))
+
+class IndicatorGraph:
+    """
+    The indicator DAG of one symbol's dataset. Any number of strategies register their nodes;
+    a node (and its inputs) is computed the first time someone reads it, then cached as a column.
+    """
+
+    def __init__(self, df, strategies=()):
+        self.df = df.copy()
+        self.nodes = {}
+        for strategy in strategies:
+            self.register(*strategy.indicators)
+
+    def register(self, *nodes):
+        """Adds nodes and their inputs. A name already taken by a different definition raises ValueError."""
+        for node in nodes:
+            if isinstance(node, str):
+                continue
+            known = self.nodes.get(node.name)
+            if known is node:
+                continue
+            if known is None:
+                self.nodes[node.name] = node
+            elif not known.same_as(node):
+                raise ValueError(f"Indicator '{node.name}' is already defined as {known.spec} from "
+                                 f"{[_name(i) for i in known.inputs]}, not {node.spec} from {[_name(i) for i in node.inputs]}")
+            self.register(*node.inputs)
+
+    def __len__(self):
+        return len(self.df)
+
+    def is_ready(self, name):
+        return name in self.df.columns
+
+    def require(self, *names):
+        for name in names:
+            if self.is_ready(name):
+                continue
+            node = self.nodes.get(name)
+            if node is None:
+                raise KeyError(f"Unknown indicator or column '{name}'")
+            self.require(*(_name(i) for i in node.inputs))
+            self.df[name] = node.fn(*(self.df[_name(i)] for i in node.inputs))
+
+    def pending_cost(self, names):
+        """Work left before `names` can be read: cost of every node not computed yet (shared inputs once)."""
+        seen, total, stack = set(), 0, list(names)
+        while stack:
+            name = stack.pop()
+            if name in seen or self.is_ready(name):
+                continue
+            seen.add(name)
+            node = self.nodes[name]
+            total += node.cost
+            stack.extend(_name(i) for i in node.inputs)
+        return total
+
+    def value(self, name, pos):
+        self.require(name)
+        return self.df[name].iat[pos]
+
+    def bar(self, pos=-1):
+        return Bar(self, pos)
+
+    def values(self, pos=-1, names=None):
+        """Already computed columns of one bar as a dict (nothing new is computed)."""
+        row = self.df.iloc[pos]
+        return {k: row[k] for k in (names or self.df.columns) if k in row.index}
+
+class Bar:
+    """One bar of an IndicatorGraph; reading an indicator computes it on first use."""
+
+    def __init__(self, graph, pos):
+        self.graph = graph
+        self.pos = pos
+
+    def __getitem__(self, name):
+        return self.graph.value(name, self.pos)
+
+class Rule:
+    """A named entry condition over the current and previous bar, with the indicators it reads."""
+
+    def __init__(self, name, needs, test):
+        self.name = name
+        self.needs = tuple(needs)
+        self.test = test
+
+def passes(graph, rules):
+    """True if every rule passes; the cheapest pending rule runs first and a failure stops the rest."""
+    remaining = list(rules)
+    curr, prev = graph.bar(-1), graph.bar(-2)
+    while remaining:
+        rule = min(remaining, key=lambda r: graph.pending_cost(r.needs))
+        remaining.remove(rule)
+        if not rule.test(curr, prev):
+            return False
+    return True
+
+class Strategy:
+    """
+    Base plug-in. Subclasses set `name`, `indicators`, `long_entry` / `short_entry` rules and
+    implement `stop_loss` (initial stop or None) and `manage` (trailing stop + exit decision).
+    Tunable ones take their parameters as keyword arguments (see `variant`).
+    """
+    name = ""
+    indicators = ()
+    long_entry = ()
+    short_entry = ()
+    min_bars = 2
+
+    def entry(self, graph):
+        """LONG / SHORT if the entry rules of that side pass on the last bar, else None."""
+        if len(graph) < self.min_bars:
+            return None
+        if self.long_entry and passes(graph, self.long_entry):
+            return LONG
+        if self.short_entry and passes(graph, self.short_entry):
+            return SHORT
+        return None
+
+    def stop_loss(self, side, curr):
+        return None
+
+    def manage(self, side, pos, curr, prev):
+        """Returns (stop_loss, exit_price, reason); exit_price is None while the position stays open."""
+        return pos.get('stop_loss'), None, None
+
+def crossed_above(fast, slow):
+    return lambda c, p: (c[fast] > c[slow]) and (p[fast] <= p[slow])
+
+def crossed_below(fast, slow):
+    return lambda c, p: (c[fast] < c[slow]) and (p[fast] >= p[slow])
+
+# --- STRATEGIES ---
+class EmaTrend(Strategy):
+    """
+    Trend stack SMA_100 / SMA_200 / EMA_50 / EMA_21 aligned, entry on the EMA_10 / EMA_21 cross,
+    stop just beyond EMA_21, trailed to breakeven at 1R and +1R at 2R, exit on the EMA_5 / EMA_10 cross.
+    fast / slow / exit_fast / exit_slow / stop_buffer replace 10 / 21 / 5 / 10 / 0.1%.
+    """
+    name = "ema_trend"
+    min_bars = 200
+
+    def __init__(self, fast=10, slow=21, exit_fast=5, exit_slow=10, stop_buffer=0.001, name=None):
+        self.name = name or self.name
+        self.fast, self.slow = f"EMA_{fast}", f"EMA_{slow}"
+        self.exit_fast, self.exit_slow = f"EMA_{exit_fast}", f"EMA_{exit_slow}"
+        self.stop_buffer = stop_buffer
+        self.indicators = (sma(100), sma(200), ema(50)) + tuple(ema(n) for n in dict.fromkeys((slow, fast, exit_fast, exit_slow)))
+        f, s = self.fast, self.slow
+        self.long_entry = (
+            Rule(f"ema{f[4:]}_cross_up", (f, s), crossed_above(f, s)),
+            Rule("trend_up", ("SMA_100", "SMA_200", "EMA_50", s),
+                 lambda c, p: (c['SMA_100'] > c['SMA_200']) and (c['EMA_50'] > c['SMA_100']) and (c[s] > c['EMA_50'])),
+        )
+        self.short_entry = (
+            Rule(f"ema{f[4:]}_cross_down", (f, s), crossed_below(f, s)),
+            Rule("trend_down", ("SMA_100", "SMA_200", "EMA_50", s),
+                 lambda c, p: (c['SMA_100'] < c['SMA_200']) and (c['EMA_50'] < c['SMA_100']) and (c[s] < c['EMA_50'])),
+        )
+
+    def stop_loss(self, side, curr):
+        return curr[self.slow] * (1 - self.stop_buffer if side == LONG else 1 + self.stop_buffer)
+
+    def manage(self, side, pos, curr, prev):
+        entry_price, initial_risk, current_sl = pos['entry_price'], pos['risk_points'], pos['stop_loss']
+        if side == LONG:
+            r_multiple = (curr['High'] - entry_price) / initial_risk if initial_risk > 0 else 0
+            new_sl = max(current_sl, entry_price + initial_risk) if r_multiple >= 2.0 else max(current_sl, entry_price) if r_multiple >= 1.0 else current_sl
+            if curr['Low'] <= new_sl:
+                return new_sl, new_sl, "Stop Loss Hit"
+            if crossed_below(self.exit_fast, self.exit_slow)(curr, prev):
+                return new_sl, curr['Close'], f"EMA {self.exit_fast[4:]} < {self.exit_slow[4:]}"
+        else:
+            r_multiple = (entry_price - curr['Low']) / initial_risk if initial_risk > 0 else 0
+            new_sl = min(current_sl, entry_price - initial_risk) if r_multiple >= 2.0 else min(current_sl, entry_price) if r_multiple >= 1.0 else current_sl
+            if curr['High'] >= new_sl:
+                return new_sl, new_sl, "Stop Loss Hit"
+            if crossed_above(self.exit_fast, self.exit_slow)(curr, prev):
+                return new_sl, curr['Close'], f"EMA {self.exit_fast[4:]} > {self.exit_slow[4:]}"
+        return new_sl, None, None
+
+_RSI = rsi(14, name="RSI")
+_PLUS_DI, _MINUS_DI = dmi(_RSI)
+
+class RsiDmi(Strategy):
+    """DMI computed on RSI(14), both DIs smoothed with EMA(5): enter when they diverge, exit when ours turns down."""
+    name = "rsi_dmi"
+    indicators = (ema(5, _PLUS_DI, name="plusDI_EMA5"), ema(5, _MINUS_DI, name="minusDI_EMA5"))
+    long_entry = (
+        Rule("plus_di_rising", ("plusDI_EMA5",), lambda c, p: c['plusDI_EMA5'] > p['plusDI_EMA5']),
+        Rule("minus_di_falling", ("minusDI_EMA5",), lambda c, p: c['minusDI_EMA5'] < p['minusDI_EMA5']),
+    )
+    short_entry = (
+        Rule("minus_di_rising", ("minusDI_EMA5",), lambda c, p: c['minusDI_EMA5'] > p['minusDI_EMA5']),
+        Rule("plus_di_falling", ("plusDI_EMA5",), lambda c, p: c['plusDI_EMA5'] < p['plusDI_EMA5']),
+    )
+
+    def manage(self, side, pos, curr, prev):
+        if side == LONG and curr['plusDI_EMA5'] < prev['plusDI_EMA5']:
+            return None, curr['Close'], "+DI Decreased"
+        if side == SHORT and curr['minusDI_EMA5'] < prev['minusDI_EMA5']:
+            return None, curr['Close'], "-DI Decreased"
+        return None, None, None
+
+class T3Reversal(Strategy):
+    """Always in the market on the side of the close vs. Tillson T3(8, 0.7), with a fixed % hard stop."""
+    name = "t3_reversal"
+
+    def __init__(self, length=8, v_factor=0.7, hard_stop_pct=0.02, name=None):
+        self.name = name or self.name
+        self.hard_stop_pct = hard_stop_pct
+        # Non-default T3s get their own column, so variants can share one graph
+        t3_name = "T3" if (length, v_factor) == (8, 0.7) else f"T3_{length}_{v_factor}"
+        self.indicators = (t3(length, v_factor, name=t3_name),)
+        self.long_entry = (Rule("close_above_t3", (t3_name,), lambda c, p: c['Close'] > c[t3_name]),)
+        self.short_entry = (Rule("close_below_t3", (t3_name,), lambda c, p: c['Close'] < c[t3_name]),)
+        self.t3 = t3_name
+
+    def stop_loss(self, side, curr):
+        return curr['Close'] * (1 - self.hard_stop_pct if side == LONG else 1 + self.hard_stop_pct)
+
+    def manage(self, side, pos, curr, prev):
+        hard_sl = pos['entry_price'] * (1 - self.hard_stop_pct if side == LONG else 1 + self.hard_stop_pct)
+        if (curr['Low'] <= hard_sl) if side == LONG else (curr['High'] >= hard_sl):
+            return hard_sl, hard_sl, f"{self.hard_stop_pct:.0%} SL Hit"
+        if (curr['Close'] < curr[self.t3]) if side == LONG else (curr['Close'] > curr[self.t3]):
+            return hard_sl, curr['Close'], "T3 Cross Down" if side == LONG else "T3 Cross Up"
+        return hard_sl, None, None
+
+STRATEGIES = {s.name: s for s in (EmaTrend(), RsiDmi(), T3Reversal())}
+
+def variant(spec):
+    """
+    A strategy from a name or {"name": ..., <parameter>: value}. With parameters it gets its
+    own name, e.g. 'ema_trend(fast=8)', which is what positions it opens record.
+    """
+    if isinstance(spec, str):
+        spec = {"name": spec}
+    params = {k: v for k, v in spec.items() if k != "name"}
+    base = STRATEGIES.get(spec.get("name"))
+    if base is None:
+        raise ValueError(f"Unknown strategies: {spec.get('name')}")
+    if not params:
+        return base
+    label = f"{base.name}({', '.join(f'{k}={v}' for k, v in sorted(params.items()))})"
+    try:
+        return type(base)(name=label, **params)
+    except TypeError as e:
+        raise ValueError(f"Bad parameters for {base.name}: {e}")
+
+def load(names):
+    """Strategy objects for a list of names or {"name", parameters} specs (e.g. config['strategies'])."""
+    unknown = [n for n in names if isinstance(n, str) and n not in STRATEGIES]
+    if unknown:
+        raise ValueError(f"Unknown strategies: {', '.join(unknown)}")
+    return [variant(n) for n in names]
+
+def parse_label(label):
+    """The {"name", parameters} spec a variant's name was built from: 'ema_trend(fast=8)' -> {"name": "ema_trend", "fast": 8}."""
+    base, _, args = label.partition("(")
+    spec = {"name": base}
+    for pair in filter(None, args.rstrip(")").split(", ")):
+        key, _, value = pair.partition("=")
+        try:
+            spec[key] = json.loads(value)
+        except ValueError:
+            spec[key] = value
+    return spec
+
+_REBUILT = {}
+
+def resolve(name, loaded=()):
+    """
+    The strategy that opened a position: one of `loaded` by name, else rebuilt from the parameters
+    in its name, so a variant dropped from the config still manages its positions with its own exits.
+    """
+    for strategy in loaded:
+        if strategy.name == name:
+            return strategy
+    if name in STRATEGIES:
+        return STRATEGIES[name]
+    if name not in _REBUILT:
+        try:
+            _REBUILT[name] = variant(parse_label(name))
+            print(f"⚠️ Strategy {name} is no longer configured: rebuilt from its name to manage its open positions")
+        except ValueError as e:
+            _REBUILT[name] = STRATEGIES[name.split("(")[0]]
+            print(f"🚨 Strategy {name} cannot be rebuilt ({e}): its positions are managed with the default {_REBUILT[name].name} exits")
+    return _REBUILT[name]
+
+def entry_signal(strategies, graph):
+    """(strategy, side) of the first strategy whose entry passes on this dataset, else (None, None)."""
+    for strategy in strategies:
+        side = strategy.entry(graph)
+        if side:
+            return strategy, side
+    return None, None
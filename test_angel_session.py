@@ -0,0 +1,106 @@
+import base64
+import json
+import os
+import angel_session
+
+CREDS = {"api_key": "key", "client_id": "C123", "pin": "0000", "totp_secret": "JBSWY3DPEHPK3PXP"}
+
+def make_jwt(exp):
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode().rstrip('=')
+    return f"header.{payload}.signature"
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+    def __call__(self):
+        return self.now
+
+class FakeSmartConnect:
+    """Local stand-in for SmartConnect: counts logins/refreshes and issues JWTs valid for 1 hour."""
+    def __init__(self, clock, refresh_ok=True):
+        self.clock = clock
+        self.refresh_ok = refresh_ok
+        self.logins = 0
+        self.refreshes = 0
+        self.access_token = None
+    def _tokens(self, n):
+        return {"jwtToken": "Bearer " + make_jwt(int(self.clock()) + 3600),
+                "refreshToken": f"refresh-{n}", "feedToken": f"feed-{n}"}
+    def generateSession(self, client_id, pin, totp):
+        self.logins += 1
+        return {"status": True, "data": self._tokens(self.logins)}
+    def generateToken(self, refresh_token):
+        self.refreshes += 1
+        if not self.refresh_ok:
+            return {"status": False, "errorcode": "AG8002", "data": None}
+        return {"status": True, "data": self._tokens(100 + self.refreshes)}
+    def setAccessToken(self, token): self.access_token = token
+    def setRefreshToken(self, token): self.refresh_token = token
+    def setFeedToken(self, token): self.feed_token = token
+    def setUserId(self, user_id): self.user_id = user_id
+
+def make_manager(tmp_path, clock, fake):
+    return angel_session.SessionManager(CREDS, session_file=str(tmp_path / "session.json"),
+                                        connect_factory=lambda key: fake, clock=clock)
+
+def test_first_run_logs_in_and_persists_privately(tmp_path):
+    clock = FakeClock(1_000_000)
+    fake = FakeSmartConnect(clock)
+    make_manager(tmp_path, clock, fake).get()
+    assert fake.logins == 1
+    assert not fake.access_token.startswith("Bearer ")
+    assert os.stat(tmp_path / "session.json").st_mode & 0o777 == 0o600
+
+def test_next_run_reuses_saved_session(tmp_path):
+    clock = FakeClock(1_000_000)
+    make_manager(tmp_path, clock, FakeSmartConnect(clock)).get()
+
+    clock.now += 600  # next hourly run, token still has 50 minutes left
+    fake = FakeSmartConnect(clock)
+    make_manager(tmp_path, clock, fake).get()
+    assert fake.logins == 0 and fake.refreshes == 0
+    assert fake.feed_token == "feed-1"
+
+def test_refreshes_before_expiry(tmp_path):
+    clock = FakeClock(1_000_000)
+    fake = FakeSmartConnect(clock)
+    manager = make_manager(tmp_path, clock, fake)
+    manager.get()
+
+    clock.now += 3600 - 60  # inside the refresh margin
+    manager.get()
+    assert fake.logins == 1 and fake.refreshes == 1
+    assert manager.tokens["refresh_token"] == "refresh-101"
+    assert manager.tokens["expires_at"] == int(clock.now) + 3600
+
+def test_expired_saved_session_is_refreshed_not_relogged(tmp_path):
+    clock = FakeClock(1_000_000)
+    make_manager(tmp_path, clock, FakeSmartConnect(clock)).get()
+
+    clock.now += 5 * 3600
+    fake = FakeSmartConnect(clock)
+    make_manager(tmp_path, clock, fake).get()
+    assert fake.refreshes == 1 and fake.logins == 0
+
+def test_rejected_refresh_falls_back_to_login(tmp_path):
+    clock = FakeClock(1_000_000)
+    make_manager(tmp_path, clock, FakeSmartConnect(clock)).get()
+
+    clock.now += 5 * 3600
+    fake = FakeSmartConnect(clock, refresh_ok=False)
+    make_manager(tmp_path, clock, fake).get()
+    assert fake.refreshes == 1 and fake.logins == 1
+
+def test_session_of_other_account_is_ignored(tmp_path):
+    clock = FakeClock(1_000_000)
+    make_manager(tmp_path, clock, FakeSmartConnect(clock)).get()
+
+    fake = FakeSmartConnect(clock)
+    other = dict(CREDS, client_id="OTHER")
+    angel_session.SessionManager(other, session_file=str(tmp_path / "session.json"),
+                                 connect_factory=lambda key: fake, clock=clock).get()
+    assert fake.logins == 1
+
+def test_token_error_detection():
+    assert angel_session.is_token_error({"status": False, "errorcode": "AG8001"})
+    assert not angel_session.is_token_error({"status": True, "data": []})
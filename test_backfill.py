@@ -0,0 +1,135 @@
+from datetime import date
+import pandas as pd
+import pytest
+import backfill
+import candle_store
+import trading_calendar
+
+HOLIDAYS = ["2026-03-04"]
+CALENDAR = trading_calendar.TradingCalendar(HOLIDAYS)
+INST = {"exchange": "NSE", "symbol": "TEST", "token": "1"}
+
+def hourly(first, last):
+    """The seven NSE hourly candles of every weekday from first to last, in SmartAPI's row format."""
+    rows = []
+    for day in pd.bdate_range(first, last):
+        for hour in range(7):
+            ts = day + pd.Timedelta(hours=9, minutes=15) + pd.Timedelta(hours=hour)
+            rows.append([ts.strftime("%Y-%m-%dT%H:%M:%S+05:30"), 100.0, 101.0, 99.0, 100.5, 1000])
+    return rows
+
+class FakeApi:
+    def __init__(self, listed_from=None, fail=0):
+        self.calls = []
+        self.listed_from = listed_from
+        self.fail = fail
+
+    def getCandleData(self, params):
+        self.calls.append((params['fromdate'], params['todate']))
+        if self.fail:
+            self.fail -= 1
+            return {"status": False, "message": "Access denied because of exceeding access rate", "data": None}
+        first, last = params['fromdate'][:10], params['todate'][:10]
+        if self.listed_from:
+            first = max(first, self.listed_from)
+        rows = [r for r in hourly(first, last) if r[0][:10] not in HOLIDAYS] if first <= last else []
+        return {"status": True, "data": rows}
+
+class NoWait:
+    def wait(self):
+        pass
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(candle_store, "CANDLE_DIR", str(tmp_path))
+    monkeypatch.setattr(backfill, "RETRY_DELAY_SECONDS", 0)
+
+def run(api, start, end, **kwargs):
+    return backfill.backfill(api, [INST], "ONE_HOUR", start, end, calendar=CALENDAR, limiter=NoWait(), **kwargs)
+
+def test_only_missing_days_are_requested(store):
+    # Stored: 2 Mar and 9-10 Mar; 4 Mar is a holiday, 3 Mar and 5-6 Mar are holes, 10 Mar is short
+    candle_store.save_candles("NSE", "TEST", "ONE_HOUR", pd.DataFrame(hourly("2026-03-02", "2026-03-02") + hourly("2026-03-09", "2026-03-09")
+                                                                      + hourly("2026-03-10", "2026-03-10")[:3],
+                                                                      columns=['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume']))
+    api = FakeApi()
+    summary = run(api, date(2026, 3, 2), date(2026, 3, 10))
+    # The holiday does not split 3 Mar .. 6 Mar into two requests
+    assert api.calls == [("2026-03-03 00:00", "2026-03-06 23:59"), ("2026-03-10 00:00", "2026-03-10 23:59")]
+    assert summary == {"requests": 2, "bars": 28, "failed": 0}
+    assert len(candle_store.load_candles("NSE", "TEST", "ONE_HOUR")) == 6 * 7
+
+    # Nothing left to fetch on a rerun
+    rerun = FakeApi()
+    run(rerun, date(2026, 3, 2), date(2026, 3, 10))
+    assert rerun.calls == []
+
+def test_requests_respect_the_api_range_limit(store, monkeypatch):
+    monkeypatch.setitem(backfill.MAX_DAYS_PER_REQUEST, "ONE_HOUR", 10)
+    api = FakeApi()
+    run(api, date(2026, 1, 1), date(2026, 2, 27), derive=["ONE_DAY"])
+    spans = [(pd.Timestamp(b[:10]) - pd.Timestamp(a[:10])).days + 1 for a, b in api.calls]
+    assert len(api.calls) == 6 and max(spans) <= 10
+    daily = candle_store.load_candles("NSE", "TEST", "ONE_DAY")
+    assert len(daily) == len(CALENDAR.trading_days("NSE", date(2026, 1, 1), date(2026, 2, 27)))
+
+def test_days_without_data_are_not_asked_for_again(store):
+    # Listed on 5 Mar: the two days before come back empty, and are asked for again a few runs
+    asked = [("2026-03-02 00:00", "2026-03-06 23:59")] + [("2026-03-02 00:00", "2026-03-03 23:59")] * (backfill.SHORT_DAY_ATTEMPTS - 1)
+    for attempt, request in enumerate(asked, start=1):
+        api = FakeApi(listed_from="2026-03-05")
+        run(api, date(2026, 3, 2), date(2026, 3, 6))
+        assert api.calls == [request]
+        assert backfill.load_state()["NSE:TEST:ONE_HOUR"] == {"2026-03-02": attempt, "2026-03-03": attempt}
+    rerun = FakeApi()
+    run(rerun, date(2026, 3, 2), date(2026, 3, 9))
+    assert rerun.calls == [("2026-03-09 00:00", "2026-03-09 23:59")]
+
+class ShortDayApi(FakeApi):
+    """Serves only the first `bars` candles of `day`, as SmartAPI does while a day is still being published."""
+
+    def __init__(self, day, bars):
+        super().__init__()
+        self.day, self.bars = day, bars
+
+    def getCandleData(self, params):
+        res = super().getCandleData(params)
+        day_rows = [r for r in res["data"] if r[0][:10] == self.day]
+        res["data"] = [r for r in res["data"] if r[0][:10] != self.day] + day_rows[:self.bars]
+        return res
+
+def test_a_day_that_came_back_short_is_asked_for_again(store):
+    run(ShortDayApi("2026-03-03", 3), date(2026, 3, 2), date(2026, 3, 3))
+    assert backfill.load_state()["NSE:TEST:ONE_HOUR"] == {"2026-03-03": 1}
+    assert len(candle_store.load_candles("NSE", "TEST", "ONE_HOUR")) == 7 + 3
+    # The next run asks for it again, and once it is complete it leaves the state
+    api = FakeApi()
+    run(api, date(2026, 3, 2), date(2026, 3, 3))
+    assert api.calls == [("2026-03-03 00:00", "2026-03-03 23:59")]
+    assert backfill.load_state()["NSE:TEST:ONE_HOUR"] == {}
+    assert len(candle_store.load_candles("NSE", "TEST", "ONE_HOUR")) == 14
+
+def test_days_given_up_by_an_older_state_file_stay_skipped(store):
+    backfill.save_state({"NSE:TEST:ONE_HOUR": ["2026-03-02"]})
+    api = FakeApi()
+    run(api, date(2026, 3, 2), date(2026, 3, 3))
+    assert api.calls == [("2026-03-03 00:00", "2026-03-03 23:59")]
+    assert backfill.load_state()["NSE:TEST:ONE_HOUR"] == {"2026-03-02": backfill.SHORT_DAY_ATTEMPTS}
+
+def test_failed_requests_are_retried(store):
+    api = FakeApi(fail=backfill.RETRIES)
+    assert run(api, date(2026, 3, 2), date(2026, 3, 3))["failed"] == 1
+    assert "NSE:TEST:ONE_HOUR" not in backfill.load_state()
+    assert run(FakeApi(fail=1), date(2026, 3, 2), date(2026, 3, 3))["bars"] == 14
+
+def test_rate_limiter_spaces_calls():
+    now, sleeps = [0.0], []
+
+    def sleep(seconds):
+        sleeps.append(round(seconds, 6))
+        now[0] += seconds
+
+    limiter = backfill.RateLimiter(rate=4, clock=lambda: now[0], sleep=sleep)
+    for _ in range(4):
+        limiter.wait()
+    assert sleeps == [0.25, 0.25, 0.25]
@@ -0,0 +1,187 @@
+import numpy as np
+import pandas as pd
+import pytest
+import backtest
+import candle_store
+import excursions
+
+CAPITAL = backtest.INITIAL_CAPITAL
+BARS = pd.date_range("2026-03-02 09:15", periods=8, freq="h")
+
+def trade(ticker, side, entry_bar, exit_bar, entry_price, exit_price, qty):
+    """A create_trade_log record as the backtests write it."""
+    gross = (exit_price - entry_price) * qty if side == "LONG" else (entry_price - exit_price) * qty
+    brokerage = (entry_price + exit_price) * qty * backtest.BROKERAGE_RATE
+    return backtest.create_trade_log(ticker, side, BARS[entry_bar], BARS[exit_bar], entry_price, exit_price, qty,
+                                     gross, brokerage, gross - brokerage, entry_price * qty, "test")
+
+def reference_equity(closes, trades):
+    """Bar-by-bar loop: realized Net P/L of closed trades plus open trades marked to the close, less entry brokerage."""
+    equity = []
+    for t, stamp in enumerate(closes.index):
+        value = CAPITAL
+        for tr in trades:
+            entry_bar = closes.index.get_loc(pd.Timestamp(tr['Entry Date']))
+            exit_bar = closes.index.get_loc(pd.Timestamp(tr['Exit Date']))
+            if exit_bar <= t:
+                value += tr['Net P/L']
+            elif entry_bar <= t:
+                close = closes.iloc[t] if isinstance(closes, pd.Series) else closes[tr['Ticker']].iloc[t]
+                sign = 1 if tr['Type'] == "LONG" else -1
+                value += sign * (close - tr['Entry Price']) * tr['Qty'] - tr['Entry Price'] * tr['Qty'] * backtest.BROKERAGE_RATE
+        equity.append(value)
+    equity = np.array(equity)
+    peak = np.maximum.accumulate(equity)
+    return equity, (peak - equity) / peak * 100
+
+def test_single_series_matches_a_bar_loop_and_the_trade_log():
+    closes = pd.Series([100, 101, 103, 99, 97, 95, 96, 98], index=BARS, dtype=float, name="NIFTY")
+    trades = [
+        trade("NIFTY", "LONG", 1, 3, 101.0, 98.98, 500),     # Stopped inside bar 3 (closed at 99)
+        trade("NIFTY", "SHORT", 4, 6, 97.0, 96.0, 400),      # Reversal exit at the close
+    ]
+    mtm = backtest.mark_to_market(closes, trades)
+    equity, drawdown = reference_equity(closes, trades)
+    np.testing.assert_allclose(mtm['Equity'], equity)
+    np.testing.assert_allclose(mtm['Drawdown'], drawdown)
+    # At every exit bar equity is capital plus the cumulative Net P/L of the log
+    realized = CAPITAL + np.cumsum([t['Net P/L'] for t in trades])
+    assert mtm['Equity'].iloc[[3, 6]].to_numpy() == pytest.approx(realized)
+    assert list(mtm['Open']) == [0, 0, 1, 1, 0, 1, 1, 0]
+
+    metrics = backtest.summarize(trades, closes)
+    assert metrics['trades'] == 2 and metrics['longs'] == 1 and metrics['wins'] == 1
+    assert metrics['net_pnl'] == pytest.approx(realized[-1] - CAPITAL)
+    assert metrics['max_drawdown_mtm'] == pytest.approx(drawdown.max())
+    assert metrics['time_in_market'] == pytest.approx(50.0)
+
+def test_multi_symbol_book():
+    closes = pd.DataFrame({"AAA": [100, 102, 104, 103, 105, 106, 104, 107],
+                           "BBB": [50, 49, 48, 50, 47, 46, 48, 45]}, index=BARS, dtype=float)
+    trades = [
+        trade("AAA", "LONG", 0, 5, 100.0, 106.0, 100),
+        trade("BBB", "SHORT", 1, 4, 49.0, 47.0, 300),
+        trade("BBB", "LONG", 5, 7, 46.0, 45.0, 200),
+    ]
+    mtm = backtest.mark_to_market(closes, trades)
+    equity, drawdown = reference_equity(closes, trades)
+    np.testing.assert_allclose(mtm['Equity'], equity)
+    np.testing.assert_allclose(mtm['Drawdown'], drawdown)
+    assert mtm['Equity'].iloc[-1] == pytest.approx(CAPITAL + sum(t['Net P/L'] for t in trades))
+    assert mtm['Open'].max() == 2
+
+def test_trades_outside_the_closes_are_rejected():
+    closes = pd.Series([100.0] * 4, index=BARS[4:])
+    with pytest.raises(ValueError):
+        backtest.mark_to_market(closes, [trade("NIFTY", "LONG", 1, 5, 100.0, 100.0, 10)])
+    with pytest.raises(ValueError):
+        backtest.mark_to_market(closes.to_frame("AAA"), [trade("ZZZ", "LONG", 4, 5, 100.0, 100.0, 10)])
+
+def test_minute_stop_exits_are_measured_up_to_the_fill():
+    stamps = pd.date_range("2026-03-02 09:15", "2026-03-02 15:29", freq="min")
+    high = np.full(len(stamps), 101.0)
+    low = np.full(len(stamps), 99.0)
+    high[stamps.get_loc(pd.Timestamp("2026-03-02 11:00"))] = 104.0     # Best price while the first trade is open
+    low[stamps.get_loc(pd.Timestamp("2026-03-02 11:40"))] = 97.0       # Its stop fill
+    high[stamps.get_loc(pd.Timestamp("2026-03-02 12:30"))] = 110.0     # After the fill: not its excursion
+    index = excursions.BarIndex(candle_store.to_epoch(stamps), high, low)
+    trades = [
+        backtest.create_trade_log("ACME", "LONG", pd.Timestamp("2026-03-02 09:15"), pd.Timestamp("2026-03-02 11:40"),
+                                  100.0, 98.0, 10, -20.0, 0.0, -20.0, 1000.0, "2% SL Hit"),
+        backtest.create_trade_log("ACME", "LONG", pd.Timestamp("2026-03-02 11:15"), pd.Timestamp("2026-03-02 12:15"),
+                                  100.0, 101.0, 10, 10.0, 0.0, 10.0, 1000.0, "T3 Cross Down"),
+    ]
+    log = backtest.trade_excursions(trades, lambda t: index, minute_stops=True)
+    # Stop: 10:15 through the 11:40 fill minute; reversal: its exit bar 12:15-13:14 included
+    assert list(log['Bars Held']) == [86, 60]
+    assert list(log['MFE']) == [4.0, 10.0]
+    assert log['MAE'].iloc[0] == 3.0
+    # Read as an hourly stamp the stop would run on to 12:39 and pick up the later high
+    hourly = backtest.trade_excursions(trades, lambda t: index)
+    assert hourly['Bars Held'].iloc[0] == 145 and hourly['MFE'].iloc[0] == 10.0
+
+def universe_bars(seed):
+    """Two months of NSE hourly bars swinging around 100, so T3 crosses both ways."""
+    days = pd.bdate_range("2026-01-05", periods=45)
+    stamps = pd.DatetimeIndex([day + pd.Timedelta(minutes=555 + 60 * i) for day in days for i in range(7)])
+    rng = np.random.default_rng(seed)
+    close = 100 + 6 * np.sin(np.arange(len(stamps)) / (5 + seed)) + rng.normal(0, 0.3, len(stamps)).cumsum() * 0.2
+    return pd.DataFrame({'Timestamp': stamps, 'Open': np.r_[close[0], close[:-1]], 'High': close + 0.5,
+                         'Low': close - 0.5, 'Close': close, 'Volume': 1000.0})
+
+@pytest.fixture
+def universe(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(candle_store, "CANDLE_DIR", str(tmp_path / "candles"))
+    monkeypatch.setattr(backtest.results_store, "RESULTS_DIR", str(tmp_path / "results"))
+    for seed, symbol in enumerate(["AAA", "BBB"]):
+        candle_store.save_candles("NSE", symbol, "ONE_HOUR", universe_bars(seed))
+    return ["AAA", "BBB"]
+
+def test_universe_runs_answer_the_same_from_the_store(universe, monkeypatch):
+    per_symbol, trades, aggregate, closes = backtest.run_universe(universe, workers=2)
+    assert list(per_symbol['symbol']) == universe and {t['Ticker'] for t in trades} == set(universe)
+    assert aggregate['trades'] == len(trades) == per_symbol['trades'].sum()
+
+    # Second run: nothing is backtested, everything comes back identical
+    code = backtest.backtest_code_version()
+    monkeypatch.setattr(backtest, "backtest_code_version", lambda: code)    # The stand-in below must not change the key
+    def recomputed(*args):
+        raise AssertionError("a stored run was backtested again")
+    monkeypatch.setattr(backtest, "run_backtest", recomputed)
+    cached_symbol, cached_trades, cached_aggregate, cached_closes = backtest.run_universe(universe, workers=2)
+    pd.testing.assert_frame_equal(pd.DataFrame(cached_trades), pd.DataFrame(trades))
+    pd.testing.assert_frame_equal(cached_closes, closes)
+    assert cached_aggregate == aggregate
+    assert list(cached_symbol['key']) == list(per_symbol['key'])
+    assert cached_symbol['net_pnl'].tolist() == pytest.approx(per_symbol['net_pnl'].tolist())
+
+def test_a_rerun_replaces_the_stored_universe_row(universe):
+    store = backtest.results_store
+    aggregate = backtest.run_universe(universe, workers=2)[2]
+    row = store.query(where="symbol == 'universe_2'").iloc[0]
+    # An earlier build stored a wrong book under the same key
+    store.save(row['key'], row['strategy'], {"mode": "universe"}, {"symbol": "universe_2"}, row['code'], [], {"net_pnl": 0.0})
+    store.compact()
+    backtest.run_universe(universe, workers=2, rerun=True)
+    rows = store.query(where="symbol == 'universe_2'")
+    assert len(rows) == 1 and rows['net_pnl'].iloc[0] == pytest.approx(aggregate['net_pnl'])
+    assert len(store.load_trades(row['key'])) == aggregate['trades']
+
+def minute_bars(days=40):
+    """NSE minute bars swinging ±0.8 around 100 (T3 reversals, no stops) with a few 4% spikes that stop whichever side is held."""
+    sessions = pd.bdate_range("2026-01-05", periods=days)
+    stamps = pd.DatetimeIndex([day + pd.Timedelta(minutes=555 + i) for day in sessions for i in range(375)])
+    x = np.arange(len(stamps))
+    close = 100 + 0.8 * np.sin(x / 600) + 0.05 * np.sin(x / 7)
+    high, low = close + 0.02, close - 0.02
+    for spike in range(3000, len(x), 4321):
+        low[spike], high[spike + 1] = close[spike] * 0.96, close[spike + 1] * 1.04
+    return pd.DataFrame({'Timestamp': stamps, 'Open': np.r_[close[0], close[:-1]], 'High': high, 'Low': low,
+                         'Close': close, 'Volume': 1.0})
+
+def bar_of(stamp):
+    """Start of the 09:15-anchored hourly bar a minute belongs to."""
+    return (pd.Timestamp(stamp) - pd.Timedelta(minutes=15)).floor("h") + pd.Timedelta(minutes=15)
+
+@pytest.mark.parametrize("start, end", [(None, None), ("2026-01-19", "2026-02-20 15:29")])
+def test_minute_backtest_matches_the_hourly_path(tmp_path, monkeypatch, start, end):
+    monkeypatch.setattr(candle_store, "CANDLE_DIR", str(tmp_path))
+    candle_store.save_candles("NSE", "ACME", backtest.MINUTE_INTERVAL, minute_bars())
+    minute = backtest.run_backtest_minute("ACME", "NSE", start=start, end=end)
+
+    hourly = backtest.resampler.resample(candle_store.load_candles("NSE", "ACME", backtest.MINUTE_INTERVAL, start, end),
+                                         "ONE_HOUR", "NSE")
+    hourly = backtest.calculate_t3(hourly.set_index('Timestamp'), length=8, v_factor=0.7)
+    expected = backtest.run_backtest("ACME", hourly)
+    assert {t['Exit Reason'] for t in expected} == {"2% SL Hit", "T3 Cross Down", "T3 Cross Up"}
+
+    # Same trades; a stop is stamped with its fill minute instead of the bar it fell in
+    assert len(minute) == len(expected)
+    for got, want in zip(minute, expected):
+        if got['Exit Reason'] == "2% SL Hit":
+            got = dict(got, **{'Exit Date': bar_of(got['Exit Date']).strftime(backtest.TRADE_TIME_FORMAT)})
+        assert got == pytest.approx(want)
+    if start:
+        assert pd.Timestamp(minute[0]['Entry Date']) >= pd.Timestamp(start)
+        assert backtest.minute_hourly_closes("ACME", "NSE", start, end).index[0] == hourly.index[0]
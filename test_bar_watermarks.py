@@ -0,0 +1,56 @@
+import json
+from datetime import datetime
+import pandas as pd
+import pytest
+import bar_watermarks
+import trading_calendar
+
+IST = trading_calendar.IST
+
+@pytest.fixture(autouse=True)
+def calendar():
+    trading_calendar.configure({"holidays": ["2026-03-03"]})
+    yield
+    trading_calendar.configure({})
+
+def at(text):
+    return datetime.fromisoformat(text).replace(tzinfo=IST)
+
+def test_the_last_closed_bar_follows_the_session():
+    assert bar_watermarks.last_closed_bar(at("2026-03-02 11:20")) == at("2026-03-02 10:15")
+    assert bar_watermarks.last_closed_bar(at("2026-03-02 11:15")) == at("2026-03-02 10:15")
+    # The 15:15 bar is cut short by the 15:30 close; a holiday and the night add nothing
+    assert bar_watermarks.last_closed_bar(at("2026-03-02 15:30")) == at("2026-03-02 15:15")
+    assert bar_watermarks.last_closed_bar(at("2026-03-04 09:50")) == at("2026-03-02 15:15")
+    assert bar_watermarks.last_closed_bar(at("2026-03-04 11:00"), bar_seconds=900) == at("2026-03-04 10:45")
+
+def test_closed_bars_drop_the_forming_bar():
+    df = pd.DataFrame({"Timestamp": pd.date_range("2026-03-02 09:15", periods=4, freq="h"), "Close": [1.0, 2.0, 3.0, 4.0]})
+    assert bar_watermarks.closed_bars(df, now=at("2026-03-02 12:40"))['Close'].tolist() == [1.0, 2.0, 3.0]
+    assert bar_watermarks.closed_bars(df, now=at("2026-03-02 09:40")).empty
+    assert bar_watermarks.closed_bars(df.iloc[0:0], now=at("2026-03-02 12:40")).empty
+
+def test_marks_are_due_once_per_closed_bar_and_only_move_forward(tmp_path):
+    path = str(tmp_path / "marks.json")
+    marks = bar_watermarks.Watermarks(path)
+    assert marks.due("ACME", now=at("2026-03-02 11:20"))
+    assert marks.mark("ACME", pd.Timestamp("2026-03-02 10:15"))
+    assert not marks.due("ACME", now=at("2026-03-02 11:50"))
+    assert marks.due("ACME", now=at("2026-03-02 12:15"))
+    # A fetch that came back with nothing newer (or older) does not count as an advance
+    assert not marks.mark("ACME", pd.Timestamp("2026-03-02 10:15"))
+    assert not marks.mark("ACME", pd.Timestamp("2026-03-02 09:15"))
+    assert not marks.due("ACME", now=at("2026-03-02 11:50"))
+    marks.save()
+
+    again = bar_watermarks.Watermarks(path)
+    assert again.marks == marks.marks and not again.due("ACME", now=at("2026-03-02 11:50"))
+    again.forget("ACME")
+    assert again.due("ACME", now=at("2026-03-02 11:50"))
+
+def test_a_corrupt_file_starts_empty(tmp_path):
+    path = tmp_path / "marks.json"
+    path.write_text("{not json")
+    assert bar_watermarks.Watermarks(str(path)).marks == {}
+    path.write_text(json.dumps({"ACME": 1}))
+    assert bar_watermarks.Watermarks(str(path)).marks == {"ACME": 1}
@@ -0,0 +1,126 @@
+import json
+import binance_stream
+from binance_stream import INTERVAL_MS, KlineStream, ReplayConnection, replay_connect
+
+START_MS = 1_700_000_000_000 // INTERVAL_MS * INTERVAL_MS
+SYMBOL = "BTCUSDT"
+
+def bar(n):
+    price = 100.0 + n
+    return (START_MS + n * INTERVAL_MS, price, price + 1, price - 1, price + 0.5, 10.0)
+
+def rest_row(n):
+    t, o, h, l, c, v = bar(n)
+    return [t, str(o), str(h), str(l), str(c), str(v), t + INTERVAL_MS - 1]
+
+def kline_msg(n, closed=True, symbol=SYMBOL):
+    t, o, h, l, c, v = bar(n)
+    k = {"t": t, "T": t + INTERVAL_MS - 1, "s": symbol, "i": "1h", "o": str(o), "h": str(h), "l": str(l), "c": str(c), "v": str(v), "x": closed}
+    return json.dumps({"stream": f"{symbol.lower()}@kline_1h", "data": {"e": "kline", "s": symbol, "k": k}})
+
+def trade_msg(price, t=START_MS, symbol=SYMBOL):
+    return json.dumps({"stream": f"{symbol.lower()}@trade", "data": {"e": "trade", "s": symbol, "p": str(price), "q": "0.1", "T": t}})
+
+class Exchange:
+    """REST side of the stand-in: klines 0..closed_through are final."""
+
+    def __init__(self, closed_through):
+        self.closed_through = closed_through
+        self.requests = []
+
+    def clock(self):
+        return (START_MS + (self.closed_through + 1) * INTERVAL_MS + 1000) / 1000
+
+    def fetch(self, symbol, start_ms=None, limit=binance_stream.REST_LIMIT):
+        self.requests.append(start_ms)
+        first = 0 if start_ms is None else (start_ms - START_MS) // INTERVAL_MS
+        if start_ms is None:
+            first = max(self.closed_through + 1 - limit, 0)
+        # Like Binance, the forming bar comes back too
+        return [rest_row(n) for n in range(first, self.closed_through + 2)][:limit]
+
+def make_stream(exchange, sessions, events, trades=None, history=300):
+    on_bar = lambda ticker, series, catching_up: events.append((ticker, series.last_open, catching_up, len(series.bars)))
+    return KlineStream(["BTC-USD"], on_bar, on_trade=trades, connect=replay_connect(sessions),
+                       fetch_klines=exchange.fetch, clock=exchange.clock, history=history, reconnect_delay=(0, 0))
+
+def test_symbols_and_url():
+    assert binance_stream.binance_symbol("ETH-USD") == "ETHUSDT"
+    url = binance_stream.stream_url(["BTCUSDT", "ETHUSDT"])
+    assert url.endswith("btcusdt@kline_1h/btcusdt@trade/ethusdt@kline_1h/ethusdt@trade")
+
+def test_seed_then_live_bar_close():
+    exchange, events = Exchange(closed_through=249), []
+    session = ReplayConnection([kline_msg(250, closed=False), kline_msg(250), kline_msg(250)])
+    stream = make_stream(exchange, [session], events)
+    stream.run(max_connections=1)
+    series = stream.series[SYMBOL]
+    # Seeding evaluates the newest closed bar once; the forming update and the duplicate do nothing
+    assert events == [("BTC-USD", bar(249)[0], False, 250), ("BTC-USD", bar(250)[0], False, 251)]
+    assert series.frame()['Close'].iat[-1] == bar(250)[4]
+    assert list(series.frame().columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+
+def test_reconnect_backfills_missed_bars_in_order():
+    exchange, events = Exchange(closed_through=99), []
+    first = ReplayConnection([kline_msg(100), kline_msg(101), kline_msg(102)], drop_after=2)
+
+    def reconnect(url):
+        # Bars 102..104 closed while we were disconnected
+        exchange.closed_through = 104
+        return ReplayConnection([kline_msg(104), kline_msg(105)])
+
+    sessions = iter([first])
+    stream = make_stream(exchange, [], events)
+    stream.connect = lambda url: next(sessions, None) or reconnect(url)
+    stream.run(max_connections=2)
+
+    opens = [e[1] for e in events]
+    assert opens == [bar(n)[0] for n in (99, 100, 101, 102, 103, 104, 105)]
+    # Only the newest backfilled bar may open positions
+    assert [e[2] for e in events] == [False, False, False, True, True, False, False]
+    assert stream.connections == 2 and stream.backfilled == 3
+    frame = stream.series[SYMBOL].frame()
+    assert frame.index.is_monotonic_increasing and frame.index.is_unique
+
+def test_gap_inside_a_session_is_backfilled():
+    exchange, events = Exchange(closed_through=14), []
+    session = ReplayConnection([kline_msg(10), kline_msg(14)])
+    stream = make_stream(exchange, [session], events)
+
+    def fetch(symbol, start_ms=None, limit=binance_stream.REST_LIMIT):
+        # At connect time only bars up to 9 exist; the gap request sees 11..13 (and 14, 15)
+        rows = exchange.fetch(symbol, start_ms, limit)
+        return [r for r in rows if start_ms is not None or r[0] <= bar(9)[0]]
+
+    stream.fetch_klines = fetch
+    stream.run(max_connections=1)
+    assert [e[1] for e in events] == [bar(n)[0] for n in range(9, 15)]
+    assert [e[2] for e in events] == [False, False, True, True, True, False]
+
+def test_history_is_bounded():
+    exchange, events = Exchange(closed_through=999), []
+    stream = make_stream(exchange, [ReplayConnection([kline_msg(1000)])], events, history=300)
+    stream.run(max_connections=1)
+    assert len(stream.series[SYMBOL].bars) == 300
+    assert stream.series[SYMBOL].last_open == bar(1000)[0]
+
+def test_trades_update_last_price_and_reach_callback():
+    exchange, events, prints = Exchange(closed_through=5), [], []
+    session = ReplayConnection([trade_msg(123.5), trade_msg(124.0), trade_msg(1.0, symbol="DOGEUSDT")])
+    stream = make_stream(exchange, [session], events, trades=lambda ticker, price, t: prints.append((ticker, price)))
+    stream.run(max_connections=1)
+    assert prints == [("BTC-USD", 123.5), ("BTC-USD", 124.0)]
+    assert stream.series[SYMBOL].last_price == 124.0
+
+def test_failing_handler_does_not_stop_the_stream():
+    exchange = Exchange(closed_through=5)
+    seen = []
+
+    def on_bar(ticker, series, catching_up):
+        seen.append(series.last_open)
+        raise ValueError("boom")
+
+    stream = KlineStream(["BTC-USD"], on_bar, connect=replay_connect([ReplayConnection([kline_msg(6), kline_msg(7)])]),
+                         fetch_klines=exchange.fetch, clock=exchange.clock, reconnect_delay=(0, 0))
+    stream.run(max_connections=1)
+    assert seen == [bar(n)[0] for n in (5, 6, 7)]
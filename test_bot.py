@@ -0,0 +1,88 @@
+import importlib
+import json
+import os
+import sys
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+import angel_session
+import candle_store
+import requests
+import strategies
+import trade_archive
+
+EXAMPLE_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config_example.json")
+
+class FakeSession:
+    """Stands in for the SmartAPI login; get() hands out the candle API below."""
+
+    def __init__(self, credentials):
+        pass
+
+    def get(self, force_refresh=False):
+        return CandleApi()
+
+class CandleApi:
+    """getCandleData serving a steady uptrend of fifteen-minute bars on weekdays; every request is kept."""
+
+    def __init__(self):
+        self.requests = []
+
+    def getCandleData(self, params):
+        self.requests.append(params)
+        start, end = pd.Timestamp(params['fromdate']), min(pd.Timestamp(params['todate']), pd.Timestamp(datetime.now()))
+        stamps = [day + pd.Timedelta(minutes=555 + 15 * i) for day in pd.bdate_range(start.normalize(), end.normalize()) for i in range(25)]
+        stamps = [t for t in stamps if start <= t <= end]
+        return {"status": True, "data": [[t.strftime('%Y-%m-%dT%H:%M:%S+05:30'), *(4 * [100 + t.value / 86400e9 * 0.05]), 1000]
+                                         for t in stamps]}
+
+def offline(*args, **kwargs):
+    raise requests.ConnectionError("offline")
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch):
+    """bot imported offline on the daily timeframe, with its stores under tmp_path."""
+    with open(EXAMPLE_CONFIG) as f:
+        config = json.load(f)
+    config['telegram']['enabled'] = False
+    config['strategy_settings']['timeframe'] = "1d"
+    (tmp_path / "config.json").write_text(json.dumps(config))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(angel_session, "SessionManager", FakeSession)
+    monkeypatch.setattr(requests, "get", offline)
+    monkeypatch.setattr(candle_store, "CANDLE_DIR", str(tmp_path / "candles"))
+    monkeypatch.setattr(trade_archive, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    sys.modules.pop("bot", None)
+    module = importlib.import_module("bot")
+    module.TOKEN_MAP = {"ACME": "1"}
+    yield module
+    sys.modules.pop("bot", None)
+
+def test_slower_timeframes_fetch_enough_history_for_the_strategies(bot):
+    assert bot.TIMEFRAME == "ONE_DAY" and bot.BASE_INTERVAL == "FIFTEEN_MINUTE"
+    graph = bot.fetch_hourly_data("ACME.NS")
+    # One bar a session: 60 days would hold ~40, the strategy needs 200
+    strategy = strategies.STRATEGIES["ema_trend"]
+    assert len(graph) >= strategy.min_bars
+    assert np.isfinite(graph.value("SMA_200", -1)) and np.isfinite(graph.value("SMA_200", -2))
+    strategy.entry(graph)                       # Runs its rules instead of stopping at min_bars
+    # No request spans more days than SmartAPI serves at the base interval
+    spans = [(pd.Timestamp(r['todate']) - pd.Timestamp(r['fromdate'])).days for r in bot.smartApi.requests]
+    assert len(spans) >= 2 and max(spans) <= bot.backfill.MAX_DAYS_PER_REQUEST["FIFTEEN_MINUTE"]
+
+    # The next scan only asks for what is new
+    bot.smartApi.requests.clear()
+    assert len(bot.fetch_hourly_data("ACME.NS")) == len(graph)
+    assert len(bot.smartApi.requests) == 1
+
+def test_a_short_stored_history_is_deepened_once(bot):
+    graph = bot.fetch_hourly_data("ACME.NS")
+    assert len(graph) >= 200
+    # A history cut at 60 days (as the 1h bot kept it) is fetched back again on the first scan of a run
+    arr = candle_store.load_arrays("NSE", "ACME", "FIFTEEN_MINUTE", mmap=False)
+    cut = candle_store.to_epoch([pd.Timestamp(datetime.now()) - pd.Timedelta(days=bot.HISTORY_DAYS)])[0]
+    candle_store.write_records("NSE", "ACME", "FIFTEEN_MINUTE", arr[arr['ts'] >= cut])
+    candle_store.write_records("NSE", "ACME", "ONE_DAY", candle_store.load_arrays("NSE", "ACME", "ONE_DAY", mmap=False)[-40:])
+    bot.DEEPENED.clear()
+    assert len(bot.fetch_hourly_data("ACME.NS")) == len(graph)
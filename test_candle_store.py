@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+import candle_store
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(candle_store, "CANDLE_DIR", str(tmp_path))
+
+def bars(start, periods, close=100.0, freq="15min"):
+    stamps = pd.date_range(start, periods=periods, freq=freq)
+    closes = close + np.arange(periods, dtype=float)
+    return pd.DataFrame({'Timestamp': stamps, 'Open': closes, 'High': closes + 1, 'Low': closes - 1,
+                         'Close': closes, 'Volume': 10.0})
+
+def test_epochs_round_trip_in_exchange_time():
+    epoch = candle_store.to_epoch(["2026-03-02 09:15"])[0]
+    assert epoch == int(pd.Timestamp("2026-03-02 03:45", tz="UTC").timestamp())
+    # Aware stamps keep their own zone; naive ones are exchange time
+    assert candle_store.to_epoch([pd.Timestamp("2026-03-02 03:45", tz="UTC")])[0] == epoch
+    back = candle_store.from_epoch([epoch])
+    assert str(back.tz) == candle_store.EXCHANGE_TZ and back[0].strftime("%H:%M") == "09:15"
+    assert candle_store.series_path("NSE", "M&M", "ONE_DAY").endswith("M_M.npy")
+
+def test_saving_merges_by_timestamp_and_is_idempotent():
+    assert candle_store.save_candles("NSE", "ACME", "FIFTEEN_MINUTE", bars("2026-03-02 09:15", 4)) == 4
+    # The last bar was still forming: a later save replaces it and appends the rest
+    update = bars("2026-03-02 10:00", 3, close=200.0)
+    assert candle_store.save_candles("NSE", "ACME", "FIFTEEN_MINUTE", update) == 6
+    assert candle_store.save_candles("NSE", "ACME", "FIFTEEN_MINUTE", update) == 6
+    df = candle_store.load_candles("NSE", "ACME", "FIFTEEN_MINUTE")
+    assert df['Close'].tolist() == [100.0, 101.0, 102.0, 200.0, 201.0, 202.0]
+    assert df['Timestamp'].is_monotonic_increasing and df['Timestamp'].is_unique
+    assert candle_store.last_timestamp("NSE", "ACME", "FIFTEEN_MINUTE") == candle_store.to_epoch(["2026-03-02 10:30"])[0]
+    assert candle_store.last_timestamp("NSE", "NONE", "FIFTEEN_MINUTE") is None
+
+def test_ranges_are_inclusive_slices_of_the_map():
+    candle_store.save_candles("NSE", "ACME", "ONE_MINUTE", bars("2026-03-02 09:15", 120, freq="min"))
+    part = candle_store.load_range("NSE", "ACME", "ONE_MINUTE", "2026-03-02 09:30", "2026-03-02 10:14")
+    assert isinstance(part, np.memmap) and len(part) == 45
+    assert candle_store.from_epoch(part['ts'][[0, -1]]).strftime("%H:%M").tolist() == ["09:30", "10:14"]
+    df = candle_store.load_candles("NSE", "ACME", "ONE_MINUTE", start="2026-03-02 11:00")
+    assert len(df) == 15 and df['Close'].iloc[0] == 205.0
+    assert len(candle_store.load_range("NSE", "ACME", "ONE_MINUTE", start="2026-03-03")) == 0
+    assert candle_store.load_range("NSE", "NONE", "ONE_MINUTE") is None
+    assert candle_store.load_candles("NSE", "NONE", "ONE_MINUTE").empty
+
+def test_csv_exports_are_read_with_any_header_case(tmp_path):
+    path = tmp_path / "export.csv"
+    bars("2026-03-02 09:15", 3).rename(columns={'Timestamp': 'datetime', 'Close': ' CLOSE'}).to_csv(path, index=False)
+    df = candle_store.read_csv_candles(path)
+    assert {'Timestamp', 'Close'} <= set(df.columns)
+    assert candle_store.save_candles("NSE", "ACME", "FIFTEEN_MINUTE", df) == 3
+    (tmp_path / "bad.csv").write_text("a,b\n1,2\n")
+    with pytest.raises(ValueError):
+        candle_store.read_csv_candles(tmp_path / "bad.csv")
@@ -0,0 +1,66 @@
+import itertools
+import json
+import os
+import pytest
+import config_loader
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), "config_example.json")
+MTIMES = itertools.count(1)
+
+@pytest.fixture
+def config_file(tmp_path):
+    with open(EXAMPLE, 'r') as f:
+        config = json.load(f)
+    path = tmp_path / "config.json"
+    write(path, config)
+    return path, config
+
+def write(path, config):
+    # Distinct mtimes even on filesystems with coarse timestamps
+    path.write_text(json.dumps(config))
+    mtime = next(MTIMES) * 10 ** 9
+    os.utime(path, ns=(mtime, mtime))
+
+def test_example_config_is_valid():
+    config_loader.load(EXAMPLE)
+
+def test_validation_reports_every_problem(config_file):
+    _, config = config_file
+    config['holidays'].append("2026-13-01")
+    config['strategy_settings']['capital'] = -5
+    config['dmi']['watchlist'] = "NIFTY"
+    with pytest.raises(config_loader.ConfigError) as e:
+        config_loader.validate(config)
+    assert "holidays" in str(e.value) and "capital" in str(e.value) and "dmi.watchlist" in str(e.value)
+
+def test_watcher_applies_valid_edits_once(config_file):
+    path, config = config_file
+    watcher = config_loader.ConfigWatcher(str(path))
+    assert watcher.poll() is None
+
+    config['holidays'].append("2026-01-26")
+    config['dmi']['watchlist'].append("SBIN")
+    write(path, config)
+    new, changed = watcher.poll()
+    assert changed == {"holidays", "dmi.watchlist"}
+    assert new['dmi']['watchlist'][-1] == "SBIN" and watcher.config is new
+    assert watcher.poll() is None
+
+def test_invalid_or_half_written_edits_keep_the_last_good_config(config_file, capsys):
+    path, config = config_file
+    watcher = config_loader.ConfigWatcher(str(path))
+    good = watcher.config
+    path.write_text(json.dumps(config)[:200])
+    os.utime(path, ns=(10 ** 12, 10 ** 12))
+    assert watcher.poll() is None and watcher.config is good
+    assert watcher.poll() is None
+    assert capsys.readouterr().out.count("Config change ignored") == 1
+
+    config['dmi']['trade_capital'] = 300000
+    write(path, config)
+    assert watcher.poll()[1] == {"dmi.trade_capital"}
+
+def test_restart_only_settings_are_flagged():
+    changed = config_loader.changed_keys({"angel_one": {"pin": "1"}, "holidays": []}, {"angel_one": {"pin": "2"}, "holidays": ["2026-01-26"]})
+    assert changed == {"angel_one.pin", "holidays"}
+    assert config_loader.needs_restart(changed) == ["angel_one.pin"]
@@ -0,0 +1,92 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+import candle_store
+import correlation
+
+SYMBOLS = [f"S{i}" for i in range(8)]
+
+def returns(bars, seed=0, gaps=0.1):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(0, 0.01, (bars, len(SYMBOLS)))
+    x[:, 1] = x[:, 0] * 0.9 + x[:, 1] * 0.3       # S0 / S1 move together
+    x[:, 2] = -x[:, 0] + x[:, 2] * 0.2              # S2 moves against S0
+    x[rng.random(x.shape) < gaps] = np.nan
+    return x
+
+def test_running_sums_match_a_full_window_recompute():
+    x = returns(500)
+    tracker = correlation.RollingCorrelation(SYMBOLS, window=60, min_periods=30)
+    for row in x:
+        tracker.push(row)
+    expected = pd.DataFrame(x[-60:]).corr(min_periods=30).values
+    assert np.allclose(tracker.matrix(), expected, equal_nan=True)
+    assert tracker.corr("S0", "S1") == pytest.approx(expected[0, 1])
+
+def test_too_few_shared_bars_is_unknown():
+    tracker = correlation.RollingCorrelation(SYMBOLS, window=60, min_periods=30)
+    for row in returns(20):
+        tracker.push(row)
+    assert np.isnan(tracker.corr("S0", "S1")) and np.isnan(tracker.corr("S0", "NOPE"))
+
+def test_filter_counts_same_direction_risk_only():
+    tracker = correlation.RollingCorrelation(SYMBOLS, window=100, min_periods=30)
+    for row in returns(100, gaps=0):
+        tracker.push(row)
+    # Long S0 adds to a long S1 and to a short S2 (which moves against S0); a short S1 is a hedge
+    hits = correlation.correlated_positions(tracker, "S0", "LONG", {"S1": "LONG", "S2": "SHORT", "S3": "LONG"}, 0.7)
+    assert [t for t, _ in hits] == ["S2", "S1"]
+    assert correlation.correlated_positions(tracker, "S0", "LONG", {"S1": "SHORT"}, 0.7) == []
+
+def test_store_updates_are_incremental_and_persist(tmp_path, monkeypatch):
+    monkeypatch.setattr(candle_store, "CANDLE_DIR", str(tmp_path))
+    x = returns(61, gaps=0)
+    stamps = pd.date_range("2026-03-02 09:15", periods=61, freq="h", tz="Asia/Kolkata")
+    for col, symbol in enumerate(SYMBOLS):
+        close = 100 * np.cumprod(1 + np.nan_to_num(x[:, col]))
+        candle_store.save_candles("NSE", symbol, "ONE_HOUR", pd.DataFrame({'Timestamp': stamps, 'Open': close, 'High': close,
+                                                                           'Low': close, 'Close': close, 'Volume': 1.0}))
+    since = candle_store.to_epoch([stamps[0]])[0] - 1
+    now = datetime(2026, 4, 1, 12, 0)
+    path = str(tmp_path / "corr.npz")
+
+    # Two runs that each see part of the history equal one run over all of it (the bar at `now` is still forming)
+    tracker = correlation.load_or_create(SYMBOLS, path, window=40, min_periods=20)
+    assert correlation.update_from_store(tracker, "NSE", "ONE_HOUR", since, now=stamps[30].to_pydatetime()) == 29
+    tracker.save(path)
+    resumed = correlation.load_or_create(SYMBOLS, path, window=40, min_periods=20)
+    assert correlation.update_from_store(resumed, "NSE", "ONE_HOUR", since, now=now) == 31
+    assert correlation.update_from_store(resumed, "NSE", "ONE_HOUR", since, now=now) == 0
+
+    batch = correlation.RollingCorrelation(SYMBOLS, window=40, min_periods=20)
+    correlation.update_from_store(batch, "NSE", "ONE_HOUR", since, now=now)
+    assert np.allclose(resumed.matrix(), batch.matrix(), equal_nan=True)
+    # The first bar has no previous close, so returns start at the second
+    closes = pd.DataFrame({s: candle_store.load_candles("NSE", s, "ONE_HOUR")['Close'] for s in SYMBOLS})
+    assert np.allclose(batch.matrix(), closes.pct_change().iloc[-40:].corr().values)
+
+def test_bars_that_arrive_a_cycle_late_still_count(tmp_path, monkeypatch):
+    monkeypatch.setattr(candle_store, "CANDLE_DIR", str(tmp_path))
+    x = returns(150, seed=3, gaps=0)[:, :2]
+    # Seven NSE hourly bars per weekday, so each one is closed an hour after it starts
+    stamps = pd.DatetimeIndex([day + pd.Timedelta(hours=9, minutes=15 + 60 * h)
+                               for day in pd.bdate_range("2026-03-02", periods=22) for h in range(7)][:150]).tz_localize("Asia/Kolkata")
+    closes = 100 * np.cumprod(1 + x, axis=0)
+    def store(symbol, bar):
+        c = closes[bar, SYMBOLS.index(symbol)]
+        candle_store.save_candles("NSE", symbol, "ONE_HOUR", pd.DataFrame({'Timestamp': [stamps[bar]], 'Open': c, 'High': c,
+                                                                           'Low': c, 'Close': c, 'Volume': 1.0}))
+    since = candle_store.to_epoch([stamps[0]])[0] - 1
+    tracker = correlation.RollingCorrelation(SYMBOLS[:2], window=40, min_periods=20)
+    store("S0", 0), store("S1", 0)
+    # Every cycle S0's new bar is in the store when the tracker updates, S1's only lands after
+    for bar in range(1, 150):
+        store("S0", bar)
+        correlation.update_from_store(tracker, "NSE", "ONE_HOUR", since, now=(stamps[bar] + pd.Timedelta(hours=1)).to_pydatetime())
+        store("S1", bar)
+    correlation.update_from_store(tracker, "NSE", "ONE_HOUR", since, now=(stamps[-1] + pd.Timedelta(hours=1)).to_pydatetime())
+
+    assert tracker.n[0, 1] == 40
+    frame = pd.DataFrame(closes[:, :2]).pct_change()
+    assert tracker.corr("S0", "S1") == pytest.approx(frame.iloc[-40:].corr().iloc[0, 1])
@@ -0,0 +1,45 @@
+import importlib
+import json
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+import strategies
+import trade_archive
+
+@pytest.fixture
+def crypto_bot(tmp_path, monkeypatch):
+    """crypto_bot imported against a config whose live strategy carries parameters."""
+    config = {"telegram": {"enabled": False, "recipients": []},
+              "strategies": {"crypto": [{"name": "ema_trend", "fast": 8}]}}
+    (tmp_path / "config.json").write_text(json.dumps(config))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(trade_archive, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    sys.modules.pop("crypto_bot", None)
+    yield importlib.import_module("crypto_bot")
+    sys.modules.pop("crypto_bot", None)
+
+def graph(bot, closes, lows=None):
+    """An indicator graph as bot.fetch_hourly_data builds it."""
+    closes = np.asarray(closes, dtype=float)
+    lows = closes * 0.999 if lows is None else np.asarray(lows, dtype=float)
+    df = pd.DataFrame({'Open': closes, 'High': closes * 1.001, 'Low': lows, 'Close': closes, 'Volume': 1.0},
+                      index=pd.date_range("2026-01-01", periods=len(closes), freq="h"))
+    return strategies.IndicatorGraph(df, bot.STRATEGIES)
+
+def test_positions_of_a_parameterized_strategy_can_be_exited(crypto_bot):
+    # An uptrend with pullbacks: EMA_8 crosses back above EMA_21 on bar 246
+    x = np.arange(246)
+    closes = 100 + 0.3 * x + 8 * np.sin(x / 8)
+    data = crypto_bot.load_portfolio()
+    crypto_bot.check_entry(data, "ACME", graph(crypto_bot, closes))
+    pos = data["open_longs"]["ACME"]
+    assert pos["strategy"] == "ema_trend(fast=8)"
+
+    # The next scan trails / exits it with the same variant (a wick through the stop)
+    closes = np.r_[closes, closes[-1]]
+    lows = np.r_[closes[:-1] * 0.999, pos["stop_loss"] * 0.99]
+    assert crypto_bot.manage_exit(data, strategies.LONG, "ACME", graph(crypto_bot, closes, lows))
+    trade = data["closed_longs"][0]
+    assert trade["Reason"] == "Stop Loss Hit" and trade["Strategy"] == "ema_trend(fast=8)"
+    assert "ACME" not in data["open_longs"]
@@ -0,0 +1,157 @@
+import importlib
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+import angel_session
+import candle_store
+import requests
+import trade_archive
+
+EXAMPLE_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config_example.json")
+TODAY = pd.to_datetime('today').normalize()
+
+class FakeSession:
+    """Stands in for the SmartAPI login; each test installs its own smartApi."""
+
+    def __init__(self, credentials):
+        pass
+
+    def get(self, force_refresh=False):
+        return None
+
+class CandleApi:
+    """getCandleData answering with a fixed set of bars."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def getCandleData(self, params):
+        return {"status": True, "data": self.rows}
+
+def offline(*args, **kwargs):
+    raise requests.ConnectionError("offline")
+
+@pytest.fixture
+def dmi_bot(tmp_path, monkeypatch):
+    """dmi_bot imported offline, rolling two days before expiry, with its stores under tmp_path."""
+    with open(EXAMPLE_CONFIG) as f:
+        config = json.load(f)
+    config['telegram']['enabled'] = False
+    config['dmi']['rollover_days_before_expiry'] = 2
+    (tmp_path / "config.json").write_text(json.dumps(config))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(angel_session, "SessionManager", FakeSession)
+    monkeypatch.setattr(requests, "get", offline)
+    monkeypatch.setattr(candle_store, "CANDLE_DIR", str(tmp_path / "candles"))
+    monkeypatch.setattr(trade_archive, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    sys.modules.pop("dmi_bot", None)
+    bot = importlib.import_module("dmi_bot")
+    bot.CONTINUOUS_META_FILE = str(tmp_path / "candles" / "continuous_contracts.json")
+    bot.FUTURES_MASTER = pd.DataFrame([
+        contract("NIFTY", "1001", "NIFTYSEP", TODAY - pd.Timedelta(days=20)),    # Expired
+        contract("NIFTY", "1002", "NIFTYOCT", TODAY + pd.Timedelta(days=2)),     # Inside the rollover window
+        contract("NIFTY", "1003", "NIFTYNOV", TODAY + pd.Timedelta(days=30)),
+    ])
+    bot.FUTURES_MASTER_DATE = TODAY
+    yield bot
+    sys.modules.pop("dmi_bot", None)
+
+def contract(name, token, symbol, expiry):
+    return {"name": name, "token": token, "symbol": symbol, "expiry": expiry.strftime('%d%b%Y').upper(),
+            "expiry_date": expiry, "exch_seg": "NFO"}
+
+def bars(day, closes, first=0):
+    """Fifteen-minute SmartAPI rows from 09:15 + first bars on day."""
+    start = pd.Timestamp(day) + pd.Timedelta(hours=9, minutes=15 + 15 * first)
+    return [[(start + pd.Timedelta(minutes=15 * i)).strftime('%Y-%m-%dT%H:%M:%S+05:30'), c, c + 1, c - 1, c, 100]
+            for i, c in enumerate(closes)]
+
+def test_pick_contract_skips_expired_and_too_near_contracts(dmi_bot):
+    # Three days out the October contract is still traded; two days out we move to November
+    assert dmi_bot.pick_contract("NIFTY", TODAY - pd.Timedelta(days=1))['trading_symbol'] == "NIFTYOCT"
+    assert dmi_bot.pick_contract("NIFTY", TODAY)['trading_symbol'] == "NIFTYNOV"
+    assert dmi_bot.pick_contract("NIFTY", TODAY)['token'] == "1003"
+    # Past every rollover window the last listed contract is kept; unknown scripts get none
+    assert dmi_bot.pick_contract("NIFTY", TODAY + pd.Timedelta(days=40))['trading_symbol'] == "NIFTYNOV"
+    assert dmi_bot.pick_contract("SENSEX", TODAY) is None
+
+def test_roll_back_adjusts_the_prior_contracts_bars(dmi_bot):
+    day = TODAY - pd.Timedelta(days=1)
+    old_closes = 100.0 + np.arange(8)
+    candle_store.save_candles("NFO", "NIFTY_CONT", dmi_bot.BASE_INTERVAL,
+                              pd.DataFrame(bars(day, old_closes), columns=['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume']))
+    # The new contract overlaps the last four bars at a 12.5 premium, then carries on
+    new_closes = np.r_[old_closes[4:] + 12.5, 120.0, 121.0]
+    dmi_bot.smartApi = CandleApi(bars(day, new_closes, first=4))
+    near, far = dmi_bot.pick_contract("NIFTY", TODAY - pd.Timedelta(days=1)), dmi_bot.pick_contract("NIFTY", TODAY)
+
+    assert dmi_bot.roll_continuous_series("NIFTY", near, far) == pytest.approx(12.5)
+    cont = candle_store.load_arrays("NFO", "NIFTY_CONT", dmi_bot.BASE_INTERVAL, mmap=False)
+    np.testing.assert_allclose(cont['Close'], np.r_[old_closes + 12.5, 120.0, 121.0])
+    np.testing.assert_allclose(cont['High'][:4], old_closes[:4] + 13.5)
+    # The hourly series is re-derived from the adjusted bars
+    hourly = candle_store.load_arrays("NFO", "NIFTY_CONT", dmi_bot.TIMEFRAME, mmap=False)
+    assert hourly['Close'][0] == pytest.approx(old_closes[3] + 12.5)
+
+def test_check_rollovers_moves_positions_at_the_rollover_window(dmi_bot):
+    day = TODAY - pd.Timedelta(days=1)
+    candle_store.save_candles("NFO", "NIFTY_CONT", dmi_bot.BASE_INTERVAL,
+                              pd.DataFrame(bars(day, [100.0, 101.0]), columns=['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume']))
+    dmi_bot.smartApi = CandleApi(bars(day, [111.0, 112.0], first=1))
+    dmi_bot.WATCHLIST, dmi_bot.TOKEN_MAP = ["NIFTY"], {}
+    near = dmi_bot.pick_contract("NIFTY", TODAY - pd.Timedelta(days=1))
+    dmi_bot.save_continuous_meta({"NIFTY": near})
+    data = {"capital": 500000.0, "open_shorts": {}, "closed_longs": [], "closed_shorts": [], "signals": [],
+            "open_longs": {"NIFTY": {"entry_price": 95.0, "qty": 50, "trading_symbol": "NIFTYOCT"}}}
+
+    dmi_bot.check_rollovers(data)
+    pos = data["open_longs"]["NIFTY"]
+    assert pos["trading_symbol"] == "NIFTYNOV" and pos["entry_price"] == pytest.approx(105.0)
+    assert data["capital"] == pytest.approx(500000.0 - 10.0 * 50)
+    assert dmi_bot.TOKEN_MAP["NIFTY"]["token"] == "1003"
+    assert dmi_bot.load_continuous_meta()["NIFTY"]["trading_symbol"] == "NIFTYNOV"
+
+    # Once rolled, the next scan leaves the position alone
+    dmi_bot.check_rollovers(data)
+    assert data["open_longs"]["NIFTY"]["entry_price"] == pytest.approx(105.0)
+    assert data["capital"] == pytest.approx(500000.0 - 10.0 * 50)
+
+def test_no_rollover_before_the_window(dmi_bot):
+    dmi_bot.FUTURES_MASTER = dmi_bot.FUTURES_MASTER.assign(
+        expiry_date=dmi_bot.FUTURES_MASTER['expiry_date'] + pd.Timedelta(days=1))   # October now expires in 3 days
+    dmi_bot.smartApi = CandleApi([])
+    dmi_bot.WATCHLIST, dmi_bot.TOKEN_MAP = ["NIFTY"], {}
+    near = dmi_bot.pick_contract("NIFTY", TODAY)
+    assert near['trading_symbol'] == "NIFTYOCT"
+    dmi_bot.save_continuous_meta({"NIFTY": near})
+    data = {"capital": 500000.0, "open_shorts": {}, "signals": [],
+            "open_longs": {"NIFTY": {"entry_price": 95.0, "qty": 50, "trading_symbol": "NIFTYOCT"}}}
+
+    dmi_bot.check_rollovers(data)
+    assert data["open_longs"]["NIFTY"] == {"entry_price": 95.0, "qty": 50, "trading_symbol": "NIFTYOCT"}
+    assert data["capital"] == 500000.0 and data["signals"] == []
+
+def test_held_scripts_keep_their_contract_across_unrelated_reloads(dmi_bot):
+    nifty = dmi_bot.pick_contract("NIFTY", TODAY)
+    dmi_bot.WATCHLIST, dmi_bot.TOKEN_MAP = ["NIFTY", "RELIANCE"], {"NIFTY": nifty, "RELIANCE": dict(nifty, trading_symbol="RELFUT")}
+    data = dmi_bot.load_portfolio()
+    data["open_longs"]["NIFTY"] = {"entry_price": 95.0, "qty": 50, "trading_symbol": nifty['trading_symbol']}
+    dmi_bot.save_portfolio(data)
+
+    config = json.loads(open("config.json").read())
+    config['dmi']['watchlist'] = ["RELIANCE"]
+    dmi_bot.apply_config(config, {"dmi.watchlist"})
+    assert set(dmi_bot.TOKEN_MAP) == {"NIFTY", "RELIANCE"}
+    # An edit that leaves the watchlist alone must not orphan the open NIFTY position
+    config['dmi']['brokerage_rate'] = 0.002
+    dmi_bot.apply_config(config, {"dmi.brokerage_rate"})
+    assert set(dmi_bot.TOKEN_MAP) == {"NIFTY", "RELIANCE"} and dmi_bot.BROKERAGE_RATE == 0.002
+
+    # Once the position is closed the dropped script is forgotten
+    data["open_longs"] = {}
+    dmi_bot.save_portfolio(data)
+    dmi_bot.apply_config(config, {"dmi.brokerage_rate"})
+    assert set(dmi_bot.TOKEN_MAP) == {"RELIANCE"}
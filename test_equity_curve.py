@@ -0,0 +1,73 @@
+import os
+import numpy as np
+import pytest
+import equity_curve
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(equity_curve, "EQUITY_DIR", str(tmp_path))
+
+def walk(n=5000, seed=11):
+    rng = np.random.default_rng(seed)
+    return np.arange(n, dtype=float) * 60, 1_000_000 + rng.normal(0, 500, n).cumsum()
+
+@pytest.mark.parametrize("points", [3, 10, 257, 1000])
+def test_lttb_keeps_the_endpoints_and_the_budget(points):
+    x, y = walk()
+    keep = equity_curve.lttb(x, y, points)
+    assert len(keep) == points and keep[0] == 0 and keep[-1] == len(x) - 1
+    assert (np.diff(keep) > 0).all()          # One sample per bucket, in order
+
+def test_lttb_picks_the_spike_of_a_bucket():
+    x = np.arange(100, dtype=float)
+    y = np.zeros(100)
+    y[37] = 50.0
+    assert 37 in equity_curve.lttb(x, y, 10)
+    # Budgets at or beyond the series length (or too small to draw) keep everything
+    assert len(equity_curve.lttb(x, y, 100)) == 100 and len(equity_curve.lttb(x, y, 2)) == 100
+
+@pytest.mark.parametrize("points", [2, 7, 64, 999])
+def test_minmax_buckets_keep_every_bucket_extreme(points):
+    _, y = walk()
+    keep = equity_curve.minmax_buckets(y, points)
+    assert len(keep) <= points and (np.diff(keep) > 0).all()
+    edges = np.unique(np.linspace(0, len(y), points // 2 + 1).astype(np.int64))
+    kept = set(keep.tolist())
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        assert lo + int(np.argmin(y[lo:hi])) in kept and lo + int(np.argmax(y[lo:hi])) in kept
+    assert y[keep].min() == y.min() and y[keep].max() == y.max()
+
+def test_downsampling_keeps_the_deepest_drawdown():
+    x, y = walk()
+    equity_curve.write_series("bt", x.astype(np.int64), y)
+    curve = equity_curve.downsample("bt", points=200)
+    records = equity_curve.load_series("bt")
+    assert len(curve) <= 200
+    assert curve['Drawdown'].min() == pytest.approx(-records['drawdown'].max())
+    assert curve['Equity'].iloc[0] == y[0] and curve['Equity'].iloc[-1] == y[-1]
+    # A zoom window only reads its own records
+    window = equity_curve.downsample("bt", start=60 * 1000, end=60 * 1999, points=100)
+    assert window['Timestamp'].iloc[0].timestamp() == 60 * 1000 and window['Timestamp'].iloc[-1].timestamp() == 60 * 1999
+
+def test_append_mark_carries_the_peak_across_marks():
+    assert equity_curve.append_mark("live", 100.0, ts=1000)
+    assert equity_curve.append_mark("live", 120.0, ts=2000)
+    assert equity_curve.append_mark("live", 90.0, ts=3000)
+    # Marks at or before the last one are ignored (a rerun inside the same bucket)
+    assert not equity_curve.append_mark("live", 500.0, ts=3000)
+    assert not equity_curve.append_mark("live", 500.0, ts=2500)
+    records = equity_curve.load_series("live")
+    assert records['ts'].tolist() == [1000, 2000, 3000]
+    assert records['peak'].tolist() == [100.0, 120.0, 120.0] and records['drawdown'][-1] == pytest.approx(25.0)
+    assert equity_curve.load_series("live", start=2000, end=3000)['ts'].tolist() == [2000, 3000]
+    assert equity_curve.series_range("live") == (1000, 3000) and equity_curve.list_series() == ["live"]
+
+def test_appends_after_a_torn_record_start_on_a_record_boundary():
+    equity_curve.append_mark("live", 100.0, ts=1000)
+    with open(equity_curve.series_path("live"), 'ab') as f:
+        f.write(b"\1" * 5)                       # Interrupted append
+    assert len(equity_curve.load_series("live")) == 1
+    assert equity_curve.append_mark("live", 110.0, ts=2000)
+    records = equity_curve.load_series("live")
+    assert records['ts'].tolist() == [1000, 2000] and records['equity'].tolist() == [100.0, 110.0]
+    assert os.path.getsize(equity_curve.series_path("live")) == 2 * equity_curve.EQUITY_DTYPE.itemsize
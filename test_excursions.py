@@ -0,0 +1,65 @@
+import time
+import numpy as np
+import pandas as pd
+import pytest
+import candle_store
+import excursions
+
+def bars(highs, lows, start="2026-03-02 09:15", freq="15min"):
+    stamps = pd.date_range(start, periods=len(highs), freq=freq)
+    return excursions.BarIndex(candle_store.to_epoch(stamps), highs, lows), stamps
+
+def test_sparse_table_matches_brute_force():
+    rng = np.random.default_rng(7)
+    values = rng.integers(0, 20, 500).astype(float)  # Plenty of ties
+    lo = rng.integers(0, 500, 2000)
+    hi = np.minimum(lo + rng.integers(0, 300, 2000), 499)
+    top = excursions.SparseTable(values, "max").query(lo, hi)
+    bottom = excursions.SparseTable(values, "min").query(lo, hi)
+    for l, h, t, b in zip(lo, hi, top, bottom):
+        window = values[l:h + 1]
+        assert t == l + np.argmax(window) and b == l + np.argmin(window)
+
+def test_long_and_short_excursions():
+    index, stamps = bars([101, 104, 103, 106, 102], [99, 100, 97, 101, 100])
+    start = candle_store.to_epoch(stamps[[1, 1]])
+    end = candle_store.to_epoch(stamps[[4, 4]])  # Exposed to bars 1..3
+    result = excursions.analyze(index, [True, False], start, end, [100, 100], [103, 98], risk=[2, 2])
+    assert list(result["MFE"]) == [6, 3] and list(result["MAE"]) == [3, 6]
+    assert list(result["Bars To Peak"]) == [3, 2] and list(result["Bars Held"]) == [3, 3]
+    assert result["MFE R"][0] == 3 and result["Capture %"][0] == pytest.approx(50)
+    assert result["Capture %"][1] == pytest.approx(200 / 3)
+    # No bars in the window: unknown, not zero
+    empty = excursions.analyze(index, [True], end + 3600, end + 7200, [100], [100])
+    assert np.isnan(empty["MFE"][0]) and np.isnan(empty["Bars Held"][0])
+
+def test_trade_log_with_offsets_and_wall_clock_alignment():
+    index, _ = bars([101, 105, 102, 103], [99, 98, 96, 100])
+    trades = [
+        # Backtest style: entry / exit are bar labels, exposure starts one bar after entry
+        {"Ticker": "ACME", "Type": "LONG", "Entry Date": "2026-03-02 09:15", "Exit Date": "2026-03-02 09:30",
+         "Entry Price": 100.0, "Exit Price": 101.0},
+        {"Ticker": "NONE", "Type": "LONG", "Entry Date": "2026-03-02 09:15", "Exit Date": "2026-03-02 09:30",
+         "Entry Price": 100.0, "Exit Price": 101.0},
+    ]
+    log = excursions.for_trades(trades, lambda t: index if t == "ACME" else None, offset=900)
+    assert log.loc[0, "MFE"] == 5 and log.loc[0, "MAE"] == 2 and log.loc[0, "Bars Held"] == 1
+    assert np.isnan(log.loc[1, "MFE"])
+    # Live style: scan wall-clock times are floored onto the bar grid first
+    live = [{"Ticker": "ACME", "Type": "SHORT", "Entry Date": "2026-03-02 09:31", "Exit Date": "2026-03-02 10:02",
+             "Entry Price": 104.0, "Exit Price": 100.0, "Risk": 2.0}]
+    log = excursions.for_trades(live, lambda t: index, risk_col='Risk', align="FIFTEEN_MINUTE")
+    assert log.loc[0, "MFE"] == 8 and log.loc[0, "MFE R"] == 4 and log.loc[0, "Bars Held"] == 2
+    stats = excursions.summary(log)
+    assert stats["reached_2r_pct"] == 100 and stats["gave_back_2r_pct"] == 0
+
+def test_thousands_of_trades_in_milliseconds():
+    rng = np.random.default_rng(1)
+    close = 1000 + np.cumsum(rng.normal(0, 1, 50000))
+    index, _ = bars(close + 1, close - 1)
+    lo = rng.integers(0, 49000, 5000)
+    start, end = index.ts[lo], index.ts[lo + rng.integers(1, 1000, 5000)]
+    began = time.perf_counter()
+    result = excursions.analyze(index, rng.random(5000) > 0.5, start, end, close[lo], close[lo], np.full(5000, 10.0))
+    assert time.perf_counter() - began < 0.05
+    assert not np.isnan(result["MFE"]).any()
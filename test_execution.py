@@ -0,0 +1,123 @@
+import time
+import execution
+
+BROKERAGE = 0.001
+
+def make_engine(tmp_path, **broker_args):
+    broker = execution.MockBroker(seed=1, **broker_args)
+    engine = execution.ExecutionEngine("test", broker, journal_file=str(tmp_path / "orders_test.json"),
+                                       brokerage=BROKERAGE, fill_timeout=5.0)
+    return engine, broker
+
+def portfolio():
+    return {"capital": 100000.0, "open_longs": {}, "open_shorts": {}, "closed_longs": [], "closed_shorts": [], "signals": []}
+
+def open_long(data, engine, ticker, qty, price, decided_at="2026-01-05 10:15"):
+    # Same bookkeeping bot.py does for a paper entry
+    cost = qty * price
+    data['capital'] -= cost + cost * BROKERAGE
+    data['open_longs'][ticker] = {"entry_date": decided_at, "entry_price": price, "qty": qty,
+                                  "risk_points": 2.0, "stop_loss": price - 2.0, "current_price": price}
+    engine.enter("open_longs", ticker, qty, price, -(cost + cost * BROKERAGE), decided_at=decided_at)
+
+def close_long(data, engine, ticker, price, decided_at="2026-01-05 14:15"):
+    pos = data['open_longs'].pop(ticker)
+    qty, entry = pos['qty'], pos['entry_price']
+    brokerage = (entry * qty + price * qty) * BROKERAGE
+    trade = {"Ticker": ticker, "Entry Date": pos['entry_date'], "Exit Date": decided_at, "Entry Price": entry,
+             "Exit Price": price, "Qty": qty, "PnL": round((price - entry) * qty - brokerage, 2), "Status": "CLOSED"}
+    data['closed_longs'].append(trade)
+    cash = price * qty - brokerage
+    data['capital'] += cash
+    engine.exit("open_longs", ticker, qty, price, cash, pos, trade, decided_at=decided_at)
+
+def test_paper_mode_returns_closes_without_orders():
+    engine = execution.ExecutionEngine("test")
+    data = portfolio()
+    open_long(data, engine, "AAA", 10, 100.0)
+    close_long(data, engine, "AAA", 110.0)
+    closes = engine.flush(data)
+    assert [side for side, _ in closes] == ["LONG"]
+    assert data['closed_longs'][0]['Exit Price'] == 110.0
+
+def test_orders_are_submitted_concurrently(tmp_path):
+    engine, broker = make_engine(tmp_path, latency=(0.3, 0.3), slippage_bps=0.0)
+    data = portfolio()
+    for i in range(8):
+        open_long(data, engine, f"S{i}", 10, 100.0)
+    started = time.time()
+    engine.flush(data)
+    # Eight sequential 0.3s round trips would take 2.4s
+    assert time.time() - started < 1.5
+    assert broker.placed == 8
+    assert all("order_status" not in pos for pos in data['open_longs'].values())
+
+def test_fill_price_is_reconciled_into_position_and_capital(tmp_path):
+    engine, _ = make_engine(tmp_path, latency=(0.01, 0.02), slippage_bps=50.0)
+    data = portfolio()
+    open_long(data, engine, "AAA", 10, 100.0)
+    engine.flush(data)
+    pos = data['open_longs']["AAA"]
+    assert 100.0 <= pos['entry_price'] <= 100.5
+    fill = engine.orders[next(iter(engine.orders))]['avg_price']
+    assert abs(data['capital'] - (100000.0 - 10 * fill * (1 + BROKERAGE))) < 1e-6
+
+def test_same_decision_is_never_sent_twice(tmp_path):
+    engine, broker = make_engine(tmp_path, latency=(0.01, 0.02))
+    data = portfolio()
+    open_long(data, engine, "AAA", 10, 100.0)
+    engine.flush(data)
+    # A restarted bot re-making the same decision (same minute) reuses the journaled order
+    restarted = execution.ExecutionEngine("test", broker, journal_file=engine.journal_file, brokerage=BROKERAGE, fill_timeout=1.0)
+    restarted.enter("open_longs", "AAA", 10, 100.0, -1001.0, decided_at="2026-01-05 10:15")
+    restarted.flush(portfolio())
+    assert broker.placed == 1
+
+def test_rejected_entry_is_undone(tmp_path):
+    engine, _ = make_engine(tmp_path, latency=(0.01, 0.02), reject_rate=1.0)
+    data = portfolio()
+    messages = []
+    open_long(data, engine, "AAA", 10, 100.0)
+    engine.flush(data, log=messages.append)
+    assert data['open_longs'] == {}
+    assert abs(data['capital'] - 100000.0) < 1e-6
+    assert any("ENTRY REJECTED" in m for m in messages)
+
+def test_rejected_exit_restores_position(tmp_path):
+    engine, broker = make_engine(tmp_path, latency=(0.01, 0.02), slippage_bps=0.0)
+    data = portfolio()
+    open_long(data, engine, "AAA", 10, 100.0)
+    engine.flush(data)
+    capital = data['capital']
+    broker.reject_rate = 1.0
+    close_long(data, engine, "AAA", 110.0)
+    closes = engine.flush(data, log=lambda m: None)
+    assert closes == []
+    assert data['open_longs']["AAA"]['qty'] == 10
+    assert data['closed_longs'] == []
+    assert abs(data['capital'] - capital) < 1e-6
+
+def test_partial_exit_keeps_remainder_open(tmp_path):
+    engine, broker = make_engine(tmp_path, latency=(0.01, 0.02), slippage_bps=0.0)
+    data = portfolio()
+    open_long(data, engine, "AAA", 10, 100.0)
+    engine.flush(data)
+    broker.partial_rate = 1.0
+    close_long(data, engine, "AAA", 110.0)
+    closes = engine.flush(data, log=lambda m: None)
+    assert closes[0][1]['Qty'] == 5
+    assert data['open_longs']["AAA"]['qty'] == 5
+    # Realized: 5 shares at +10, less brokerage on those 5
+    assert abs(closes[0][1]['PnL'] - (50 - (500 + 550) * BROKERAGE)) < 0.01
+
+def test_unfilled_orders_stay_pending_and_reconcile_later(tmp_path):
+    engine, broker = make_engine(tmp_path, latency=(0.5, 0.5), slippage_bps=0.0)
+    engine.fill_timeout = 0.05
+    data = portfolio()
+    open_long(data, engine, "AAA", 10, 100.0)
+    engine.flush(data)
+    assert data['open_longs']["AAA"]['order_status'] == "PENDING"
+    time.sleep(0.6)
+    engine.flush(data)
+    assert "order_status" not in data['open_longs']["AAA"]
+    assert broker.placed == 1
@@ -0,0 +1,54 @@
+import market_data
+
+class FakeApi:
+    def __init__(self, prices, fail_first_with=None):
+        self.prices = prices     # {(exchange, token): ltp}
+        self.calls = []
+        self.fail_first_with = fail_first_with
+
+    def getMarketData(self, mode, exchange_tokens):
+        self.calls.append(exchange_tokens)
+        if self.fail_first_with:
+            code, self.fail_first_with = self.fail_first_with, None
+            return {"status": False, "errorcode": code, "message": "Invalid Token", "data": None}
+        fetched = [{"exchange": exchange, "symbolToken": token, "ltp": self.prices[(exchange, token)]}
+                   for exchange, tokens in exchange_tokens.items() for token in tokens if (exchange, token) in self.prices]
+        return {"status": True, "data": {"fetched": fetched, "unfetched": []}}
+
+class FakeSession:
+    def __init__(self):
+        self.refreshed = 0
+
+    def get(self, force_refresh=False):
+        self.refreshed += force_refresh
+
+def test_one_request_per_exchange():
+    api = FakeApi({("NSE", "1"): 100.0, ("NSE", "2"): 200.0, ("NFO", "3"): 300.0, ("MCX", "4"): 400.0})
+    instruments = {"A": {"exchange": "NSE", "token": "1"}, "B": {"exchange": "NSE", "token": "2"},
+                   "C": {"exchange": "NFO", "token": "3"}, "D": {"exchange": "MCX", "token": 4}}
+    prices = market_data.quote_ltp(api, instruments)
+    assert prices == {"A": 100.0, "B": 200.0, "C": 300.0, "D": 400.0}
+    assert sorted(next(iter(call)) for call in api.calls) == ["MCX", "NFO", "NSE"]
+
+def test_large_books_are_chunked():
+    api = FakeApi({("NSE", str(i)): float(i) for i in range(120)})
+    prices = market_data.quote_ltp(api, {f"S{i}": {"exchange": "NSE", "token": str(i)} for i in range(120)})
+    assert len(prices) == 120
+    assert [len(call["NSE"]) for call in api.calls] == [50, 50, 20]
+
+def test_missing_tokens_and_quotes_are_skipped():
+    api = FakeApi({("NSE", "1"): 100.0})
+    prices = market_data.quote_ltp(api, {"A": {"exchange": "NSE", "token": "1"}, "B": {"exchange": "NSE", "token": "2"},
+                                         "C": {"exchange": "NSE", "token": None}, "D": {}})
+    assert prices == {"A": 100.0}
+
+def test_expired_session_is_refreshed_once():
+    api, session = FakeApi({("NSE", "1"): 100.0}, fail_first_with="AG8001"), FakeSession()
+    assert market_data.quote_ltp(api, {"A": {"exchange": "NSE", "token": "1"}}, session) == {"A": 100.0}
+    assert session.refreshed == 1
+
+def test_mark_positions_updates_both_books():
+    data = {"open_longs": {"A": {"current_price": 1.0}}, "open_shorts": {"B": {"current_price": 2.0}, "C": {"current_price": 3.0}}}
+    assert market_data.mark_positions(data, {"A": 10.456, "B": 20.0}) == 2
+    assert data["open_longs"]["A"]["current_price"] == 10.46
+    assert data["open_shorts"]["C"]["current_price"] == 3.0
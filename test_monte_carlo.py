@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+import monte_carlo
+
+PNL = np.array([12000.0, -8000.0, -8000.0, 25000.0, -8000.0, 4000.0, -3000.0, 15000.0, -8000.0, 6000.0])
+
+@pytest.mark.parametrize("method", ["bootstrap", "shuffle"])
+def test_a_seed_fixes_every_run(method):
+    results = monte_carlo.simulate(PNL, runs=500, initial_capital=100000.0, method=method, seed=7)
+    assert set(results) == {"final_equity", "max_drawdown", "max_losing_streak"}
+    assert all(values.shape == (500,) for values in results.values())
+    again = monte_carlo.simulate(PNL, runs=500, initial_capital=100000.0, method=method, seed=7)
+    for name, values in results.items():
+        np.testing.assert_array_equal(values, again[name])
+    other = monte_carlo.simulate(PNL, runs=500, initial_capital=100000.0, method=method, seed=8)
+    assert not np.array_equal(results["max_drawdown"], other["max_drawdown"])
+
+def test_shuffles_keep_the_total_and_bootstraps_stay_in_range():
+    shuffled = monte_carlo.simulate(PNL, runs=300, initial_capital=100000.0, method="shuffle", seed=1)
+    np.testing.assert_allclose(shuffled["final_equity"], 100000.0 + PNL.sum())
+    assert shuffled["max_losing_streak"].min() >= 1 and shuffled["max_losing_streak"].max() <= 5
+    boot = monte_carlo.simulate(PNL, runs=300, initial_capital=100000.0, method="bootstrap", seed=1)
+    n = len(PNL)
+    assert (boot["final_equity"] >= 100000.0 + n * PNL.min()).all() and (boot["final_equity"] <= 100000.0 + n * PNL.max()).all()
+    assert (boot["max_drawdown"] >= 0).all() and boot["final_equity"].std() > 0
+    # The recorded order is one of the shuffles
+    actual = monte_carlo.path_stats(PNL, 100000.0)
+    assert actual["final_equity"] == 100000.0 + PNL.sum() and actual["max_losing_streak"] == 2
+    assert shuffled["max_drawdown"].min() <= actual["max_drawdown"] <= shuffled["max_drawdown"].max()
+
+def test_percentile_table_is_ordered():
+    results = monte_carlo.simulate(PNL, runs=2000, initial_capital=100000.0, seed=3)
+    table = monte_carlo.summarize(results)
+    assert list(table.index) == [f"P{p}" for p in monte_carlo.PERCENTILES]
+    assert list(table.columns) == ["final_equity", "max_drawdown", "max_losing_streak"]
+    for column in table:
+        assert table[column].is_monotonic_increasing
+    assert table.loc["P50", "final_equity"] == pytest.approx(np.median(results["final_equity"]))
+    scale = monte_carlo.risk_scale_for_drawdown(results, 5.0, confidence=95)
+    assert scale == pytest.approx(5.0 / np.percentile(results["max_drawdown"], 95))
+
+def test_bad_input_is_rejected():
+    with pytest.raises(ValueError):
+        monte_carlo.simulate(PNL, method="jackknife")
+    with pytest.raises(ValueError):
+        monte_carlo.simulate([])
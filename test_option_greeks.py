@@ -0,0 +1,108 @@
+import time
+from datetime import datetime
+import numpy as np
+import pytest
+import option_greeks
+
+NOW = datetime(2026, 10, 20, 11, 0, tzinfo=option_greeks.IST)
+FORWARD = 24812.4
+EXPIRY = "27OCT2026"
+T = option_greeks.years_to_expiry(EXPIRY, NOW)
+
+def smile(strike):
+    m = np.log(np.asarray(strike) / FORWARD)
+    return 0.13 - 0.12 * m + 1.5 * m * m
+
+def scrip_master():
+    """NIFTY option rows as the scrip master lists them (strike x100), two expiries plus noise."""
+    rows = []
+    for expiry, offset in ((EXPIRY, 0), ("03NOV2026", 5000)):
+        for i, strike in enumerate(range(22800, 26850, 50)):
+            for j, kind in enumerate(("CE", "PE")):
+                rows.append({"token": str(40000 + offset + 2 * i + j), "symbol": f"NIFTY{expiry[:5]}{expiry[-2:]}{strike}{kind}",
+                             "name": "NIFTY", "expiry": expiry, "strike": f"{strike * 100:.6f}", "lotsize": "75",
+                             "instrumenttype": "OPTIDX", "exch_seg": "NFO"})
+    rows.append({"token": "35001", "symbol": "NIFTY27OCT26FUT", "name": "NIFTY", "expiry": EXPIRY, "strike": "-1.000000",
+                 "lotsize": "75", "instrumenttype": "FUTIDX", "exch_seg": "NFO"})
+    return rows
+
+class ReplayApi:
+    """Answers getMarketData from a recorded LTP snapshot ({token: ltp}), like the exchange: 0.05 ticks, illiquid strikes unquoted."""
+
+    def __init__(self, ltps):
+        self.ltps = ltps
+        self.calls = []
+
+    def getMarketData(self, mode, exchange_tokens):
+        self.calls.append(exchange_tokens)
+        fetched = [{"exchange": ex, "symbolToken": tok, "ltp": self.ltps[tok]}
+                   for ex, tokens in exchange_tokens.items() for tok in tokens if tok in self.ltps]
+        return {"status": True, "data": {"fetched": fetched, "unfetched": []}}
+
+def recorded_quotes(chain):
+    premium = option_greeks.black76_price(FORWARD, chain['strike'].to_numpy(), T, smile(chain['strike'].to_numpy()), chain['call'].to_numpy())
+    ticks = np.round(premium / 0.05) * 0.05
+    return {tok: float(p) for tok, p in zip(chain['token'], ticks) if p >= 0.05}
+
+def test_round_trip_recovers_volatility_across_moneyness():
+    strikes = np.linspace(18000, 32000, 281)
+    sigma = np.full(strikes.shape, 0.22)
+    for call in (True, False):
+        price = option_greeks.black76_price(FORWARD, strikes, 30 / 365, sigma, call)
+        out = option_greeks.implied_vol_greeks(price, FORWARD, strikes, 30 / 365, call)
+        # Strikes with only paise of time value have almost no vega, so the price tolerance leaves a little IV slack there
+        time_value = price - np.exp(-option_greeks.RISK_FREE_RATE * 30 / 365) * np.maximum((FORWARD - strikes) * (1 if call else -1), 0)
+        assert np.allclose(out['iv'][time_value > 0.5], 0.22, atol=1e-6)
+        assert np.allclose(out['iv'][time_value > 1e-3], 0.22, atol=1e-4)
+        assert out['iterations'].max() <= option_greeks.MAX_ITERATIONS
+
+def test_greeks_match_finite_differences():
+    strikes = np.array([23500.0, 24800.0, 26000.0])
+    for call in (True, False):
+        price = option_greeks.black76_price(FORWARD, strikes, T, 0.15, call)
+        out = option_greeks.implied_vol_greeks(price, FORWARD, strikes, T, call)
+        h = 1.0
+        up, down = (option_greeks.black76_price(FORWARD + d, strikes, T, 0.15, call) for d in (h, -h))
+        assert np.allclose(out['delta'], (up - down) / (2 * h), atol=1e-5)
+        assert np.allclose(out['gamma'], (up - 2 * price + down) / h ** 2, atol=1e-6)
+        vega = (option_greeks.black76_price(FORWARD, strikes, T, 0.1505, call) - option_greeks.black76_price(FORWARD, strikes, T, 0.1495, call)) * 10
+        assert np.allclose(out['vega'], vega, rtol=1e-4)
+        minute = 1 / (option_greeks.DAYS_PER_YEAR * 1440)
+        theta = (option_greeks.black76_price(FORWARD, strikes, T - minute, 0.15, call)
+                 - option_greeks.black76_price(FORWARD, strikes, T + minute, 0.15, call)) * 720
+        assert np.allclose(out['theta'], theta, rtol=1e-5)
+
+def test_quotes_without_an_implied_volatility_are_nan():
+    intrinsic = FORWARD - 24000
+    out = option_greeks.implied_vol_greeks([intrinsic * 0.99, 0.0, np.nan, FORWARD * 1.01, 50.0], FORWARD, 24000.0,
+                                           [T, T, T, T, 0.0], True)
+    assert np.isnan(out['iv']).all() and np.isnan(out['delta']).all()
+
+def test_chain_from_scrip_master_and_replayed_quotes():
+    chain = option_greeks.option_chain(scrip_master(), "NIFTY", today=NOW.date())
+    assert len(chain) == 162 and (chain['expiry'] == chain['expiry'].iat[0]).all()
+    assert chain['strike'].min() == 22800 and chain['lotsize'].iat[0] == 75
+
+    ltps = recorded_quotes(chain)
+    ltps["35001"] = FORWARD + 3.5                    # The future, a little off the options' forward
+    api = ReplayApi(ltps)
+    priced, forward = option_greeks.quote_and_price(api, chain, forward=ltps["35001"], now=NOW)
+    assert [len(c["NFO"]) for c in api.calls] == [50, 50, 50, 12]
+    assert forward == pytest.approx(FORWARD, abs=0.1)
+    assert option_greeks.atm_iv(priced, forward) == pytest.approx(float(smile(24800)), abs=2e-3)
+
+    # Out-of-the-money side, as the chain is read; tick rounding only blurs the far wings
+    otm = priced[priced['call'] == (priced['strike'] > forward)]
+    liquid = otm[otm['ltp'] > 5]
+    assert np.allclose(liquid['iv'], smile(liquid['strike'].to_numpy()), atol=5e-3)
+    assert ((priced['delta'] > 0) == priced['call'])[priced['iv'].notna()].all()
+
+def test_two_full_chains_reprice_well_inside_a_minute():
+    strikes = np.tile(np.arange(20000.0, 60000.0, 50.0), 2)
+    call = np.repeat([True, False], len(strikes) // 2)
+    price = option_greeks.black76_price(FORWARD, strikes, T, smile(strikes), call)
+    option_greeks.implied_vol_greeks(price[:10], FORWARD, strikes[:10], T, call[:10])   # Compile
+    start = time.perf_counter()
+    out = option_greeks.implied_vol_greeks(price, FORWARD, strikes, T, call)
+    assert time.perf_counter() - start < 1.0
+    assert np.isfinite(out['iv']).sum() > 0
@@ -0,0 +1,84 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+import pytest
+import equity_curve
+import portfolio_api
+
+def closed(ticker, exit_date, pnl):
+    return {"Ticker": ticker, "Entry Date": "2026-03-02 09:15", "Exit Date": exit_date, "Entry Price": 100.0,
+            "Exit Price": 100.0 + pnl / 10, "Qty": 10, "PnL": pnl}
+
+PORTFOLIO = {
+    "capital": 100000.0,
+    "open_longs": {"NIFTY": {"entry_price": 100.0, "current_price": 103.0, "qty": 10}},
+    "open_shorts": {},
+    "closed_longs": [closed("ACME", f"2026-03-{day:02d} 15:15", 10.0 * day) for day in range(2, 9)],
+    "closed_shorts": [closed("BETA", "2026-03-05 11:15", -25.0)],
+    "signals": [{"Ticker": f"S{i}"} for i in range(30)],
+}
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """The API serving one portfolio file from tmp_path on a free port; yields get(path, headers) -> (status, body, headers)."""
+    path = tmp_path / "portfolio.json"
+    path.write_text(json.dumps(PORTFOLIO))
+    monkeypatch.setattr(equity_curve, "EQUITY_DIR", str(tmp_path / "equity"))
+    monkeypatch.setattr(portfolio_api, "STATES", {"nifty": portfolio_api.PortfolioState("nifty", str(path)),
+                                                  "dmi": portfolio_api.PortfolioState("dmi", str(tmp_path / "missing.json"))})
+    for state in portfolio_api.STATES.values():
+        state.refresh()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), portfolio_api.PortfolioHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def get(url, headers=None):
+        request = urllib.request.Request(f"http://127.0.0.1:{server.server_port}{url}", headers=headers or {})
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.loads(response.read()), response.headers
+        except urllib.error.HTTPError as e:
+            body = e.read()
+            return e.code, json.loads(body) if body else None, e.headers
+    yield get
+    server.shutdown()
+    server.server_close()
+
+def test_endpoints_and_status_codes(api):
+    assert api("/portfolios")[:2] == (200, ["dmi", "nifty"])
+    status, summary, _ = api("/nifty/summary")
+    assert status == 200 and summary["closed_trades"] == 8 and summary["unrealized_pnl"] == 30.0
+    assert api("/nifty/positions")[1]["open_longs"] == PORTFOLIO["open_longs"]
+    assert api("/nifty/nope")[0] == 404 and api("/other/summary")[0] == 404
+    assert api("/dmi/summary")[0] == 503              # Its file does not exist yet
+    # Unchanged content is answered with 304
+    status, _, headers = api("/nifty/snapshot")
+    assert api("/nifty/snapshot", {"If-None-Match": headers["ETag"]})[0] == 304
+
+def test_closed_trades_are_paginated_newest_first(api):
+    status, first, headers = api("/nifty/closed?page=1&size=3")
+    assert status == 200 and first["total"] == 8 and first["size"] == 3
+    assert [t["Exit Date"][:10] for t in first["trades"]] == ["2026-03-08", "2026-03-07", "2026-03-06"]
+    last = api("/nifty/closed?page=3&size=3")[1]
+    assert [t["Exit Date"][:10] for t in last["trades"]] == ["2026-03-03", "2026-03-02"]
+    assert api("/nifty/closed?page=4&size=3")[1]["trades"] == []
+    shorts = api("/nifty/closed?side=short")[1]
+    assert shorts["total"] == 1 and shorts["trades"][0]["Side"] == "SHORT"
+    # Pages do not share an ETag
+    assert api("/nifty/closed?page=2&size=3")[2]["ETag"] != headers["ETag"]
+    assert len(api("/nifty/signals")[1]) == 20 and len(api("/nifty/signals?limit=5")[1]) == 5
+
+@pytest.mark.parametrize("url", ["/nifty/signals?limit=abc", "/nifty/signals?limit=-1", "/nifty/closed?page=0",
+                                 "/nifty/closed?size=x", "/nifty/closed?page=-2", "/nifty/closed?side=both"])
+def test_bad_query_parameters_are_rejected(api, url):
+    status, body, _ = api(url)
+    assert status == 400 and "error" in body
+
+def test_equity_query_parameters_are_validated(api):
+    equity_curve.write_series("live", [1000, 2000, 3000], [100.0, 90.0, 120.0])
+    status, body, _ = api("/equity/live?start=1500")
+    assert status == 200 and body["equity"] == [90.0, 120.0] and body["drawdown"] == [-10.0, -0.0]
+    assert api("/equity/live?start=yesterday")[0] == 400
+    assert api("/equity/live?points=0")[0] == 400
+    assert api("/equity/none")[0] == 404
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+import candle_store
+import resampler
+
+def session(day, exchange="NSE", minutes=15):
+    """One session of base candles (09:15-15:30 NSE, 09:00-23:30 MCX) with distinct prices."""
+    start, end = ("09:15", "15:30") if exchange == "NSE" else ("09:00", "23:30")
+    ts = pd.date_range(f"{day} {start}", f"{day} {end}", freq=f"{minutes}min", inclusive="left", tz="Asia/Kolkata")
+    close = np.arange(len(ts), dtype=float) + 100
+    return pd.DataFrame({'Timestamp': ts, 'Open': close - 0.5, 'High': close + 1, 'Low': close - 1,
+                         'Close': close, 'Volume': np.full(len(ts), 10.0)})
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(candle_store, "CANDLE_DIR", str(tmp_path))
+
+def test_hourly_bars_are_anchored_at_the_session_open():
+    df = session("2026-03-02")
+    hourly = resampler.resample(df, "ONE_HOUR")
+    assert [t.strftime("%H:%M") for t in hourly['Timestamp']] == ["09:15", "10:15", "11:15", "12:15", "13:15", "14:15", "15:15"]
+    # Matches a pandas resample offset to 09:15; the last bar is the 15-minute 15:15-15:30 stub
+    expected = df.set_index('Timestamp').resample("60min", offset="15min").agg(
+        {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'})
+    assert np.allclose(hourly[['Open', 'High', 'Low', 'Close', 'Volume']].values, expected.values)
+    assert hourly['Volume'].iat[-1] == 10.0
+
+def test_mcx_and_daily_buckets():
+    mcx = resampler.resample(session("2026-03-02", "MCX"), "FOUR_HOUR", "MCX")
+    assert mcx['Timestamp'].dt.strftime("%H:%M").tolist() == ["09:00", "13:00", "17:00", "21:00"]
+    daily = resampler.resample(pd.concat([session("2026-03-02"), session("2026-03-03")]), "ONE_DAY")
+    assert len(daily) == 2 and daily['Volume'].tolist() == [250.0, 250.0]
+
+def test_parse_timeframe():
+    assert resampler.parse_timeframe("4h") == "FOUR_HOUR"
+    assert resampler.parse_timeframe("one_hour") == "ONE_HOUR"
+    with pytest.raises(ValueError):
+        resampler.parse_timeframe("1wk")
+
+def test_incremental_update_matches_batch(store):
+    df = pd.concat([session("2026-03-02"), session("2026-03-03")], ignore_index=True)
+    # Fed in uneven chunks, each ending mid-bucket, like successive bot wakeups
+    for lo, hi in [(0, 7), (7, 30), (30, 41), (41, len(df))]:
+        candle_store.save_candles("NSE", "TEST", "FIFTEEN_MINUTE", df.iloc[lo:hi])
+        resampler.update("NSE", "TEST", "FIFTEEN_MINUTE", "ONE_HOUR")
+    stored = candle_store.load_candles("NSE", "TEST", "ONE_HOUR")
+    batch = resampler.resample(df, "ONE_HOUR")
+    assert len(stored) == len(batch) == 14
+    assert np.allclose(stored[['Open', 'High', 'Low', 'Close', 'Volume']].values, batch[['Open', 'High', 'Low', 'Close', 'Volume']].values)
+
+def test_backfilled_base_bars_need_since(store):
+    early, late = session("2026-03-02"), session("2026-03-03")
+    candle_store.save_candles("NSE", "TEST", "FIFTEEN_MINUTE", late)
+    resampler.update("NSE", "TEST", "FIFTEEN_MINUTE", "ONE_HOUR")
+    candle_store.save_candles("NSE", "TEST", "FIFTEEN_MINUTE", early)
+    resampler.update("NSE", "TEST", "FIFTEEN_MINUTE", "ONE_HOUR", since=candle_store.frame_to_records(early)['ts'][0])
+    assert len(candle_store.load_candles("NSE", "TEST", "ONE_HOUR")) == 14
@@ -0,0 +1,76 @@
+import glob
+import os
+import pytest
+import results_store
+
+DATASET = {"symbol": "NIFTY", "data_start": "2026-01-01", "data_end": "2026-03-31", "bars": 420, "checksum": "abc"}
+TRADES = [{"Ticker": "NIFTY", "Type": "LONG", "Net P/L": 120.5}, {"Ticker": "NIFTY", "Type": "SHORT", "Net P/L": -40.0}]
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(results_store, "RESULTS_DIR", str(tmp_path))
+
+def run(params, metrics=None, dataset=DATASET, code="v1"):
+    """A memoized run whose compute() reports whether it was called."""
+    calls = []
+    def compute():
+        calls.append(1)
+        return TRADES, metrics or {"trades": 2, "net_pnl": 80.5}
+    key, trades, stored, cached = results_store.memoized("rsi_dmi", params, dataset, code, compute)
+    return key, trades, stored, cached, len(calls)
+
+def test_a_stored_run_is_answered_without_computing():
+    key, trades, metrics, cached, calls = run({"rsi": 14})
+    assert not cached and calls == 1
+    again, trades2, metrics2, cached2, calls2 = run({"rsi": 14})
+    assert again == key and cached2 and calls2 == 0
+    assert trades2 == TRADES
+    assert metrics2["net_pnl"] == 80.5 and metrics2["param_rsi"] == 14 and metrics2["symbol"] == "NIFTY"
+
+def test_the_key_follows_code_params_and_dataset():
+    key = results_store.run_key("rsi_dmi", {"rsi": 14}, DATASET, "v1")
+    assert results_store.run_key("rsi_dmi", {"rsi": 14}, dict(DATASET), "v1") == key
+    assert results_store.run_key("rsi_dmi", {"rsi": 14}, DATASET, "v2") != key
+    assert results_store.run_key("rsi_dmi", {"rsi": 21}, DATASET, "v1") != key
+    assert results_store.run_key("rsi_dmi", {"rsi": 14}, dict(DATASET, checksum="abd"), "v1") != key
+    run({"rsi": 14})
+    assert run({"rsi": 14}, code="v2")[4] == 1
+    assert run({"rsi": 14}, dataset=dict(DATASET, data_end="2026-04-30"))[4] == 1
+
+def test_compact_then_query_round_trips():
+    keys = [run({"rsi": rsi}, {"trades": rsi, "net_pnl": pnl})[0] for rsi, pnl in ((10, 50.0), (14, 300.0), (21, -20.0))]
+    assert results_store.compact() == 3
+    assert glob.glob(os.path.join(results_store._parts_dir(), "*")) == []
+    best = results_store.query(where="trades > 10", top=1)
+    assert list(best["key"]) == [keys[1]] and best["net_pnl"].iloc[0] == 300.0
+    assert list(results_store.query()["param_rsi"]) == [14, 10, 21]
+    # Compacted runs are still found (and not recomputed)
+    assert results_store.lookup(keys[0])["net_pnl"] == 50.0
+    assert run({"rsi": 10})[4] == 0
+    assert results_store.compact() == 0
+
+def test_forget_drops_a_run_everywhere():
+    kept, gone = run({"rsi": 14})[0], run({"rsi": 21})[0]
+    results_store.compact()
+    results_store.forget(gone)
+    assert results_store.lookup(gone) is None
+    assert list(results_store.query()["key"]) == [kept]
+    assert run({"rsi": 21})[4] == 1      # Forgotten runs are computed again
+
+def test_compact_is_safe_across_processes(monkeypatch):
+    key = run({"rsi": 14})[0]
+    # Another process is compacting: leave the parts to it
+    open(results_store._lock_path(), 'w').close()
+    assert results_store.compact() == 0
+    assert os.path.exists(results_store._part_path(key))
+    # ... unless its lock is stale
+    old = os.path.getmtime(results_store._lock_path()) - results_store.LOCK_STALE_SECONDS - 1
+    os.utime(results_store._lock_path(), (old, old))
+    assert results_store.compact() == 1 and not os.path.exists(results_store._lock_path())
+
+    # A part removed by someone else between listing and reading is skipped
+    other = run({"rsi": 21})[0]
+    real_glob = glob.glob
+    monkeypatch.setattr(results_store.glob, "glob", lambda pattern: real_glob(pattern) + [results_store._part_path("vanished")])
+    assert results_store.compact() == 1
+    assert set(results_store.query()["key"]) == {key, other}
@@ -0,0 +1,63 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+import candle_store
+import screener
+
+NOW = datetime(2026, 3, 20, 16, 0)     # Friday after the close: the 15:15 bar is the last closed one
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(candle_store, "CANDLE_DIR", str(tmp_path))
+
+def cache(symbol, last_day, closes=None):
+    """Seven NSE hourly bars per weekday from 2 Feb to last_day, flat unless closes are given."""
+    stamps = [day + pd.Timedelta(hours=9, minutes=15 + 60 * h) for day in pd.bdate_range("2026-02-02", last_day) for h in range(7)]
+    closes = np.full(len(stamps), 100.0) if closes is None else np.asarray(closes, dtype=float)[-len(stamps):]
+    candle_store.save_candles("NSE", symbol, "ONE_HOUR", pd.DataFrame({
+        'Timestamp': stamps, 'Open': closes, 'High': closes, 'Low': closes, 'Close': closes, 'Volume': 1.0}))
+
+def test_stale_cache_is_rewarmed_instead_of_screened_out():
+    cache("FRESH", "2026-03-20")
+    cache("FROZEN", "2026-03-17")            # Never refetched since its trend read NONE
+    cache("RISING", "2026-03-17", 100 + np.arange(400) * 0.1)
+    candidates, stage1 = screener.screen(["FRESH.NS", "FROZEN.NS", "RISING.NS", "NEW.NS"], now=NOW)
+    assert list(stage1['State']) == ["NONE", "NONE", "LONG", "NO_DATA"]
+    assert list(stage1['Stale']) == [False, True, True, True]
+    # Aligned stacks still go through; the frozen NONE is re-warmed after the uncached symbol
+    assert candidates == ["RISING.NS", "NEW.NS", "FROZEN.NS"]
+    # An up-to-date NONE stays out, and the warm-up budget applies to stale symbols too
+    assert screener.screen(["FRESH.NS", "FROZEN.NS", "NEW.NS"], now=NOW, warmup_per_scan=1)[0] == ["NEW.NS"]
+
+def test_snapshot_rows_carry_the_stack_state_and_trigger_gap(tmp_path):
+    cache("RISING", "2026-03-20", 100 + np.arange(400) * 0.1)
+    cache("FALLING", "2026-03-20", 200 - np.arange(400) * 0.1)
+    cache("SHORTLIVED", "2026-03-20", 100 + np.arange(400) * 0.1)
+    candle_store.write_records("NSE", "SHORTLIVED", "ONE_HOUR",
+                               candle_store.load_arrays("NSE", "SHORTLIVED", "ONE_HOUR", mmap=False)[-50:])
+    stage1 = screener.trend_stage(["RISING.NS", "FALLING.NS", "SHORTLIVED.NS"], now=NOW)
+    # LIVE was fetched this scan only, with just the columns its strategy read
+    live = {"FALLING.NS": {"Close": 150.0, "EMA_10": 151.0}, "LIVE.NS": {"Close": 50.0, "EMA_10": 51.0, "EMA_21": 50.0}}
+    snapshot = screener.build_snapshot(stage1, live, positions={"RISING.NS": "LONG"})
+
+    assert sorted(snapshot.index) == ["FALLING.NS", "LIVE.NS", "RISING.NS", "SHORTLIVED.NS"]
+    assert set(snapshot.columns) >= set(screener.TREND_COLUMNS) | {"Bars", "Source", "State", "Trigger Gap %",
+                                                                    "Trend Spread %", "Position"}
+    rising, falling, live_row, short = (snapshot.loc[t] for t in ["RISING.NS", "FALLING.NS", "LIVE.NS", "SHORTLIVED.NS"])
+    assert (rising['State'], rising['Source'], rising['Position']) == ("LONG", "cache", "LONG")
+    assert rising['Trigger Gap %'] > 0 and rising['Trend Spread %'] > 0
+    # Live values override the cached ones they carry; the rest of the row stays cached
+    assert (falling['State'], falling['Source'], falling['Position']) == ("SHORT", "live", "")
+    assert falling['Close'] == 150.0 and falling['EMA_10'] == 151.0
+    assert falling['EMA_21'] == round(stage1.loc["FALLING.NS", 'EMA_21'], 2)
+    assert falling['Trigger Gap %'] == round((151.0 - falling['EMA_21']) / 150.0 * 100, 3)
+    # Without an SMA_200 (live only, or too short a cache) the state is NO_DATA
+    assert (live_row['State'], live_row['Source'], live_row['Trigger Gap %']) == ("NO_DATA", "live", 2.0)
+    assert (short['State'], short['Bars']) == ("NO_DATA", 50)
+
+    path = str(tmp_path / "snapshot.json")
+    screener.save_snapshot(snapshot, path, scanned_at=NOW)
+    scanned_at, loaded = screener.load_snapshot(path)
+    assert scanned_at == "2026-03-20 16:00:00" and sorted(loaded.index) == sorted(snapshot.index)
+    assert loaded.loc["RISING.NS", "State"] == "LONG" and pd.isna(loaded.loc["LIVE.NS", "SMA_200"])
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+import equity_curve
+import shadow
+import strategies
+import trade_archive
+
+CONFIG = {
+    "strategy_settings": {"capital": 1000000, "risk_per_trade_percent": 1.0, "brokerage_percent": 0.1},
+    "shadow_portfolios": {
+        "base": {},
+        "half_risk": {"risk_per_trade_percent": 0.5},
+        "wide_stop": {"strategies": [{"name": "t3_reversal", "hard_stop_pct": 0.04}]},
+        "slow_t3": {"strategies": [{"name": "t3_reversal", "length": 12}]},
+    },
+}
+
+@pytest.fixture(autouse=True)
+def tmp_stores(tmp_path, monkeypatch):
+    monkeypatch.setattr(shadow, "SHADOW_DIR", str(tmp_path / "shadow"))
+    monkeypatch.setattr(equity_curve, "EQUITY_DIR", str(tmp_path / "equity"))
+    monkeypatch.setattr(trade_archive, "ARCHIVE_DIR", str(tmp_path / "archive"))
+
+def graph(closes, lows=None):
+    closes = np.asarray(closes, dtype=float)
+    lows = closes * 0.999 if lows is None else np.asarray(lows, dtype=float)
+    df = pd.DataFrame({'Timestamp': pd.date_range("2026-03-02 09:15", periods=len(closes), freq="h"),
+                       'Open': closes, 'High': closes * 1.001, 'Low': lows, 'Close': closes, 'Volume': 1.0})
+    return strategies.IndicatorGraph(df, [strategies.STRATEGIES["ema_trend"]])
+
+def test_variants_get_their_own_named_strategies():
+    fast = strategies.variant({"name": "ema_trend", "fast": 8})
+    assert fast.name == "ema_trend(fast=8)" and fast.fast == "EMA_8"
+    assert strategies.variant("ema_trend") is strategies.STRATEGIES["ema_trend"]
+    assert strategies.resolve("ema_trend(fast=8)", [fast]) is fast
+    assert strategies.resolve("ema_trend") is strategies.STRATEGIES["ema_trend"]
+    with pytest.raises(ValueError):
+        strategies.variant({"name": "ema_trend", "nope": 1})
+    with pytest.raises(ValueError):
+        strategies.variant({"name": "rsi_dmi", "n": 9})
+
+def test_a_variant_no_longer_configured_is_rebuilt_from_its_name(capsys):
+    # A position opened by t3_reversal(length=5) keeps its own T3 and stop after the variant leaves the config
+    dropped = strategies.resolve("t3_reversal(hard_stop_pct=0.03, length=5)")
+    assert dropped.name == "t3_reversal(hard_stop_pct=0.03, length=5)"
+    assert dropped.t3 == "T3_5_0.7" and dropped.hard_stop_pct == 0.03
+    assert strategies.resolve("t3_reversal(hard_stop_pct=0.03, length=5)") is dropped
+    assert "no longer configured" in capsys.readouterr().out
+    # Parameters the strategy no longer takes fall back to its defaults, loudly
+    assert strategies.resolve("rsi_dmi(n=9)") is strategies.STRATEGIES["rsi_dmi"]
+    assert "cannot be rebuilt" in capsys.readouterr().out
+
+def test_default_parameters_keep_the_live_indicator_columns():
+    ema = strategies.STRATEGIES["ema_trend"]
+    assert [i.name for i in ema.indicators] == ["SMA_100", "SMA_200", "EMA_50", "EMA_21", "EMA_10", "EMA_5"]
+    assert [r.name for r in ema.long_entry] == ["ema10_cross_up", "trend_up"]
+    assert strategies.STRATEGIES["t3_reversal"].indicators[0].name == "T3"
+
+def test_one_graph_many_ledgers():
+    variants = shadow.from_config("nifty", CONFIG, ["t3_reversal"])
+    assert [v.name for v in variants] == ["base", "half_risk", "wide_stop", "slow_t3"]
+    rising = graph(100 + np.arange(60) * 0.5)
+    books = {v.name: shadow.load_book(v) for v in variants}
+    for v in variants:
+        shadow.step(v, books[v.name], ["ACME"], lambda t: rising)
+    # Every variant went long off the same dataset; sizing and stops follow each variant's settings
+    qty = {name: book["open_longs"]["ACME"]["qty"] for name, book in books.items()}
+    assert qty["half_risk"] == pytest.approx(qty["base"] / 2, abs=1)
+    assert qty["wide_stop"] == pytest.approx(qty["base"] / 2, abs=1)
+    assert books["slow_t3"]["open_longs"]["ACME"]["strategy"] == "t3_reversal(length=12)"
+    # The default T3 is computed once and shared; the slow variant adds only its own column
+    assert {"T3", "T3_12_0.7"} <= set(rising.df.columns)
+
+    # A 3% wick below the entry (closing higher) stops out the 2% variants but not the 4% one
+    closes = np.r_[100 + np.arange(60) * 0.5, 130.0]
+    falling = graph(closes, np.r_[closes[:-1] * 0.999, 129.5 * 0.97])
+    for v in variants:
+        closed = shadow.manage_exits(v, books[v.name], lambda t: falling)
+        shadow.finish(v, books[v.name], {}, closed)
+    assert "ACME" in books["wide_stop"]["open_longs"]
+    assert books["base"]["closed_longs"][0]["Reason"] == "2% SL Hit"
+
+    table = shadow.comparison("nifty")
+    assert list(table.index) == sorted(b for b in books)
+    assert table.loc["base", "Trades"] == 1 and table.loc["wide_stop", "Open"] == 1
+    assert table.loc["half_risk", "Realized P&L"] == pytest.approx(table.loc["base", "Realized P&L"] / 2, rel=0.05)
+    assert trade_archive.load_rollups("nifty_shadow_base")["total"]["trades"] == 1
@@ -0,0 +1,140 @@
+from collections import Counter
+import numpy as np
+import pandas as pd
+import pytest
+import strategies
+
+def ohlc(n=420):
+    """An uptrend with pullbacks that rolls over into a downtrend, with some noise: crosses on both sides."""
+    x = np.arange(n)
+    rng = np.random.default_rng(7)
+    close = 100 + 0.3 * np.minimum(x, 260) - 0.45 * np.maximum(x - 260, 0) + 8 * np.sin(x / 8) + rng.normal(0, 0.4, n)
+    spread = np.abs(rng.normal(0, 0.6, n))
+    return pd.DataFrame({'Open': np.r_[close[0], close[:-1]], 'High': close + spread, 'Low': close - spread,
+                         'Close': close, 'Volume': 1000.0}, index=pd.date_range("2026-01-01 09:15", periods=n, freq="h"))
+
+def inline_indicators(df):
+    """The indicator code the bots and the backtest carried before strategies.py, verbatim."""
+    df = df.copy()
+    df['SMA_100'] = df['Close'].rolling(window=100).mean()
+    df['SMA_200'] = df['Close'].rolling(window=200).mean()
+    for n in (50, 21, 10, 5):
+        df[f'EMA_{n}'] = df['Close'].ewm(span=n, adjust=False).mean()
+
+    delta = df['Close'].diff()
+    up = delta.clip(lower=0)
+    down = -1 * delta.clip(upper=0)
+    rs = up.ewm(alpha=1/14, adjust=False).mean() / down.ewm(alpha=1/14, adjust=False).mean()
+    df['RSI'] = 100 - (100 / (1 + rs))
+    rsi_diff = df['RSI'].diff()
+    upMove, downMove = rsi_diff, -rsi_diff
+    plusDM = pd.Series(np.where((upMove > downMove) & (upMove > 0), upMove, 0), index=df.index)
+    minusDM = pd.Series(np.where((downMove > upMove) & (downMove > 0), downMove, 0), index=df.index)
+    smoothedTR = abs(rsi_diff).ewm(alpha=1/14, adjust=False).mean()
+    df['plusDI'] = 100 * plusDM.ewm(alpha=1/14, adjust=False).mean() / smoothedTR
+    df['minusDI'] = 100 * minusDM.ewm(alpha=1/14, adjust=False).mean() / smoothedTR
+    df['plusDI_EMA5'] = df['plusDI'].ewm(span=5, adjust=False).mean()
+    df['minusDI_EMA5'] = df['minusDI'].ewm(span=5, adjust=False).mean()
+
+    a = 0.7
+    c1, c2, c3, c4 = -a**3, 3*a**2 + 3*a**3, -6*a**2 - 3*a - 3*a**3, 1 + 3*a + a**3 + 3*a**2
+    e = [df['Close']]
+    for _ in range(6):
+        e.append(e[-1].ewm(span=8, adjust=False).mean())
+    df['T3'] = c1*e[6] + c2*e[5] + c3*e[4] + c4*e[3]
+    return df
+
+def inline_signal(name, curr, prev):
+    """The entry conditions as the bots wrote them inline."""
+    if name == "ema_trend":
+        if ((curr['SMA_100'] > curr['SMA_200']) and (curr['EMA_50'] > curr['SMA_100']) and (curr['EMA_21'] > curr['EMA_50'])
+                and (curr['EMA_10'] > curr['EMA_21']) and (prev['EMA_10'] <= prev['EMA_21'])):
+            return strategies.LONG
+        if ((curr['SMA_100'] < curr['SMA_200']) and (curr['EMA_50'] < curr['SMA_100']) and (curr['EMA_21'] < curr['EMA_50'])
+                and (curr['EMA_10'] < curr['EMA_21']) and (prev['EMA_10'] >= prev['EMA_21'])):
+            return strategies.SHORT
+    elif name == "rsi_dmi":
+        if (curr['plusDI_EMA5'] > prev['plusDI_EMA5']) and (curr['minusDI_EMA5'] < prev['minusDI_EMA5']):
+            return strategies.LONG
+        if (curr['minusDI_EMA5'] > prev['minusDI_EMA5']) and (curr['plusDI_EMA5'] < prev['plusDI_EMA5']):
+            return strategies.SHORT
+    elif name == "t3_reversal":
+        if curr['Close'] > curr['T3']:
+            return strategies.LONG
+        if curr['Close'] < curr['T3']:
+            return strategies.SHORT
+    return None
+
+def test_indicator_graph_matches_the_inline_formulas():
+    df = ohlc()
+    expected = inline_indicators(df)
+    graph = strategies.IndicatorGraph(df, strategies.STRATEGIES.values())
+    for column in ["SMA_100", "SMA_200", "EMA_50", "EMA_21", "EMA_10", "EMA_5", "RSI",
+                   "plusDI", "minusDI", "plusDI_EMA5", "minusDI_EMA5", "T3"]:
+        graph.require(column)
+        np.testing.assert_allclose(graph.df[column], expected[column], rtol=1e-12, equal_nan=True, err_msg=column)
+
+@pytest.mark.parametrize("name", ["ema_trend", "rsi_dmi", "t3_reversal"])
+def test_entry_signals_match_the_inline_rules(name):
+    df, strategy = ohlc(), strategies.STRATEGIES[name]
+    expected = inline_indicators(df)
+    signals, inline = [], []
+    for end in range(199, len(df)):           # Every bar from the first one ema_trend may trade
+        graph = strategies.IndicatorGraph(df.iloc[:end + 1], [strategy])
+        signals.append(strategy.entry(graph))
+        inline.append(inline_signal(name, expected.iloc[end], expected.iloc[end - 1]))
+    assert signals == inline
+    assert {strategies.LONG, strategies.SHORT} <= set(signals)
+
+def counted(graph):
+    """Wraps every node of the graph so each computation is counted by name."""
+    calls = Counter()
+    for name, node in graph.nodes.items():
+        def fn(*columns, _name=name, _fn=node.fn):
+            calls[_name] += 1
+            return _fn(*columns)
+        graph.nodes[name] = strategies.Indicator(name, node.inputs, fn, node.cost)
+    return calls
+
+def test_shared_nodes_are_computed_once():
+    df = ohlc()
+    loaded = strategies.load(["ema_trend", {"name": "ema_trend", "fast": 8}, "rsi_dmi", "t3_reversal"])
+    graph = strategies.IndicatorGraph(df, loaded)
+    calls = counted(graph)
+    for strategy in loaded:
+        strategy.entry(graph)
+    for column in ["SMA_200", "EMA_8", "EMA_10", "T3", "plusDI_EMA5", "minusDI_EMA5"]:
+        graph.require(column)
+    # EMA_21 feeds both EMA trend variants; RMA(14) of the RSI's TR feeds both DIs
+    assert calls["EMA_21"] == 1 and calls["TR_RMA14"] == 1 and calls["RSI"] == 1
+    assert max(calls.values()) == 1
+    # Exits read the already computed columns
+    strategies.STRATEGIES["ema_trend"].manage(strategies.LONG, {"entry_price": 1.0, "risk_points": 1.0, "stop_loss": 0.0},
+                                              graph.bar(-1), graph.bar(-2))
+    assert max(calls.values()) == 1
+
+def test_a_name_means_one_definition():
+    graph = strategies.IndicatorGraph(ohlc(), [strategies.STRATEGIES["ema_trend"]])
+    # Identical definitions built elsewhere share the node already registered
+    ema_21 = graph.nodes["EMA_21"]
+    graph.register(strategies.ema(21), strategies.sma(200), strategies.t3(length=21, v_factor=0.5, name="T3_21"))
+    assert graph.nodes["EMA_21"] is ema_21
+    # The same name for another computation, or the same computation on other inputs, is refused
+    with pytest.raises(ValueError, match="EMA_21"):
+        graph.register(strategies.sma(21, name="EMA_21"))
+    with pytest.raises(ValueError, match="EMA_21"):
+        graph.register(strategies.ema(21, "High", name="EMA_21"))
+    with pytest.raises(ValueError, match="T3"):
+        graph.register(strategies.t3(8, 0.7), strategies.t3(8, 0.9))
+    with pytest.raises(ValueError, match="SMA_100"):
+        graph.register(strategies.Indicator("SMA_100", ("Close",), lambda s: s * 0))
+    graph.require("EMA_21", "T3_21")
+    np.testing.assert_allclose(graph.df["EMA_21"], inline_indicators(ohlc())["EMA_21"], rtol=1e-12)
+
+def test_rules_stop_before_the_slow_trend_filter():
+    # No EMA 10 / 21 cross on the last bar: the SMA stack is never computed
+    df = ohlc().iloc[:300]
+    graph = strategies.IndicatorGraph(df, [strategies.STRATEGIES["ema_trend"]])
+    calls = counted(graph)
+    assert strategies.STRATEGIES["ema_trend"].entry(graph) is None
+    assert calls["EMA_10"] == 1 and calls["SMA_200"] == 0
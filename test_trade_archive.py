@@ -0,0 +1,101 @@
+import json
+import os
+import pandas as pd
+import pytest
+import trade_archive
+
+@pytest.fixture(autouse=True)
+def archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(trade_archive, "ARCHIVE_DIR", str(tmp_path / "archive"))
+
+def closed(ticker, entry, exit, entry_price, exit_price, qty, pnl):
+    return {"Ticker": ticker, "Entry Date": entry, "Exit Date": exit, "Entry Price": entry_price,
+            "Exit Price": exit_price, "Qty": qty, "PnL": pnl, "Reason": "test"}
+
+LONGS = [
+    closed("NIFTY", "2026-02-26 10:15", "2026-02-27 14:15", 22000.0, 22150.0, 50, 7347.25),
+    closed("RELIANCE", "2026-03-02 09:15", "2026-03-02 15:15", 2900.0, 2880.5, 100, -2837.13),
+    closed("NIFTY", "2026-03-03 11:15", "2026-03-05 13:15", 22100.0, 22180.0, 50, 3667.2),
+]
+SHORTS = [
+    closed("RELIANCE", "2026-03-04 09:15", "2026-03-04 12:15", 2910.0, 2890.0, 100, 1912.01),
+]
+
+def test_archiving_the_same_trade_twice_stores_one_row(tmp_path):
+    assert trade_archive.archive_trade("dmi", "rsi_dmi", "LONG", LONGS[0]) == 1
+    assert trade_archive.archive_trade("dmi", "rsi_dmi", "LONG", LONGS[0]) == 0
+    # The same trade twice in one batch, and a whole portfolio re-imported
+    assert trade_archive.archive_trades("dmi", "rsi_dmi", "LONG", [LONGS[1], LONGS[1]]) == 1
+    portfolio = tmp_path / "dmi_portfolio.json"
+    portfolio.write_text(json.dumps({"closed_longs": LONGS, "closed_shorts": SHORTS}))
+    assert trade_archive.import_portfolio("dmi", "rsi_dmi", str(portfolio)) == 2
+    assert trade_archive.import_portfolio("dmi", "rsi_dmi", str(portfolio)) == 0
+
+    rows = trade_archive.scan("dmi")
+    assert len(rows) == 4 and rows['trade_id'].is_unique
+    assert trade_archive.load_rollups("dmi")["total"]["trades"] == 4
+
+def test_rollups_match_a_recompute_from_the_partitions():
+    trade_archive.archive_trades("dmi", "rsi_dmi", "LONG", LONGS[:2])
+    trade_archive.archive_trades("dmi", "rsi_dmi", "LONG", LONGS)          # Partly a replay
+    trade_archive.archive_trades("dmi", "t3_reversal", "SHORT", SHORTS)
+    trade_archive.archive_trade("crypto", "ema_trend", "LONG", LONGS[0])   # Another engine, other rollups
+    assert [p.split("month=")[1][:7] for p in trade_archive.partitions("dmi")] == ["2026-02", "2026-03"]
+
+    rows = trade_archive.scan("dmi")
+    rows['win'] = (rows['net_pnl'] > 0).astype(int)
+    keys = {"daily": rows['exit_date'].str[:10], "monthly": rows['exit_date'].str[:7],
+            "symbol": rows['ticker'], "strategy": rows['strategy']}
+    for level, key in keys.items():
+        expected = rows.groupby(key).agg(trades=('trade_id', 'size'), wins=('win', 'sum'), net_pnl=('net_pnl', 'sum'),
+                                         gross_pnl=('gross_pnl', 'sum'), brokerage=('brokerage', 'sum'),
+                                         exposure=('exposure', 'sum'))
+        stored = trade_archive.rollup_frame("dmi", level)
+        assert list(stored.index) == list(expected.index)
+        pd.testing.assert_frame_equal(stored[trade_archive.ROLLUP_FIELDS].astype(float), expected.astype(float),
+                                      check_names=False, atol=0.01)
+    total = trade_archive.load_rollups("dmi")["total"]
+    assert total["trades"] == 4 and total["net_pnl"] == pytest.approx(rows['net_pnl'].sum())
+    assert trade_archive.load_rollups("crypto")["total"]["trades"] == 1
+
+def test_a_close_writes_its_own_part_and_rollups_recover_from_a_crash(monkeypatch):
+    trade_archive.archive_trades("dmi", "rsi_dmi", "LONG", LONGS[1:])
+    first = trade_archive._parts("dmi", "2026-03")
+    stamp = os.path.getmtime(first[0])
+    # The process dies after writing the part, before the rollups
+    real_save = trade_archive._save_json
+    monkeypatch.setattr(trade_archive, "_save_json", lambda path, payload: None)
+    trade_archive.archive_trades("dmi", "t3_reversal", "SHORT", SHORTS)
+    monkeypatch.setattr(trade_archive, "_save_json", real_save)
+    assert len(trade_archive._parts("dmi", "2026-03")) == 2 and os.path.getmtime(first[0]) == stamp
+    assert trade_archive.load_rollups("dmi")["total"]["trades"] == 2
+
+    # The next writer notices the unlisted part and rebuilds from the partitions
+    trade_archive.archive_trade("dmi", "rsi_dmi", "LONG", LONGS[0])
+    rollups = trade_archive.load_rollups("dmi")
+    assert rollups["total"]["trades"] == 4 and rollups["strategy"]["t3_reversal"]["trades"] == 1
+    assert rollups["total"]["net_pnl"] == pytest.approx(trade_archive.scan("dmi")['net_pnl'].sum())
+
+def test_parts_are_compacted_without_losing_or_doubling_trades(monkeypatch):
+    monkeypatch.setattr(trade_archive, "MAX_PARTS_PER_MONTH", 2)
+    for record in LONGS[1:]:
+        trade_archive.archive_trade("dmi", "rsi_dmi", "LONG", record)
+    trade_archive.archive_trade("dmi", "t3_reversal", "SHORT", SHORTS[0])
+    assert [os.path.basename(p) for p in trade_archive._parts("dmi", "2026-03")] == ["trades.parquet"]
+    assert sorted(trade_archive.scan("dmi")['ticker']) == ["NIFTY", "RELIANCE", "RELIANCE"]
+    assert trade_archive.load_rollups("dmi")["parts"] == [os.path.join("month=2026-03", "trades.parquet")]
+    assert trade_archive.archive_trade("dmi", "rsi_dmi", "LONG", LONGS[2]) == 0
+    assert trade_archive.load_rollups("dmi")["total"]["trades"] == 3
+
+def test_writers_wait_for_the_archive_lock(monkeypatch):
+    monkeypatch.setattr(trade_archive, "LOCK_WAIT_SECONDS", 0)
+    os.makedirs(trade_archive.ARCHIVE_DIR)
+    open(trade_archive._lock_path("dmi"), 'w').close()
+    # Held by another writer past the wait: the close is reported and skipped, never written unlocked
+    assert trade_archive.archive_trade("dmi", "rsi_dmi", "LONG", LONGS[0]) == 0
+    assert trade_archive.scan("dmi").empty
+    # ... unless the lock is stale
+    old = os.path.getmtime(trade_archive._lock_path("dmi")) - trade_archive.LOCK_STALE_SECONDS - 1
+    os.utime(trade_archive._lock_path("dmi"), (old, old))
+    assert trade_archive.archive_trade("dmi", "rsi_dmi", "LONG", LONGS[0]) == 1
+    assert not os.path.exists(trade_archive._lock_path("dmi"))
@@ -0,0 +1,57 @@
+from datetime import date, datetime
+import pytest
+import bar_watermarks
+import trading_calendar
+
+# 2025-10-21 (Tue) is a holiday with a one-hour muhurat session; 2025-10-24 is a Friday
+CALENDAR = trading_calendar.TradingCalendar(
+    holidays=["2025-10-21"],
+    special_sessions=[{"date": "2025-10-21", "start": "13:45", "end": "14:45", "exchanges": ["NSE", "NFO"]}])
+
+def ist(text):
+    return datetime.fromisoformat(text).replace(tzinfo=trading_calendar.IST)
+
+def test_sessions_holidays_and_special_sessions():
+    assert CALENDAR.is_open("NSE", datetime(2025, 10, 20, 9, 15))
+    assert not CALENDAR.is_open("NSE", datetime(2025, 10, 20, 15, 30))
+    assert not CALENDAR.is_open("NSE", datetime(2025, 10, 25, 11, 0))       # Saturday
+    assert not CALENDAR.is_open("NFO", datetime(2025, 10, 21, 10, 0))       # Holiday ...
+    assert CALENDAR.is_open("NFO", datetime(2025, 10, 21, 14, 0))           # ... except muhurat
+    assert CALENDAR.is_open("MCX", datetime(2025, 10, 21, 22, 0))           # MCX keeps its hours
+    # Epochs and aware datetimes are the same instant
+    assert CALENDAR.is_open("NSE", int(ist("2025-10-20T10:00").timestamp()))
+    assert CALENDAR.bars_on("NSE", date(2025, 10, 20), 3600) == 7
+    assert CALENDAR.bars_on("NSE", date(2025, 10, 21), 3600) == 1
+    assert CALENDAR.trading_days("NSE", date(2025, 10, 20), date(2025, 10, 26)) == [
+        date(2025, 10, 20), date(2025, 10, 21), date(2025, 10, 22), date(2025, 10, 23), date(2025, 10, 24)]
+
+def test_next_and_last_bar_close():
+    assert CALENDAR.next_bar_close("NSE", datetime(2025, 10, 20, 10, 20)) == ist("2025-10-20T11:15")
+    assert CALENDAR.next_bar_close("NSE", datetime(2025, 10, 20, 11, 15)) == ist("2025-10-20T12:15")
+    assert CALENDAR.next_bar_close("NSE", datetime(2025, 10, 20, 15, 20)) == ist("2025-10-20T15:30")
+    assert CALENDAR.next_bar_close("NSE", datetime(2025, 10, 20, 16, 0)) == ist("2025-10-21T14:45")
+    assert CALENDAR.next_bar_close("NSE", datetime(2025, 10, 24, 16, 0), 900) == ist("2025-10-27T09:30")
+    assert CALENDAR.last_closed_bar("NSE", datetime(2025, 10, 20, 10, 15)) == ist("2025-10-20T09:15")
+    assert CALENDAR.last_closed_bar("NSE", datetime(2025, 10, 20, 9, 0)) == ist("2025-10-17T15:15")
+    assert CALENDAR.last_closed_bar("NSE", datetime(2025, 10, 22, 9, 30)) == ist("2025-10-21T13:45")
+    assert CALENDAR.last_closed_bar("MCX", datetime(2025, 10, 20, 23, 45)) == ist("2025-10-20T23:00")
+
+def test_bars_between_spans_weeks_and_years():
+    assert CALENDAR.bars_between("NSE", datetime(2025, 10, 17, 16, 0), datetime(2025, 10, 24, 16, 0)) == 4 * 7 + 1
+    assert CALENDAR.bars_between("NSE", datetime(2025, 10, 20, 10, 15), datetime(2025, 10, 20, 12, 15)) == 2
+    assert CALENDAR.bars_between("NSE", datetime(2025, 12, 31, 9, 0), datetime(2026, 1, 2, 16, 0)) == 3 * 7
+    assert CALENDAR.bars_between("NSE", datetime(2026, 1, 2, 16, 0), datetime(2025, 12, 31, 9, 0)) == -3 * 7
+
+def test_watermarks_follow_the_configured_calendar(monkeypatch):
+    monkeypatch.setattr(trading_calendar, "_CALENDAR", CALENDAR)
+    assert bar_watermarks.last_closed_bar(datetime(2025, 10, 22, 9, 30)) == ist("2025-10-21T13:45")
+    with pytest.raises(ValueError):
+        CALENDAR.next_bar_close("NSE", None, 90)
+
+def test_history_start_counts_bars_back_over_sessions():
+    # 7 hourly bars on 20 Oct, 1 on the muhurat holiday, 7 on 22 Oct; the weekend adds none
+    assert CALENDAR.history_start("NSE", 15, 3600, datetime(2025, 10, 22, 16, 0)) == date(2025, 10, 20)
+    assert CALENDAR.history_start("NSE", 16, 3600, datetime(2025, 10, 22, 16, 0)) == date(2025, 10, 17)
+    # Four-hour bars: two per regular day; daily bars: one per trading day
+    assert CALENDAR.history_start("NSE", 4, 4 * 3600, datetime(2025, 10, 27, 16, 0)) == date(2025, 10, 24)
+    assert CALENDAR.history_start("NSE", 5, 86400, datetime(2025, 10, 27, 16, 0)) == date(2025, 10, 21)
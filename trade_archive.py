@@ -0,0 +1,269 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+import pandas as pd
+
+# --- TRADE ARCHIVE ---
+# Every closed trade from every engine is appended to a month-partitioned Parquet archive:
+#   trade_archive/engine=<engine>/month=YYYY-MM/part-<trade_id>.parquet   (one per write)
+#   trade_archive/engine=<engine>/month=YYYY-MM/trades.parquet            (compacted parts)
+# A close writes one small part instead of rewriting its month; once a month holds
+# MAX_PARTS_PER_MONTH parts they are folded into trades.parquet. Alongside, rollups_<engine>.json
+# keeps daily / monthly / per-symbol / per-strategy totals updated incrementally on each close,
+# so dashboards never rescan the trade list. The rollups list the parts they include: a writer
+# that finds other parts on disk (a crash between the two writes) rebuilds them from the parts.
+# Writers of one engine serialise on an O_EXCL lock file, as results_store does.
+ARCHIVE_DIR = "trade_archive"
+ROLLUP_LEVELS = ["daily", "monthly", "symbol", "strategy"]
+ROLLUP_FIELDS = ["trades", "wins", "net_pnl", "gross_pnl", "brokerage", "exposure"]
+MAX_PARTS_PER_MONTH = 64
+LOCK_STALE_SECONDS = 600      # A lock older than this was left by a crashed process
+LOCK_WAIT_SECONDS = 30
+
+def _engine_dir(engine):
+    return os.path.join(ARCHIVE_DIR, f"engine={engine}")
+
+def _month_dir(engine, month):
+    return os.path.join(_engine_dir(engine), f"month={month}")
+
+def _rollup_path(engine):
+    return os.path.join(ARCHIVE_DIR, f"rollups_{engine}.json")
+
+def _lock_path(engine):
+    return os.path.join(ARCHIVE_DIR, f"{engine}.lock")
+
+@contextmanager
+def _archive_lock(engine):
+    """Exclusive right to write an engine's partitions and rollups; yields False if still held after LOCK_WAIT_SECONDS."""
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    path = _lock_path(engine)
+    deadline = time.time() + LOCK_WAIT_SECONDS
+    while True:
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > LOCK_STALE_SECONDS:
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.time() >= deadline:
+                yield False
+                return
+            time.sleep(0.1)
+    try:
+        yield True
+    finally:
+        os.remove(path)
+
+def _parts(engine, month="*"):
+    """Part files of an engine (one month or all), sorted."""
+    return sorted(glob.glob(os.path.join(_month_dir(engine, month), "*.parquet")))
+
+def _part_name(engine, path):
+    return os.path.relpath(path, _engine_dir(engine))
+
+def _read(paths, columns=None):
+    """Rows of the given part files; a trade found in two of them (a compaction cut short) is kept once."""
+    if not paths:
+        return pd.DataFrame(columns=columns)
+    read = None if columns is None else list(dict.fromkeys(["trade_id", *columns]))
+    df = pd.concat([pd.read_parquet(p, columns=read) for p in paths], ignore_index=True)
+    df = df.drop_duplicates("trade_id", ignore_index=True)
+    return df if columns is None else df[columns]
+
+def _write_parquet(df, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+def trade_id(engine, side, record):
+    key = f"{engine}|{side}|{record['Ticker']}|{record['Entry Date']}|{record['Exit Date']}"
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+def to_row(engine, strategy, side, record, brokerage=None):
+    """Normalises a closed-trade record from any bot (Ticker / Entry Price / PnL ...) into an archive row."""
+    entry_price = float(record['Entry Price'])
+    exit_price = float(record['Exit Price'])
+    qty = float(record['Qty'])
+    gross_pnl = (exit_price - entry_price) * qty if side == "LONG" else (entry_price - exit_price) * qty
+    net_pnl = float(record['PnL'])
+    if brokerage is None:
+        # Bots only store net P&L; brokerage is whatever separates it from gross
+        brokerage = gross_pnl - net_pnl
+    return {
+        "trade_id": trade_id(engine, side, record),
+        "engine": engine, "strategy": strategy, "side": side,
+        "ticker": record['Ticker'], "contract": record.get('Trading Symbol', record['Ticker']),
+        "entry_date": record['Entry Date'], "exit_date": record['Exit Date'],
+        "entry_price": entry_price, "exit_price": exit_price, "qty": qty,
+        "gross_pnl": round(gross_pnl, 2), "brokerage": round(float(brokerage), 2), "net_pnl": round(net_pnl, 2),
+        "exposure": round(entry_price * qty, 2), "reason": record.get('Reason', '')
+    }
+
+# --- ROLLUPS ---
+def load_rollups(engine):
+    """All rollups of one engine: {level: {key: {trades, wins, net_pnl, ...}}, 'total': {...}, 'parts': [...]}."""
+    path = _rollup_path(engine)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f: return json.load(f)
+        except: pass
+    return {level: {} for level in ROLLUP_LEVELS} | {"total": {}, "parts": []}
+
+def _add_to(bucket, row):
+    for field in ROLLUP_FIELDS:
+        bucket.setdefault(field, 0)
+    bucket["trades"] += 1
+    bucket["wins"] += 1 if row["net_pnl"] > 0 else 0
+    for field in ["net_pnl", "gross_pnl", "brokerage", "exposure"]:
+        bucket[field] = round(bucket[field] + row[field], 2)
+
+def _update_rollups(rollups, row):
+    keys = {
+        "daily": row["exit_date"][:10],
+        "monthly": row["exit_date"][:7],
+        "symbol": row["ticker"],
+        "strategy": row["strategy"],
+    }
+    for level, key in keys.items():
+        _add_to(rollups.setdefault(level, {}).setdefault(key, {}), row)
+    _add_to(rollups.setdefault("total", {}), row)
+
+def _rebuilt_rollups(engine):
+    """Rollups recomputed from every part on disk."""
+    rollups = {level: {} for level in ROLLUP_LEVELS} | {"total": {}}
+    for row in scan(engine).to_dict('records'):
+        _update_rollups(rollups, row)
+    rollups["parts"] = [_part_name(engine, p) for p in _parts(engine)]
+    return rollups
+
+def _save_json(path, payload):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f: json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+def rollup_frame(engine, level):
+    """One rollup level as a DataFrame (index = day / month / symbol / strategy) with win rate."""
+    rows = load_rollups(engine).get(level, {})
+    df = pd.DataFrame.from_dict(rows, orient='index', columns=ROLLUP_FIELDS)
+    if not df.empty:
+        df['win_rate'] = (df['wins'] / df['trades'] * 100).round(2)
+        df = df.sort_index()
+    return df
+
+# --- WRITING ---
+def _compact_month(engine, month, rollups):
+    """Folds a month's parts into trades.parquet; parts left by a crash in between are deduplicated on read."""
+    paths = _parts(engine, month)
+    path = os.path.join(_month_dir(engine, month), "trades.parquet")
+    _write_parquet(_read(paths), path)
+    for old in paths:
+        if old != path:
+            os.remove(old)
+    folded = {_part_name(engine, p) for p in paths}
+    rollups["parts"] = sorted(set(rollups["parts"]) - folded | {_part_name(engine, path)})
+
+def archive_trades(engine, strategy, side, records):
+    """
+    Appends closed trades to their month partitions and folds them into the rollups.
+    Trades already archived (same engine, side, ticker, entry and exit time) are skipped,
+    so re-importing a portfolio file is harmless. Returns the number of new trades.
+    """
+    rows = [to_row(engine, strategy, side, r) for r in records]
+    if not rows:
+        return 0
+    with _archive_lock(engine) as locked:
+        if not locked:
+            raise RuntimeError(f"Archive lock {_lock_path(engine)} is held; {len(rows)} trade(s) not archived")
+        rollups = load_rollups(engine)
+        stale = sorted(rollups.get("parts", [])) != [_part_name(engine, p) for p in _parts(engine)]
+        if stale:
+            rollups = _rebuilt_rollups(engine)
+        added = 0
+
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(row["exit_date"][:7], []).append(row)
+
+        for month, month_rows in by_month.items():
+            paths = _parts(engine, month)
+            seen = set(_read(paths, columns=['trade_id'])['trade_id'])
+            fresh = [r for r in month_rows if r["trade_id"] not in seen]
+            # Duplicates inside the same batch
+            fresh = list({r["trade_id"]: r for r in fresh}.values())
+            if not fresh:
+                continue
+
+            path = os.path.join(_month_dir(engine, month), f"part-{fresh[0]['trade_id']}.parquet")
+            _write_parquet(pd.DataFrame(fresh), path)
+            rollups["parts"].append(_part_name(engine, path))
+            for row in fresh:
+                _update_rollups(rollups, row)
+            added += len(fresh)
+            if len(paths) + 1 > MAX_PARTS_PER_MONTH:
+                _compact_month(engine, month, rollups)
+
+        if added or stale:
+            _save_json(_rollup_path(engine), rollups)
+    return added
+
+def archive_trade(engine, strategy, side, record):
+    """Archives one closed trade. Never raises: a failing archive must not stop the bot."""
+    try:
+        return archive_trades(engine, strategy, side, [record])
+    except Exception as e:
+        print(f"⚠️ Trade archive write failed: {e}")
+        return 0
+
+# --- READING ---
+def partitions(engine=None, start_month=None, end_month=None):
+    """Month partition directories matching the engine and inclusive 'YYYY-MM' month range."""
+    pattern = os.path.join(ARCHIVE_DIR, f"engine={engine or '*'}", "month=*")
+    paths = []
+    for path in sorted(glob.glob(pattern)):
+        month = os.path.basename(path).split("=", 1)[1]
+        if start_month and month < start_month: continue
+        if end_month and month > end_month: continue
+        paths.append(path)
+    return paths
+
+def scan(engine=None, start_month=None, end_month=None, columns=None):
+    """Loads only the partitions (and columns) an ad-hoc query needs."""
+    paths = [p for d in partitions(engine, start_month, end_month) for p in sorted(glob.glob(os.path.join(d, "*.parquet")))]
+    return _read(paths, columns)
+
+def import_portfolio(engine, strategy, portfolio_file):
+    """One-off import of the closed trades already sitting in a portfolio JSON."""
+    with open(portfolio_file, 'r') as f:
+        data = json.load(f)
+    return (archive_trades(engine, strategy, "LONG", data.get("closed_longs", [])) +
+            archive_trades(engine, strategy, "SHORT", data.get("closed_shorts", [])))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Columnar trade archive utilities.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    imp = sub.add_parser("import", help="Archive the closed trades of a portfolio JSON")
+    imp.add_argument("engine", choices=["nifty", "dmi", "crypto"])
+    imp.add_argument("portfolio_file")
+    imp.add_argument("--strategy", default=None)
+
+    show = sub.add_parser("rollup", help="Print a rollup table")
+    show.add_argument("engine", choices=["nifty", "dmi", "crypto"])
+    show.add_argument("level", choices=ROLLUP_LEVELS)
+
+    args = parser.parse_args()
+    if args.command == "import":
+        strategy = args.strategy or {"nifty": "ema_trend", "dmi": "rsi_dmi", "crypto": "ema_trend"}[args.engine]
+        added = import_portfolio(args.engine, strategy, args.portfolio_file)
+        print(f"✅ Archived {added} new trades for {args.engine}")
+    else:
+        print(rollup_frame(args.engine, args.level).to_string())
@@ -0,0 +1,216 @@
+import calendar
+import time
+from datetime import date, datetime, timedelta, timezone, time as dt_time
+import numpy as np
+import pandas as pd
+
+# --- EXCHANGE SESSION CALENDAR ---
+# One place that knows when each exchange trades. For every exchange and year the sessions of
+# each day (regular hours, weekends, holidays, special sessions such as Diwali muhurat trading)
+# are compiled once into a minute-resolution open bitmap, and per bar size into the sorted bar
+# closes plus a running count of closes per minute. "Is it open", "when does the next bar
+# close", "which bar closed last" and "how many bars between" are then array lookups.
+#   config.json -> "holidays": ["2026-01-26", ...]            (NSE / NFO)
+#                  "special_sessions": [{"date": "2025-10-21", "start": "13:45", "end": "14:45",
+#                                        "exchanges": ["NSE", "NFO"]}]     (exchanges optional)
+IST = timezone(timedelta(hours=5, minutes=30))
+IST_OFFSET_SECONDS = 19800
+# Regular session of each exchange; bars are anchored at the open and the last one is cut short by the close
+SESSIONS = {
+    "NSE": (dt_time(9, 15), dt_time(15, 30)),
+    "NFO": (dt_time(9, 15), dt_time(15, 30)),
+    "MCX": (dt_time(9, 0), dt_time(23, 30)),
+}
+HOLIDAY_EXCHANGES = ("NSE", "NFO")      # The config's holiday list is NSE's; MCX only skips weekends
+MINUTES_PER_DAY = 1440
+
+def _minutes(t):
+    return t.hour * 60 + t.minute
+
+def _epoch(when):
+    """Epoch seconds of an epoch, a datetime / Timestamp (naive = exchange time) or None (now)."""
+    if when is None:
+        return int(time.time())
+    if isinstance(when, datetime):
+        return int((when if when.tzinfo else when.replace(tzinfo=IST)).timestamp())
+    return int(when)
+
+def _ist(epoch):
+    return datetime.fromtimestamp(epoch, IST)
+
+class _Year:
+    """One exchange-year compiled: open bitmap, and per bar size the closes, bar starts and close counts."""
+
+    def __init__(self, year, day_sessions):
+        self.year = year
+        self.origin = calendar.timegm((year, 1, 1, 0, 0, 0)) - IST_OFFSET_SECONDS
+        self.day_sessions = day_sessions           # [(start_minute, end_minute), ...] per day of the year
+        self.open = np.zeros(len(day_sessions) * MINUTES_PER_DAY, dtype=bool)
+        self.by_sessions = {}
+        for day, sessions in enumerate(day_sessions):
+            for session in sessions:
+                self.open[day * MINUTES_PER_DAY + session[0]:day * MINUTES_PER_DAY + session[1]] = True
+                self.by_sessions.setdefault(session, []).append(day)
+        self.bars = {}
+
+    def minute(self, epoch):
+        return (epoch - self.origin) // 60
+
+    def bar_table(self, bar_minutes):
+        """(closes, starts, count) for a bar size: close / start minute of every bar, closes at or before each minute."""
+        if bar_minutes not in self.bars:
+            closes, starts = [], []
+            for (first, last), days in self.by_sessions.items():
+                begin = np.arange(first, last, bar_minutes)
+                end = np.minimum(begin + bar_minutes, last)
+                base = np.asarray(days)[:, None] * MINUTES_PER_DAY
+                closes.append((base + end).ravel())
+                starts.append((base + begin).ravel())
+            closes = np.concatenate(closes) if closes else np.empty(0, dtype=np.int64)
+            starts = np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+            order = np.argsort(closes, kind='stable')
+            closes, starts = closes[order], starts[order]
+            flags = np.zeros(len(self.open) + 1, dtype=np.int32)
+            np.add.at(flags, closes, 1)
+            self.bars[bar_minutes] = (closes, starts, np.cumsum(flags, dtype=np.int32))
+        return self.bars[bar_minutes]
+
+class TradingCalendar:
+    """Sessions of every exchange, compiled per year on first use. Times are epochs or datetimes (naive = IST)."""
+
+    def __init__(self, holidays=(), special_sessions=(), sessions=SESSIONS):
+        self.sessions = dict(sessions)
+        self.holidays = {pd.Timestamp(h).date() for h in holidays}
+        self.special = {}
+        for spec in special_sessions:
+            day = pd.Timestamp(spec['date']).date()
+            window = (_minutes(dt_time.fromisoformat(spec['start'])), _minutes(dt_time.fromisoformat(spec['end'])))
+            for exchange in spec.get('exchanges', list(self.sessions)):
+                self.special.setdefault((exchange, day), []).append(window)
+        self._years = {}
+
+    # --- COMPILING ---
+    def _regular(self, exchange):
+        start, end = self.sessions.get(exchange, self.sessions["NSE"])
+        return (_minutes(start), _minutes(end))
+
+    def day_sessions(self, exchange, day):
+        """[(start_minute, end_minute)] the exchange trades on `day`: regular hours unless closed, plus special sessions."""
+        regular = self._regular(exchange)
+        closed = day.weekday() >= 5 or (exchange in HOLIDAY_EXCHANGES and day in self.holidays)
+        sessions = [] if closed else [regular]
+        for window in self.special.get((exchange, day), []):
+            if not any(s < window[1] and window[0] < e for s, e in sessions):
+                sessions.append(window)
+        return sorted(sessions)
+
+    def _year(self, exchange, year):
+        key = (exchange, year)
+        if key not in self._years:
+            first = date(year, 1, 1)
+            days = [first + timedelta(days=i) for i in range(366 if calendar.isleap(year) else 365)]
+            self._years[key] = _Year(year, [tuple(self.day_sessions(exchange, d)) for d in days])
+        return self._years[key]
+
+    def _locate(self, exchange, epoch):
+        year = self._year(exchange, datetime.fromtimestamp(epoch + IST_OFFSET_SECONDS, timezone.utc).year)
+        return year, year.minute(epoch)
+
+    @staticmethod
+    def _bar_minutes(bar_seconds):
+        if bar_seconds % 60:
+            raise ValueError(f"bar size must be whole minutes, got {bar_seconds}s")
+        return bar_seconds // 60
+
+    # --- QUERIES ---
+    def is_open(self, exchange, when=None):
+        """True while the exchange is in a session (the close itself is outside it)."""
+        year, minute = self._locate(exchange, _epoch(when))
+        return bool(year.open[minute])
+
+    def is_trading_day(self, exchange, day):
+        return bool(self.day_sessions(exchange, day))
+
+    def trading_days(self, exchange, start, end):
+        """Dates from start to end (inclusive) with at least one session."""
+        return [d.date() for d in pd.date_range(start, end) if self.is_trading_day(exchange, d.date())]
+
+    def session_bounds(self, exchange, day):
+        """[(open, close)] IST datetimes of the sessions on `day`."""
+        midnight = datetime.combine(day, dt_time(0), IST)
+        return [(midnight + timedelta(minutes=s), midnight + timedelta(minutes=e)) for s, e in self.day_sessions(exchange, day)]
+
+    def bars_on(self, exchange, day, bar_seconds):
+        """Bars the sessions of `day` hold (each session's last bar may be cut short by its close)."""
+        bar = self._bar_minutes(bar_seconds)
+        return sum(-(-(e - s) // bar) for s, e in self.day_sessions(exchange, day))
+
+    def history_start(self, exchange, bars, bar_seconds, when=None, max_days=3660):
+        """The latest day whose sessions up to `when`'s day hold at least `bars` bars (weekends and holidays add to the span)."""
+        day = _ist(_epoch(when)).date()
+        total = 0
+        for _ in range(max_days):
+            total += self.bars_on(exchange, day, bar_seconds)
+            if total >= bars:
+                break
+            day -= timedelta(days=1)
+        return day
+
+    def next_bar_close(self, exchange, when=None, bar_seconds=3600, years_ahead=2):
+        """The first bar close strictly after `when` (IST datetime), or None within years_ahead."""
+        bar = self._bar_minutes(bar_seconds)
+        year, minute = self._locate(exchange, _epoch(when))
+        closes, _, count = year.bar_table(bar)
+        position = count[minute]
+        for _ in range(years_ahead + 1):
+            if position < len(closes):
+                return _ist(year.origin + int(closes[position]) * 60)
+            year = self._year(exchange, year.year + 1)
+            closes, _, _ = year.bar_table(bar)
+            position = 0
+        return None
+
+    def last_closed_bar(self, exchange, when=None, bar_seconds=3600, years_back=2):
+        """Start (IST datetime) of the most recent bar that has fully closed at `when`, or None."""
+        bar = self._bar_minutes(bar_seconds)
+        year, minute = self._locate(exchange, _epoch(when))
+        _, starts, count = year.bar_table(bar)
+        position = count[minute]
+        for _ in range(years_back + 1):
+            if position > 0:
+                return _ist(year.origin + int(starts[position - 1]) * 60)
+            year = self._year(exchange, year.year - 1)
+            _, starts, _ = year.bar_table(bar)
+            position = len(starts)
+        return None
+
+    def bars_between(self, exchange, start, end, bar_seconds=3600):
+        """Number of bars closing in (start, end]."""
+        bar = self._bar_minutes(bar_seconds)
+        first, a = self._locate(exchange, _epoch(start))
+        last, b = self._locate(exchange, _epoch(end))
+        if (first.year, a) > (last.year, b):
+            return -self.bars_between(exchange, end, start, bar_seconds)
+        if first.year == last.year:
+            count = first.bar_table(bar)[2]
+            return int(count[b] - count[a])
+        closes, _, count = first.bar_table(bar)
+        total = len(closes) - int(count[a])
+        for y in range(first.year + 1, last.year):
+            total += len(self._year(exchange, y).bar_table(bar)[0])
+        return total + int(last.bar_table(bar)[2][b])
+
+def from_config(config):
+    return TradingCalendar(config.get('holidays', []), config.get('special_sessions', []))
+
+# --- PROCESS-WIDE CALENDAR ---
+# The bots configure it from config.json at start-up and on every reload; everything else reads it.
+_CALENDAR = TradingCalendar()
+
+def configure(config):
+    global _CALENDAR
+    _CALENDAR = from_config(config)
+    return _CALENDAR
+
+def get():
+    return _CALENDAR